@@ -5,7 +5,7 @@ from bot.config.models.core import (
     LoggingConfig,
     ThrottlingConfig,
 )
-from bot.config.models.security import ThreatFilterConfig
+from bot.config.models.security import SecurityConfig, ThreatFilterConfig
 from bot.config.models.services import (
     AchievementServiceConfig,
     AsicServiceConfig,
@@ -26,6 +26,7 @@ __all__ = [
     "FeatureFlags",
     "LoggingConfig",
     "ThrottlingConfig",
+    "SecurityConfig",
     "ThreatFilterConfig",
     "AchievementServiceConfig",
     "AsicServiceConfig",
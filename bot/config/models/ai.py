@@ -16,4 +16,13 @@ class AIConfig(BaseModel):
     max_retries: int = 5
     history_max_size: int = 10
 
-    request_timeout: int = 30
\ No newline at end of file
+    request_timeout: int = 30
+    openai_max_concurrency: int = 8
+    openai_max_connections: int = 16
+
+    # запуск следующего провайдера, если текущий молчит дольше задержки
+    hedge_enabled: bool = True
+    hedge_delay_seconds: float = 3.0
+
+    response_cache_enabled: bool = True
+    response_cache_max_bytes: int = 32 * 1024 * 1024
\ No newline at end of file
@@ -1,5 +1,6 @@
 # bot/config/models/security.py
-from typing import List
+import os
+from typing import List, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
@@ -18,4 +19,72 @@ class ThreatFilterConfig(BaseModel):
     mute_seconds: int = 3600
 
     deny_domains: List[str] = Field(default_factory=list)
-    allow_domains: List[str] = Field(default_factory=list)
\ No newline at end of file
+    allow_domains: List[str] = Field(default_factory=list)
+
+class SecurityConfig(BaseModel):
+    """Антиспам: пороги санкций, хэши изображений, NB-модель, самообучение."""
+
+    model_config = ConfigDict(protected_namespaces=())
+
+    # санкции AntiSpamService
+    warn_threshold: int = 1
+    mute_threshold: int = 2
+    ban_threshold: int = 3
+    window_sec: int = 6 * 60 * 60
+    mute_minutes: int = 60
+
+    # одинаковый текст от разных пользователей (флуд-волна)
+    flood_window_sec: int = 10 * 60
+    flood_min_users: int = 5
+    flood_max_distance: int = 10
+    # "delete" — только удалить сообщение волны; "spam" — как спам (нарушение, мут/бан)
+    flood_action: str = "delete"
+
+    # отпечатки изображений; порог dHash с запасом над расхождением до 6 бит
+    # между хэшем уменьшенной копии и хэшем оригинала (см. bot.utils.image_hash)
+    phash_distance: int = 8
+    phash_probe_radius: int = 0
+    phash_in_memory: bool = True
+    phash_min_side: int = 160
+    phash_ttl_seconds: int = 2592000
+    dct_phash_distance: int = 10
+    whash_distance: int = 8
+    fingerprint_kinds: List[str] = Field(default_factory=lambda: ["dhash", "phash"])
+    image_cache_ttl_sec: int = 7 * 24 * 3600
+
+    # OCR-текст на изображениях и автобан ImageGuard
+    image_spam_patterns: Optional[List[str]] = None
+    image_text_spam_score: int = 5
+    image_spam_autoban_threshold: int = 3
+    window_seconds: int = 86400
+
+    # пул процессов для хэширования
+    image_worker_processes: int = Field(default_factory=lambda: min(2, os.cpu_count() or 1))
+    image_worker_max_pending: int = 64
+    image_worker_queue_timeout: float = 10.0
+
+    # очередь запросов к vision-модели
+    vision_max_concurrency: int = 4
+    vision_max_queue: int = 64
+    vision_max_queue_per_chat: int = 8
+    vision_max_wait: float = 20.0
+
+    # наивный Байес: "hash" — точные счетчики, "sketch" — count-min sketch
+    nb_store: str = "hash"
+    nb_bits: int = 20
+    nb_sketch_width: int = 1 << 16
+    nb_sketch_depth: int = 4
+    nb_half_life_days: float = 14.0
+
+    # самообучаемый антиспам
+    learning_max_phrases: int = 10000
+    learning_max_domains: int = 5000
+    learning_max_samples: int = 1000
+    learning_log_versions: int = 1000
+    learning_cache_ttl_seconds: int = 300
+    learning_min_ratio: int = 80
+    learning_scorer_type: str = "partial_ratio"
+    learning_use_trigrams: bool = False
+    learning_top_k: int = 500
+    learning_domain_min_score: float = 3.0
+    learning_domain_bloom_fp_rate: float = 0.01
@@ -86,6 +86,17 @@ class QuizServiceConfig(BaseModel):
     
     fallback_questions_path: str = "data/quiz_fallback.json"
 
+    # пул заранее сгенерированных вопросов (Redis)
+    pool_enabled: bool = True
+    pool_low_water: int = 20
+    pool_target: int = 100
+    pool_max_size: int = 500
+    refill_batch_size: int = 10
+    refill_check_seconds: int = 300
+    dedup_retention_days: int = 30
+    # часы (UTC), когда пул дополняется до pool_target, даже если он выше low water
+    offpeak_hours_utc: List[int] = Field(default_factory=lambda: [1, 2, 3, 4, 5])
+
 
 class MiningEventServiceConfig(BaseModel):
     model_config = ConfigDict(protected_namespaces=())
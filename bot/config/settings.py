@@ -20,6 +20,7 @@ from bot.config.models import (
     NewsServiceConfig,
     PriceServiceConfig,
     QuizServiceConfig,
+    SecurityConfig,
     ThreatFilterConfig,
     ThrottlingConfig,
 )
@@ -52,6 +53,7 @@ class Settings(BaseSettings):
     news_service: NewsServiceConfig = Field(default_factory=NewsServiceConfig)
     endpoints: EndpointsConfig = Field(default_factory=EndpointsConfig)
     threat_filter: ThreatFilterConfig = Field(default_factory=ThreatFilterConfig)
+    security: SecurityConfig = Field(default_factory=SecurityConfig)
     asic_service: AsicServiceConfig = Field(default_factory=AsicServiceConfig)
     crypto_center: CryptoCenterServiceConfig = Field(default_factory=CryptoCenterServiceConfig)
     quiz: QuizServiceConfig = Field(default_factory=QuizServiceConfig)
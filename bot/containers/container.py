@@ -32,6 +32,8 @@ from bot.config.settings import settings
 from bot.containers.lock import InstanceLockManager
 from bot.containers.wiring import WIRING_MODULES
 from bot.utils.http_client import HTTPClient
+from bot.utils.image_result_cache import ImageResultCache
+from bot.utils.image_worker import shutdown_image_worker
 
 from bot.services.admin_service import AdminService
 from bot.services.user_service import UserService
@@ -181,12 +183,6 @@ class Container(containers.DeclarativeContainer):
         redis=redis_client,
     )
     
-    quiz_service = providers.Singleton(
-        QuizService,
-        redis=redis_client,
-        http_client=http_client,
-    )
-    
     event_service = providers.Singleton(
         EventService,
         redis=redis_client,
@@ -208,15 +204,28 @@ class Container(containers.DeclarativeContainer):
         redis=redis_client,
     )
     
+    ai_service = providers.Singleton(
+        AIService,
+        redis=redis_client,
+    )
+    
+    # один кэш (и один LRU процесса) на vision, image guard, антиспам и SecurityMiddleware
+    image_result_cache = providers.Singleton(
+        ImageResultCache,
+        redis=redis_client,
+    )
+    
     image_vision_service = providers.Singleton(
         ImageVisionService,
-        http_client=http_client,
+        ai_service=ai_service,
+        result_cache=image_result_cache,
     )
     
     image_guard_service = providers.Singleton(
         ImageGuardService,
         redis=redis_client,
         vision_service=image_vision_service,
+        result_cache=image_result_cache,
     )
     
     antispam_learning_service = providers.Singleton(
@@ -227,8 +236,9 @@ class Container(containers.DeclarativeContainer):
     anti_spam_service = providers.Singleton(
         AntiSpamService,
         redis=redis_client,
-        stop_word_service=stop_word_service,
-        learning_service=antispam_learning_service,
+        bot=bot,
+        settings=providers.Object(settings),
+        image_cache=image_result_cache,
     )
     
     security_service = providers.Singleton(
@@ -249,8 +259,10 @@ class Container(containers.DeclarativeContainer):
         security_service=security_service,
     )
     
-    ai_service = providers.Singleton(
-        AIService,
+    quiz_service = providers.Singleton(
+        QuizService,
+        ai_content_service=ai_service,
+        redis=redis_client,
     )
 
 
@@ -368,13 +380,23 @@ async def shutdown_container_resources(container: Container) -> None:
     
     Порядок освобождения (обратный инициализации):
     1. Instance Lock
-    2. HTTP Client
-    3. Bot Session
-    4. Redis Connection
+    2. Image Worker Pool
+    3. AI Provider Connections
+    4. Anti-Spam Service (пул Redis NB sketch)
+    5. Image Guard Service (фоновая перезагрузка реплик хэшей)
+    6. Invalidation Listeners (pub/sub стоп-слов и базы знаний антиспама)
+    7. HTTP Client
+    8. Bot Session
+    9. Redis Connection
     """
     logger.info("🛑 Shutting down container resources...")
     
     await _release_lock(container)
+    _stop_image_worker()
+    await _close_ai_service(container)
+    await _close_anti_spam_service(container)
+    await _close_image_guard_service(container)
+    await _close_invalidation_listeners(container)
     await _close_http_client(container)
     await _close_bot_session(container)
     await _close_redis(container)
@@ -393,6 +415,57 @@ async def _release_lock(container: Container) -> None:
         logger.error(f"⚠️ Error releasing lock: {e}")
 
 
+def _stop_image_worker() -> None:
+    """Останавливает пул процессов обработки изображений."""
+    try:
+        shutdown_image_worker()
+        logger.info("✅ Image worker pool stopped")
+        
+    except Exception as e:
+        logger.error(f"⚠️ Error stopping image worker pool: {e}")
+
+
+async def _close_ai_service(container: Container) -> None:
+    """Закрывает соединения AI провайдеров."""
+    try:
+        await container.ai_service().close()
+        logger.info("✅ AI provider connections closed")
+        
+    except Exception as e:
+        logger.error(f"⚠️ Error closing AI providers: {e}")
+
+
+async def _close_anti_spam_service(container: Container) -> None:
+    """Закрывает собственный пул Redis sketch-модели NB."""
+    try:
+        await container.anti_spam_service().close()
+        logger.info("✅ Anti-spam service closed")
+        
+    except Exception as e:
+        logger.error(f"⚠️ Error closing anti-spam service: {e}")
+
+
+async def _close_image_guard_service(container: Container) -> None:
+    """Останавливает фоновую перезагрузку реплик базы хэшей."""
+    try:
+        await container.image_guard_service().close()
+        logger.info("✅ Image guard service closed")
+        
+    except Exception as e:
+        logger.error(f"⚠️ Error closing image guard service: {e}")
+
+
+async def _close_invalidation_listeners(container: Container) -> None:
+    """Останавливает фоновые подписки на инвалидацию кэшей."""
+    for name in ("stop_word_service", "antispam_learning_service"):
+        try:
+            await getattr(container, name)().close()
+            logger.info(f"✅ {name} invalidation listener stopped")
+            
+        except Exception as e:
+            logger.error(f"⚠️ Error stopping {name} invalidation listener: {e}")
+
+
 async def _close_http_client(container: Container) -> None:
     """Закрывает HTTP Client."""
     try:
@@ -222,11 +222,13 @@ class Application:
         
         Компоненты:
         - Bot Polling (всегда)
+        - Пополнение пула вопросов викторины (всегда)
         - Health Server (только в WEB режиме)
         """
         logger.info("🚀 Starting application components...")
         
         self._start_bot_polling()
+        self._start_quiz_pool_refill()
         
         if settings.IS_WEB_PROCESS:
             self._start_health_server()
@@ -242,6 +244,21 @@ class Application:
         self._tasks.append(bot_task)
         logger.debug("✅ Bot polling task created")
     
+    def _start_quiz_pool_refill(self) -> None:
+        """Создает задачу пополнения пула вопросов викторины."""
+        try:
+            quiz_service = self.container.quiz_service()
+        except Exception as e:
+            logger.warning(f"⚠️ Quiz pool refill not started: {e}")
+            return
+        
+        refill_task = asyncio.create_task(
+            quiz_service.run_refill_worker(),
+            name="quiz_pool_refill"
+        )
+        self._tasks.append(refill_task)
+        logger.debug("✅ Quiz pool refill task created")
+    
     def _start_health_server(self) -> None:
         """Создает задачу для health server."""
         port = int(os.environ.get("PORT", 10000))
@@ -8,6 +8,9 @@ from typing import Optional
 from aiohttp import web
 from loguru import logger
 
+from bot.utils.image_worker import image_worker_stats
+from bot.utils.vision_queue import vision_queue_stats
+
 
 class HealthServer:
     """HTTP сервер для health checks."""
@@ -25,6 +28,7 @@ class HealthServer:
         app.router.add_get("/healthz", self._health_check)
         app.router.add_get("/ready", self._readiness_check)
         app.router.add_get("/live", self._liveness_check)
+        app.router.add_get("/metrics", self._metrics)
         return app
     
     async def _health_check(self, request: web.Request) -> web.Response:
@@ -49,6 +53,13 @@ class HealthServer:
             "service": "cryptobot"
         })
     
+    async def _metrics(self, request: web.Request) -> web.Response:
+        """Метрики внутренних очередей (глубина, задержки)."""
+        return web.json_response({
+            "image_worker": image_worker_stats(),
+            "vision_queue": vision_queue_stats(),
+        })
+    
     async def start(self) -> None:
         """Запуск HTTP сервера."""
         self._app = self._create_app()
@@ -62,6 +73,7 @@ class HealthServer:
         logger.info(f"   - Health: http://{self.host}:{self.port}/health")
         logger.info(f"   - Ready:  http://{self.host}:{self.port}/ready")
         logger.info(f"   - Live:   http://{self.host}:{self.port}/live")
+        logger.info(f"   - Metrics: http://{self.host}:{self.port}/metrics")
         
         # Держим сервер запущенным
         try:
@@ -0,0 +1,196 @@
+# ======================================================================================
+# File: bot/diagnostics/image_hash_benchmark.py
+# Description:
+#   Полнота и задержка поиска почти одинаковых 64-битных хэшей изображений:
+#   прежняя схема (один бакет по старшим 16 битам) против multi-index hashing
+#   (4 полосы по 16 бит, см. bot/utils/multi_index_hash.py) с разным радиусом.
+#   База — случайные хэши, запросы — хэши из базы с d случайно измененными
+#   битами. Redis — fakeredis (или --redis-url на отдельную тестовую базу).
+#
+#   python -m bot.diagnostics.image_hash_benchmark [--size 20000] [--queries 200]
+# ======================================================================================
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from bot.diagnostics.spam_benchmark import percentile
+from bot.utils.multi_index_hash import HashMatch, MultiIndexHashIndex, hamming64
+
+PREFIX_BITS = 16
+BENCH_TTL = 3600
+
+
+class PrefixIndex:
+    """Прежняя схема: один SET на значение старших PREFIX_BITS бит."""
+
+    def __init__(self, redis, max_distance: int):
+        self.redis = redis
+        self.max_distance = max_distance
+        self.probes_per_query = 1
+
+    @staticmethod
+    def _key(image_hash: int) -> str:
+        return f"bench:phash:prefix:{image_hash >> (64 - PREFIX_BITS):04x}"
+
+    async def add_many(self, hashes: Sequence[int]) -> None:
+        pipe = self.redis.pipeline(transaction=False)
+        for h in hashes:
+            pipe.sadd(self._key(h), str(h))
+        await pipe.execute()
+
+    async def find(self, image_hash: int) -> Optional[HashMatch]:
+        best = None
+        for raw in await self.redis.smembers(self._key(image_hash)) or ():
+            distance = hamming64(image_hash, int(raw))
+            if distance <= self.max_distance and (best is None or distance < best.distance):
+                best = HashMatch(image_hash=int(raw), distance=distance)
+        return best
+
+
+class MIHBench:
+    """Обертка MultiIndexHashIndex с пакетной загрузкой базы."""
+
+    def __init__(self, redis, max_distance: int, probe_radius: int):
+        self.index = MultiIndexHashIndex(
+            redis,
+            lambda band, value: f"bench:phash:mih{probe_radius}:{band}:{value:04x}",
+            max_distance=max_distance,
+            ttl_seconds=BENCH_TTL,
+            probe_radius=probe_radius,
+        )
+        self.probes_per_query = len(self.index.probe_keys(0))
+
+    async def add_many(self, hashes: Sequence[int]) -> None:
+        pipe = self.index.redis.pipeline(transaction=False)
+        for h in hashes:
+            for key in self.index.bucket_keys(h):
+                pipe.sadd(key, str(h))
+        await pipe.execute()
+
+    async def find(self, image_hash: int) -> Optional[HashMatch]:
+        return await self.index.find(image_hash)
+
+
+def flip_bits(value: int, count: int, rng: random.Random) -> int:
+    """Меняет count случайных различных бит 64-битного значения."""
+    for pos in rng.sample(range(64), count):
+        value ^= 1 << pos
+    return value
+
+
+async def run_benchmark(
+    redis,
+    *,
+    size: int = 20000,
+    queries: int = 200,
+    max_distance: int = 12,
+    seed: int = 1337,
+) -> Dict[str, Any]:
+    """
+    Сравнивает схемы поиска.
+
+    Args:
+        redis: Клиент Redis (в него пишутся ключи bench:phash:*)
+        size: Размер базы хэшей
+        queries: Запросов на каждое расстояние
+        max_distance: Порог совпадения и максимальное проверяемое расстояние
+        seed: Зерно генератора
+
+    Returns:
+        {"schemes": {имя: {"recall_by_distance", "p50_ms", "p99_ms", ...}}}
+    """
+    rng = random.Random(seed)
+    database = [rng.getrandbits(64) for _ in range(size)]
+
+    schemes = {
+        "prefix16": PrefixIndex(redis, max_distance),
+        "mih4x16_r0": MIHBench(redis, max_distance, probe_radius=0),
+        "mih4x16_r1": MIHBench(redis, max_distance, probe_radius=1),
+    }
+    for scheme in schemes.values():
+        await scheme.add_many(database)
+
+    workload = [
+        (distance, flip_bits(rng.choice(database), distance, rng))
+        for distance in range(max_distance + 1)
+        for _ in range(queries)
+    ]
+
+    results: Dict[str, Any] = {}
+    for name, scheme in schemes.items():
+        found: Dict[int, int] = {}
+        latencies: List[float] = []
+        for distance, query in workload:
+            started = time.perf_counter()
+            match = await scheme.find(query)
+            latencies.append(time.perf_counter() - started)
+            if match is not None:
+                found[distance] = found.get(distance, 0) + 1
+
+        results[name] = {
+            "probes_per_query": scheme.probes_per_query,
+            "recall": round(sum(found.values()) / len(workload), 4),
+            "recall_by_distance": {d: round(found.get(d, 0) / queries, 3) for d in range(max_distance + 1)},
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        }
+
+    return {"size": size, "queries_per_distance": queries, "max_distance": max_distance, "schemes": results}
+
+
+def _format_table(result: Dict[str, Any]) -> str:
+    distances = range(result["max_distance"] + 1)
+    header = f"{'scheme':<12}{'probes':>7}{'p50 ms':>8}{'p99 ms':>8}  " + "".join(f"{f'd={d}':>6}" for d in distances)
+    lines = [header, "-" * len(header)]
+    for name, r in result["schemes"].items():
+        lines.append(
+            f"{name:<12}{r['probes_per_query']:>7}{r['p50_ms']:>8.2f}{r['p99_ms']:>8.2f}  "
+            + "".join(f"{r['recall_by_distance'][d]:>6.2f}" for d in distances)
+        )
+    return "\n".join(lines)
+
+
+async def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Полнота/задержка поиска хэшей изображений")
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200, help="Запросов на каждое расстояние")
+    parser.add_argument("--max-distance", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=1337)
+    parser.add_argument("--redis-url", help="Тестовая база Redis вместо fakeredis")
+    parser.add_argument("--output", type=Path, help="Сохранить результат в JSON")
+    args = parser.parse_args(argv)
+
+    if args.redis_url:
+        from redis.asyncio import Redis
+
+        redis = Redis.from_url(args.redis_url, decode_responses=True)
+    else:
+        try:
+            from fakeredis import FakeAsyncRedis
+        except ImportError:
+            raise SystemExit("Нужен fakeredis или --redis-url на тестовую базу Redis")
+        redis = FakeAsyncRedis(decode_responses=True)
+
+    try:
+        result = await run_benchmark(
+            redis, size=args.size, queries=args.queries, max_distance=args.max_distance, seed=args.seed
+        )
+    finally:
+        await redis.aclose()
+
+    print(_format_table(result))
+    if args.output:
+        args.output.write_text(json.dumps(result, indent=2) + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,454 @@
+# ======================================================================================
+# File: bot/diagnostics/spam_benchmark.py
+# Description:
+#   Бенчмарк классификаторов спама на размеченном корпусе.
+#   Корпус: обезличенные RU/EN примеры (data/spam_corpus.jsonl) + синтетические
+#   варианты с эмодзи, конфузаблами, невидимыми символами, ссылками и длинными
+#   подписями. Классификаторы: AntiSpamService, AntiSpamLearningService.score_text,
+#   AdvancedSecurityService, эвристики SecurityService. Redis — fakeredis
+#   (или --redis-url на отдельную тестовую базу: данные в ней будут изменены).
+#
+#   Отчет: precision/recall, сообщений в секунду, p50/p99 задержки. Результат
+#   сохраняется как JSON-baseline, --check падает при регрессии относительно него.
+#
+#   python -m bot.diagnostics.spam_benchmark [--check | --update-baseline]
+#
+#   Режим по умолчанию (fakeredis с Lua) требует dev-зависимостей:
+#   pip install -r requirements-dev.txt
+# ======================================================================================
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+ROOT = Path(__file__).resolve().parents[2]
+CORPUS_PATH = ROOT / "data" / "spam_corpus.jsonl"
+BASELINE_PATH = ROOT / "data" / "spam_benchmark_baseline.json"
+
+# Допустимое ухудшение относительно baseline
+PRECISION_TOLERANCE = 0.02
+RECALL_TOLERANCE = 0.02
+THROUGHPUT_TOLERANCE = 0.30
+
+# Латиница -> визуально похожая кириллица и наоборот
+CONFUSABLES = {
+    "a": "а", "c": "с", "e": "е", "o": "о", "p": "р", "x": "х", "y": "у",
+    "а": "a", "с": "c", "е": "e", "о": "o", "р": "p", "х": "x", "у": "y",
+}
+ZERO_WIDTH = ("\u200b", "\u200c", "\u200d", "\u2060")
+EMOJI = ("🔥", "🚀", "💰", "✅", "💎", "😊", "👍", "📈")
+SPAM_LINKS = ("t.me/+a1b2c3d4", "bit.ly/3xYzAb", "https://profit-daily.top/join", "www.crypto-bonus.xyz")
+HAM_LINKS = ("https://github.com/braiins/braiins-os", "https://mempool.space", "https://en.bitcoin.it/wiki/Mining")
+HAM_FILLER = (
+    "Фото с фермы после переезда, стойки пока временные.",
+    "Замерил потребление ваттметром, цифры в таблице ниже.",
+    "Here is the log from the control board after reboot.",
+    "Attached a photo of the setup, airflow goes from left to right.",
+)
+
+Verdict = Callable[["Sample", int], Awaitable[bool]]
+
+
+@dataclass(frozen=True)
+class Sample:
+    """Размеченный пример корпуса."""
+    text: str
+    is_spam: bool
+    lang: str = "ru"
+    variant: str = "original"
+
+
+@dataclass
+class ClassifierReport:
+    """Матрица ошибок и задержки одного классификатора."""
+    name: str
+    tp: int = 0
+    fp: int = 0
+    fn: int = 0
+    tn: int = 0
+    errors: int = 0
+    latencies: List[float] = field(default_factory=list)
+
+    def record(self, predicted: bool, actual: bool, elapsed: float) -> None:
+        self.latencies.append(elapsed)
+        if predicted and actual:
+            self.tp += 1
+        elif predicted:
+            self.fp += 1
+        elif actual:
+            self.fn += 1
+        else:
+            self.tn += 1
+
+    @property
+    def precision(self) -> float:
+        return self.tp / (self.tp + self.fp) if self.tp + self.fp else 0.0
+
+    @property
+    def recall(self) -> float:
+        return self.tp / (self.tp + self.fn) if self.tp + self.fn else 0.0
+
+    @property
+    def messages_per_sec(self) -> float:
+        total = sum(self.latencies)
+        return len(self.latencies) / total if total else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "tp": self.tp, "fp": self.fp, "fn": self.fn, "tn": self.tn,
+            "errors": self.errors,
+            "precision": round(self.precision, 4),
+            "recall": round(self.recall, 4),
+            "messages_per_sec": round(self.messages_per_sec, 1),
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 3),
+            "p99_ms": round(percentile(self.latencies, 99) * 1000, 3),
+        }
+
+
+# --------------------------------------------------------------------------------------
+# Метрики и сравнение с baseline (без зависимостей от сервисов)
+# --------------------------------------------------------------------------------------
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Перцентиль по методу ближайшего ранга (0.0 для пустого набора)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def find_regressions(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """
+    Сравнивает результаты с baseline.
+
+    Args:
+        current: Результаты прогона (поле "classifiers")
+        baseline: Сохраненный baseline того же формата
+
+    Returns:
+        Описания регрессий (пустой список, если их нет)
+    """
+    problems = []
+    for name, base in (baseline.get("classifiers") or {}).items():
+        cur = (current.get("classifiers") or {}).get(name)
+        if cur is None:
+            problems.append(f"{name}: нет в текущем прогоне")
+            continue
+        for metric, tolerance in (("precision", PRECISION_TOLERANCE), ("recall", RECALL_TOLERANCE)):
+            if cur[metric] < base[metric] - tolerance:
+                problems.append(f"{name}: {metric} {base[metric]:.3f} -> {cur[metric]:.3f}")
+        if base["messages_per_sec"] and cur["messages_per_sec"] < base["messages_per_sec"] * (1 - THROUGHPUT_TOLERANCE):
+            problems.append(
+                f"{name}: messages_per_sec {base['messages_per_sec']:.0f} -> {cur['messages_per_sec']:.0f}"
+            )
+    return problems
+
+
+# --------------------------------------------------------------------------------------
+# Корпус
+# --------------------------------------------------------------------------------------
+
+def load_corpus(path: Path = CORPUS_PATH) -> List[Sample]:
+    """Читает JSONL-корпус: {"label": "spam"|"ham", "lang": ..., "text": ...}."""
+    samples = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            samples.append(Sample(text=row["text"], is_spam=row["label"] == "spam", lang=row.get("lang", "ru")))
+    return samples
+
+
+def _confusables(text: str, rng: random.Random) -> str:
+    return "".join(CONFUSABLES[ch] if ch in CONFUSABLES and rng.random() < 0.5 else ch for ch in text)
+
+
+def _zero_width(text: str, rng: random.Random) -> str:
+    return "".join(ch + rng.choice(ZERO_WIDTH) if ch.isalpha() and rng.random() < 0.3 else ch for ch in text)
+
+
+def _emoji(text: str, rng: random.Random) -> str:
+    words = text.split()
+    for _ in range(rng.randint(2, 6)):
+        words.insert(rng.randint(0, len(words)), rng.choice(EMOJI))
+    return " ".join(words)
+
+
+def _link(text: str, rng: random.Random, is_spam: bool) -> str:
+    return f"{text} {rng.choice(SPAM_LINKS if is_spam else HAM_LINKS)}"
+
+
+def _long_caption(text: str, rng: random.Random) -> str:
+    filler = " ".join(rng.choice(HAM_FILLER) for _ in range(rng.randint(8, 14)))
+    return f"{filler}\n\n{text}" if rng.random() < 0.5 else f"{text}\n\n{filler}"
+
+
+def synthesize(samples: Sequence[Sample], variants: int = 3, seed: int = 1337) -> List[Sample]:
+    """
+    Детерминированно порождает синтетические варианты примеров.
+
+    Ссылки добавляются к спаму и к части обычных сообщений (полезные
+    ресурсы), чтобы правило "есть ссылка" не давало бесплатный recall.
+
+    Args:
+        samples: Исходные примеры
+        variants: Сколько вариантов на пример
+        seed: Зерно генератора (результат воспроизводим)
+
+    Returns:
+        Новые примеры (исходные не включаются)
+    """
+    rng = random.Random(seed)
+    mutations = ("confusables", "zero_width", "emoji", "link", "long_caption")
+    out = []
+    for sample in samples:
+        for kind in rng.sample(mutations, k=min(variants, len(mutations))):
+            text = sample.text
+            if kind == "confusables":
+                text = _confusables(text, rng)
+            elif kind == "zero_width":
+                text = _zero_width(text, rng)
+            elif kind == "emoji":
+                text = _emoji(text, rng)
+            elif kind == "link":
+                text = _link(text, rng, sample.is_spam)
+            else:
+                text = _long_caption(text, rng)
+            out.append(Sample(text=text, is_spam=sample.is_spam, lang=sample.lang, variant=kind))
+    return out
+
+
+def split(samples: Sequence[Sample], train_ratio: float = 0.3, seed: int = 1337) -> Tuple[List[Sample], List[Sample]]:
+    """Стратифицированное разбиение на обучение (прогрев моделей) и проверку."""
+    rng = random.Random(seed)
+    train: List[Sample] = []
+    test: List[Sample] = []
+    for is_spam in (True, False):
+        group = [s for s in samples if s.is_spam == is_spam]
+        rng.shuffle(group)
+        cut = int(len(group) * train_ratio)
+        train.extend(group[:cut])
+        test.extend(group[cut:])
+    return train, test
+
+
+# --------------------------------------------------------------------------------------
+# Классификаторы
+# --------------------------------------------------------------------------------------
+
+def _make_message(sample: Sample, idx: int):
+    """Настоящий aiogram Message: сервисы читают text, from_user, chat."""
+    from aiogram.types import Chat, Message, User
+
+    return Message(
+        message_id=idx + 1,
+        date=datetime.now(timezone.utc),
+        chat=Chat(id=-100_000_000_001, type="supergroup"),
+        from_user=User(id=10_000 + idx, is_bot=False, first_name="bench"),
+        text=sample.text,
+    )
+
+
+async def build_classifiers(redis, train: Sequence[Sample]) -> Dict[str, Verdict]:
+    """
+    Создает сервисы на переданном Redis и прогревает обучаемые модели.
+
+    Returns:
+        {имя: async (sample, idx) -> является ли спамом}
+    """
+    from types import SimpleNamespace
+
+    from bot.services.advanced_security import AdvancedSecurityService
+    from bot.services.advanced_security.config import SecurityConfig
+    from bot.services.anti_spam_service import AntiSpamService
+    from bot.services.antispam_learning import AntiSpamLearningService
+    from bot.services.security_service import SecurityService
+
+    learning = AntiSpamLearningService(redis)
+    anti_spam = AntiSpamService(redis, bot=None, settings=SimpleNamespace(security=SimpleNamespace()))
+    advanced = AdvancedSecurityService(redis, learning, config=SecurityConfig())
+    security = SecurityService(
+        ai_content_service=None,
+        image_vision_service=None,
+        moderation_service=None,
+        redis_client=redis,
+        bot=None,
+    )
+
+    for sample in train:
+        await anti_spam.learn_from_admin_action(is_spam=sample.is_spam, text=sample.text)
+        if sample.is_spam:
+            await learning.add_feedback(sample.text)
+
+    learning_threshold = getattr(learning.scorer, "min_ratio", 80)
+
+    async def anti_spam_verdict(sample: Sample, idx: int) -> bool:
+        verdict, _ = await anti_spam._classify_message(_make_message(sample, idx))
+        return verdict != "ok"
+
+    async def learning_verdict(sample: Sample, idx: int) -> bool:
+        score, _ = await learning.score_text(sample.text)
+        return score >= learning_threshold
+
+    async def advanced_verdict(sample: Sample, idx: int) -> bool:
+        verdict = await advanced.inspect_message(_make_message(sample, idx))
+        return verdict.score >= advanced.config.SCORE_DELETE
+
+    async def security_verdict(sample: Sample, idx: int) -> bool:
+        if not security._apply_text_heuristics(sample.text).ok:
+            return True
+        return not security._analyze_links(sample.text).ok
+
+    return {
+        "anti_spam_service": anti_spam_verdict,
+        "learning_score_text": learning_verdict,
+        "advanced_security": advanced_verdict,
+        "security_heuristics": security_verdict,
+    }
+
+
+async def _run_classifier(name: str, classify: Verdict, samples: Sequence[Sample], offset: int) -> ClassifierReport:
+    report = ClassifierReport(name=name)
+    for i, sample in enumerate(samples):
+        started = time.perf_counter()
+        try:
+            predicted = await classify(sample, offset + i)
+        except Exception:  # noqa: BLE001
+            report.errors += 1
+            predicted = False
+        report.record(predicted, sample.is_spam, time.perf_counter() - started)
+    return report
+
+
+async def run_benchmark(
+    redis,
+    samples: Sequence[Sample],
+    *,
+    train_ratio: float = 0.3,
+    seed: int = 1337,
+) -> Dict[str, Any]:
+    """
+    Прогоняет все классификаторы по корпусу.
+
+    Args:
+        redis: Клиент Redis (изменяется: обучение, счетчики)
+        samples: Корпус вместе с синтетическими вариантами
+        train_ratio: Доля корпуса для прогрева моделей
+        seed: Зерно разбиения
+
+    Returns:
+        Словарь результатов в формате baseline
+    """
+    train, test = split(samples, train_ratio, seed)
+    classifiers = await build_classifiers(redis, train)
+
+    results: Dict[str, Any] = {}
+    for n, (name, classify) in enumerate(classifiers.items()):
+        # Разные user_id у классификаторов: счетчики повторов не пересекаются
+        report = await _run_classifier(name, classify, test, offset=n * len(test))
+        results[name] = report.to_dict()
+
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "corpus": {
+            "train": len(train),
+            "test": len(test),
+            "spam": sum(s.is_spam for s in test),
+            "ham": sum(not s.is_spam for s in test),
+        },
+        "classifiers": results,
+    }
+
+
+def _format_table(result: Dict[str, Any]) -> str:
+    header = f"{'classifier':<22}{'prec':>7}{'recall':>8}{'msg/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'err':>5}"
+    lines = [header, "-" * len(header)]
+    for name, r in result["classifiers"].items():
+        lines.append(
+            f"{name:<22}{r['precision']:>7.3f}{r['recall']:>8.3f}{r['messages_per_sec']:>10.0f}"
+            f"{r['p50_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['errors']:>5}"
+        )
+    return "\n".join(lines)
+
+
+async def _create_redis(url: Optional[str]):
+    if url:
+        from redis.asyncio import Redis
+
+        return Redis.from_url(url, decode_responses=True)
+    try:
+        from fakeredis import FakeAsyncRedis
+    except ImportError:
+        raise SystemExit(
+            "Нужен fakeredis (pip install -r requirements-dev.txt) "
+            "или --redis-url на тестовую базу Redis"
+        )
+    return FakeAsyncRedis(decode_responses=True)
+
+
+async def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк классификаторов спама")
+    parser.add_argument("--corpus", type=Path, default=CORPUS_PATH)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--redis-url", help="Тестовая база Redis вместо fakeredis (будет изменена)")
+    parser.add_argument("--variants", type=int, default=3, help="Синтетических вариантов на пример")
+    parser.add_argument("--seed", type=int, default=1337)
+    parser.add_argument("--update-baseline", action="store_true", help="Перезаписать baseline")
+    parser.add_argument("--check", action="store_true", help="Код 1 при регрессии относительно baseline")
+    args = parser.parse_args(argv)
+
+    from loguru import logger
+
+    logger.disable("bot")
+
+    base = load_corpus(args.corpus)
+    samples = base + synthesize(base, variants=args.variants, seed=args.seed)
+
+    redis = await _create_redis(args.redis_url)
+    try:
+        result = await run_benchmark(redis, samples, seed=args.seed)
+    finally:
+        await redis.aclose()
+
+    print(_format_table(result))
+
+    from bot.utils.text.normalizer import normalization_stats
+
+    memo = normalization_stats()
+    print(
+        f"\nКэш нормализации: hit_rate={memo['hit_rate']:.2f}, "
+        f"записей={memo['entries']}, bytes_held={memo['bytes_held']}"
+    )
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(result, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"\nBaseline сохранен: {args.baseline}")
+        return 0
+
+    if args.baseline.exists():
+        problems = find_regressions(result, json.loads(args.baseline.read_text(encoding="utf-8")))
+        if problems:
+            print("\nРегрессии относительно baseline:")
+            for problem in problems:
+                print(f"  - {problem}")
+            return 1 if args.check else 0
+        print("\nРегрессий относительно baseline нет")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
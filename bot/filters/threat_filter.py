@@ -10,6 +10,7 @@ from typing import Any, Dict, List, Optional, Union
 from aiogram.filters import BaseFilter
 from aiogram.types import Message, CallbackQuery
 
+from bot.services.message_analysis import MessageAnalysis
 from bot.utils.dependencies import Deps
 
 
@@ -40,14 +41,17 @@ class ThreatFilter(BaseFilter):
             return False
 
         deps: Optional[Deps] = data.get("deps")
+        # Общий контекст сообщения (создается MessageAnalysisMiddleware)
+        analysis = MessageAnalysis.from_data(data, message)
         total_score: float = 0.0
         reasons: List[str] = []
 
         # 1) Попытка использовать полноценный SecurityService (если он есть в DI)
         if deps and getattr(deps, "security_service", None):
             try:
-                verdict = await deps.security_service.analyze_message(text)
-                total_score += float(verdict.score)
+                verdict = await deps.security_service.analyze_message(message, analysis=analysis)
+                if not verdict.ok:
+                    total_score += float(verdict.weight)
                 if verdict.reasons:
                     reasons.extend(verdict.reasons)
             except Exception:
@@ -56,7 +60,7 @@ class ThreatFilter(BaseFilter):
 
         # 2) Легкие эвристики на случай недоступности сервисов
         if total_score == 0.0:
-            lowered = text.lower()
+            lowered = analysis.lowered
             bad_kw = ["http://", "https://", "casino", "airdrop", "giveaway", "usdt", "бинанс промокод"]
             hits = [kw for kw in bad_kw if kw in lowered]
             if hits:
@@ -2,12 +2,14 @@ from __future__ import annotations
 
 import contextlib
 import logging
+import os
+import tempfile
 from typing import Any, Callable, Iterable
 
 from aiogram import Router, F, types
 from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramAPIError
 from aiogram.filters import Command
-from aiogram.types import Message
+from aiogram.types import FSInputFile, Message
 
 from bot.filters.access_filters import PrivilegeFilter, UserRole
 from bot.utils.dependencies import Deps
@@ -275,6 +277,85 @@ async def handle_list_stop_words_command(message: Message, deps: Deps) -> None:
     await message.reply(result)
 
 
+@moderation_router.message(
+    Command("import_spam_hashes", prefix="!/"),
+    PrivilegeFilter(min_role=UserRole.ADMIN),
+)
+async def handle_import_spam_hashes_command(message: Message, deps: Deps) -> None:
+    """
+    Импортирует хэши спам-изображений из файла другого бота.
+    Использование: ответом на файл (или в подписи к нему) -> !/import_spam_hashes [dhash|phash|whash]
+    Формат файла определяется автоматически: текст (хэш на строку) или 8 байт big-endian на хэш.
+    """
+    guard = getattr(deps, "image_guard_service", None)
+    source = message.document or (message.reply_to_message.document if message.reply_to_message else None)
+    if guard is None:
+        await message.reply("⚠️ Сервис защиты изображений недоступен.")
+        return
+    if source is None:
+        await message.reply("⚠️ Отправьте команду ответом на файл с хэшами.")
+        return
+
+    parts = (message.text or message.caption or "").split()
+    kind = parts[1].strip().lower() if len(parts) > 1 else "dhash"
+
+    try:
+        with tempfile.TemporaryFile() as tmp:
+            await message.bot.download(source, destination=tmp)
+            tmp.seek(0)
+            stats = await guard.import_spam_hashes(tmp, kind=kind)
+    except ValueError as e:
+        await message.reply(f"⚠️ {e}")
+        return
+    except Exception as e:
+        logger.error("Import spam hashes failed: %s", e, exc_info=True)
+        await message.reply("Не удалось импортировать хэши.")
+        return
+
+    await message.reply(
+        f"✅ Импорт {kind}: прочитано {stats['read']}, добавлено {stats['added']}, "
+        f"дубликатов {stats['duplicates']}, некорректных строк {stats['invalid']}."
+    )
+
+
+@moderation_router.message(
+    Command("export_spam_hashes", prefix="!/"),
+    PrivilegeFilter(min_role=UserRole.ADMIN),
+)
+async def handle_export_spam_hashes_command(message: Message, deps: Deps) -> None:
+    """
+    Выгружает хэши спам-изображений файлом.
+    Использование: !/export_spam_hashes [dhash|phash|whash] [text|binary]
+    """
+    guard = getattr(deps, "image_guard_service", None)
+    if guard is None:
+        await message.reply("⚠️ Сервис защиты изображений недоступен.")
+        return
+
+    parts = (message.text or "").split()
+    kind = parts[1].strip().lower() if len(parts) > 1 else "dhash"
+    fmt = "binary" if len(parts) > 2 and parts[2].strip().lower() in ("bin", "binary") else "text"
+
+    path = None
+    try:
+        with tempfile.NamedTemporaryFile(suffix=".bin" if fmt == "binary" else ".txt", delete=False) as tmp:
+            path = tmp.name
+            total = await guard.export_spam_hashes(tmp, kind=kind, fmt=fmt)
+        await message.answer_document(
+            FSInputFile(path, filename=f"spam_hashes_{kind}{os.path.splitext(path)[1]}"),
+            caption=f"📤 Хэшей {kind}: {total}",
+        )
+    except ValueError as e:
+        await message.reply(f"⚠️ {e}")
+    except Exception as e:
+        logger.error("Export spam hashes failed: %s", e, exc_info=True)
+        await message.reply("Не удалось выгрузить хэши.")
+    finally:
+        if path:
+            with contextlib.suppress(OSError):
+                os.unlink(path)
+
+
 # ===== Дубли команд на классические префиксы ("/") для совместимости =====
 
 @moderation_router.message(
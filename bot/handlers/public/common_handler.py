@@ -15,6 +15,7 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.enums import ChatType
 
 from bot.filters.not_command_filter import NotCommandFilter
+from bot.utils.ai_response_cache import FAQ_CACHE_TTL
 from bot.utils.dependencies import Deps
 
 logger = logging.getLogger(__name__)
@@ -76,7 +77,8 @@ async def handle_ai_question(message: Message, state: FSMContext, deps: Deps):
         # ✅ ПРАВИЛЬНЫЙ МЕТОД: get_text_response
         ai_answer = await deps.ai_content_service.get_text_response(
             prompt=full_prompt,
-            system_prompt=system_prompt
+            system_prompt=system_prompt,
+            cache_ttl=None if history else FAQ_CACHE_TTL
         )
         
         ai_answer = ai_answer or "Не удалось получить ответ от AI."
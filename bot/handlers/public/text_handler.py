@@ -7,6 +7,9 @@ from aiogram.filters import Command
 from aiogram.types import Message
 from loguru import logger
 
+from bot.utils.ai_response_cache import FAQ_CACHE_TTL
+from bot.utils.telegram_stream import stream_to_message
+
 router = Router(name="text_public")
 
 _PAIR_RE = re.compile(r"^\s*([a-zA-Z]{2,10})\s*[/\s,-]?\s*([a-zA-Z]{2,10})?\s*$")
@@ -63,23 +66,21 @@ async def cmd_ask(message: Message, deps) -> None:
             )
             return
         
-        # Используем правильный метод из AIContentService
-        response = await ai_service.generate_text(
-            prompt=f"Ты - помощник по криптовалютам. Отвечай кратко и понятно на русском языке.\n\nВопрос: {question}",
-            use_flash=True
+        # Ответ показывается по мере генерации: первое сообщение уходит с
+        # первым фрагментом, дальше оно дописывается правками. /ask не
+        # хранит историю, поэтому повторные вопросы отдаются из кэша AI
+        chunks = ai_service.stream_text_response(
+            prompt=question,
+            system_prompt="Ты - помощник по криптовалютам. Отвечай кратко и понятно на русском языке.",
+            cache_ttl=FAQ_CACHE_TTL
         )
+        response = await stream_to_message(message, chunks, header="🤖 <b>Ответ:</b>\n\n")
         
-        if not response or not response.strip():
+        if not response.strip():
             await message.answer(
                 "❌ Не удалось получить ответ. Попробуйте переформулировать вопрос.",
                 parse_mode="HTML"
             )
-            return
-        
-        await message.answer(
-            f"🤖 <b>Ответ:</b>\n\n{response}",
-            parse_mode="HTML"
-        )
         
     except Exception as e:
         logger.exception(f"Error in /ask command: {e}")
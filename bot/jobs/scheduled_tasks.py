@@ -3,10 +3,11 @@
 # Версия: "Distinguished Engineer" — Август 2025 (Asia/Tbilisi)
 # Описание:
 #   Централизованный планировщик фоновых задач на APScheduler (AsyncIOScheduler).
-#   Поддерживает три типовые задачи:
+#   Поддерживает типовые задачи:
 #     • update_coin_list_job      — обновляет и переиндексирует список монет
 #     • warm_price_cache_job      — прогревает кэш котировок (если сервис поддерживает)
 #     • prefetch_news_job         — предзагружает свежие новости в кэш
+#     • decay_nb_model_job        — затухание sketch-модели NB антиспама
 #   Замечание: отправку сообщений намеренно не выполняем внутри задач, чтобы не зависеть
 #   от жизненного цикла бота. Эти джобы безопасны для запуска до start_polling.
 # ======================================================================================
@@ -132,6 +133,18 @@ async def prefetch_news_job(deps: "Deps") -> None:
         logger.info("NewsService не имеет подходящих методов предзагрузки — пропуск.")
 
 
+async def decay_nb_model_job(deps: "Deps") -> None:
+    """
+    Экспоненциальное затухание NB-модели антиспама (только для sketch-хранилища).
+    """
+    svc = getattr(deps, "anti_spam_service", None)
+    if not svc:
+        logger.info("AntiSpamService отсутствует — пропуск затухания NB-модели.")
+        return
+
+    await _call_if_exists(svc, "decay_nb_model")
+
+
 # --------------------------- scheduler bootstrap -------------------------------
 
 async def setup_scheduler(deps: "Deps", dp: "Dispatcher") -> None:
@@ -169,6 +182,7 @@ async def setup_scheduler(deps: "Deps", dp: "Dispatcher") -> None:
         scheduler.add_job(update_coin_list_job, "interval", hours=max(1, coin_hours), args=[deps], id="coin_list_update", replace_existing=True)
         scheduler.add_job(warm_price_cache_job, "interval", minutes=max(1, price_minutes), args=[deps], id="price_cache_warmup", replace_existing=True)
         scheduler.add_job(prefetch_news_job, "interval", minutes=max(10, news_minutes), args=[deps], id="news_prefetch", replace_existing=True)
+        scheduler.add_job(decay_nb_model_job, "interval", hours=6, args=[deps], id="nb_model_decay", replace_existing=True)
     except Exception as e:  # noqa: BLE001
         logger.critical("Ошибка при создании задач в планировщике: %s", e, exc_info=True)
         return
@@ -1,4 +1,5 @@
 # bot/middlewares/__init__.py
 from bot.middlewares.dependencies import DependenciesMiddleware
+from bot.middlewares.message_analysis_middleware import MessageAnalysisMiddleware
 
-__all__ = ["DependenciesMiddleware"]
\ No newline at end of file
+__all__ = ["DependenciesMiddleware", "MessageAnalysisMiddleware"]
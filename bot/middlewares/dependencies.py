@@ -82,6 +82,7 @@ class DependenciesMiddleware(BaseMiddleware):
             'stop_word_service',
             'image_guard_service',
             'image_vision_service',
+            'image_result_cache',
             'advanced_security_service',
             'antispam_learning_service',
         ]
@@ -141,6 +142,7 @@ class DependenciesMiddleware(BaseMiddleware):
             data["stop_word_service"] = self._services_cache.get('stop_word_service')
             data["image_guard_service"] = self._services_cache.get('image_guard_service')
             data["image_vision_service"] = self._services_cache.get('image_vision_service')
+            data["image_result_cache"] = self._services_cache.get('image_result_cache')
             data["advanced_security_service"] = self._services_cache.get('advanced_security_service')
             data["antispam_learning_service"] = self._services_cache.get('antispam_learning_service')
             
@@ -168,6 +170,7 @@ class DependenciesMiddleware(BaseMiddleware):
                 achievement_service=data["achievement_service"],
                 ai_content_service=data["ai_service"],
                 quiz_service=data["quiz_service"],
+                image_result_cache=data["image_result_cache"],
             )
             
             data["deps"] = deps
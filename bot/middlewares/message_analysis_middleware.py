@@ -0,0 +1,28 @@
+# bot/middlewares/message_analysis_middleware.py
+"""
+Middleware, создающий общий контекст анализа сообщения (MessageAnalysis).
+
+Регистрируется внешним middleware для сообщений раньше слоев модерации,
+поэтому все они получают один и тот же объект через data["message_analysis"].
+Сам контекст ленивый: пока к нему не обратились, ничего не вычисляется.
+"""
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import Message, TelegramObject
+
+from bot.services.message_analysis import MessageAnalysis
+
+
+class MessageAnalysisMiddleware(BaseMiddleware):
+    """Кладет MessageAnalysis в data для каждого входящего сообщения."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if isinstance(event, Message):
+            MessageAnalysis.from_data(data, event)
+        return await handler(event, data)
@@ -4,7 +4,8 @@
 # Description:
 #   Inline anti-spam middleware using AIContentService + Redis counters.
 #   - Text moderation (heuristics + optional OpenAI)
-#   - Image spam scoring via Gemini-Vision (if configured)
+#   - Image spam scoring via Gemini-Vision (if configured), cached by file_unique_id
+#   - Known spam images/stickers/GIFs blocked by fingerprint before any vision call
 #   - Progressive enforcement: warn → delete → mute/ban on repeat
 #   - Respects existing SecurityService if present (delegates when available)
 # ======================================================================================
@@ -12,13 +13,19 @@
 from __future__ import annotations
 
 import contextlib
+import json
 import logging
 from typing import Any, Dict
 
 from aiogram import BaseMiddleware
 from aiogram.types import Message
 
+from bot.services.message_analysis import MessageAnalysis
 from bot.utils.dependencies import Deps
+from bot.utils.image_result_cache import ImageResultCache, spam_score_field
+from bot.utils.keys import KeyFactory
+from bot.utils.vision_queue import VisionOverloaded, get_vision_queue
+from bot.utils.violation_counter import ViolationCounter
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +36,14 @@ class SecurityMiddleware(BaseMiddleware):
       1) if deps.security_service has `handle_incoming_update(message, deps)` -> delegate (project's logic)
       2) else:
          - score text via deps.ai_content_service.moderate_text()
+         - for photos/stickers/animations/image documents: look the fingerprint up in
+           deps.image_guard_service's spam hash database first (known spam -> score 1.0)
          - for photos/stickers: estimate spam via deps.ai_content_service.spam_score_image()
+           (verdicts cached per file_unique_id + caption: a forwarded copy costs no download/AI call;
+           calls go through the shared vision queue — bounded concurrency, per-chat fairness,
+           in-flight dedup; when it is saturated the image is not even downloaded and the
+           verdict is heuristics-only);
+           a captionless image scored above delete threshold is added to the hash database
          - maintain counters in Redis; escalate actions on repeat
     """
 
@@ -50,6 +64,9 @@ class SecurityMiddleware(BaseMiddleware):
         self.ban_th = autoban_threshold
         self.window = repeat_window_seconds
         self.repeat_ban = repeat_ban_count
+        # общий кэш контейнера: его LRU процесса видят и остальные слои модерации
+        self.image_cache = getattr(deps, "image_result_cache", None) or ImageResultCache(deps.redis)
+        self.vision_queue = get_vision_queue()
 
     async def __call__(self, handler, event: Message, data: Dict[str, Any]):
         # allow other updates (callbacks etc.)
@@ -57,6 +74,8 @@ class SecurityMiddleware(BaseMiddleware):
             return await handler(event, data)
 
         deps = self.deps
+        analysis = MessageAnalysis.from_data(data, event)
+
         # 0) If project has its own security_service, delegate first
         sec = getattr(deps, "security_service", None)
         if sec is not None and hasattr(sec, "handle_incoming_update"):
@@ -73,41 +92,86 @@ class SecurityMiddleware(BaseMiddleware):
             cues = {}
 
             if event.text or event.caption:
-                text = (event.text or "") + "\n" + (event.caption or "")
                 try:
-                    res = await deps.ai_content_service.moderate_text(text)
+                    res = analysis.scores.get("moderate_text")
+                    if res is None:
+                        res = await deps.ai_content_service.moderate_text(analysis.full_text)
+                        analysis.scores["moderate_text"] = res
                     score = max(score, float(res.get("score", 0.0)))
                     cues.update(res.get("flags", {}))
                 except Exception as e:
                     logger.debug("moderate_text() error: %s", e)
 
-            # Vision for images/stickers/documents (images)
-            if event.photo or (event.sticker and getattr(event.sticker, "is_video", False) is False):
-                # Get best resolution photo bytes
-                images = []
+            # Known spam image (any sticker kind, GIF, image document) -> no vision call
+            guard = getattr(deps, "image_guard_service", None)
+            known_spam = False
+            if guard is not None and analysis.image_unique_id:
                 try:
-                    if event.photo:
-                        photo = event.photo[-1]
-                        file = await event.bot.get_file(photo.file_id)
-                        b = await event.bot.download_file(file.file_path)
-                        images.append(b.read())
-                    elif event.sticker and event.sticker.is_animated is False and event.sticker.file_id:
-                        file = await event.bot.get_file(event.sticker.file_id)
-                        b = await event.bot.download_file(file.file_path)
-                        images.append(b.read())
+                    known_spam, reason = await guard.find_known_spam(event)
+                    if known_spam:
+                        score = 1.0
+                        cues["image_hash"] = reason
                 except Exception as e:
-                    logger.debug("Failed to fetch image bytes: %s", e)
+                    logger.debug("image fingerprint lookup error: %s", e)
 
-                if images:
+            # Vision for images/stickers/documents (images)
+            if not known_spam and (
+                event.photo or (event.sticker and getattr(event.sticker, "is_video", False) is False)
+            ):
+                caption = event.caption or event.text or ""
+                cache_field = spam_score_field(caption)
+                vis = None
+
+                # Same image + same caption already scored -> no download, no AI call
+                cached = await self.image_cache.get(analysis.image_unique_id, cache_field)
+                if cached is not None:
+                    with contextlib.suppress(ValueError):
+                        vis = json.loads(cached)
+
+                chat_key = getattr(event.chat, "id", None)
+                if vis is None and not self.vision_queue.accepts(chat_key):
+                    logger.debug("vision queue saturated, heuristics-only verdict (chat=%s)", chat_key)
+                elif vis is None:
+                    # Get best resolution photo bytes
+                    images = []
                     try:
-                        vis = await deps.ai_content_service.spam_score_image(
-                            caption=(event.caption or event.text or ""),
-                            images=images,
-                        )
-                        score = max(score, float(vis.get("score", 0.0)))
-                        cues.update(vis.get("cues", {}))
+                        image: bytes | None = None
+                        if event.photo:
+                            image = await analysis.photo_bytes(event.bot)
+                        elif event.sticker and event.sticker.is_animated is False and event.sticker.file_id:
+                            image = await analysis.download(event.sticker.file_id, bot=event.bot)
+                        if image:
+                            images.append(image)
                     except Exception as e:
-                        logger.debug("spam_score_image() error: %s", e)
+                        logger.debug("Failed to fetch image bytes: %s", e)
+
+                    if images:
+                        try:
+                            vis = await self.vision_queue.submit(
+                                lambda: deps.ai_content_service.spam_score_image(
+                                    caption=caption,
+                                    images=images,
+                                ),
+                                key=(
+                                    f"spam_score:{analysis.image_unique_id}:{cache_field}"
+                                    if analysis.image_unique_id else None
+                                ),
+                                chat_id=chat_key,
+                            )
+                            if isinstance(vis, dict):
+                                await self.image_cache.set(
+                                    analysis.image_unique_id, cache_field, json.dumps(vis, ensure_ascii=False)
+                                )
+                        except VisionOverloaded as e:
+                            logger.debug("spam_score_image() shed: %s", e)
+                        except Exception as e:
+                            logger.debug("spam_score_image() error: %s", e)
+
+                if isinstance(vis, dict):
+                    # vision verdicts are not written to the fingerprint DB: one false
+                    # positive would block the image in every chat; admins add spam explicitly
+                    score = max(score, float(vis.get("score", 0.0)))
+                    cues.update(vis.get("cues", {}))
 
             # 2) Enforcement based on thresholds + repeats
             if score < self.warn_th:
@@ -119,15 +183,18 @@ class SecurityMiddleware(BaseMiddleware):
             if chat_id is None or user_id is None:
                 return await handler(event, data)
 
-            r = deps.redis
-            key_base = f"sec:chat:{chat_id}:user:{user_id}"
+            # first_ts/score_sum/cnt + окно + порог повтора — один EVALSHA
             try:
-                await r.hsetnx(key_base, "first_ts", int(event.date.timestamp()))
-                await r.hincrbyfloat(key_base, "score_sum", score)
-                c = await r.hincrby(key_base, "cnt", 1)
-                await r.expire(key_base, self.window)
+                escalation = await ViolationCounter(deps.redis).register(
+                    KeyFactory.security_violations(chat_id, user_id),
+                    window_seconds=self.window,
+                    ban_threshold=self.repeat_ban,
+                    score=score,
+                    now=int(event.date.timestamp()),
+                )
+                repeat_ban = escalation.decision == "ban"
             except Exception:
-                c = 1
+                repeat_ban = 1 >= self.repeat_ban
 
             # Action selection
             # a) delete on high score
@@ -146,7 +213,7 @@ class SecurityMiddleware(BaseMiddleware):
 
             # c) autoban if very high score or if repeats exceed N
             #    (mute attempt if ban fails)
-            need_ban = score >= self.ban_th or c >= self.repeat_ban
+            need_ban = score >= self.ban_th or repeat_ban
             if need_ban and event.chat.type in ("group", "supergroup", "channel"):
                 try:
                     await event.bot.ban_chat_member(chat_id=chat_id, user_id=user_id)
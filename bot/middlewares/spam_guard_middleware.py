@@ -11,6 +11,7 @@ from aiogram import BaseMiddleware
 from aiogram.types import Message, TelegramObject
 
 from bot.services.anti_spam_service import AntiSpamService
+from bot.services.message_analysis import MessageAnalysis
 
 class SpamGuardMiddleware(BaseMiddleware):
     def __init__(self, anti_spam: AntiSpamService):
@@ -25,7 +26,8 @@ class SpamGuardMiddleware(BaseMiddleware):
     ) -> Any:
         # Пускаем только входящие сообщения
         if isinstance(event, Message) and event.from_user and not event.from_user.is_bot:
-            verdict = await self.anti_spam.analyze_and_act(event)
+            analysis = MessageAnalysis.from_data(data, event)
+            verdict = await self.anti_spam.analyze_and_act(event, analysis)
             if verdict:  # уже что-то сделали (удалили/замьютили/забанили)
                 return  # не пробрасываем дальше хендлерам
         return await handler(event, data)
\ No newline at end of file
@@ -7,6 +7,8 @@ from typing import Any, Callable, Dict
 from aiogram import BaseMiddleware
 from aiogram.types import Message
 
+from bot.services.message_analysis import MessageAnalysis
+
 class ThreatProtectionMiddleware(BaseMiddleware):
     """
     Middleware that inspects incoming messages and calls SecurityService.
@@ -28,7 +30,9 @@ class ThreatProtectionMiddleware(BaseMiddleware):
 
         # Inspect
         try:
-            verdict = await self.sec.inspect_message(message)
+            verdict = await self.sec.inspect_message(
+                message, analysis=MessageAnalysis.from_data(data, message)
+            )
         except Exception:
             # Never block whole chat if inspection fails
             return await handler(event, data)
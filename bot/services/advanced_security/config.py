@@ -3,7 +3,7 @@
 Конфигурация системы безопасности.
 """
 from dataclasses import dataclass
-from typing import List
+from typing import Dict, List
 
 
 @dataclass
@@ -31,10 +31,15 @@ class SecurityConfig:
     STRIKES_FOR_AUTOBAN: int = 3
     REPEAT_WINDOW_SECONDS: int = 3600  # 1 час
     
+    # Планирование инспекторов
+    CONCURRENT_INSPECTION: bool = True  # False — строго последовательный режим
+    INSPECTOR_TIMEOUTS: Dict[str, float] = None  # бюджет времени, секунды
+    
     # Списки
     SUSPICIOUS_WORDS: List[str] = None
     SUSPICIOUS_TLDS: List[str] = None
     SAFE_DOMAINS: List[str] = None
+    BLACKLIST_DOMAINS: List[str] = None  # домены вместе со всеми поддоменами
     
     def __post_init__(self):
         """Инициализация списков по умолчанию."""
@@ -54,4 +59,16 @@ class SecurityConfig:
             self.SAFE_DOMAINS = [
                 "telegram.org", "t.me", "youtube.com",
                 "github.com", "google.com"
-            ]
\ No newline at end of file
+            ]
+        
+        if self.BLACKLIST_DOMAINS is None:
+            self.BLACKLIST_DOMAINS = []
+        
+        # Незаданные бюджеты берутся по умолчанию
+        self.INSPECTOR_TIMEOUTS = {
+            "text": 1.0,
+            "domain": 2.0,
+            "phrase": 3.0,
+            "image": 10.0,
+            **(self.INSPECTOR_TIMEOUTS or {}),
+        }
\ No newline at end of file
@@ -3,11 +3,12 @@
 Инспектор для анализа доменов в ссылках.
 """
 import re
-from typing import List
+from typing import Iterable, List, Optional
 from urllib.parse import urlparse
 
 from loguru import logger
 
+from bot.utils.domain_trie import DomainSuffixTrie
 from bot.services.advanced_security.inspectors.base import BaseInspector
 from bot.services.advanced_security.models import InspectionResult
 
@@ -24,11 +25,19 @@ class DomainInspector(BaseInspector):
     Инспектор доменов.
     
     Извлекает и анализирует домены из ссылок на:
-    - Присутствие в черном списке (через learning service)
+    - Присутствие в статическом черном списке (включая поддомены)
+    - Присутствие в выученном черном списке (через learning service)
     - Подозрительные TLD
     - Безопасные домены
+    
+    Статические списки и TLD проверяются по суффиксному дереву в памяти,
+    выученный список — через Bloom-фильтр learning service, поэтому
+    для чистых доменов сетевых обращений нет.
     """
     
+    CATEGORY_BLACKLIST = "blacklist"
+    CATEGORY_TLD = "tld"
+    
     def __init__(self, config, learning_service):
         """
         Инициализация инспектора доменов.
@@ -39,24 +48,43 @@ class DomainInspector(BaseInspector):
         """
         super().__init__(config)
         self.learning_service = learning_service
+        
+        self._safe_domains = frozenset(
+            domain.lower() for domain in (self.config.SAFE_DOMAINS or [])
+        )
+        
+        self._suffix_index = DomainSuffixTrie()
+        self._suffix_index.add_many(self.config.SUSPICIOUS_TLDS, self.CATEGORY_TLD)
+        self._suffix_index.add_many(
+            getattr(self.config, 'BLACKLIST_DOMAINS', None),
+            self.CATEGORY_BLACKLIST
+        )
     
-    async def inspect(self, text: str) -> InspectionResult:
+    async def inspect(
+        self,
+        text: str,
+        hostnames: Optional[Iterable[str]] = None
+    ) -> InspectionResult:
         """
         Анализирует домены в тексте.
         
         Args:
             text: Текст с потенциальными ссылками
+            hostnames: Уже извлеченные хосты (из MessageAnalysis),
+                чтобы не разбирать текст повторно
             
         Returns:
             Результат проверки с найденными доменами
         """
         result = InspectionResult()
         
-        if not text:
+        if hostnames is not None:
+            domains = self._filter_safe(hostnames)
+        elif not text:
             return result
-        
-        # Извлекаем домены
-        domains = self._extract_domains(text)
+        else:
+            # Извлекаем домены
+            domains = self._extract_domains(text)
         
         if not domains:
             return result
@@ -97,7 +125,7 @@ class DomainInspector(BaseInspector):
                     hostname_lower = hostname.lower()
                     
                     # Пропускаем безопасные домены
-                    if hostname_lower not in self.config.SAFE_DOMAINS:
+                    if hostname_lower not in self._safe_domains:
                         domains.add(hostname_lower)
             except Exception as e:
                 logger.debug(f"Ошибка парсинга URL '{url}': {e}")
@@ -105,6 +133,14 @@ class DomainInspector(BaseInspector):
         
         return list(domains)
     
+    def _filter_safe(self, hostnames: Iterable[str]) -> List[str]:
+        """Оставляет уникальные хосты, не входящие в список безопасных."""
+        return list({
+            hostname.lower()
+            for hostname in hostnames
+            if hostname and hostname.lower() not in self._safe_domains
+        })
+    
     async def _check_domain(
         self,
         domain: str,
@@ -117,8 +153,13 @@ class DomainInspector(BaseInspector):
             domain: Доменное имя
             result: Результат для добавления оценок
         """
-        # Проверка в черном списке через learning service
-        is_blacklisted = await self.learning_service.is_bad_domain(domain)
+        category = self._suffix_index.match(domain)
+        
+        # Статический черный список или выученный через learning service
+        is_blacklisted = (
+            category == self.CATEGORY_BLACKLIST
+            or await self.learning_service.is_bad_domain(domain)
+        )
         
         if is_blacklisted:
             result.add_reason(
@@ -130,25 +171,10 @@ class DomainInspector(BaseInspector):
             return  # Один плохой домен достаточен
         
         # Проверка подозрительных TLD
-        if self._has_suspicious_tld(domain):
+        if category == self.CATEGORY_TLD:
             result.add_reason(
                 f"suspicious_tld:{domain}",
                 self.config.SUSPICIOUS_TLD_SCORE
             )
             result.metadata["suspicious_tld_domains"] = \
                 result.metadata.get("suspicious_tld_domains", []) + [domain]
-    
-    def _has_suspicious_tld(self, domain: str) -> bool:
-        """
-        Проверяет, имеет ли домен подозрительный TLD.
-        
-        Args:
-            domain: Доменное имя
-            
-        Returns:
-            True если TLD подозрительный
-        """
-        return any(
-            domain.endswith(tld)
-            for tld in self.config.SUSPICIOUS_TLDS
-        )
\ No newline at end of file
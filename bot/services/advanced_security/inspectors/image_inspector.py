@@ -2,7 +2,7 @@
 """
 Инспектор для анализа изображений.
 """
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
 from aiogram import Bot
 from aiogram.types import Message
@@ -11,6 +11,9 @@ from loguru import logger
 from bot.services.advanced_security.inspectors.base import BaseInspector
 from bot.services.advanced_security.models import InspectionResult
 
+if TYPE_CHECKING:
+    from bot.services.message_analysis import MessageAnalysis
+
 
 class ImageInspector(BaseInspector):
     """
@@ -36,7 +39,8 @@ class ImageInspector(BaseInspector):
     async def inspect(
         self,
         message: Message,
-        bot: Bot
+        bot: Bot,
+        analysis: Optional["MessageAnalysis"] = None
     ) -> InspectionResult:
         """
         Анализирует изображение в сообщении.
@@ -44,6 +48,8 @@ class ImageInspector(BaseInspector):
         Args:
             message: Сообщение с потенциальным изображением
             bot: Экземпляр бота для скачивания файла
+            analysis: Общий контекст сообщения (фото скачивается один раз
+                на все слои модерации)
             
         Returns:
             Результат проверки
@@ -55,29 +61,14 @@ class ImageInspector(BaseInspector):
             return result
         
         try:
-            # Выбираем самое большое фото
-            largest_photo = max(
-                message.photo,
-                key=lambda p: (p.width or 0) * (p.height or 0)
-            )
+            if analysis is not None:
+                image_bytes = await analysis.photo_bytes(bot)
+            else:
+                image_bytes = await self._download_largest_photo(message, bot)
             
-            # Скачиваем файл
-            file_info = await bot.get_file(largest_photo.file_id)
-            
-            if not file_info.file_path:
-                logger.warning("Не удалось получить путь к файлу изображения")
+            if not image_bytes:
                 return result
             
-            # Загружаем содержимое
-            file_download = await bot.download_file(file_info.file_path)
-            
-            if not file_download:
-                logger.warning("Не удалось скачать изображение")
-                return result
-            
-            # Читаем байты
-            image_bytes = file_download.read()
-            
             # Анализируем через Vision API
             is_spam, details = await self.vision_service.analyze(image_bytes)
             
@@ -105,4 +96,32 @@ class ImageInspector(BaseInspector):
                 exc_info=True
             )
         
-        return result
\ No newline at end of file
+        return result
+    
+    async def _download_largest_photo(
+        self,
+        message: Message,
+        bot: Bot
+    ) -> Optional[bytes]:
+        """Скачивает самый крупный размер фото из сообщения."""
+        # Выбираем самое большое фото
+        largest_photo = max(
+            message.photo,
+            key=lambda p: (p.width or 0) * (p.height or 0)
+        )
+        
+        # Скачиваем файл
+        file_info = await bot.get_file(largest_photo.file_id)
+        
+        if not file_info.file_path:
+            logger.warning("Не удалось получить путь к файлу изображения")
+            return None
+        
+        # Загружаем содержимое
+        file_download = await bot.download_file(file_info.file_path)
+        
+        if not file_download:
+            logger.warning("Не удалось скачать изображение")
+            return None
+        
+        return file_download.read()
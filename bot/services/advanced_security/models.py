@@ -2,8 +2,9 @@
 """
 Модели данных для системы безопасности.
 """
+from collections import deque
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import Deque, List, Optional
 
 
 @dataclass
@@ -48,4 +49,54 @@ class ThreatMetrics:
     chat_id: int
     strikes: int = 0
     total_score: int = 0
-    last_violation: Optional[float] = None
\ No newline at end of file
+    last_violation: Optional[float] = None
+
+
+@dataclass
+class InspectorStats:
+    """
+    Статистика времени работы одного инспектора.
+    
+    Attributes:
+        calls: Количество завершенных запусков
+        timeouts: Превышения бюджета времени
+        errors: Запуски, завершившиеся исключением
+        cancelled: Отмены после достижения порога бана
+        skipped: Пропуски (порог бана достигнут до запуска)
+        max_ms: Максимальная задержка
+        recent_ms: Задержки последних запусков (для медианы и p95)
+    """
+    calls: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    cancelled: int = 0
+    skipped: int = 0
+    max_ms: float = 0.0
+    recent_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=512))
+    
+    def record(self, latency_ms: float) -> None:
+        """Фиксирует задержку завершенного запуска."""
+        self.calls += 1
+        self.max_ms = max(self.max_ms, latency_ms)
+        self.recent_ms.append(latency_ms)
+    
+    def percentile(self, q: float) -> float:
+        """Возвращает перцентиль задержки по последним запускам."""
+        if not self.recent_ms:
+            return 0.0
+        ordered = sorted(self.recent_ms)
+        index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+        return ordered[index]
+    
+    def to_dict(self) -> dict:
+        """Преобразует в словарь."""
+        return {
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "skipped": self.skipped,
+            "p50_ms": round(self.percentile(0.5), 2),
+            "p95_ms": round(self.percentile(0.95), 2),
+            "max_ms": round(self.max_ms, 2),
+        }
@@ -2,7 +2,9 @@
 """
 Главный сервис продвинутой системы безопасности.
 """
-from typing import Optional
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
 
 from aiogram import Bot
 from aiogram.types import Message
@@ -17,8 +19,9 @@ from bot.services.advanced_security.inspectors import (
     PhraseInspector,
     TextInspector,
 )
-from bot.services.advanced_security.models import InspectionResult
+from bot.services.advanced_security.models import InspectionResult, InspectorStats
 from bot.services.advanced_security.verdict_calculator import VerdictCalculator
+from bot.services.message_analysis import MessageAnalysis
 from bot.utils.models import SecurityVerdict
 
 
@@ -47,12 +50,20 @@ class AdvancedSecurityService:
     
     Функции:
     - Многоуровневый анализ сообщений
+    - Параллельный запуск инспекторов с бюджетом времени и ранним выходом:
+      дешевые (text, domain) выполняются первыми, дорогие (phrase, image)
+      не запускаются или отменяются, как только оценка достигла SCORE_BAN
     - Самообучающаяся система (через learning service)
     - Система страйков с автобаном
     - Анализ изображений (опционально)
     - Детальное логирование и метрики
     """
     
+    # Порядок объединения результатов (и запуска в последовательном режиме)
+    INSPECTOR_ORDER = ("text", "domain", "phrase", "image")
+    CHEAP_INSPECTORS = ("text", "domain")
+    EXPENSIVE_INSPECTORS = ("phrase", "image")
+    
     def __init__(
         self,
         redis: Redis,
@@ -82,6 +93,11 @@ class AdvancedSecurityService:
         # Инициализируем калькулятор вердиктов
         self.verdict_calculator = VerdictCalculator(self.redis, self.config)
         
+        # Метрики задержек по инспекторам
+        self._inspector_stats: Dict[str, InspectorStats] = {
+            name: InspectorStats() for name in self.INSPECTOR_ORDER
+        }
+        
         logger.success("✅ Сервис AdvancedSecurityService инициализирован")
     
     def _load_config(self) -> SecurityConfig:
@@ -104,7 +120,10 @@ class AdvancedSecurityService:
             REPEAT_WINDOW_SECONDS=getattr(threat_config, 'REPEAT_WINDOW_SECONDS', 3600),
             SUSPICIOUS_WORDS=getattr(threat_config, 'SUSPICIOUS_WORDS', None),
             SUSPICIOUS_TLDS=getattr(threat_config, 'SUSPICIOUS_TLDS', None),
+            CONCURRENT_INSPECTION=getattr(threat_config, 'CONCURRENT_INSPECTION', True),
+            INSPECTOR_TIMEOUTS=getattr(threat_config, 'INSPECTOR_TIMEOUTS', None),
             SAFE_DOMAINS=getattr(threat_config, 'SAFE_DOMAINS', None),
+            BLACKLIST_DOMAINS=getattr(threat_config, 'BLACKLIST_DOMAINS', None),
         )
     
     def _init_inspectors(self) -> None:
@@ -131,7 +150,8 @@ class AdvancedSecurityService:
     async def inspect_message(
         self,
         message: Message,
-        bot: Optional[Bot] = None
+        bot: Optional[Bot] = None,
+        analysis: Optional[MessageAnalysis] = None
     ) -> SecurityVerdict:
         """
         Выполняет комплексную проверку сообщения.
@@ -142,6 +162,8 @@ class AdvancedSecurityService:
         Args:
             message: Сообщение для проверки
             bot: Экземпляр бота (для анализа изображений)
+            analysis: Общий контекст сообщения из middleware; если не передан,
+                создается локально (текст, домены и фото разбираются один раз)
             
         Returns:
             Вердикт с действием и причинами
@@ -152,33 +174,28 @@ class AdvancedSecurityService:
             logger.warning("Сообщение без пользователя, пропуск проверки")
             return SecurityVerdict()
         
+        if analysis is None or not analysis.is_for(message):
+            analysis = MessageAnalysis(message, bot=bot)
+        
         # Извлекаем текст
-        text = (message.text or message.caption or "").strip()
+        text = analysis.text.strip()
         
-        # Объединенный результат всех проверок
-        combined_result = InspectionResult()
+        inspections = self._build_inspections(message, text, bot, analysis)
         
-        # Запускаем инспекторы последовательно
         try:
-            # 1. Анализ текста
-            text_result = await self.text_inspector.inspect(text)
-            combined_result.merge(text_result)
-            
-            # 2. Анализ доменов
-            domain_result = await self.domain_inspector.inspect(text)
-            combined_result.merge(domain_result)
-            
-            # 3. Анализ по базе знаний
-            phrase_result = await self.phrase_inspector.inspect(text)
-            combined_result.merge(phrase_result)
-            
-            # 4. Анализ изображений (если есть бот)
-            if bot:
-                image_result = await self.image_inspector.inspect(message, bot)
-                combined_result.merge(image_result)
-        
+            if self.config.CONCURRENT_INSPECTION:
+                results = await self._inspect_concurrent(inspections)
+            else:
+                results = await self._inspect_sequential(inspections)
         except Exception as e:
             logger.error(f"Ошибка при проверке сообщения: {e}", exc_info=True)
+            results = {}
+        
+        # Объединяем в фиксированном порядке, чтобы причины не зависели от гонок
+        combined_result = InspectionResult()
+        for name in self.INSPECTOR_ORDER:
+            if name in results:
+                combined_result.merge(results[name])
         
         # Вычисляем финальный вердикт
         action, reason = await self.verdict_calculator.calculate(
@@ -206,6 +223,158 @@ class AdvancedSecurityService:
         
         return verdict
     
+    def _build_inspections(
+        self,
+        message: Message,
+        text: str,
+        bot: Optional[Bot],
+        analysis: MessageAnalysis
+    ) -> Dict[str, Callable[[], Awaitable[InspectionResult]]]:
+        """Собирает фабрики корутин инспекторов, применимых к сообщению."""
+        inspections = {
+            "text": lambda: self.text_inspector.inspect(text),
+            "domain": lambda: self.domain_inspector.inspect(text, analysis.domains),
+            "phrase": lambda: self.phrase_inspector.inspect(text),
+        }
+        
+        # Анализ изображений (если есть бот)
+        if bot:
+            inspections["image"] = lambda: self.image_inspector.inspect(message, bot, analysis)
+        
+        return inspections
+    
+    async def _inspect_sequential(
+        self,
+        inspections: Dict[str, Callable[[], Awaitable[InspectionResult]]]
+    ) -> Dict[str, InspectionResult]:
+        """Запускает инспекторы строго по очереди."""
+        results: Dict[str, InspectionResult] = {}
+        
+        for name in self.INSPECTOR_ORDER:
+            if name in inspections:
+                result = await self._run_inspector(name, inspections[name])
+                if result is not None:
+                    results[name] = result
+        
+        return results
+    
+    async def _inspect_concurrent(
+        self,
+        inspections: Dict[str, Callable[[], Awaitable[InspectionResult]]]
+    ) -> Dict[str, InspectionResult]:
+        """
+        Запускает инспекторы параллельно с ранним выходом.
+        
+        Сначала параллельно выполняются дешевые инспекторы. Если их суммарная
+        оценка уже достигла SCORE_BAN, дорогие не запускаются. Иначе дорогие
+        запускаются параллельно и отменяются, как только накопленная оценка
+        достигает порога. Оценки неотрицательны, поэтому действие
+        ("ban") от этого не меняется.
+        """
+        results: Dict[str, InspectionResult] = {}
+        
+        cheap = [name for name in self.CHEAP_INSPECTORS if name in inspections]
+        cheap_results = await asyncio.gather(
+            *(self._run_inspector(name, inspections[name]) for name in cheap)
+        )
+        for name, result in zip(cheap, cheap_results):
+            if result is not None:
+                results[name] = result
+        
+        score = sum(result.score for result in results.values())
+        expensive = [name for name in self.EXPENSIVE_INSPECTORS if name in inspections]
+        
+        if score >= self.config.SCORE_BAN:
+            for name in expensive:
+                self._inspector_stats[name].skipped += 1
+            logger.debug(f"Ранний выход: score={score}, пропущены {expensive}")
+            return results
+        
+        tasks = {
+            asyncio.create_task(
+                self._run_inspector(name, inspections[name]),
+                name=f"inspector:{name}"
+            ): name
+            for name in expensive
+        }
+        pending = set(tasks)
+        
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                
+                for task in done:
+                    result = task.result()
+                    if result is not None:
+                        results[tasks[task]] = result
+                        score += result.score
+                
+                if score >= self.config.SCORE_BAN and pending:
+                    cancelled = [tasks[task] for task in pending]
+                    for task in pending:
+                        task.cancel()
+                        self._inspector_stats[tasks[task]].cancelled += 1
+                    await asyncio.gather(*pending, return_exceptions=True)
+                    pending = set()
+                    logger.debug(f"Ранний выход: score={score}, отменены {cancelled}")
+        finally:
+            # Отмена самого inspect_message не должна оставлять висящие задачи
+            for task in pending:
+                task.cancel()
+        
+        return results
+    
+    async def _run_inspector(
+        self,
+        name: str,
+        factory: Callable[[], Awaitable[InspectionResult]]
+    ) -> Optional[InspectionResult]:
+        """
+        Запускает один инспектор с бюджетом времени и замером задержки.
+        
+        Returns:
+            Результат или None при таймауте/ошибке
+        """
+        stats = self._inspector_stats[name]
+        timeout = self.config.INSPECTOR_TIMEOUTS.get(name)
+        started = time.perf_counter()
+        
+        try:
+            result = await asyncio.wait_for(factory(), timeout=timeout)
+        
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            logger.warning(f"Инспектор {name} превысил бюджет {timeout}s")
+            result = None
+        
+        except asyncio.CancelledError:
+            # Отмена учитывается вызывающей стороной
+            raise
+        
+        except Exception as e:
+            stats.errors += 1
+            logger.error(f"Ошибка инспектора {name}: {e}", exc_info=True)
+            result = None
+        
+        stats.record((time.perf_counter() - started) * 1000)
+        return result
+    
+    def get_inspector_stats(self) -> Dict[str, dict]:
+        """
+        Возвращает метрики задержек по инспекторам.
+        
+        Returns:
+            Словарь {инспектор: {calls, timeouts, errors, cancelled,
+            skipped, p50_ms, p95_ms, max_ms}}
+        """
+        return {
+            name: stats.to_dict()
+            for name, stats in self._inspector_stats.items()
+        }
+    
     async def get_user_strikes(self, chat_id: int, user_id: int) -> int:
         """Получает количество страйков пользователя."""
         return await self.verdict_calculator.get_user_strikes(chat_id, user_id)
@@ -1,6 +1,6 @@
 # bot/services/ai/base.py
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 
 class AIProvider(ABC):
@@ -22,6 +22,15 @@ class AIProvider(ABC):
     ) -> str:
         pass
 
+    async def stream_text(
+        self, 
+        prompt: str, 
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7
+    ) -> AsyncIterator[str]:
+        # провайдер без потокового API отдает ответ одним фрагментом
+        yield await self.generate_text(prompt, system_prompt, temperature)
+
     @abstractmethod
     def is_available(self) -> bool:
         pass
@@ -1,6 +1,6 @@
 # bot/services/ai/gemini_provider.py
 import logging
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Dict, Optional
 
 import backoff
 
@@ -120,6 +120,28 @@ class GeminiProvider(AIProvider):
         full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
         return await self._request(self.pro_model, full_prompt, temperature)
 
+    async def stream_text(
+        self, 
+        prompt: str, 
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7
+    ) -> AsyncIterator[str]:
+        if not self.pro_model:
+            raise RuntimeError("Gemini model not initialized")
+        
+        full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
+        response = await self.pro_model.generate_content_async(
+            contents=full_prompt,
+            generation_config=GenerationConfig(temperature=temperature),
+            stream=True
+        )
+        
+        async for chunk in response:
+            # у фрагмента, остановленного фильтрами, нет текста
+            text = chunk.text if chunk.parts else ""
+            if text:
+                yield text
+
     async def generate_json(
         self, 
         prompt: str, 
@@ -1,15 +1,16 @@
 # bot/services/ai/openai_provider.py
 import asyncio
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 import backoff
+import httpx
 
 try:
-    from openai import APIConnectionError, OpenAI, RateLimitError
+    from openai import APIConnectionError, AsyncOpenAI, DefaultAsyncHttpxClient, RateLimitError
     OPENAI_AVAILABLE = True
 except ImportError:
-    OpenAI = None
+    AsyncOpenAI = None
     
     class APIConnectionError(Exception):
         pass
@@ -26,22 +27,58 @@ logger = logging.getLogger(__name__)
 
 
 class OpenAIProvider(AIProvider):
-    def __init__(self, api_key: str, model: str, timeout: int = 30):
+    """
+    Провайдер OpenAI на асинхронном клиенте.
+    
+    Запросы идут через общий пул HTTP-соединений (keep-alive) и не
+    занимают потоки executor'а. Число одновременных запросов ограничено
+    семафором: лишние ждут слота, а не открывают новые соединения.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        timeout: int = 30,
+        max_concurrency: int = 8,
+        max_connections: int = 16
+    ):
+        """
+        Args:
+            api_key: Ключ OpenAI API
+            model: Модель
+            timeout: Таймаут одного запроса (секунды)
+            max_concurrency: Максимум одновременных запросов
+            max_connections: Размер пула HTTP-соединений
+        """
         self.model = model
         self.timeout = timeout
-        self.client: Optional[OpenAI] = None
+        self.client: Optional[AsyncOpenAI] = None
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
         
         if not OPENAI_AVAILABLE:
             logger.warning("⚠️ OpenAI library not available")
             return
         
         try:
-            self.client = OpenAI(api_key=api_key, timeout=timeout)
-            logger.info(f"✅ OpenAI initialized (model: {model})")
+            http_client = DefaultAsyncHttpxClient(
+                timeout=httpx.Timeout(timeout, connect=min(timeout, 10)),
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                ),
+            )
+            self.client = AsyncOpenAI(api_key=api_key, timeout=timeout, http_client=http_client)
+            logger.info(f"✅ OpenAI initialized (model: {model}, concurrency: {max_concurrency})")
         except Exception as e:
             logger.error(f"❌ Failed to initialize OpenAI: {e}")
             self.client = None
 
+    async def close(self) -> None:
+        """Закрывает пул HTTP-соединений."""
+        if self.client is not None:
+            await self.client.close()
+
     def is_available(self) -> bool:
         return self.client is not None
 
@@ -74,10 +111,11 @@ class OpenAIProvider(AIProvider):
         if response_format:
             request_params["response_format"] = response_format
 
-        response = await asyncio.to_thread(
-            self.client.chat.completions.create,
-            **request_params
-        )
+        async with self._semaphore:
+            response = await self.client.chat.completions.create(
+                **request_params,
+                timeout=self.timeout
+            )
         
         return (response.choices[0].message.content or "").strip()
 
@@ -96,6 +134,38 @@ class OpenAIProvider(AIProvider):
         
         return await self._request(messages, temperature)
 
+    async def stream_text(
+        self, 
+        prompt: str, 
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7
+    ) -> AsyncIterator[str]:
+        if not self.client:
+            raise RuntimeError("OpenAI client not initialized")
+        
+        messages = []
+        
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        
+        messages.append({"role": "user", "content": clip_text(prompt, 8000)})
+        
+        # слот семафора занят, пока поток не дочитан
+        async with self._semaphore:
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                stream=True,
+                timeout=self.timeout
+            )
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                await stream.close()
+
     async def generate_json(
         self, 
         prompt: str, 
@@ -4,14 +4,17 @@
 Версия: 3.0.0 Production (07.11.2025)
 """
 import json
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from loguru import logger
+from redis.asyncio import Redis
 
 from bot.config.settings import settings
 from bot.services.ai.gemini_provider import GeminiProvider
 from bot.services.ai.openai_provider import OpenAIProvider
 from bot.services.ai.providers.base import BaseAIProvider
+from bot.utils.ai_response_cache import AIResponseCache, estimate_tokens
+from bot.utils.hedging import AllAttemptsFailed, hedged_call
 from bot.utils.text_utils import clean_json_string
 
 
@@ -23,7 +26,12 @@ class AIContentService:
     - OpenAI (GPT)
     - Google Gemini
     
-    Реализует failover между провайдерами.
+    Реализует failover между провайдерами с хеджированием: если первый
+    провайдер не ответил за hedge_delay_seconds, параллельно запускается
+    следующий и побеждает первый валидный ответ.
+    
+    Ответы на повторяющиеся запросы можно кэшировать в Redis: кэш
+    включается на месте вызова параметром cache_ttl.
     
     Архитектура:
     ┌──────────────────────────────┐
@@ -41,13 +49,30 @@ class AIContentService:
     └──────────┘ └──────────┘
     """
     
-    def __init__(self):
-        """Инициализирует AI сервис с доступными провайдерами."""
+    def __init__(self, redis: Optional[Redis] = None):
+        """
+        Инициализирует AI сервис с доступными провайдерами.
+        
+        Args:
+            redis: Клиент Redis для кэша ответов (без него кэш выключен)
+        """
         self.config = settings.ai
         self.providers: List[BaseAIProvider] = []
         
         self._initialize_providers()
         
+        self.response_cache: Optional[AIResponseCache] = None
+        if redis is not None and getattr(self.config, "response_cache_enabled", True):
+            self.response_cache = AIResponseCache(
+                redis,
+                max_bytes=getattr(self.config, "response_cache_max_bytes", 32 * 1024 * 1024),
+            )
+        # ответ зависит от цепочки провайдеров и их моделей
+        self._model_signature = "|".join(
+            [p.get_name() for p in self.providers]
+            + [self.config.openai_model, self.config.model_name]
+        )
+        
         if not self.providers:
             logger.critical(
                 "❌ No AI providers initialized. "
@@ -80,7 +105,9 @@ class AIContentService:
             openai_provider = OpenAIProvider(
                 api_key=openai_key,
                 model=self.config.openai_model,
-                timeout=self.config.request_timeout
+                timeout=self.config.request_timeout,
+                max_concurrency=getattr(self.config, "openai_max_concurrency", 8),
+                max_connections=getattr(self.config, "openai_max_connections", 16)
             )
             
             if openai_provider.is_available():
@@ -127,7 +154,8 @@ class AIContentService:
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
-        temperature: Optional[float] = None
+        temperature: Optional[float] = None,
+        cache_ttl: Optional[int] = None
     ) -> str:
         """
         Генерирует текстовый ответ от AI.
@@ -138,6 +166,7 @@ class AIContentService:
             prompt: Запрос пользователя
             system_prompt: Системный промпт (необязательно)
             temperature: Температура генерации (необязательно)
+            cache_ttl: Кэшировать ответ на столько секунд (None — без кэша)
         
         Returns:
             Сгенерированный текст или сообщение об ошибке
@@ -148,46 +177,123 @@ class AIContentService:
         
         temp = temperature if temperature is not None else self.config.default_temperature
         
-        for idx, provider in enumerate(self.providers, 1):
-            try:
-                logger.debug(
-                    f"🔄 Attempting text generation with {provider.get_name()} "
-                    f"(provider {idx}/{len(self.providers)})"
-                )
-                
-                result = await provider.generate_text(
-                    prompt,
-                    system_prompt,
-                    temperature=temp
-                )
-                
-                logger.info(
-                    f"✅ Text response generated by {provider.get_name()} "
-                    f"({len(result)} chars)"
-                )
-                
-                return result
-            
-            except Exception as e:
-                logger.warning(
-                    f"⚠️ {provider.get_name()} failed (attempt {idx}/{len(self.providers)}): {e}"
-                )
-                
-                if idx == len(self.providers):
-                    logger.error(
-                        f"❌ All AI providers failed for text generation",
-                        exc_info=True
-                    )
-                
-                continue
-        
-        return "AI service temporarily unavailable. Please try again later."
+        cache_key = self._cache_key(cache_ttl, "text", prompt, system_prompt, None, temp)
+        if cache_key is not None:
+            cached = await self.response_cache.get(cache_key)
+            if isinstance(cached, str):
+                logger.debug("♻️ Text response served from AI cache")
+                return cached
+        
+        try:
+            name, result = await self._race(
+                self.providers,
+                lambda p: p.generate_text(prompt, system_prompt, temperature=temp),
+                parse=self._parse_text,
+            )
+        except AllAttemptsFailed as e:
+            logger.error(f"❌ All AI providers failed for text generation: {e}")
+            return "AI service temporarily unavailable. Please try again later."
+        
+        logger.info(f"✅ Text response generated by {name} ({len(result)} chars)")
+        
+        if cache_key is not None:
+            await self.response_cache.set(
+                cache_key, result,
+                ttl_seconds=cache_ttl,
+                tokens=estimate_tokens(prompt, system_prompt, result),
+            )
+        
+        return result
+    
+    async def stream_text_response(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: Optional[float] = None,
+        cache_ttl: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """
+        Генерирует текстовый ответ потоком фрагментов.
+        
+        Провайдеры соревнуются за первый фрагмент так же, как в
+        get_text_response (хеджирование); после первого фрагмента ответ
+        дочитывается у победителя. Ошибка посреди потока обрывает ответ.
+        
+        Args:
+            prompt: Запрос пользователя
+            system_prompt: Системный промпт (необязательно)
+            temperature: Температура генерации (необязательно)
+            cache_ttl: Кэшировать ответ на столько секунд (None — без кэша)
+        
+        Yields:
+            Фрагменты текста ответа; если ни один провайдер не ответил,
+            поток пуст — сообщение об ошибке показывает вызывающий код
+        """
+        if not self.providers:
+            logger.error("❌ No AI providers available")
+            return
+        
+        temp = temperature if temperature is not None else self.config.default_temperature
+        
+        cache_key = self._cache_key(cache_ttl, "text", prompt, system_prompt, None, temp)
+        if cache_key is not None:
+            cached = await self.response_cache.get(cache_key)
+            if isinstance(cached, str):
+                logger.debug("♻️ Streamed response served from AI cache")
+                yield cached
+                return
+        
+        try:
+            name, (first, stream) = await self._race(
+                self.providers,
+                lambda p: self._first_chunk(p.stream_text(prompt, system_prompt, temperature=temp)),
+                parse=lambda value: value,
+            )
+        except AllAttemptsFailed as e:
+            logger.error(f"❌ All AI providers failed for streaming: {e}")
+            return
+        
+        parts = [first]
+        complete = False
+        try:
+            yield first
+            async for chunk in stream:
+                parts.append(chunk)
+                yield chunk
+            complete = True
+        except Exception as e:
+            logger.warning(f"⚠️ {name} stream interrupted after {len(parts)} chunks: {e}")
+        finally:
+            await stream.aclose()
+        
+        result = "".join(parts)
+        logger.info(f"✅ Text response streamed by {name} ({len(result)} chars)")
+        
+        if complete and cache_key is not None and result.strip():
+            await self.response_cache.set(
+                cache_key, result,
+                ttl_seconds=cache_ttl,
+                tokens=estimate_tokens(prompt, system_prompt, result),
+            )
+    
+    @staticmethod
+    async def _first_chunk(stream: AsyncIterator[str]) -> Tuple[str, AsyncIterator[str]]:
+        """Ждет первый непустой фрагмент потока; пустой поток — ошибка провайдера."""
+        try:
+            async for chunk in stream:
+                if chunk:
+                    return chunk, stream
+            raise ValueError("empty stream")
+        except BaseException:
+            await stream.aclose()
+            raise
     
     async def get_structured_response(
         self,
         prompt: str,
         json_schema: Dict[str, Any],
-        temperature: Optional[float] = None
+        temperature: Optional[float] = None,
+        cache_ttl: Optional[int] = None
     ) -> Optional[Dict[str, Any]]:
         """
         Генерирует структурированный JSON ответ от AI.
@@ -196,6 +302,7 @@ class AIContentService:
             prompt: Запрос с описанием требуемой структуры
             json_schema: Схема ожидаемого JSON
             temperature: Температура генерации
+            cache_ttl: Кэшировать ответ на столько секунд (None — без кэша)
         
         Returns:
             Распарсенный JSON или None при ошибке
@@ -206,49 +313,99 @@ class AIContentService:
         
         temp = temperature if temperature is not None else self.config.default_temperature
         
-        for idx, provider in enumerate(self.providers, 1):
-            try:
-                logger.debug(
-                    f"🔄 Attempting JSON generation with {provider.get_name()} "
-                    f"(provider {idx}/{len(self.providers)})"
-                )
-                
-                raw_json = await provider.generate_json(
-                    prompt,
-                    json_schema,
-                    temperature=temp
-                )
-                
-                cleaned = clean_json_string(raw_json)
-                result = json.loads(cleaned)
-                
-                logger.info(
-                    f"✅ JSON response generated by {provider.get_name()}"
-                )
-                
-                return result
-            
-            except json.JSONDecodeError as e:
-                logger.error(
-                    f"❌ JSON decode error from {provider.get_name()}: {e}\n"
-                    f"Raw response: {raw_json[:200]}..."
-                )
-                continue
-            
-            except Exception as e:
-                logger.warning(
-                    f"⚠️ {provider.get_name()} failed (attempt {idx}/{len(self.providers)}): {e}"
-                )
-                
-                if idx == len(self.providers):
-                    logger.error(
-                        "❌ All AI providers failed for JSON generation",
-                        exc_info=True
-                    )
-                
-                continue
-        
-        return None
+        cache_key = self._cache_key(cache_ttl, "json", prompt, None, json_schema, temp)
+        if cache_key is not None:
+            cached = await self.response_cache.get(cache_key)
+            if cached is not None:
+                logger.debug("♻️ JSON response served from AI cache")
+                return cached
+        
+        try:
+            name, (result, raw_json) = await self._race(
+                self.providers,
+                lambda p: p.generate_json(prompt, json_schema, temperature=temp),
+                parse=self._parse_json,
+            )
+        except AllAttemptsFailed as e:
+            logger.error(f"❌ All AI providers failed for JSON generation: {e}")
+            return None
+        
+        logger.info(f"✅ JSON response generated by {name}")
+        
+        if cache_key is not None and result is not None:
+            await self.response_cache.set(
+                cache_key, result,
+                ttl_seconds=cache_ttl,
+                tokens=estimate_tokens(prompt, json.dumps(json_schema), raw_json),
+            )
+        
+        return result
+    
+    async def _race(
+        self,
+        providers: List[BaseAIProvider],
+        call: Callable[[BaseAIProvider], Awaitable[Any]],
+        parse: Callable[[Any], Any]
+    ) -> Tuple[str, Any]:
+        """
+        Опрашивает провайдеров с хеджированием (см. bot.utils.hedging).
+        
+        Следующий провайдер запускается, если предыдущий не ответил за
+        ai.hedge_delay_seconds или ответил ошибкой/невалидным ответом;
+        возвращается первый валидный ответ, остальные вызовы отменяются.
+        
+        Args:
+            providers: Провайдеры в порядке приоритета
+            call: Вызов провайдера
+            parse: Проверка ответа (исключение — ответ невалиден)
+        
+        Returns:
+            (имя провайдера, разобранный ответ)
+        
+        Raises:
+            AllAttemptsFailed: Ни один провайдер не дал валидный ответ
+        """
+        hedge_delay = (
+            getattr(self.config, "hedge_delay_seconds", 3.0)
+            if getattr(self.config, "hedge_enabled", True)
+            else None
+        )
+        return await hedged_call(
+            [(p.get_name(), lambda p=p: call(p)) for p in providers],
+            hedge_delay=hedge_delay,
+            parse=parse,
+        )
+    
+    @staticmethod
+    def _parse_text(raw: Any) -> str:
+        """Текстовый ответ валиден, если он не пустой."""
+        if not isinstance(raw, str) or not raw.strip():
+            raise ValueError("empty text response")
+        return raw
+    
+    @staticmethod
+    def _parse_json(raw: str) -> Tuple[Any, str]:
+        """Разбирает JSON ответа; невалидный JSON — ошибка попытки."""
+        try:
+            return json.loads(clean_json_string(raw)), raw
+        except json.JSONDecodeError as e:
+            raise ValueError(f"invalid JSON ({e}): {raw[:200]}...") from e
+    
+    def _cache_key(
+        self,
+        cache_ttl: Optional[int],
+        kind: str,
+        prompt: str,
+        system_prompt: Optional[str],
+        json_schema: Optional[Dict[str, Any]],
+        temperature: float
+    ) -> Optional[str]:
+        """Ключ кэша ответа или None, если кэш для вызова не включен."""
+        if not cache_ttl or self.response_cache is None:
+            return None
+        return self.response_cache.make_key(
+            kind, prompt, system_prompt, json_schema, self._model_signature, temperature
+        )
     
     async def analyze_image(
         self,
@@ -283,43 +440,18 @@ class AIContentService:
         else:
             schema_prompt = prompt
         
-        for idx, provider in enumerate(vision_providers, 1):
-            try:
-                logger.debug(
-                    f"🔄 Attempting image analysis with {provider.get_name()} "
-                    f"(provider {idx}/{len(vision_providers)})"
-                )
-                
-                raw_json = await provider.analyze_image(
-                    schema_prompt,
-                    image_bytes
-                )
-                
-                cleaned = clean_json_string(raw_json)
-                result = json.loads(cleaned)
-                
-                logger.info(
-                    f"✅ Image analyzed by {provider.get_name()}"
-                )
-                
-                return result
-            
-            except json.JSONDecodeError as e:
-                logger.error(
-                    f"❌ JSON decode error in image analysis: {e}\n"
-                    f"Raw response: {raw_json[:200]}..."
-                )
-                continue
-            
-            except Exception as e:
-                logger.error(
-                    f"❌ Image analysis failed with {provider.get_name()}: {e}",
-                    exc_info=True
-                )
-                continue
+        try:
+            name, (result, _) = await self._race(
+                vision_providers,
+                lambda p: p.analyze_image(schema_prompt, image_bytes),
+                parse=self._parse_json,
+            )
+        except AllAttemptsFailed as e:
+            logger.error(f"❌ All vision providers failed for image analysis: {e}")
+            return None
         
-        logger.error("❌ All vision providers failed for image analysis")
-        return None
+        logger.info(f"✅ Image analyzed by {name}")
+        return result
     
     @staticmethod
     def _build_image_analysis_prompt(base_prompt: str) -> str:
@@ -346,6 +478,13 @@ class AIContentService:
         
         return base_prompt + schema_description
     
+    async def close(self) -> None:
+        """Закрывает HTTP-соединения провайдеров."""
+        for provider in self.providers:
+            close = getattr(provider, "close", None)
+            if close is not None:
+                await close()
+    
     def is_available(self) -> bool:
         """
         Проверяет доступность AI сервиса.
@@ -383,7 +522,8 @@ class AIContentService:
                     "available": p.is_available()
                 }
                 for p in self.providers
-            ]
+            ],
+            "response_cache": self.response_cache.get_stats() if self.response_cache else None,
         }
 
 
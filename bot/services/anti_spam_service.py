@@ -8,48 +8,40 @@ from __future__ import annotations
 
 import contextlib
 import hashlib
-import html
 import io
 import math
 import re
 import time
 from dataclasses import dataclass
-from typing import Any, Dict, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
 
 from aiogram import Bot
 from aiogram.types import Message, PhotoSize
-from PIL import Image, ImageOps  # pillow
+
+from bot.utils.image_hash import DEFAULT_MIN_SIDE, pick_hash_source, pick_photo_for_hashing
+from bot.utils.image_result_cache import ImageResultCache, image_unique_id
+from bot.utils.image_worker import get_image_worker
+from bot.utils.keys import KeyFactory
+from bot.utils.multi_index_hash import MultiIndexHashIndex
+from bot.utils.nb_sketch_store import NBSketchStore
+from bot.utils.near_duplicate import NearDuplicateDetector
+from bot.utils.text.normalizer import normalize_spam_text as normalize_text
+from bot.utils.violation_counter import ViolationCounter
+
+if TYPE_CHECKING:
+    from bot.services.message_analysis import MessageAnalysis
 
 # --- Small utilities ---------------------------------------------------------
 
-ZERO_WIDTH_RE = re.compile(r"[\u200B-\u200F\uFEFF]", re.UNICODE)
 URL_RE = re.compile(r"(https?://|www\.)\S+", re.IGNORECASE)
 CONTACT_RE = re.compile(r"(?:t\.me/|@[\w\d_]{4,}|wa\.me/\d+|https?://\S*telegram\.me/\S+)", re.IGNORECASE)
 MASS_REPEAT_RE = re.compile(r"(.)\1{6,}")  # 7+ одинаковых символов подряд
 EMOJI_SPAM_RE = re.compile(r"(?:[\U0001F300-\U0001FAFF]\uFE0F?){8,}")
 
-# Латиница↔кириллица часто обфусцируют одинаково выглядящими символами.
-CONFUSABLES = str.maketrans(
-    {
-        "о": "o", "О": "O", "а": "a", "А": "A", "е": "e", "Е": "E",
-        "р": "p", "Р": "P", "с": "c", "С": "C", "х": "x", "Х": "X",
-        "у": "y", "У": "Y", "к": "k", "К": "K", "В": "B", "Т": "T",
-        "М": "M", "Н": "H",
-    }
-)
-LEET = str.maketrans({"0": "o", "1": "l", "3": "e", "4": "a", "5": "s", "7": "t"})
-
-def normalize_text(text: str) -> str:
-    txt = text or ""
-    txt = html.unescape(txt)
-    txt = ZERO_WIDTH_RE.sub("", txt)
-    txt = txt.translate(CONFUSABLES)
-    txt = txt.translate(LEET)
-    txt = txt.lower()
-    # нормализуем пробелы/пунктуацию
-    txt = re.sub(r"[^a-z0-9а-яё@#\.\:/\-\s]", " ", txt)
-    txt = re.sub(r"\s+", " ", txt).strip()
-    return txt
+
+def _is_image_document(m: Message) -> bool:
+    return bool(m.document and (m.document.mime_type or "").startswith("image/"))
+
 
 def sha1_short(data: bytes, nbits: int = 64) -> int:
     h = hashlib.sha1(data).digest()
@@ -98,10 +90,17 @@ class AntiSpamService:
     Самодостаточный антиспам:
       - текст: эвристики + онлайн NB с feature hashing;
       - картинки: dHash (64 бита) + Hamming, Redis-бакеты по префиксу;
+      - рейды: SimHash текста + LSH-бакеты, N разных авторов за окно;
       - эскалация по Redis-счётчикам.
     """
 
-    def __init__(self, redis, bot: Bot, settings: Optional[Any] = None):
+    def __init__(
+        self,
+        redis,
+        bot: Bot,
+        settings: Optional[Any] = None,
+        image_cache: Optional[ImageResultCache] = None,
+    ):
         self.r = redis
         self.bot = bot
         self.settings = settings
@@ -115,24 +114,69 @@ class AntiSpamService:
         self.mute_minutes = getattr(sec, "mute_minutes", 60)              # длительность мута
 
         # image hashing
-        self.phash_prefix_bits = getattr(sec, "phash_prefix_bits", 16)
-        self.phash_distance = getattr(sec, "phash_distance", 10)          # 64-битный dHash; 8–12 обычно разумно
+        self.phash_distance = getattr(sec, "phash_distance", 8)           # 64-битный dHash; 8–12 обычно разумно
+        self.phash_min_side = getattr(sec, "phash_min_side", DEFAULT_MIN_SIDE)  # размер копии фото для хэша
+        # поиск по 4 полосам по 16 бит (multi-index hashing) вместо одного префикса
+        self.phash_index = MultiIndexHashIndex(
+            redis,
+            KeyFactory.antispam_phash_band,
+            max_distance=self.phash_distance,
+            ttl_seconds=14 * 24 * 3600,
+            probe_radius=getattr(sec, "phash_probe_radius", 0),
+        )
+        self.image_worker = get_image_worker()
+        # dHash по file_unique_id: пересланная копия не скачивается повторно
+        self.image_cache = image_cache or ImageResultCache(
+            redis, ttl_seconds=getattr(sec, "image_cache_ttl_sec", 7 * 24 * 3600)
+        )
 
         # NB model
         self.nb = NBModel(n_bits=getattr(sec, "nb_bits", 20), alpha=1.0)
 
+        # альтернативное хранилище NB: count-min sketch фиксированного размера
+        # с затуханием вместо HASH'ей с EXPIRE на всю модель
+        self.nb_sketch: Optional[NBSketchStore] = None
+        if getattr(sec, "nb_store", "hash") == "sketch":
+            self.nb_sketch = NBSketchStore(
+                redis,
+                alpha=self.nb.alpha,
+                vocab_size=self.nb.vocab_size,
+                width=getattr(sec, "nb_sketch_width", 1 << 16),
+                depth=getattr(sec, "nb_sketch_depth", 4),
+                half_life_days=getattr(sec, "nb_half_life_days", 14.0),
+            )
+
+        # атомарный счётчик нарушений + эскалация (один EVALSHA)
+        self.violations = ViolationCounter(redis)
+
+        # рейды: почти одинаковые тексты от разных пользователей (SimHash + LSH)
+        self.near_dup = NearDuplicateDetector(
+            redis,
+            window_seconds=getattr(sec, "flood_window_sec", 10 * 60),
+            min_users=getattr(sec, "flood_min_users", 5),
+            max_distance=getattr(sec, "flood_max_distance", 10),
+        )
+        # совпадение с волной — слабое доказательство против отдельного
+        # пользователя, поэтому по умолчанию сообщение только удаляется
+        self.flood_action = getattr(sec, "flood_action", "delete")
+
     # ---------- public API ----------------------------------------------------
 
-    async def analyze_and_act(self, message: Message) -> Optional[str]:
+    async def analyze_and_act(
+        self, message: Message, analysis: Optional["MessageAnalysis"] = None
+    ) -> Optional[str]:
         """
         Возвращает строку с действием для логов (или None), применяет меры:
         delete / warn / mute / ban (эскалация).
+
+        analysis — общий контекст сообщения (нормализованный текст, скачанные
+        файлы), чтобы не повторять работу других слоев модерации.
         """
         # только для чатов/групп
         if not message.chat or message.chat.type == "private":
             return None
 
-        verdict, reason = await self._classify_message(message)
+        verdict, reason = await self._classify_message(message, analysis)
 
         if verdict == "ok":
             return None
@@ -141,13 +185,17 @@ class AntiSpamService:
         with contextlib.suppress(Exception):
             await message.delete()
 
-        # увеличиваем счётчик нарушений пользователя
-        count = await self._bump_user_violations(message.chat.id, message.from_user.id)
+        # волна почти одинаковых текстов: без нарушения и эскалации
+        if verdict == "flood":
+            return f"delete:{reason}"
 
-        if count >= self.ban_threshold:
+        # увеличиваем счётчик нарушений пользователя и получаем решение
+        decision = await self._bump_user_violations(message.chat.id, message.from_user.id)
+
+        if decision == "ban":
             await self._ban_user(message.chat.id, message.from_user.id, reason)
             action = "ban"
-        elif count >= self.mute_threshold:
+        elif decision == "mute":
             await self._mute_user(message.chat.id, message.from_user.id)
             action = "mute"
         else:
@@ -168,21 +216,32 @@ class AntiSpamService:
 
     # ---------- core classification ------------------------------------------
 
-    async def _classify_message(self, m: Message) -> Tuple[str, str]:
+    async def _classify_message(
+        self, m: Message, analysis: Optional["MessageAnalysis"] = None
+    ) -> Tuple[str, str]:
         # 1) быстрые правила
-        raw_txt = (m.text or m.caption or "")[:4096]
-        txt = normalize_text(raw_txt)
+        if analysis is not None:
+            txt = analysis.spam_normalized
+        else:
+            txt = normalize_text((m.text or m.caption or "")[:4096])
 
         heuristics = self._heuristics(txt, m)
         if heuristics:
             return "spam", heuristics  # уже понятно
 
-        # 2) dHash изображений (если есть)
-        if m.photo:
-            if await self._is_spam_image(m):
+        # 2) массовая рассылка почти одинаковых текстов
+        if m.from_user:
+            dup = await self.near_dup.check(txt, m.from_user.id)
+            if dup and dup.is_flood:
+                verdict = "spam" if self.flood_action == "spam" else "flood"
+                return verdict, f"near-dup:{dup.distinct_users}"
+
+        # 3) dHash изображений (если есть): фото и картинки, отправленные файлом
+        if m.photo or _is_image_document(m):
+            if await self._is_spam_image(m, analysis):
                 return "spam", "image-similar"
 
-        # 3) Байес — мягкий сигнал
+        # 4) Байес — мягкий сигнал
         prob_spam = await self._nb_predict(txt)
         if prob_spam >= 0.92:
             return "spam", f"nb:{prob_spam:.2f}"
@@ -198,18 +257,20 @@ class AntiSpamService:
             return "mass-repeat"
         if EMOJI_SPAM_RE.search(txt):
             return "emoji-mass"
-        # файлы-изображения как документ
-        if m.document and (m.document.mime_type or "").startswith("image/"):
-            return "image-doc"
         return None
 
     # ---------- Redis counters / escalation ----------------------------------
 
-    async def _bump_user_violations(self, chat_id: int, user_id: int) -> int:
-        key = f"antispam:viol:{chat_id}:{user_id}"
-        count = await self.r.incr(key)
-        await self.r.expire(key, self.window_sec)
-        return int(count)
+    async def _bump_user_violations(self, chat_id: int, user_id: int) -> str:
+        """Инкремент + окно + выбор меры одним Lua-вызовом. Возвращает warn/mute/ban."""
+        result = await self.violations.register(
+            KeyFactory.antispam_violations(chat_id, user_id),
+            window_seconds=self.window_sec,
+            warn_threshold=self.warn_threshold,
+            mute_threshold=self.mute_threshold,
+            ban_threshold=self.ban_threshold,
+        )
+        return result.decision
 
     async def _mute_user(self, chat_id: int, user_id: int) -> None:
         until = int(time.time()) + self.mute_minutes * 60
@@ -229,55 +290,62 @@ class AntiSpamService:
 
     # ---------- Image hashing (dHash 64-bit) ---------------------------------
 
-    async def _is_spam_image(self, m: Message) -> bool:
+    async def _is_spam_image(self, m: Message, analysis: Optional["MessageAnalysis"] = None) -> bool:
         try:
-            ph = await self._message_dhash(m)
+            ph = await self._message_dhash(m, analysis)
         except Exception:
             return False
         if ph is None:
             return False
-        # префикс-бакет по старшим self.phash_prefix_bits
-        pref = ph >> (64 - self.phash_prefix_bits)
-        key = f"antispam:phash:{pref:0{self.phash_prefix_bits//4}x}"
-
-        # проверяем соседей
-        candidates = await self.r.smembers(key)
-        for c in candidates or []:
-            other = int(c)
-            if hamming64(ph, other) <= self.phash_distance:
-                return True
+        # проверяем соседей по всем полосам одним pipeline
+        if await self.phash_index.find(ph):
+            return True
 
         # не спам — добавим в индекс (TTL чтобы не пухло)
-        await self.r.sadd(key, str(int(ph)))
-        await self.r.expire(key, 14 * 24 * 3600)
+        await self.phash_index.add(ph)
         return False
 
-    async def _message_dhash(self, m: Message) -> Optional[int]:
+    async def _message_dhash(self, m: Message, analysis: Optional["MessageAnalysis"] = None) -> Optional[int]:
+        if analysis is not None and "dhash" in analysis.hashes:
+            return analysis.hashes["dhash"]
+
+        unique_id = image_unique_id(m)
+        cached = await self.image_cache.get_dhash(unique_id)
+        if cached is not None:
+            if analysis is not None:
+                analysis.hashes["dhash"] = cached
+            return cached
+
         file_id: Optional[str] = None
-        # возьмём самое крупное фото
+        # для 9x8 хватает маленькой копии: крупное фото нужно только OCR/vision
         if m.photo:
-            p: PhotoSize = max(m.photo, key=lambda x: x.file_size or 0)
-            file_id = p.file_id
-        elif m.document and (m.document.mime_type or "").startswith("image/"):
-            file_id = m.document.file_id
+            if analysis is not None:
+                p: Optional[PhotoSize] = analysis.hash_photo(self.phash_min_side)
+            else:
+                p = pick_photo_for_hashing(m.photo, self.phash_min_side)
+            file_id = p.file_id if p else None
+        elif _is_image_document(m):
+            # превью Telegram, если оно достаточно крупное; большой файл не качаем
+            source = pick_hash_source(m, self.phash_min_side)
+            file_id = source.file_id if source else None
         if not file_id:
             return None
 
-        f = await self.bot.get_file(file_id)
-        buf = io.BytesIO()
-        await self.bot.download(f, destination=buf)
-        buf.seek(0)
-        img = Image.open(buf).convert("L")  # grayscale
-        # классический dHash: 9x8 -> соседние сравнения по ширине
-        img = ImageOps.exif_transpose(img)
-        img = img.resize((9, 8), Image.Resampling.LANCZOS)
-        pixels = list(img.getdata())
-        bits = 0
-        for row in range(8):
-            for col in range(8):
-                left = pixels[row * 9 + col]
-                right = pixels[row * 9 + col + 1]
-                bits = (bits << 1) | (1 if left > right else 0)
+        if analysis is not None:
+            data = await analysis.download(file_id, bot=self.bot)
+            if data is None:
+                return None
+        else:
+            f = await self.bot.get_file(file_id)
+            buf = io.BytesIO()
+            await self.bot.download(f, destination=buf)
+            data = buf.getvalue()
+        # классический dHash 9x8; JPEG декодируется сразу уменьшенным (draft),
+        # в пуле процессов — не на event loop
+        bits = await self.image_worker.dhash(data)
+        if analysis is not None:
+            analysis.hashes["dhash"] = bits
+        await self.image_cache.set_dhash(unique_id, bits)
         return bits
 
     # ---------- Online NB in Redis -------------------------------------------
@@ -286,6 +354,9 @@ class AntiSpamService:
         toks = tokenize(text)
         feats = hashed_features(toks, n_bits=self.nb.n_bits)
 
+        if self.nb_sketch is not None:
+            return await self.nb_sketch.predict(feats)
+
         # загрузим метаданные
         meta = await self.r.hgetall(self.nb.meta_key)
         spam_docs = int(meta.get(b"spam_docs", b"0"))
@@ -326,6 +397,10 @@ class AntiSpamService:
         toks = tokenize(normalize_text(text))
         feats = hashed_features(toks, n_bits=self.nb.n_bits)
 
+        if self.nb_sketch is not None:
+            await self.nb_sketch.partial_fit(feats, label_spam)
+            return
+
         pipe = self.r.pipeline()
         # обновляем метаданные
         if label_spam:
@@ -344,8 +419,13 @@ class AntiSpamService:
         pipe.expire(self.nb.ham_counts_key, 30 * 24 * 3600)
         await pipe.execute()
 
-# --- helpers -----------------------------------------------------------------
-
+    async def decay_nb_model(self) -> Optional[float]:
+        """Затухание sketch-модели NB (периодическая задача). Для HASH-модели — no-op."""
+        if self.nb_sketch is None:
+            return None
+        return await self.nb_sketch.decay()
 
-def hamming64(a: int, b: int) -> int:
-    return (a ^ b).bit_count()
\ No newline at end of file
+    async def close(self) -> None:
+        """Освобождает ресурсы (отдельный бинарный пул Redis sketch-модели)."""
+        if self.nb_sketch is not None:
+            await self.nb_sketch.close()
@@ -3,7 +3,7 @@
 Кэш для оптимизации производительности системы антиспама.
 """
 import time
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from loguru import logger
 
@@ -14,6 +14,11 @@ class SpamPhraseCache:
     
     Уменьшает количество обращений к Redis путем локального кэширования
     наиболее частых спам-фраз с автоматическим обновлением.
+    
+    Хранит частоты фраз и версию набора, поэтому может применять
+    инкрементальные обновления (только фразы, измененные после версии)
+    без полной перезагрузки. TTL служит страховкой: по его истечении
+    выполняется полная перезагрузка.
     """
     
     # Константы
@@ -38,10 +43,15 @@ class SpamPhraseCache:
             )
         
         self._phrases: List[str] = []
+        self._scores: Dict[str, float] = {}
+        self._version: Optional[int] = None
+        self._limit: int = 0
         self._expiry_time: float = 0.0
         self._ttl_seconds = ttl_seconds
         self._hit_count = 0
         self._miss_count = 0
+        self._full_loads = 0
+        self._incremental_loads = 0
         
         logger.debug(f"🔧 SpamPhraseCache инициализирован (TTL: {ttl_seconds}s)")
     
@@ -79,22 +89,91 @@ class SpamPhraseCache:
             logger.warning("⚠️ Попытка кэширования пустого списка фраз")
             return
         
-        self._phrases = phrases.copy()
+        # Без частот сохраняем исходный порядок через убывающие оценки
+        count = len(phrases)
+        self.set_scored(
+            [(phrase, float(count - i)) for i, phrase in enumerate(phrases)],
+            version=None,
+        )
+    
+    def set_scored(
+        self,
+        scored: List[Tuple[str, float]],
+        version: Optional[int],
+        limit: Optional[int] = None
+    ) -> None:
+        """
+        Полностью заменяет содержимое кэша.
+        
+        Args:
+            scored: Пары (фраза, частота) от частых к редким
+            version: Версия набора в Redis
+            limit: Максимальное число фраз (по умолчанию — размер списка)
+        """
+        self._scores = {phrase: score for phrase, score in scored}
+        self._limit = limit or len(scored)
+        self._version = version
+        self._rebuild()
         self._expiry_time = time.monotonic() + self._ttl_seconds
+        self._full_loads += 1
         
         logger.info(
-            f"📦 Кэш обновлен: {len(phrases)} фраз, "
+            f"📦 Кэш обновлен: {len(self._phrases)} фраз (версия {version}), "
             f"истекает через {self._ttl_seconds}s"
         )
     
+    def apply_updates(self, updates: Dict[str, Optional[float]], version: int) -> None:
+        """
+        Применяет инкрементальные изменения к кэшу.
+        
+        TTL не продлевается — полная перезагрузка остается страховкой
+        от фраз, вытесненных из Redis без записи в журнал.
+        
+        Args:
+            updates: Фраза -> новая частота (None — фраза удалена из базы)
+            version: Версия, до которой применены изменения
+        """
+        for phrase, score in updates.items():
+            if score is None:
+                self._scores.pop(phrase, None)
+            else:
+                self._scores[phrase] = score
+        
+        self._version = version
+        self._rebuild()
+        self._incremental_loads += 1
+        
+        logger.debug(
+            f"🔁 Кэш обновлен инкрементально: {len(updates)} изменений, "
+            f"{len(self._phrases)} фраз (версия {version})"
+        )
+    
+    def _rebuild(self) -> None:
+        """Пересобирает отсортированный список и отсекает хвост сверх лимита."""
+        ranked = sorted(self._scores.items(), key=lambda item: item[1], reverse=True)
+        if self._limit and len(ranked) > self._limit:
+            ranked = ranked[:self._limit]
+            self._scores = dict(ranked)
+        self._phrases = [phrase for phrase, _ in ranked]
+    
+    @property
+    def version(self) -> Optional[int]:
+        """Версия набора, с которой синхронизирован кэш."""
+        return self._version
+    
+    def is_expired(self) -> bool:
+        """Истек ли TTL (нужна полная перезагрузка)."""
+        return time.monotonic() >= self._expiry_time
+    
     def is_valid(self) -> bool:
         """
         Проверяет валидность кэша.
         
         Returns:
-            True если кэш актуален и не пуст
+            True если кэш актуален и не пуст (или синхронизирован по версии)
         """
-        has_data = bool(self._phrases)
+        # Пустой, но синхронизированный по версии набор — тоже валидное состояние
+        has_data = bool(self._phrases) or self._version is not None
         not_expired = time.monotonic() < self._expiry_time
         
         return has_data and not_expired
@@ -104,6 +183,8 @@ class SpamPhraseCache:
         phrases_count = len(self._phrases)
         self._expiry_time = 0.0
         self._phrases = []
+        self._scores = {}
+        self._version = None
         
         logger.info(f"🔄 Кэш инвалидирован ({phrases_count} фраз удалено)")
     
@@ -148,4 +229,7 @@ class SpamPhraseCache:
             "misses": self._miss_count,
             "hit_rate": self.get_hit_rate(),
             "ttl_remaining": self.get_ttl_remaining(),
+            "version": self._version,
+            "full_loads": self._full_loads,
+            "incremental_loads": self._incremental_loads,
         }
\ No newline at end of file
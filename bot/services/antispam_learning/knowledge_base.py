@@ -2,13 +2,16 @@
 """
 База знаний о спаме в Redis.
 """
-from typing import Iterable, List
+import hashlib
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from loguru import logger
 from redis.asyncio import Redis
+from redis.exceptions import NoScriptError
 
 from bot.config.settings import settings
 from bot.utils.keys import KeyFactory
+from bot.utils.lua_scripts import LuaScripts
 
 
 class SpamKnowledgeBase:
@@ -23,6 +26,9 @@ class SpamKnowledgeBase:
     Использует Redis Sorted Sets для эффективного хранения и запросов.
     """
     
+    ADD_PHRASES_SCRIPT = LuaScripts.ADD_SPAM_PHRASES
+    ADD_PHRASES_SHA = hashlib.sha1(ADD_PHRASES_SCRIPT.encode("utf-8")).hexdigest()
+    
     def __init__(self, redis: Redis):
         """
         Инициализирует базу знаний.
@@ -32,57 +38,61 @@ class SpamKnowledgeBase:
         """
         self.redis = redis
         self.key_factory = KeyFactory()
-        self.config = settings.security
+        self.config = getattr(settings, "security", None)
         
         # Лимиты хранения
         self.max_phrases = getattr(self.config, 'learning_max_phrases', 10000)
         self.max_domains = getattr(self.config, 'learning_max_domains', 5000)
         self.max_samples = getattr(self.config, 'learning_max_samples', 1000)
         
+        # Сколько последних версий хранит журнал изменений фраз
+        self.log_versions = getattr(self.config, 'learning_log_versions', 1000)
+        
         logger.debug(
             f"🔧 SpamKnowledgeBase инициализирована "
             f"(phrases: {self.max_phrases}, domains: {self.max_domains}, "
             f"samples: {self.max_samples})"
         )
     
-    async def add_phrases(self, phrases: set[str]) -> int:
+    async def add_phrases(self, phrases: set[str]) -> Optional[int]:
         """
         Добавляет фразы в базу знаний.
         
         Увеличивает счетчик для существующих фраз и добавляет новые.
         Автоматически удаляет наименее частые фразы при превышении лимита.
+        Одним скриптом резервирует новую версию набора и записывает фразы
+        в журнал изменений под ней — это позволяет другим экземплярам
+        подтягивать только новые фразы.
         
         Args:
             phrases: Набор фраз для добавления
             
         Returns:
-            Количество обработанных фраз
+            Версия набора с этими фразами (None если ничего не записано)
         """
         if not phrases:
             logger.debug("⚠️ Пустой набор фраз для добавления")
-            return 0
+            return None
+        
+        keys = (
+            self.key_factory.spam_phrases(),
+            self.key_factory.spam_phrases_log(),
+            self.key_factory.spam_phrases_version(),
+        )
+        args = (self.max_phrases, self.log_versions, *phrases)
         
         try:
-            pipe = self.redis.pipeline()
-            
-            key = self.key_factory.spam_phrases()
+            try:
+                version = await self.redis.evalsha(self.ADD_PHRASES_SHA, len(keys), *keys, *args)
+            except NoScriptError:
+                version = await self.redis.eval(self.ADD_PHRASES_SCRIPT, len(keys), *keys, *args)
             
-            # Увеличиваем счетчик для каждой фразы
-            for phrase in phrases:
-                pipe.zincrby(key, 1.0, phrase)
-            
-            # Удаляем наименее частые при превышении лимита
-            # Оставляем только топ N
-            pipe.zremrangebyrank(key, 0, -(self.max_phrases + 1))
-            
-            await pipe.execute()
-            
-            logger.info(f"✅ Добавлено {len(phrases)} фраз в базу знаний")
-            return len(phrases)
+            logger.info(f"✅ Добавлено {len(phrases)} фраз в базу знаний (версия {version})")
+            return int(version)
             
         except Exception as e:
             logger.error(f"❌ Ошибка добавления фраз в базу: {e}", exc_info=True)
-            return 0
+            return None
     
     async def add_domains(self, domains: Iterable[str]) -> int:
         """
@@ -178,11 +188,7 @@ class SpamKnowledgeBase:
             # Получаем топ N фраз в обратном порядке (от большего к меньшему)
             phrases_bytes = await self.redis.zrevrange(key, 0, limit - 1)
             
-            # Декодируем байты в строки
-            phrases = [
-                phrase.decode("utf-8", "ignore")
-                for phrase in phrases_bytes
-            ]
+            phrases = [self._decode(phrase) for phrase in phrases_bytes]
             
             logger.debug(f"📊 Получено {len(phrases)} топ-фраз из базы")
             return phrases
@@ -191,6 +197,99 @@ class SpamKnowledgeBase:
             logger.error(f"❌ Ошибка получения фраз из базы: {e}", exc_info=True)
             return []
     
+    async def get_top_phrases_versioned(
+        self,
+        limit: int
+    ) -> Tuple[List[Tuple[str, float]], Optional[int]]:
+        """
+        Получает топ фраз с частотами и версией, которой они соответствуют.
+        
+        Версия берется из журнала изменений в той же транзакции, поэтому
+        она согласована с прочитанными фразами.
+        
+        Args:
+            limit: Количество фраз
+            
+        Returns:
+            Кортеж (список (фраза, частота), версия); версия None при ошибке Redis
+        """
+        if limit <= 0:
+            logger.warning(f"⚠️ Некорректный лимит: {limit}")
+            return [], None
+        
+        try:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.zrevrange(self.key_factory.spam_phrases(), 0, limit - 1, withscores=True)
+            pipe.zrevrange(self.key_factory.spam_phrases_log(), 0, 0, withscores=True)
+            scored, last_logged = await pipe.execute()
+            
+            phrases = [(self._decode(phrase), float(score)) for phrase, score in scored]
+            version = int(last_logged[0][1]) if last_logged else 0
+            
+            logger.debug(f"📊 Получено {len(phrases)} топ-фраз из базы (версия {version})")
+            return phrases, version
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения фраз из базы: {e}", exc_info=True)
+            return [], None
+    
+    async def get_phrase_updates(
+        self,
+        since_version: int
+    ) -> Optional[Tuple[Dict[str, Optional[float]], int]]:
+        """
+        Получает фразы, измененные после указанной версии.
+        
+        Args:
+            since_version: Версия локального кэша
+            
+        Returns:
+            Кортеж (фраза -> частота или None если удалена, новая версия),
+            либо None если журнал не покрывает разрыв и нужна полная перезагрузка
+        
+        Новая версия — последняя записанная в журнал: версия и фразы
+        пишутся одним скриптом (add_phrases), поэтому журнал не отстает
+        от счетчика.
+        """
+        try:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.get(self.key_factory.spam_phrases_version())
+            pipe.zrangebyscore(
+                self.key_factory.spam_phrases_log(),
+                f"({since_version}",
+                "+inf",
+                withscores=True
+            )
+            raw_version, changed = await pipe.execute()
+            
+            remote_version = int(raw_version or 0)
+            if remote_version < since_version or remote_version - since_version > self.log_versions:
+                return None
+            
+            if not changed:
+                return {}, since_version
+            
+            version = max(since_version, int(changed[-1][1]))
+            phrases = [self._decode(phrase) for phrase, _ in changed]
+            scores = await self.redis.zmscore(self.key_factory.spam_phrases(), phrases)
+            updates = {
+                phrase: (float(score) if score is not None else None)
+                for phrase, score in zip(phrases, scores)
+            }
+            
+            return updates, version
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения изменений фраз: {e}", exc_info=True)
+            return None
+    
+    @staticmethod
+    def _decode(value) -> str:
+        """Декодирует значение Redis в строку."""
+        if isinstance(value, bytes):
+            return value.decode("utf-8", "ignore")
+        return str(value)
+    
     async def get_phrase_score(self, phrase: str) -> float:
         """
         Получает оценку (частоту) конкретной фразы.
@@ -236,6 +335,31 @@ class SpamKnowledgeBase:
             )
             return 0.0
     
+    async def get_domains_above(
+        self,
+        min_score: float
+    ) -> Optional[Tuple[List[str], int]]:
+        """
+        Получает все домены с оценкой не ниже порога и версию набора.
+        
+        Args:
+            min_score: Минимальная оценка домена
+            
+        Returns:
+            Кортеж (домены, версия) или None при ошибке Redis
+        """
+        try:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.zrangebyscore(self.key_factory.spam_domains(), min_score, "+inf")
+            pipe.get(self.key_factory.spam_domains_version())
+            domains, raw_version = await pipe.execute()
+            
+            return [self._decode(domain) for domain in domains], int(raw_version or 0)
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения доменов из базы: {e}", exc_info=True)
+            return None
+    
     async def get_phrase_count(self) -> int:
         """Возвращает общее количество фраз в базе."""
         try:
@@ -267,15 +391,22 @@ class SpamKnowledgeBase:
         """
         Очищает всю базу знаний (для тестирования).
         
+        Увеличивает версию набора доменов и оповещает экземпляры, иначе
+        их Bloom-фильтры продолжили бы помечать удаленные домены.
+        
         Returns:
             True если успешно очищено
         """
         try:
-            pipe = self.redis.pipeline()
+            pipe = self.redis.pipeline(transaction=True)
             pipe.delete(self.key_factory.spam_phrases())
             pipe.delete(self.key_factory.spam_domains())
             pipe.delete(self.key_factory.spam_samples())
-            await pipe.execute()
+            pipe.delete(self.key_factory.spam_phrases_log())
+            pipe.incr(self.key_factory.spam_domains_version())
+            *_, domains_version = await pipe.execute()
+            
+            await self.redis.publish(self.key_factory.spam_domains_channel(), str(domains_version))
             
             logger.warning("🗑️ База знаний полностью очищена")
             return True
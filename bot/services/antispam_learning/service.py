@@ -2,6 +2,7 @@
 """
 Главный сервис самообучаемой системы антиспама.
 """
+import asyncio
 from typing import Iterable, Optional, Tuple
 
 from loguru import logger
@@ -13,6 +14,9 @@ from bot.services.antispam_learning.extractor import TextPhraseExtractor
 from bot.services.antispam_learning.knowledge_base import SpamKnowledgeBase
 from bot.services.antispam_learning.models import ScoredPhrase, SpamStatistics
 from bot.services.antispam_learning.scorer import SpamTextScorer
+from bot.utils.bloom_filter import BloomFilter
+from bot.utils.keys import KeyFactory
+from bot.utils.redis_invalidation import VersionedInvalidator
 from bot.utils.text_utils import normalize_text
 
 
@@ -23,7 +27,8 @@ class AntiSpamLearningService:
     Основные возможности:
     - Обучение на примерах спама с обратной связью
     - Хранение и анализ спам-фраз и доменов
-    - Кэширование для производительности
+    - Bloom-фильтр плохих доменов: чистые домены отсеиваются без Redis
+    - Кэширование для производительности с межпроцессной инвалидацией
     - Нечеткое сравнение текста с известными паттернами
     - Статистика и метрики
     
@@ -52,7 +57,7 @@ class AntiSpamLearningService:
             redis: Клиент Redis для хранения данных
         """
         self.redis = redis
-        self.config = settings.security
+        self.config = getattr(settings, "security", None)
         
         # Инициализация компонентов
         self._init_cache()
@@ -63,9 +68,24 @@ class AntiSpamLearningService:
         logger.success("✅ Сервис AntiSpamLearningService инициализирован")
     
     def _init_cache(self) -> None:
-        """Инициализирует кэш фраз."""
+        """Инициализирует кэш фраз и синхронизацию версий между экземплярами."""
         cache_ttl = getattr(self.config, 'learning_cache_ttl_seconds', 300)
         self.cache = SpamPhraseCache(ttl_seconds=cache_ttl)
+        self.phrase_sync = VersionedInvalidator(
+            self.redis,
+            version_key=KeyFactory.spam_phrases_version(),
+            channel=KeyFactory.spam_phrases_channel(),
+            name="spam_phrases",
+        )
+        
+        self._domain_filter: Optional[BloomFilter] = None
+        self._domain_reload_lock = asyncio.Lock()
+        self.domain_sync = VersionedInvalidator(
+            self.redis,
+            version_key=KeyFactory.spam_domains_version(),
+            channel=KeyFactory.spam_domains_channel(),
+            name="spam_domains",
+        )
     
     def _init_knowledge_base(self) -> None:
         """Инициализирует базу знаний."""
@@ -120,19 +140,25 @@ class AntiSpamLearningService:
             logger.warning("⚠️ Не удалось извлечь фразы из текста")
             return
         
-        # Добавляем фразы в базу
-        phrases_added = await self.knowledge_base.add_phrases(phrases)
+        # Добавляем фразы в базу и журнал изменений под новой версией
+        version = await self.knowledge_base.add_phrases(phrases)
+        phrases_added = len(phrases) if version is not None else 0
         
         # Добавляем домены если есть
         domains_added = 0
         if domains:
             domains_added = await self.knowledge_base.add_domains(domains)
+            if domains_added:
+                await self._bump_domain_version()
         
         # Сохраняем пример
         await self.knowledge_base.add_sample(text)
         
-        # Инвалидируем кэш для обновления
-        self.cache.invalidate()
+        # Оповещаем все экземпляры: они подтянут только новые фразы
+        if version is not None:
+            await self.phrase_sync.publish(version)
+        else:
+            self.cache.invalidate()
         
         logger.success(
             f"✅ База обновлена: {phrases_added} фраз, "
@@ -181,11 +207,15 @@ class AntiSpamLearningService:
         if not host:
             return False
         
-        # Получаем оценку домена
+        # Отрицательный ответ Bloom-фильтра точен — Redis не нужен
+        if not await self._domain_may_be_bad(host):
+            return False
+        
+        # Получаем оценку домена (подтверждение ложноположительных)
         score = await self.knowledge_base.get_domain_score(host)
         
         # Проверяем по порогу
-        min_score = getattr(self.config, 'learning_domain_min_score', 3.0)
+        min_score = self._domain_min_score()
         is_bad = score >= min_score
         
         if is_bad:
@@ -196,6 +226,55 @@ class AntiSpamLearningService:
         
         return is_bad
     
+    def _domain_min_score(self) -> float:
+        """Порог оценки, с которого домен считается плохим."""
+        return getattr(self.config, 'learning_domain_min_score', 3.0)
+    
+    async def _domain_may_be_bad(self, host: str) -> bool:
+        """
+        Проверяет домен по локальному Bloom-фильтру.
+        
+        Фильтр перестраивается только после изменения набора доменов
+        (на любом экземпляре). Если построить его не удалось, возвращает
+        True, и проверка идет по Redis как раньше.
+        """
+        if await self.domain_sync.needs_refresh() or self._domain_filter is None:
+            async with self._domain_reload_lock:
+                # Пока ждали блокировку, фильтр мог перестроить другой корутин
+                if await self.domain_sync.needs_refresh() or self._domain_filter is None:
+                    await self._rebuild_domain_filter()
+        
+        if self._domain_filter is None:
+            return True
+        
+        return host.lower().strip() in self._domain_filter
+    
+    async def _rebuild_domain_filter(self) -> None:
+        """Строит Bloom-фильтр по доменам с оценкой выше порога."""
+        loaded = await self.knowledge_base.get_domains_above(self._domain_min_score())
+        
+        if loaded is None:
+            self._domain_filter = None
+            return
+        
+        domains, version = loaded
+        fp_rate = getattr(self.config, 'learning_domain_bloom_fp_rate', 0.01)
+        self._domain_filter = BloomFilter.from_items(domains, fp_rate=fp_rate)
+        self.domain_sync.mark_fresh(version)
+        
+        logger.debug(
+            f"🌸 Bloom-фильтр доменов перестроен: {len(domains)} доменов, "
+            f"{self._domain_filter.size_bytes} байт (версия {version})"
+        )
+    
+    async def _bump_domain_version(self) -> None:
+        """Оповещает экземпляры об изменении набора доменов."""
+        try:
+            await self.domain_sync.bump()
+        except Exception as e:
+            self.domain_sync.mark_stale()
+            logger.warning(f"⚠️ Не удалось обновить версию доменов: {e}")
+    
     async def get_domain_score(self, host: str) -> float:
         """
         Получает оценку домена.
@@ -212,27 +291,47 @@ class AntiSpamLearningService:
         """
         Получает список фраз с использованием кэша.
         
+        Пока версия набора не менялась, обращений к Redis нет. После
+        уведомления об изменении подтягиваются только новые фразы; полная
+        перезагрузка — при пустом кэше, истекшем TTL или разрыве журнала.
+        
         Returns:
             Список спам-фраз
         """
-        # Пытаемся получить из кэша
-        cached = self.cache.get()
+        stale = await self.phrase_sync.needs_refresh()
+        
+        if not stale:
+            cached = self.cache.get()
+            if cached is not None:
+                return cached
+        
+        if self.cache.version is not None and not self.cache.is_expired():
+            updates = await self.knowledge_base.get_phrase_updates(self.cache.version)
+            if updates is not None:
+                changed, version = updates
+                self.cache.apply_updates(changed, version)
+                self.phrase_sync.mark_fresh(version)
+                return self.cache.get() or []
+        
+        return await self._reload_phrases()
+    
+    async def _reload_phrases(self) -> list[str]:
+        """Полностью перезагружает топ фраз из базы знаний."""
+        top_k = getattr(self.config, 'learning_top_k', 500)
+        scored, version = await self.knowledge_base.get_top_phrases_versioned(top_k)
         
-        if cached is not None:
-            return cached
+        if version is None:
+            return []
         
-        # Кэш пуст или устарел - загружаем из базы
-        top_k = getattr(self.config, 'learning_top_k', 500)
-        phrases = await self.knowledge_base.get_top_phrases(top_k)
+        self.cache.set_scored(scored, version=version, limit=top_k)
+        self.phrase_sync.mark_fresh(version)
         
-        if phrases:
-            # Обновляем кэш
-            self.cache.set(phrases)
-            logger.info(f"📦 Кэш обновлен из базы знаний: {len(phrases)} фраз")
+        if scored:
+            logger.info(f"📦 Кэш обновлен из базы знаний: {len(scored)} фраз")
         else:
             logger.warning("⚠️ База знаний пуста")
         
-        return phrases
+        return [phrase for phrase, _ in scored]
     
     async def get_statistics(self) -> SpamStatistics:
         """
@@ -276,8 +375,14 @@ class AntiSpamLearningService:
     async def invalidate_cache(self) -> None:
         """Принудительно инвалидирует кэш."""
         self.cache.invalidate()
+        self.phrase_sync.mark_stale()
         logger.info("🔄 Кэш инвалидирован по запросу")
     
+    async def close(self) -> None:
+        """Останавливает подписки на уведомления об изменениях."""
+        await self.phrase_sync.close()
+        await self.domain_sync.close()
+    
     def get_cache_stats(self) -> dict:
         """Возвращает детальную статистику кэша."""
         return self.cache.get_stats()
\ No newline at end of file
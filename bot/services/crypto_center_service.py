@@ -21,6 +21,9 @@ from bot.utils.models import AirdropProject, MiningProject, NewsArticle
 
 T = TypeVar("T", bound=BaseModel)
 
+# саммари одной и той же новости не меняется — пересказываем ее один раз
+NEWS_SUMMARY_CACHE_TTL = 24 * 3600
+
 class CryptoCenterService:
     """
     Персональный AI-ассистент для навигации в мире криптовалют.
@@ -63,7 +66,10 @@ class CryptoCenterService:
         user_profile = await self._get_user_interest_profile(user_id)
         prompt = get_personalized_alpha_prompt(user_profile, alpha_type)
         json_schema = {"type": "array", "items": model.model_json_schema()}
-        ai_result = await self.ai_service.get_structured_response(prompt, json_schema)
+        # одинаковый профиль интересов дает одинаковый промпт — ответ AI общий
+        ai_result = await self.ai_service.get_structured_response(
+            prompt, json_schema, cache_ttl=self.config.alpha_cache_ttl_seconds
+        )
 
         if isinstance(ai_result, list):
             try:
@@ -108,7 +114,8 @@ class CryptoCenterService:
             if clean_text:
                 summary = await self.ai_service.get_text_response(
                     clean_text, 
-                    system_prompt="Суммируй новость в 3-4 коротких тезисах."
+                    system_prompt="Суммируй новость в 3-4 коротких тезисах.",
+                    cache_ttl=NEWS_SUMMARY_CACHE_TTL
                 )
                 if summary and "К сожалению" not in summary:
                     article.ai_summary = summary
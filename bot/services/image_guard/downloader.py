@@ -9,6 +9,8 @@ from aiogram import Bot
 from aiogram.types import Message, PhotoSize
 from loguru import logger
 
+from bot.utils.image_hash import DEFAULT_MIN_SIDE, HashSource, pick_hash_source
+
 
 class ImageDownloader:
     """
@@ -17,6 +19,11 @@ class ImageDownloader:
     Поддерживает:
     - Фотографии (message.photo)
     - Документы с изображениями (message.document)
+    - Стикеры и анимации (только для хэширования, через превью для
+      анимированных)
+    
+    Для хэширования скачивается самый маленький достаточный размер фото
+    (download_for_hashing), полноразмерное — только для OCR (download_photo).
     """
     
     def __init__(self, bot: Bot):
@@ -39,8 +46,31 @@ class ImageDownloader:
         Returns:
             Байты изображения или None при ошибке
         """
-        photo_size = self._get_photo_size(message)
+        return await self._download(self._get_photo_size(message))
+    
+    async def download_for_hashing(
+        self,
+        message: Message,
+        min_side: int = DEFAULT_MIN_SIDE
+    ) -> Optional[bytes]:
+        """
+        Скачивает файл, достаточный для отпечатка (см. pick_hash_source).
         
+        Args:
+            message: Сообщение с фото, стикером, анимацией или документом
+            min_side: Минимальная меньшая сторона в пикселях
+            
+        Returns:
+            Байты изображения или None при ошибке
+        """
+        return await self._download(pick_hash_source(message, min_side))
+    
+    async def download_source(self, source: Optional[HashSource]) -> Optional[bytes]:
+        """Скачивает уже выбранный источник отпечатка."""
+        return await self._download(source)
+    
+    async def _download(self, photo_size) -> Optional[bytes]:
+        """Скачивает PhotoSize, Document или HashSource (всё, у чего есть file_id) в память."""
         if not photo_size:
             logger.debug("⚠️ Фото не найдено в сообщении")
             return None
@@ -69,9 +99,7 @@ class ImageDownloader:
     @staticmethod
     def _get_photo_size(message: Message) -> Optional[PhotoSize]:
         """
-        Извлекает объект фото из сообщения.
-        
-        Выбирает самое большое фото по размеру файла.
+        Извлекает самое большое фото (по размеру файла) из сообщения.
         
         Args:
             message: Сообщение
@@ -108,4 +136,18 @@ class ImageDownloader:
         if message.document and message.document.mime_type:
             return "image" in message.document.mime_type
         
-        return False
\ No newline at end of file
+        return False
+    
+    @staticmethod
+    def has_image(message: Message) -> bool:
+        """
+        Проверяет, есть ли в сообщении что хэшировать: фото, стикер,
+        анимация или изображение-документ.
+        
+        Args:
+            message: Сообщение
+            
+        Returns:
+            True если отпечаток можно посчитать
+        """
+        return pick_hash_source(message) is not None
\ No newline at end of file
@@ -2,26 +2,52 @@
 """
 База данных хэшей спам-изображений в Redis.
 """
-from typing import Tuple
+import time
+from functools import partial
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
 
 from loguru import logger
 from redis.asyncio import Redis
 
 from bot.config.settings import settings
+from bot.services.image_guard.hash_replica import SpamHashReplica
 from bot.services.image_guard.hasher import ImageHasher
+from bot.utils.image_fingerprint import FINGERPRINT_KINDS, ImageFingerprint
 from bot.utils.keys import KeyFactory
+from bot.utils.multi_index_hash import HashMatch, MultiIndexHashIndex
 
 
 class SpamHashDatabase:
     """
     Компонент для работы с базой хэшей спам-изображений в Redis.
     
-    Использует bucketing по префиксу хэша для эффективного поиска:
-    - Хэш делится на префикс (первые N бит)
-    - Каждый bucket содержит хэши с одинаковым префиксом
-    - При проверке ищем только в соответствующем bucket
+    Использует multi-index hashing (см. bot.utils.multi_index_hash):
+    - Хэш делится на 4 непересекающиеся 16-битные полосы
+    - Каждая полоса индексируется отдельным bucket
+    - При проверке читаем bucket каждой полосы одним pipeline: хэши на
+      расстоянии меньше 4 находятся гарантированно, дальше — с высокой
+      вероятностью (в отличие от одного префикса, где отличие в любом
+      из старших бит прячет совпадение)
+    
+    По умолчанию проверка идет по локальной реплике (SpamHashReplica):
+    все хэши в массиве NumPy, полный перебор векторным XOR/popcount без
+    обращений к Redis, изменения приходят через Redis Stream. Индекс
+    полос остается запасным путем и используется при phash_in_memory=False.
+    
+    Каждый тип хэша из составного отпечатка (dhash, phash, whash — см.
+    bot.utils.image_fingerprint) индексируется отдельно, со своим порогом;
+    изображение считается дубликатом, если совпал любой из типов.
+    Активные типы задаются fingerprint_kinds (по умолчанию dhash и phash).
+    
+    Массовый обмен базой (import_hashes / iter_hash_batches) пишет и читает
+    те же структуры пачками: один SADD на бакет и один ZADD на пачку,
+    реплики перезагружаются по одному событию reload в потоке.
     """
     
+    IMPORT_BATCH = 250_000
+    EXPORT_BATCH = 10_000
+    EXPIRE_BATCH = 10_000
+    
     def __init__(self, redis: Redis):
         """
         Инициализирует базу данных хэшей.
@@ -30,19 +56,53 @@ class SpamHashDatabase:
             redis: Клиент Redis
         """
         self.redis = redis
-        self.key_factory = KeyFactory()
-        self.config = settings.security
+        self.config = getattr(settings, "security", None)
         self.hasher = ImageHasher()
         
         # Загружаем параметры из конфига
-        self.prefix_bits = getattr(self.config, 'phash_prefix_bits', 16)
-        self.distance_threshold = getattr(self.config, 'phash_distance', 5)
+        self.distance_threshold = getattr(self.config, 'phash_distance', 8)
         self.ttl_seconds = getattr(self.config, 'phash_ttl_seconds', 2592000)  # 30 дней
+        self.probe_radius = getattr(self.config, 'phash_probe_radius', 0)
+        self.in_memory = getattr(self.config, 'phash_in_memory', True)
+        
+        self.kinds = tuple(
+            kind for kind in getattr(self.config, 'fingerprint_kinds', ("dhash", "phash"))
+            if kind in FINGERPRINT_KINDS
+        )
+        if "dhash" not in self.kinds:
+            self.kinds = ("dhash",) + self.kinds
+        self.distances = {
+            "dhash": self.distance_threshold,
+            "phash": getattr(self.config, 'dct_phash_distance', 10),
+            "whash": getattr(self.config, 'whash_distance', 8),
+        }
+        
+        self.indexes: Dict[str, MultiIndexHashIndex] = {
+            kind: MultiIndexHashIndex(
+                redis,
+                partial(KeyFactory.image_fingerprint_band, kind),
+                max_distance=self.distances[kind],
+                ttl_seconds=self.ttl_seconds,
+                probe_radius=self.probe_radius,
+            )
+            for kind in self.kinds
+        }
+        self.index = self.indexes["dhash"]
+        
+        self.replicas: Dict[str, SpamHashReplica] = {}
+        if self.in_memory:
+            self.replicas = {
+                kind: SpamHashReplica(redis, ttl_seconds=self.ttl_seconds, kind=kind)
+                for kind in self.kinds
+            }
+        self.replica: Optional[SpamHashReplica] = self.replicas.get("dhash")
         
         logger.debug(
             f"🔧 SpamHashDatabase инициализирована "
-            f"(prefix_bits: {self.prefix_bits}, "
-            f"distance_threshold: {self.distance_threshold}, "
+            f"(distance_threshold: {self.distance_threshold}, "
+            f"probe_radius: {self.probe_radius}, "
+            f"kinds: {','.join(self.kinds)}, "
+            f"in_memory: {self.in_memory}, "
             f"ttl: {self.ttl_seconds}s)"
         )
     
@@ -51,71 +111,78 @@ class SpamHashDatabase:
         Проверяет хэш на совпадение с известными спам-хэшами.
         
         Args:
-            image_hash: Хэш изображения для проверки
+            image_hash: dHash изображения для проверки
             
         Returns:
             Кортеж (является_спамом, причина)
         """
-        try:
-            # Вычисляем префикс для bucket
-            prefix = image_hash >> (64 - self.prefix_bits)
-            bucket_key = self.key_factory.image_hash_bucket(prefix)
-            
-            # Получаем все хэши из bucket
-            candidate_hashes = await self.redis.smembers(bucket_key)
-            
-            if not candidate_hashes:
-                logger.debug(f"✅ Bucket {prefix} пуст, хэш не найден")
-                return False, "no_matches"
-            
-            logger.debug(
-                f"🔍 Проверка хэша в bucket {prefix} "
-                f"({len(candidate_hashes)} кандидатов)"
-            )
-            
-            # Проверяем каждый кандидат на схожесть
-            for ch_bytes in candidate_hashes:
-                try:
-                    candidate_hash = int(ch_bytes)
-                    distance = self.hasher.hamming_distance(image_hash, candidate_hash)
-                    
-                    logger.debug(
-                        f"  - Candidate {candidate_hash}: distance={distance}"
-                    )
-                    
-                    if distance <= self.distance_threshold:
-                        similarity = self.hasher.similarity_percent(
-                            image_hash, candidate_hash
-                        )
-                        
-                        logger.warning(
-                            f"🚨 Найдено совпадение! "
-                            f"distance={distance}, similarity={similarity:.1f}%"
-                        )
-                        
-                        return True, f"similar_hash(dist={distance},sim={similarity:.0f}%)"
-                
-                except (ValueError, TypeError) as e:
-                    logger.warning(
-                        f"⚠️ Некорректный хэш в базе: {ch_bytes} ({e})"
-                    )
-                    # Удаляем некорректный хэш
-                    await self.redis.srem(bucket_key, ch_bytes)
-                    continue
-            
-            logger.debug("✅ Совпадений не найдено")
-            return False, "no_similar_hashes"
+        return await self._check("dhash", image_hash)
+    
+    async def is_spam_fingerprint(self, fingerprint: ImageFingerprint) -> Tuple[bool, str]:
+        """
+        Проверяет составной отпечаток: совпадение любого активного типа хэша.
+        
+        Args:
+            fingerprint: Отпечаток изображения
             
+        Returns:
+            Кортеж (является_спамом, причина)
+        """
+        reason = "no_similar_hashes"
+        for kind, value in fingerprint.items():
+            if kind not in self.indexes:
+                continue
+            is_spam, kind_reason = await self._check(kind, value)
+            if is_spam:
+                return True, kind_reason
+            if kind_reason == "redis_error":
+                reason = kind_reason
+        return False, reason
+    
+    async def _check(self, kind: str, image_hash: int) -> Tuple[bool, str]:
+        """Ищет совпадение хэша одного типа и формирует причину."""
+        try:
+            match = await self._find(kind, image_hash)
         except Exception as e:
             logger.error(
                 f"❌ Ошибка проверки хэша в Redis: {e}",
                 exc_info=True
             )
             return False, "redis_error"
+        
+        if match is None:
+            logger.debug(f"✅ Совпадений {kind} не найдено")
+            return False, "no_similar_hashes"
+        
+        similarity = self.hasher.similarity_percent(image_hash, match.image_hash)
+        
+        logger.warning(
+            f"🚨 Найдено совпадение {kind}! "
+            f"distance={match.distance}, similarity={similarity:.1f}%"
+        )
+        
+        label = "hash" if kind == "dhash" else kind
+        return True, f"similar_{label}(dist={match.distance},sim={similarity:.0f}%)"
+    
+    async def _find(self, kind: str, image_hash: int) -> Optional[HashMatch]:
+        """Ближайший хэш: по локальной реплике, при ее недоступности — по индексу."""
+        replica = self.replicas.get(kind)
+        if replica is not None:
+            try:
+                await replica.ensure_fresh()
+            except Exception as e:
+                logger.warning(f"⚠️ Реплика хэшей не обновлена, поиск по индексу: {e}")
+            else:
+                # до первой загрузки реплики (она идет в фоне) — по индексу
+                if replica.is_loaded:
+                    found = replica.nearest(image_hash, self.distances[kind])
+                    return HashMatch(*found) if found else None
+        
+        return await self.indexes[kind].find(image_hash)
     
     async def add_spam_hash(self, image_hash: int) -> bool:
         """
-        Добавляет хэш в базу спам-изображений.
+        Добавляет dHash в базу спам-изображений.
         
         Args:
             image_hash: Хэш для добавления
@@ -123,19 +190,36 @@ class SpamHashDatabase:
         Returns:
             True если успешно добавлено
         """
+        return await self._add({"dhash": image_hash})
+    
+    async def add_spam_fingerprint(self, fingerprint: ImageFingerprint) -> bool:
+        """
+        Добавляет все активные типы хэшей отпечатка одной транзакцией.
+        
+        Args:
+            fingerprint: Отпечаток изображения
+            
+        Returns:
+            True если успешно добавлено
+        """
+        return await self._add(dict(fingerprint.items()))
+    
+    async def _add(self, hashes: Dict[str, int]) -> bool:
+        hashes = {kind: value for kind, value in hashes.items() if kind in self.indexes}
         try:
-            # Вычисляем префикс
-            prefix = image_hash >> (64 - self.prefix_bits)
-            bucket_key = self.key_factory.image_hash_bucket(prefix)
-            
-            # Добавляем хэш в bucket с TTL
-            pipe = self.redis.pipeline()
-            pipe.sadd(bucket_key, str(image_hash))
-            pipe.expire(bucket_key, self.ttl_seconds)
+            pipe = self.redis.pipeline(transaction=True)
+            for kind, value in hashes.items():
+                self.indexes[kind].stage_add(pipe, value)
+                if kind in self.replicas:
+                    self.replicas[kind].stage_add(pipe, value)
             await pipe.execute()
             
+            for kind, value in hashes.items():
+                if kind in self.replicas:
+                    self.replicas[kind].matcher.add(value)
+            
             logger.success(
-                f"✅ Хэш {image_hash} добавлен в bucket {prefix} "
+                f"✅ Хэши {hashes} добавлены в индекс "
                 f"(TTL: {self.ttl_seconds}s)"
             )
             
@@ -143,53 +227,209 @@ class SpamHashDatabase:
             
         except Exception as e:
             logger.error(
-                f"❌ Ошибка добавления хэша {image_hash}: {e}",
+                f"❌ Ошибка добавления хэшей {hashes}: {e}",
                 exc_info=True
             )
             return False
     
-    async def get_bucket_stats(self, prefix: int) -> dict:
+    async def import_hashes(
+        self,
+        batches: Iterable[List[int]],
+        kind: str = "dhash"
+    ) -> Dict[str, int]:
+        """
+        Массово добавляет хэши одного типа в активную раскладку: бакеты
+        полос всегда, ZSET реплики — если она включена.
+        
+        Каждая пачка — один pipeline; повторы внутри пачки отбрасываются
+        до отправки, с уже сохраненными — самим Redis (SADD/ZADD).
+        
+        Args:
+            batches: Пачки хэшей (например, HashFileReader.batches())
+            kind: Тип хэша (dhash/phash/whash)
+            
+        Returns:
+            Словарь {read, added, duplicates}
+            
+        Raises:
+            ValueError: Тип хэша не активен
+        """
+        if kind not in self.indexes:
+            raise ValueError(f"тип хэша {kind} не активен ({','.join(self.kinds)})")
+        
+        index = self.indexes[kind]
+        replica = self.replicas.get(kind)
+        stats = {"read": 0, "added": 0, "duplicates": 0}
+        touched: Set[str] = set()
+        started = time.perf_counter()
+        
+        for batch in batches:
+            unique = set(batch)
+            stats["read"] += len(batch)
+            if not unique:
+                continue
+            
+            pipe = self.redis.pipeline(transaction=False)
+            if replica is not None:
+                replica.stage_add_many(pipe, unique)
+            band_keys = index.stage_add_many(pipe, unique)
+            replies = await pipe.execute()
+            
+            # новых хэшей: ответ ZADD или сумма SADD по полосе 0
+            # (каждый хэш лежит ровно в одном ее бакете)
+            if replica is not None:
+                added = int(replies[0])
+            else:
+                added = sum(int(r) for r in replies[:len(band_keys[0])])
+            stats["added"] += added
+            stats["duplicates"] += len(batch) - added
+            for keys in band_keys:
+                touched.update(keys)
+        
+        touched_keys = list(touched)
+        for start in range(0, len(touched_keys), self.EXPIRE_BATCH):
+            pipe = self.redis.pipeline(transaction=False)
+            index.stage_expire(pipe, touched_keys[start:start + self.EXPIRE_BATCH])
+            await pipe.execute()
+        
+        if replica is not None and stats["read"]:
+            pipe = self.redis.pipeline(transaction=False)
+            replica.stage_reload(pipe)
+            await pipe.execute()
+        
+        logger.success(
+            f"✅ Импорт хэшей {kind}: прочитано {stats['read']}, добавлено {stats['added']}, "
+            f"дубликатов {stats['duplicates']} за {time.perf_counter() - started:.1f}s"
+        )
+        return stats
+    
+    async def iter_hash_batches(
+        self,
+        kind: str = "dhash",
+        batch_size: int = EXPORT_BATCH
+    ) -> AsyncIterator[List[int]]:
         """
-        Получает статистику bucket.
+        Потоково отдает все хэши типа kind пачками.
+        
+        С репликой читается ZSET постранично (от старых к новым, без
+        истекших), без нее — бакеты полосы 0 через SCAN: каждый хэш лежит
+        ровно в одном из них, поэтому повторов нет.
         
         Args:
-            prefix: Префикс bucket
+            kind: Тип хэша (dhash/phash/whash)
+            batch_size: Размер пачки
+            
+        Yields:
+            Списки хэшей
+        """
+        if kind not in self.indexes:
+            raise ValueError(f"тип хэша {kind} не активен ({','.join(self.kinds)})")
+        
+        replica = self.replicas.get(kind)
+        if replica is not None:
+            min_score = time.time() - self.ttl_seconds
+            offset = 0
+            while True:
+                members = await self.redis.zrangebyscore(
+                    replica.set_key, min_score, "+inf", start=offset, num=batch_size
+                )
+                if members:
+                    yield [int(m) for m in members]
+                if len(members) < batch_size:
+                    return
+                offset += len(members)
+        
+        pattern = KeyFactory.image_fingerprint_band_pattern(kind, 0)
+        seen_keys: Set[str] = set()
+        pending: List[str] = []
+        buffer: List[int] = []
+        scan = self.redis.scan_iter(match=pattern, count=1000)
+        while True:
+            key = await anext(scan, None)
+            if key is not None and key not in seen_keys:
+                seen_keys.add(key)
+                pending.append(key)
+            if pending and (key is None or len(pending) >= 500):
+                pipe = self.redis.pipeline(transaction=False)
+                for bucket in pending:
+                    pipe.smembers(bucket)
+                for members in await pipe.execute():
+                    buffer.extend(int(m) for m in members)
+                pending = []
+                while len(buffer) >= batch_size:
+                    yield buffer[:batch_size]
+                    buffer = buffer[batch_size:]
+            if key is None:
+                break
+        if buffer:
+            yield buffer
+    
+    async def get_bucket_stats(self, image_hash: int) -> dict:
+        """
+        Получает статистику bucket'ов полос хэша.
+        
+        Args:
+            image_hash: Хэш, полосы которого нужно показать
             
         Returns:
             Словарь со статистикой
         """
         try:
-            bucket_key = self.key_factory.image_hash_bucket(prefix)
+            keys = self.index.bucket_keys(image_hash)
             
-            size = await self.redis.scard(bucket_key)
-            ttl = await self.redis.ttl(bucket_key)
+            pipe = self.redis.pipeline(transaction=False)
+            for key in keys:
+                pipe.scard(key)
+                pipe.ttl(key)
+            replies = await pipe.execute()
             
             return {
-                "prefix": prefix,
-                "size": size,
-                "ttl": ttl,
-                "key": bucket_key
+                "hash": image_hash,
+                "buckets": [
+                    {"key": key, "size": replies[2 * i], "ttl": replies[2 * i + 1]}
+                    for i, key in enumerate(keys)
+                ]
             }
         except Exception as e:
             logger.error(f"Ошибка получения статистики bucket: {e}")
             return {}
     
-    async def clear_bucket(self, prefix: int) -> bool:
+    async def remove_spam_hash(self, image_hash: int) -> bool:
         """
-        Очищает bucket (для тестирования).
+        Удаляет dHash из всех bucket'ов (ложное срабатывание, тесты).
         
         Args:
-            prefix: Префикс bucket
+            image_hash: Хэш для удаления
             
         Returns:
             True если успешно
         """
+        return await self._remove({"dhash": image_hash})
+    
+    async def remove_spam_fingerprint(self, fingerprint: ImageFingerprint) -> bool:
+        """Удаляет все типы хэшей отпечатка (ложное срабатывание)."""
+        return await self._remove(dict(fingerprint.items()))
+    
+    async def _remove(self, hashes: Dict[str, int]) -> bool:
+        hashes = {kind: value for kind, value in hashes.items() if kind in self.indexes}
         try:
-            bucket_key = self.key_factory.image_hash_bucket(prefix)
-            await self.redis.delete(bucket_key)
+            pipe = self.redis.pipeline(transaction=True)
+            for kind, value in hashes.items():
+                self.indexes[kind].stage_remove(pipe, value)
+                if kind in self.replicas:
+                    self.replicas[kind].stage_remove(pipe, value)
+            await pipe.execute()
+            
+            for kind, value in hashes.items():
+                if kind in self.replicas:
+                    self.replicas[kind].matcher.remove(value)
             
-            logger.info(f"🗑️ Bucket {prefix} очищен")
+            logger.info(f"🗑️ Хэши {hashes} удалены из индекса")
             return True
         except Exception as e:
-            logger.error(f"Ошибка очистки bucket: {e}")
-            return False
\ No newline at end of file
+            logger.error(f"Ошибка удаления хэша: {e}")
+            return False    
+    async def close(self) -> None:
+        """Останавливает фоновые перезагрузки реплик."""
+        for replica in self.replicas.values():
+            await replica.close()
@@ -0,0 +1,236 @@
+# bot/services/image_guard/hash_replica.py
+"""
+Локальная реплика базы хэшей спам-изображений.
+
+Источник истины — ZSET всех хэшей в Redis (score = время добавления).
+Каждый процесс держит копию в VectorHashMatcher и догоняет изменения
+по Redis Stream с операциями add/del, поэтому проверка фото не ходит
+в сеть. Полная перезагрузка выполняется при старте, если поток был
+обрезан дальше прочитанной позиции, после события reload (массовый
+импорт) и периодически (чтобы убрать хэши с истекшим TTL).
+
+Полная перезагрузка идет фоновой задачей, а разбор снимка — в отдельном
+потоке: проверка фото не ждет чтения миллиона хэшей и до конца
+перезагрузки использует прежнюю копию.
+"""
+import asyncio
+import time
+from typing import Iterable, Optional, Tuple
+
+from loguru import logger
+from redis.asyncio import Redis
+
+from bot.utils.keys import KeyFactory
+from bot.utils.vector_hash_matcher import VectorHashMatcher
+
+
+def _s(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _stream_id(value: str) -> Tuple[int, int]:
+    ms, _, seq = value.partition("-")
+    return int(ms), int(seq or 0)
+
+
+class SpamHashReplica:
+    """
+    Копия базы хэшей в памяти процесса, синхронизируемая через Redis Stream.
+
+    Использование:
+        replica = SpamHashReplica(redis, ttl_seconds=30 * 24 * 3600)
+        await replica.ensure_fresh()
+        if replica.is_loaded:
+            match = replica.nearest(image_hash, max_distance=5)
+
+        pipe = redis.pipeline()
+        replica.stage_add(pipe, image_hash)
+        await pipe.execute()
+    """
+
+    READ_BATCH = 1000
+
+    def __init__(
+        self,
+        redis: Redis,
+        *,
+        ttl_seconds: int,
+        refresh_seconds: float = 2.0,
+        resync_seconds: float = 3600.0,
+        stream_maxlen: int = 100_000,
+        kind: str = "dhash",
+    ):
+        """
+        Args:
+            redis: Клиент Redis
+            ttl_seconds: Время жизни хэша в базе
+            refresh_seconds: Как часто читать поток изменений
+            resync_seconds: Как часто перезагружать реплику целиком
+            stream_maxlen: Примерная максимальная длина потока
+            kind: Тип хэша (dhash/phash/whash) — у каждого свои ZSET и поток
+        """
+        self.redis = redis
+        self.ttl_seconds = ttl_seconds
+        self.refresh_seconds = refresh_seconds
+        self.resync_seconds = resync_seconds
+        self.stream_maxlen = stream_maxlen
+        self.kind = kind
+
+        self.set_key = KeyFactory.image_fingerprint_set(kind)
+        self.stream_key = KeyFactory.image_fingerprint_stream(kind)
+
+        self.matcher = VectorHashMatcher()
+        self._last_id: Optional[str] = None
+        self._loaded_at = 0.0
+        self._refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+        self._reload_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._last_id is not None
+
+    @property
+    def is_reloading(self) -> bool:
+        return self._reload_task is not None and not self._reload_task.done()
+
+    def nearest(self, image_hash: int, max_distance: int) -> Optional[Tuple[int, int]]:
+        """Ближайший хэш реплики: (хэш, расстояние) или None."""
+        return self.matcher.nearest(image_hash, max_distance)
+
+    # ------------------------------------------------------------------
+    # Запись (в составе pipeline вызывающего). Локальная копия меняется
+    # после успешного execute() через matcher.add/remove — иначе ее
+    # догонит поток.
+    # ------------------------------------------------------------------
+
+    def stage_add(self, pipe, image_hash: int, now: Optional[float] = None) -> None:
+        """Добавляет в pipeline запись хэша в ZSET и событие add в поток."""
+        now = time.time() if now is None else now
+        member = str(int(image_hash))
+        pipe.zadd(self.set_key, {member: now})
+        pipe.zremrangebyscore(self.set_key, "-inf", now - self.ttl_seconds)
+        pipe.xadd(self.stream_key, {"op": "add", "hash": member}, maxlen=self.stream_maxlen, approximate=True)
+
+    def stage_add_many(self, pipe, hashes: Iterable[int], now: Optional[float] = None) -> None:
+        """
+        Добавляет в pipeline пачку хэшей одним ZADD, без событий в поток:
+        после импорта вызывающий ставит одно событие reload (stage_reload).
+        """
+        now = time.time() if now is None else now
+        pipe.zadd(self.set_key, {str(int(h)): now for h in hashes})
+
+    def stage_reload(self, pipe, now: Optional[float] = None) -> None:
+        """Удаляет устаревшие хэши и просит реплики перезагрузиться целиком."""
+        now = time.time() if now is None else now
+        pipe.zremrangebyscore(self.set_key, "-inf", now - self.ttl_seconds)
+        pipe.xadd(self.stream_key, {"op": "reload"}, maxlen=self.stream_maxlen, approximate=True)
+
+    def stage_remove(self, pipe, image_hash: int) -> None:
+        """Добавляет в pipeline удаление хэша и событие del в поток."""
+        member = str(int(image_hash))
+        pipe.zrem(self.set_key, member)
+        pipe.xadd(self.stream_key, {"op": "del", "hash": member}, maxlen=self.stream_maxlen, approximate=True)
+
+    # ------------------------------------------------------------------
+    # Синхронизация
+    # ------------------------------------------------------------------
+
+    async def ensure_fresh(self) -> None:
+        """
+        Догоняет изменения не чаще refresh_seconds.
+
+        Если нужна полная загрузка, запускает ее в фоне и сразу
+        возвращается: до ее завершения реплика отдает прежнюю копию,
+        а до первой загрузки is_loaded == False.
+        """
+        now = time.monotonic()
+        if now - self._refreshed_at < self.refresh_seconds:
+            return
+
+        async with self._lock:
+            if time.monotonic() - self._refreshed_at < self.refresh_seconds or self.is_reloading:
+                return
+            if (
+                not self.is_loaded
+                or now - self._loaded_at >= self.resync_seconds
+                or not await self._apply_stream()
+            ):
+                self._reload_task = asyncio.create_task(self._full_load())
+            self._refreshed_at = time.monotonic()
+
+    async def close(self) -> None:
+        """Останавливает фоновую перезагрузку."""
+        if self._reload_task and not self._reload_task.done():
+            self._reload_task.cancel()
+            try:
+                await self._reload_task
+            except asyncio.CancelledError:
+                pass
+        self._reload_task = None
+
+    async def _full_load(self) -> None:
+        """Снимок ZSET и позиция потока — атомарно (MULTI); новая копия заменяет старую."""
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.xrevrange(self.stream_key, count=1)
+                pipe.zrangebyscore(self.set_key, time.time() - self.ttl_seconds, "+inf")
+                last, members = await pipe.execute()
+
+            matcher = VectorHashMatcher()
+            await asyncio.to_thread(matcher.load, members)
+        except Exception as e:
+            logger.warning(f"⚠️ Реплика хэшей ({self.kind}) не перезагружена: {e}")
+            return
+
+        # события после снимка (в том числе add/del, уже примененные
+        # к старой копии) придут из потока начиная с _last_id
+        self.matcher = matcher
+        self._last_id = _s(last[0][0]) if last else "0-0"
+        self._loaded_at = time.monotonic()
+
+        logger.info(
+            f"🧮 Реплика хэшей спам-изображений ({self.kind}) загружена: {len(self.matcher)} хэшей, "
+            f"{self.matcher.nbytes // 1024} KiB"
+        )
+
+    async def _apply_stream(self) -> bool:
+        """
+        Применяет события потока после прочитанной позиции.
+
+        Returns:
+            False, если поток обрезан дальше позиции или пришло событие
+            reload после массового импорта (нужна полная загрузка)
+        """
+        while True:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.xread({self.stream_key: self._last_id}, count=self.READ_BATCH)
+                pipe.xrange(self.stream_key, count=1)
+                pipe.xlen(self.stream_key)
+                replies, first, length = await pipe.execute()
+
+            if (
+                first
+                and length >= self.stream_maxlen
+                and _stream_id(_s(first[0][0])) > _stream_id(self._last_id)
+            ):
+                logger.warning("⚠️ Поток хэшей обрезан дальше позиции реплики, полная перезагрузка")
+                return False
+
+            entries = replies[0][1] if replies else []
+            for entry_id, fields in entries:
+                fields = {_s(k): _s(v) for k, v in fields.items()}
+                if fields.get("op") == "reload":
+                    return False
+                try:
+                    image_hash = int(fields.get("hash", ""))
+                except ValueError:
+                    continue
+                if fields.get("op") == "del":
+                    self.matcher.remove(image_hash)
+                else:
+                    self.matcher.add(image_hash)
+                self._last_id = _s(entry_id)
+
+            if len(entries) < self.READ_BATCH:
+                return True
@@ -2,9 +2,12 @@
 """
 Перцептивное хэширование изображений.
 """
-from PIL import Image, ImageOps
+from PIL import Image
 from loguru import logger
 
+from bot.utils.image_fingerprint import ImageFingerprint, fingerprint_bytes
+from bot.utils.image_hash import HASH_SIZE, HASH_WIDTH, dhash, open_for_hashing
+
 
 class ImageHasher:
     """
@@ -18,11 +21,15 @@ class ImageHasher:
     2. Уменьшение до 9x8 пикселей
     3. Сравнение соседних пикселей
     4. Создание 64-битного хэша
+    
+    JPEG из байтов декодируется сразу в уменьшенном виде (draft), см.
+    bot.utils.image_hash. Составной отпечаток (dHash + pHash/wHash) —
+    compute_fingerprint_bytes, см. bot.utils.image_fingerprint.
     """
     
     # Константы
-    HASH_SIZE = 8
-    HASH_WIDTH = 9
+    HASH_SIZE = HASH_SIZE
+    HASH_WIDTH = HASH_WIDTH
     
     @staticmethod
     def compute_dhash(image: Image.Image) -> int:
@@ -36,35 +43,7 @@ class ImageHasher:
             64-битный хэш изображения
         """
         try:
-            # Применяем EXIF ротацию если есть
-            img = ImageOps.exif_transpose(image)
-            
-            # Конвертируем в grayscale
-            img = img.convert("L")
-            
-            # Уменьшаем до 9x8
-            img = img.resize(
-                (ImageHasher.HASH_WIDTH, ImageHasher.HASH_SIZE),
-                Image.Resampling.LANCZOS
-            )
-            
-            # Получаем пиксели
-            pixels = list(img.getdata())
-            
-            # Вычисляем хэш
-            hash_val = 0
-            
-            for row in range(ImageHasher.HASH_SIZE):
-                for col in range(ImageHasher.HASH_SIZE):
-                    # Индексы для текущего и следующего пикселя
-                    left_idx = row * ImageHasher.HASH_WIDTH + col
-                    right_idx = row * ImageHasher.HASH_WIDTH + col + 1
-                    
-                    left_pixel = pixels[left_idx]
-                    right_pixel = pixels[right_idx]
-                    
-                    # Сдвигаем и добавляем бит
-                    hash_val = (hash_val << 1) | (1 if left_pixel > right_pixel else 0)
+            hash_val = dhash(image)
             
             logger.debug(f"🔢 Вычислен dHash: {hash_val}")
             return hash_val
@@ -73,6 +52,33 @@ class ImageHasher:
             logger.error(f"❌ Ошибка вычисления dHash: {e}", exc_info=True)
             raise
     
+    @staticmethod
+    def compute_dhash_bytes(data: bytes) -> int:
+        """
+        Вычисляет dHash по байтам файла с уменьшенным декодированием JPEG.
+        
+        Args:
+            data: Байты изображения
+            
+        Returns:
+            64-битный хэш изображения
+        """
+        return ImageHasher.compute_dhash(open_for_hashing(data))
+    
+    @staticmethod
+    def compute_fingerprint_bytes(data: bytes, with_whash: bool = False) -> ImageFingerprint:
+        """
+        Вычисляет составной отпечаток по байтам файла за одно декодирование.
+        
+        Args:
+            data: Байты изображения
+            with_whash: Считать ли wHash
+            
+        Returns:
+            ImageFingerprint (dHash совпадает с compute_dhash_bytes)
+        """
+        return fingerprint_bytes(data, with_whash)
+    
     @staticmethod
     def hamming_distance(hash1: int, hash2: int) -> int:
         """
@@ -2,21 +2,24 @@
 """
 Главный сервис защиты от спам-изображений.
 """
-import asyncio
-import io
-from typing import Optional
+from typing import BinaryIO, Dict, Optional, Tuple
 
 from aiogram import Bot
 from aiogram.types import Message
 from loguru import logger
-from PIL import Image
 from redis.asyncio import Redis
 
+from bot.config.settings import settings
 from bot.services.image_guard.downloader import ImageDownloader
 from bot.services.image_guard.hash_database import SpamHashDatabase
 from bot.services.image_guard.hasher import ImageHasher
 from bot.services.image_guard.text_analyzer import SpamTextAnalyzer
 from bot.services.image_guard.violation_tracker import ViolationTracker
+from bot.utils.image_fingerprint import ImageFingerprint
+from bot.utils.image_hash import DEFAULT_MIN_SIDE, pick_hash_source
+from bot.utils.image_hash_transfer import FORMAT_TEXT, HashFileReader, write_hashes
+from bot.utils.image_result_cache import FIELD_OCR, ImageResultCache, image_unique_id
+from bot.utils.image_worker import ImageQueueFull, ImageWorkerPool, get_image_worker
 from bot.utils.models import ImageVerdict
 
 
@@ -30,8 +33,8 @@ class ImageGuardService:
     └────────────────────────────────────┘
               ↓          ↓          ↓
     ┌──────────────┐ ┌──────────┐ ┌────────────────┐
-    │ Hasher       │ │ Downloader│ │ Text Analyzer │
-    │ (dHash)      │ │ (Telegram)│ │ (Patterns)    │
+    │ Fingerprint  │ │ Downloader│ │ Text Analyzer │
+    │ (dHash+pHash)│ │ (Telegram)│ │ (Patterns)    │
     └──────────────┘ └──────────┘ └────────────────┘
               ↓                    ↓
     ┌─────────────────────┐ ┌──────────────────┐
@@ -40,17 +43,22 @@ class ImageGuardService:
     └─────────────────────┘ └──────────────────┘
     
     Функции:
-    - Перцептивное хэширование (dHash)
+    - Перцептивный отпечаток (dHash + pHash, опционально wHash)
     - База дубликатов с bucketing
     - Анализ текста на спам-паттерны
     - OCR через Vision API (опционально)
+    - Кэш хэша и OCR по file_unique_id (повторная картинка не скачивается)
+    - Стикеры (WebP, превью TGS/видео), анимации и изображения-документы
+    - Импорт/экспорт базы хэшей файлом (обмен блок-листами между ботами)
     - Система эскалации наказаний
     """
     
     def __init__(
         self,
         redis: Redis,
-        vision_service: Optional[any] = None
+        vision_service: Optional[any] = None,
+        result_cache: Optional[ImageResultCache] = None,
+        image_worker: Optional[ImageWorkerPool] = None
     ):
         """
         Инициализирует сервис защиты от спам-изображений.
@@ -58,9 +66,16 @@ class ImageGuardService:
         Args:
             redis: Клиент Redis
             vision_service: Опциональный сервис для OCR
+            result_cache: Общий кэш результатов по file_unique_id
+            image_worker: Пул процессов для декодирования и хэширования
         """
         self.redis = redis
         self.vision_service = vision_service
+        self.hash_min_side = getattr(
+            getattr(settings, "security", None), "phash_min_side", DEFAULT_MIN_SIDE
+        )
+        self.result_cache = result_cache or ImageResultCache(redis)
+        self.image_worker = image_worker or get_image_worker()
         
         # Инициализируем компоненты
         self.hasher = ImageHasher()
@@ -89,10 +104,11 @@ class ImageGuardService:
         
         Алгоритм:
         1. Проверка наличия фото
-        2. Скачивание изображения
-        3. Вычисление хэша
+        2. Отпечаток из кэша по file_unique_id, иначе скачивание маленькой
+           копии и вычисление dHash/pHash
+        3. Сохранение отпечатка в кэш
         4. Проверка по базе дубликатов
-        5. Извлечение и анализ текста
+        5. Извлечение и анализ текста (полноразмерное фото — только для OCR)
         6. Определение наказания
         
         Args:
@@ -113,35 +129,27 @@ class ImageGuardService:
             logger.warning("⚠️ Bot не установлен, пропускаем проверку")
             return ImageVerdict(action="allow")
         
-        # Скачиваем изображение
-        img_bytes = await self.downloader.download_photo(message)
-        
-        if not img_bytes:
-            logger.debug("Не удалось скачать изображение")
-            return ImageVerdict(action="allow", reason="download_failed")
+        # Отпечаток из кэша или по маленькой копии фото
+        fingerprint, failure = await self._get_fingerprint(message)
         
-        # Вычисляем хэш
-        image_hash = await self._compute_hash(img_bytes)
+        if fingerprint is None:
+            return ImageVerdict(action="allow", reason=failure)
         
-        if image_hash is None:
-            logger.warning("Не удалось вычислить хэш")
-            return ImageVerdict(action="allow", reason="hash_failed")
-        
-        # Проверяем по базе дубликатов
-        is_duplicate, dup_reason = await self.hash_db.is_spam_hash(image_hash)
+        # Проверяем по базе дубликатов (любой тип хэша)
+        is_duplicate, dup_reason = await self.hash_db.is_spam_fingerprint(fingerprint)
         
         if is_duplicate:
             logger.warning(f"🚨 Обнаружен дубликат спам-изображения: {dup_reason}")
             return await self._escalate_punishment(message, dup_reason)
         
         # Извлекаем и анализируем текст
-        text = await self._extract_text(message, img_bytes)
+        text = await self._extract_text(message)
         
         if self.text_analyzer.is_spam(text):
             logger.warning("🚨 Обнаружен спам в тексте изображения")
             
-            # Добавляем хэш в базу для будущих проверок
-            await self.hash_db.add_spam_hash(image_hash)
+            # Добавляем отпечаток в базу для будущих проверок
+            await self.hash_db.add_spam_fingerprint(fingerprint)
             
             return await self._escalate_punishment(message, "suspicious_text")
         
@@ -164,72 +172,185 @@ class ImageGuardService:
         if not self._has_photo(message):
             return "❌ В сообщении нет изображения"
         
-        # Скачиваем изображение
-        img_bytes = await self.downloader.download_photo(message)
+        fingerprint, failure = await self._get_fingerprint(message)
         
-        if not img_bytes:
+        if failure == "download_failed":
             return "❌ Не удалось скачать изображение"
         
-        # Вычисляем хэш
-        image_hash = await self._compute_hash(img_bytes)
-        
-        if image_hash is None:
+        if fingerprint is None:
             return "❌ Не удалось вычислить хэш"
         
         # Добавляем в базу
-        success = await self.hash_db.add_spam_hash(image_hash)
+        success = await self.hash_db.add_spam_fingerprint(fingerprint)
         
         if success:
-            return f"✅ Изображение добавлено в базу спама (hash: {image_hash})"
+            return f"✅ Изображение добавлено в базу спама (hash: {fingerprint.dhash})"
         
         return "❌ Ошибка добавления в базу"
     
+    async def import_spam_hashes(
+        self,
+        stream: BinaryIO,
+        kind: str = "dhash",
+        fmt: str = "auto"
+    ) -> Dict[str, int]:
+        """
+        Импортирует хэши из файла (админская функция).
+        
+        Args:
+            stream: Файл в бинарном режиме (текстовый или бинарный формат)
+            kind: Тип хэшей в файле (dhash/phash/whash)
+            fmt: "text", "binary" или "auto"
+            
+        Returns:
+            Словарь {read, added, duplicates, invalid}
+        """
+        reader = HashFileReader(stream, fmt)
+        stats = await self.hash_db.import_hashes(
+            reader.batches(self.hash_db.IMPORT_BATCH), kind
+        )
+        stats["invalid"] = reader.invalid
+        return stats
+    
+    async def export_spam_hashes(
+        self,
+        stream: BinaryIO,
+        kind: str = "dhash",
+        fmt: str = FORMAT_TEXT
+    ) -> int:
+        """
+        Выгружает хэши в файл пачками (вся база в память не читается).
+        
+        Args:
+            stream: Файл в бинарном режиме
+            kind: Тип хэшей (dhash/phash/whash)
+            fmt: "text" или "binary"
+            
+        Returns:
+            Количество выгруженных хэшей
+        """
+        total = 0
+        async for batch in self.hash_db.iter_hash_batches(kind):
+            total += write_hashes(stream, batch, fmt)
+        logger.info(f"📤 Экспортировано хэшей {kind}: {total}")
+        return total
+    
+    async def find_known_spam(self, message: Message) -> Tuple[bool, str]:
+        """
+        Проверяет изображение только по базе отпечатков — без OCR, AI и
+        эскалации. Повторный стикер или картинка не скачиваются: отпечаток
+        берется из кэша по file_unique_id.
+        
+        Args:
+            message: Сообщение с фото, стикером, анимацией или документом
+            
+        Returns:
+            (найден ли в базе спама, причина)
+        """
+        if not self._ensure_downloader(message) or not self._has_photo(message):
+            return False, "no_image"
+        
+        fingerprint, failure = await self._get_fingerprint(message)
+        if fingerprint is None:
+            return False, failure or "hash_failed"
+        
+        return await self.hash_db.is_spam_fingerprint(fingerprint)
+    
+    def _ensure_downloader(self, message: Message) -> bool:
+        """Создает загрузчик из бота сообщения, если set_bot() не вызывался."""
+        if self.downloader is None and message.bot is not None:
+            self.set_bot(message.bot)
+        return self.downloader is not None
+    
     @staticmethod
     def _has_photo(message: Message) -> bool:
         """
-        Проверяет наличие фото в сообщении.
+        Проверяет, есть ли в сообщении изображение для проверки.
         
         Args:
             message: Сообщение
             
         Returns:
-            True если есть фото
+            True если есть фото, стикер, анимация или изображение-документ
+        """
+        return ImageDownloader.has_image(message)
+    
+    async def _get_fingerprint(
+        self,
+        message: Message
+    ) -> Tuple[Optional[ImageFingerprint], Optional[str]]:
+        """
+        Возвращает отпечаток изображения, по возможности без скачивания.
+        
+        Args:
+            message: Сообщение с фото, стикером, анимацией или документом
+            
+        Returns:
+            (отпечаток, None) или (None, "download_failed" | "hash_failed")
         """
-        return ImageDownloader.has_photo(message)
+        source = pick_hash_source(message, self.hash_min_side)
+        if source is None:
+            return None, "download_failed"
+        
+        unique_id = source.unique_id
+        with_whash = "whash" in self.hash_db.kinds
+        
+        fingerprint = await self.result_cache.get_fingerprint(unique_id, with_whash)
+        if fingerprint is not None:
+            logger.debug(f"♻️ Отпечаток изображения из кэша: {unique_id} ({source.kind})")
+            return fingerprint, None
+        
+        hash_bytes = await self.downloader.download_source(source)
+        
+        if not hash_bytes:
+            logger.debug("Не удалось скачать изображение")
+            return None, "download_failed"
+        
+        fingerprint = await self._compute_fingerprint(hash_bytes, with_whash)
+        
+        if fingerprint is None:
+            logger.warning("Не удалось вычислить хэш")
+            return None, "hash_failed"
+        
+        await self.result_cache.set_fingerprint(unique_id, fingerprint)
+        return fingerprint, None
     
-    async def _compute_hash(self, img_bytes: bytes) -> Optional[int]:
+    async def _compute_fingerprint(
+        self,
+        img_bytes: bytes,
+        with_whash: bool = False
+    ) -> Optional[ImageFingerprint]:
         """
-        Вычисляет хэш изображения в отдельном потоке.
+        Вычисляет отпечаток изображения в пуле процессов.
         
         Args:
             img_bytes: Байты изображения
+            with_whash: Считать ли wHash
             
         Returns:
-            Хэш или None при ошибке
+            Отпечаток или None при ошибке или переполненной очереди
         """
         try:
-            # Открываем изображение
-            image = Image.open(io.BytesIO(img_bytes))
+            # Декодирование держит GIL — считаем вне процесса бота
+            return await self.image_worker.fingerprint(img_bytes, with_whash)
             
-            # Вычисляем хэш в thread pool (CPU-intensive)
-            hash_value = await asyncio.to_thread(
-                self.hasher.compute_dhash,
-                image
-            )
-            
-            return hash_value
+        except ImageQueueFull as e:
+            logger.warning(f"⚠️ Хэш изображения пропущен: {e}")
+            return None
             
         except Exception as e:
             logger.error(f"❌ Ошибка вычисления хэша: {e}", exc_info=True)
             return None
     
-    async def _extract_text(self, message: Message, img_bytes: bytes) -> str:
+    async def _extract_text(self, message: Message) -> str:
         """
         Извлекает текст из сообщения и изображения (OCR).
         
+        Полноразмерное фото скачивается только если настроен OCR,
+        текста этой картинки еще нет в кэше и очередь vision не перегружена.
+        
         Args:
             message: Сообщение
-            img_bytes: Байты изображения
             
         Returns:
             Объединенный текст
@@ -240,10 +361,22 @@ class ImageGuardService:
         if message.caption:
             text_parts.append(message.caption.strip())
         
-        # OCR через Vision API
+        # OCR через Vision API (результат кэшируется, в том числе пустой)
         if self.vision_service:
             try:
-                ocr_result = await self.vision_service.extract_text(img_bytes)
+                unique_id = image_unique_id(message)
+                ocr_result = await self.result_cache.get(unique_id, FIELD_OCR)
+                
+                chat_id = message.chat.id if message.chat else None
+                # очередь vision перегружена — не качаем фото, решают эвристики
+                if ocr_result is None and self.vision_service.accepts(chat_id):
+                    img_bytes = await self.downloader.download_photo(message)
+                    ocr_result = (
+                        await self.vision_service.extract_text(img_bytes, unique_id, chat_id)
+                        if img_bytes else None
+                    )
+                    if ocr_result is not None:
+                        await self.result_cache.set(unique_id, FIELD_OCR, ocr_result)
                 
                 if ocr_result and ocr_result.strip():
                     text_parts.append(ocr_result)
@@ -298,4 +431,7 @@ class ImageGuardService:
     
     async def reset_user_violations(self, user_id: int) -> bool:
         """Сбрасывает нарушения пользователя (для админов)."""
-        return await self.violation_tracker.reset_violations(user_id)
\ No newline at end of file
+        return await self.violation_tracker.reset_violations(user_id)    
+    async def close(self) -> None:
+        """Останавливает фоновые задачи базы хэшей."""
+        await self.hash_db.close()
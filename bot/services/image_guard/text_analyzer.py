@@ -21,7 +21,7 @@ class SpamTextAnalyzer:
     
     def __init__(self):
         """Инициализирует анализатор текста."""
-        self.config = settings.security
+        self.config = getattr(settings, "security", None)
         self._spam_pattern = self._compile_spam_pattern()
         
         logger.debug("🔧 SpamTextAnalyzer инициализирован")
@@ -8,6 +8,7 @@ from redis.asyncio import Redis
 from bot.config.settings import settings
 from bot.utils.keys import KeyFactory
 from bot.utils.models import ImageVerdict
+from bot.utils.violation_counter import ViolationCounter
 
 
 class ViolationTracker:
@@ -28,7 +29,8 @@ class ViolationTracker:
         """
         self.redis = redis
         self.key_factory = KeyFactory()
-        self.config = settings.security
+        self.counter = ViolationCounter(redis)
+        self.config = getattr(settings, "security", None)
         
         # Загружаем параметры
         self.window_seconds = getattr(self.config, 'window_seconds', 86400)  # 24 часа
@@ -52,12 +54,16 @@ class ViolationTracker:
         try:
             key = self.key_factory.user_spam_image_count(user_id)
             
-            # Увеличиваем счетчик
-            violations = await self.redis.incr(key)
+            # Увеличиваем счетчик атомарно; окно отсчитывается от первого нарушения
+            result = await self.counter.register(
+                key,
+                window_seconds=self.window_seconds,
+                ban_threshold=self.ban_threshold,
+                sliding=False,
+            )
+            violations = result.count
             
-            # Устанавливаем TTL только при первом нарушении
             if violations == 1:
-                await self.redis.expire(key, self.window_seconds)
                 logger.info(
                     f"⚠️ Первое нарушение user_id={user_id} "
                     f"(окно: {self.window_seconds}s)"
@@ -120,9 +126,7 @@ class ViolationTracker:
         """
         try:
             key = self.key_factory.user_spam_image_count(user_id)
-            value = await self.redis.get(key)
-            
-            return int(value) if value else 0
+            return await self.counter.get_count(key)
         except Exception as e:
             logger.error(f"Ошибка получения нарушений: {e}")
             return 0
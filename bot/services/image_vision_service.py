@@ -4,15 +4,21 @@
 # Описание: Сервис-фасад для анализа изображений с использованием AI.
 # Делегирует задачи по распознаванию текста и модерации основному AI-сервису.
 
-import asyncio
-from io import BytesIO
-from typing import Dict, Any, Optional
+import hashlib
+from typing import Dict, Any, Optional, Tuple
 
 from loguru import logger
-from PIL import Image
 
 from bot.services.ai_content_service import AIContentService
+from bot.utils.image_result_cache import FIELD_VISION, ImageResultCache
+from bot.utils.image_worker import (
+    ImageQueueFull,
+    ImageWorkerPool,
+    get_image_worker,
+    prepare_image_for_vision,
+)
 from bot.utils.models import ImageAnalysisResult
+from bot.utils.vision_queue import VisionOverloaded, VisionWorkQueue, get_vision_queue
 
 
 class ImageVisionService:
@@ -22,62 +28,143 @@ class ImageVisionService:
     для распознавания текста (OCR) и вынесения вердикта о спаме.
     """
 
-    def __init__(self, ai_service: AIContentService):
+    def __init__(
+        self,
+        ai_service: AIContentService,
+        result_cache: Optional[ImageResultCache] = None,
+        image_worker: Optional[ImageWorkerPool] = None,
+        vision_queue: Optional[VisionWorkQueue] = None,
+    ):
         """
         Инициализирует сервис.
 
         :param ai_service: Экземпляр AIContentService для выполнения AI-запросов.
+        :param result_cache: Кэш вердиктов по file_unique_id (без него AI вызывается всегда).
+        :param image_worker: Пул процессов для подготовки изображений.
+        :param vision_queue: Очередь AI-вызовов (лимит параллелизма, честность по чатам).
         """
         self.ai_service = ai_service
+        self.result_cache = result_cache
+        self.image_worker = image_worker or get_image_worker()
+        self.vision_queue = vision_queue or get_vision_queue()
         logger.info("Сервис ImageVisionService инициализирован.")
 
-    async def analyze(self, photo_bytes: bytes) -> ImageAnalysisResult:
+    async def get_cached(self, file_unique_id: Optional[str]) -> Optional[ImageAnalysisResult]:
+        """
+        Возвращает сохраненный вердикт для картинки, если он есть.
+
+        Позволяет вызывающему коду не скачивать уже проверенное изображение.
+        """
+        if self.result_cache is None or not file_unique_id:
+            return None
+        raw = await self.result_cache.get(file_unique_id, FIELD_VISION)
+        if raw is None:
+            return None
+        try:
+            return ImageAnalysisResult.model_validate_json(raw)
+        except ValueError:
+            return None
+
+    def accepts(self, chat_id: Optional[int] = None) -> bool:
+        """Примет ли очередь AI-вызов (проверяйте до скачивания картинки)."""
+        return self.vision_queue.accepts(chat_id)
+
+    async def analyze(
+        self,
+        photo_bytes: bytes,
+        file_unique_id: Optional[str] = None,
+        chat_id: Optional[int] = None,
+    ) -> ImageAnalysisResult:
         """
         Анализирует изображение на предмет спама и извлекает текст.
 
         Возвращает объект ImageAnalysisResult с результатами анализа.
         В случае сбоя AI или отсутствия AI-провайдера возвращает
         нейтральный результат (не спам, нет текста).
+        Если передан file_unique_id, успешный вердикт кэшируется и
+        повторная картинка не отправляется в AI.
+        AI-вызов идет через общую очередь (chat_id — для честности по
+        чатам); одинаковая картинка в работе анализируется один раз, а при
+        перегрузке возвращается нейтральный результат.
         """
+        result, _ = await self._analyze(photo_bytes, file_unique_id, chat_id)
+        return result
+
+    async def extract_text(
+        self,
+        photo_bytes: bytes,
+        file_unique_id: Optional[str] = None,
+        chat_id: Optional[int] = None,
+    ) -> Optional[str]:
+        """
+        Извлекает текст с изображения (OCR) тем же вызовом, что и analyze().
+
+        Возвращает None, если анализ не выполнен (нет AI, перегрузка, ошибка),
+        чтобы вызывающий не кэшировал пустой текст как настоящий результат.
+        """
+        result, ok = await self._analyze(photo_bytes, file_unique_id, chat_id)
+        return (result.extracted_text or "") if ok else None
+
+    async def _analyze(
+        self,
+        photo_bytes: bytes,
+        file_unique_id: Optional[str],
+        chat_id: Optional[int],
+    ) -> Tuple[ImageAnalysisResult, bool]:
+        """Вердикт и признак того, что он получен от AI или из кэша (а не заглушка)."""
+        cached = await self.get_cached(file_unique_id)
+        if cached is not None:
+            return cached, True
+
         if not self.ai_service:
             logger.warning("AIContentService не доступен, анализ изображений пропущен.")
-            return ImageAnalysisResult()
+            return ImageAnalysisResult(), False
 
         try:
-            # Асинхронно выполняем CPU-bound операцию по обработке изображения
-            prepared_bytes = await asyncio.to_thread(self._prepare_image, photo_bytes)
-
-            prompt = (
-                "Проанализируй это изображение на предмет спама, рекламы или мошенничества. "
-                "Извлеки весь читаемый текст. Верни JSON."
+            key = file_unique_id or hashlib.blake2b(photo_bytes, digest_size=16).hexdigest()
+            response_data = await self.vision_queue.submit(
+                lambda: self._call_ai(photo_bytes), key=f"analyze:{key}", chat_id=chat_id
             )
-            
-            # Вызываем основной AI сервис для анализа
-            response_data = await self.ai_service.analyze_image(prompt, prepared_bytes)
 
             if isinstance(response_data, dict):
-                return ImageAnalysisResult.model_validate(response_data)
+                result = ImageAnalysisResult.model_validate(response_data)
+                if self.result_cache is not None and file_unique_id:
+                    await self.result_cache.set(file_unique_id, FIELD_VISION, result.model_dump_json())
+                return result, True
             
             logger.warning(f"AI-сервис вернул неожиданный тип данных для анализа изображения: {type(response_data)}")
-            return ImageAnalysisResult(explanation="AI service returned invalid data type.")
+            return ImageAnalysisResult(explanation="AI service returned invalid data type."), False
+
+        except ImageQueueFull as e:
+            # перегрузка: решение остается за эвристиками, AI не вызывается
+            logger.warning(f"Анализ изображения пропущен: {e}")
+            return ImageAnalysisResult(explanation="Image queue is full."), False
+
+        except VisionOverloaded as e:
+            logger.warning(f"Анализ изображения пропущен: {e}")
+            return ImageAnalysisResult(explanation="Vision queue is saturated."), False
 
         except Exception as e:
             logger.exception(f"Критическая ошибка при анализе изображения: {e}")
-            return ImageAnalysisResult(explanation=f"Analysis failed due to an exception: {e}")
+            return ImageAnalysisResult(explanation=f"Analysis failed due to an exception: {e}"), False
+
+    async def _call_ai(self, photo_bytes: bytes) -> Any:
+        """Подготовка картинки в пуле процессов и сам AI-вызов (внутри слота очереди)."""
+        prepared_bytes = await self.image_worker.prepare_for_vision(photo_bytes)
+
+        prompt = (
+            "Проанализируй это изображение на предмет спама, рекламы или мошенничества. "
+            "Извлеки весь читаемый текст. Верни JSON."
+        )
+
+        # Вызываем основной AI сервис для анализа
+        return await self.ai_service.analyze_image(prompt, prepared_bytes)
 
     @staticmethod
     def _prepare_image(photo_bytes: bytes) -> bytes:
         """
         Подготавливает изображение для отправки в AI-модель.
         Конвертирует в стандартный формат (JPEG) для лучшей совместимости.
-        Эта операция выполняется в отдельном потоке, чтобы не блокировать event loop.
+        Синхронная версия; analyze() выполняет то же самое в пуле процессов.
         """
-        try:
-            img = Image.open(BytesIO(photo_bytes)).convert("RGB")
-            buffer = BytesIO()
-            img.save(buffer, format="JPEG", quality=90)
-            return buffer.getvalue()
-        except Exception as e:
-            logger.error(f"Не удалось подготовить изображение: {e}")
-            # В случае ошибки возвращаем исходные байты
-            return photo_bytes
\ No newline at end of file
+        return prepare_image_for_vision(photo_bytes)
\ No newline at end of file
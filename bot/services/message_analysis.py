@@ -0,0 +1,234 @@
+# bot/services/message_analysis.py
+"""
+Общий контекст анализа одного сообщения для всех слоев модерации.
+
+Одно сообщение в группе проходит через несколько middleware, фильтров
+и сервисов. Каждый из них раньше заново читал текст, нормализовал его,
+извлекал ссылки и скачивал фото. MessageAnalysis вычисляет все это лениво
+и ровно один раз, а затем переиспользуется через словарь `data` aiogram.
+
+Использование:
+    analysis = MessageAnalysis.from_data(data, message)
+    if analysis.domains:
+        ...
+    photo = await analysis.photo_bytes()
+"""
+import asyncio
+import re
+from functools import cached_property
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+from aiogram import Bot
+from aiogram.types import Message, PhotoSize
+from loguru import logger
+
+from bot.utils.image_hash import DEFAULT_MIN_SIDE, pick_photo_for_hashing
+from bot.utils.image_result_cache import image_unique_id
+from bot.utils.text.normalizer import normalize_spam_text, normalize_text
+
+# Совпадает с разбором ссылок в DomainInspector
+URL_PATTERN = re.compile(r"https?://[^\s/$.?#].[^\s]*", re.IGNORECASE)
+
+
+class MessageAnalysis:
+    """
+    Лениво вычисляемые признаки сообщения.
+
+    Текстовые признаки — cached_property, скачанные файлы кэшируются
+    по file_id (параллельные запросы одного файла разделяют одну загрузку).
+    Слои модерации могут сохранять свои результаты в `hashes` и `scores`,
+    чтобы следующие слои их не пересчитывали.
+    """
+
+    DATA_KEY = "message_analysis"
+    MAX_TEXT_LENGTH = 4096
+
+    def __init__(self, message: Message, bot: Optional[Bot] = None):
+        """
+        Args:
+            message: Анализируемое сообщение
+            bot: Бот для скачивания файлов (по умолчанию message.bot)
+        """
+        self.message = message
+        self.bot = bot or getattr(message, "bot", None)
+
+        self.hashes: Dict[str, Any] = {}
+        self.scores: Dict[str, Any] = {}
+
+        self._downloads: Dict[str, "asyncio.Future[Optional[bytes]]"] = {}
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any], message: Message) -> "MessageAnalysis":
+        """
+        Возвращает контекст сообщения из `data`, создавая его при необходимости.
+
+        Args:
+            data: Словарь данных aiogram (или kwargs фильтра)
+            message: Текущее сообщение
+        """
+        analysis = data.get(cls.DATA_KEY)
+
+        if isinstance(analysis, cls) and analysis.is_for(message):
+            return analysis
+
+        analysis = cls(message, bot=data.get("bot"))
+        data[cls.DATA_KEY] = analysis
+        return analysis
+
+    def is_for(self, message: Message) -> bool:
+        """Относится ли контекст к этому сообщению."""
+        if message is self.message:
+            return True
+        return (
+            getattr(message, "message_id", None) == getattr(self.message, "message_id", None)
+            and getattr(message.chat, "id", None) == getattr(self.message.chat, "id", None)
+        )
+
+    # ------------------------------------------------------------------
+    # Текст
+    # ------------------------------------------------------------------
+
+    @cached_property
+    def text(self) -> str:
+        """Текст или подпись сообщения (обрезанный до MAX_TEXT_LENGTH)."""
+        return (self.message.text or self.message.caption or "")[:self.MAX_TEXT_LENGTH]
+
+    @cached_property
+    def full_text(self) -> str:
+        """Текст и подпись вместе (для AI-модерации)."""
+        parts = [self.message.text or "", self.message.caption or ""]
+        return "\n".join(parts)[:self.MAX_TEXT_LENGTH]
+
+    @cached_property
+    def lowered(self) -> str:
+        """Текст в нижнем регистре."""
+        return self.text.lower()
+
+    @cached_property
+    def normalized(self) -> str:
+        """Текст без пунктуации и лишних пробелов (bot.utils.text)."""
+        return normalize_text(self.text)
+
+    @cached_property
+    def spam_normalized(self) -> str:
+        """Текст с раскрытой обфускацией (конфузаблы, leet) для антиспама."""
+        return normalize_spam_text(self.text)
+
+    @cached_property
+    def tokens(self) -> List[str]:
+        """Слова нормализованного текста."""
+        return self.normalized.split()
+
+    @cached_property
+    def urls(self) -> List[str]:
+        """Ссылки со схемой http(s)."""
+        return URL_PATTERN.findall(self.text)
+
+    @cached_property
+    def domains(self) -> List[str]:
+        """Уникальные хосты из ссылок в нижнем регистре, в порядке появления."""
+        domains: List[str] = []
+        for url in self.urls:
+            try:
+                hostname = urlparse(url).hostname
+            except ValueError as e:
+                logger.debug(f"Ошибка парсинга URL '{url}': {e}")
+                continue
+            if hostname and hostname.lower() not in domains:
+                domains.append(hostname.lower())
+        return domains
+
+    # ------------------------------------------------------------------
+    # Медиа
+    # ------------------------------------------------------------------
+
+    @cached_property
+    def largest_photo(self) -> Optional[PhotoSize]:
+        """Самый крупный размер фото или None."""
+        if not self.message.photo:
+            return None
+        return max(
+            self.message.photo,
+            key=lambda p: (p.file_size or 0, (p.width or 0) * (p.height or 0))
+        )
+
+    @cached_property
+    def image_unique_id(self) -> Optional[str]:
+        """file_unique_id изображения — ключ кэша результатов (ImageResultCache)."""
+        return image_unique_id(self.message)
+
+    async def photo_bytes(self, bot: Optional[Bot] = None) -> Optional[bytes]:
+        """Байты самого крупного фото для OCR/vision (скачиваются один раз)."""
+        photo = self.largest_photo
+        if photo is None:
+            return None
+        return await self.download(photo.file_id, bot=bot)
+
+    def hash_photo(self, min_side: int = DEFAULT_MIN_SIDE) -> Optional[PhotoSize]:
+        """Самый маленький размер фото, достаточный для перцептивного хэша."""
+        if not self.message.photo:
+            return None
+        return pick_photo_for_hashing(self.message.photo, min_side)
+
+    async def hash_photo_bytes(
+        self,
+        bot: Optional[Bot] = None,
+        min_side: int = DEFAULT_MIN_SIDE
+    ) -> Optional[bytes]:
+        """Байты маленькой копии фото для хэширования (скачиваются один раз)."""
+        photo = self.hash_photo(min_side)
+        if photo is None:
+            return None
+        return await self.download(photo.file_id, bot=bot)
+
+    async def download(self, file_id: str, bot: Optional[Bot] = None) -> Optional[bytes]:
+        """
+        Скачивает файл Telegram один раз на сообщение.
+
+        Args:
+            file_id: Идентификатор файла
+            bot: Бот (если не задан в контексте)
+
+        Returns:
+            Байты файла или None при ошибке
+
+        Сохраняется только завершенное скачивание: если первый вызов
+        отменен (ранний выход, таймаут слоя), запись удаляется, и
+        ожидающие или следующие вызовы скачивают файл заново.
+        """
+        while file_id in self._downloads:
+            future = self._downloads[file_id]
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # отменили этот вызов, а не скачивание
+
+        future = asyncio.get_running_loop().create_future()
+        self._downloads[file_id] = future
+
+        try:
+            data = await self._fetch(file_id, bot or self.bot)
+        except BaseException:
+            del self._downloads[file_id]
+            future.cancel()
+            raise
+
+        future.set_result(data)
+        return data
+
+    @staticmethod
+    async def _fetch(file_id: str, bot: Optional[Bot]) -> Optional[bytes]:
+        if bot is None:
+            logger.debug("MessageAnalysis: нет бота для скачивания файла")
+            return None
+        try:
+            file = await bot.get_file(file_id)
+            if not file.file_path:
+                return None
+            buffer = await bot.download_file(file.file_path)
+            return buffer.read() if buffer else None
+        except Exception as e:
+            logger.debug(f"MessageAnalysis: не удалось скачать файл {file_id}: {e}")
+            return None
@@ -0,0 +1,513 @@
+# bot/services/nb_trainer.py
+"""
+Пакетное (офлайн) обучение NB-модели AntiSpamService.
+
+Онлайн-обучение (learn_from_admin_action) пишет по одному HINCRBY на
+признак каждого сообщения. Пакетный тренер читает сохраненные примеры
+спама (SpamKnowledgeBase) и/или JSONL-корпус, агрегирует счетчики
+признаков в памяти и сбрасывает их крупными транзакционными пайплайнами.
+
+Режимы:
+- merge   — счетчики добавляются к текущей модели;
+- rebuild — модель строится заново во временных ключах и атомарно
+            подменяет текущую (RENAME в MULTI), предсказания во время
+            обучения используют старую модель.
+
+Обучение возобновляемое: каждый сброс записывает чекпоинт (позиции
+в источниках) в той же транзакции, что и счетчики, поэтому после сбоя
+повторный запуск продолжает с последнего сброса без двойного учета.
+Примеры спама читаются из снимка, сделанного в начале задания: живой
+список обрезается (LTRIM) при каждом новом примере, и позиции в нем
+сдвигались бы между запусками.
+
+Если антиспам работает на count-min sketch (SECURITY__NB_STORE =
+"sketch"), счетчики пишутся в sketch (BITFIELD), а не в HASH'и.
+
+Rebuild требует обоих классов: примеры из Redis — только спам, поэтому
+без JSONL-корпуса с ham пересборка отклоняется, а рабочая модель
+остается нетронутой.
+
+Запуск:
+    python -m bot.services.nb_trainer --jsonl corpus.jsonl --rebuild
+
+Формат JSONL: {"text": "...", "label": "spam" | "ham"} (также 1/0,
+true/false или поле "is_spam").
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
+
+from loguru import logger
+from redis.asyncio import Redis
+
+from bot.services.anti_spam_service import NBModel, hashed_features, normalize_text, tokenize
+from bot.utils.count_min_sketch import HAM, SPAM, CountMinSketch
+from bot.utils.keys import KeyFactory
+from bot.utils.nb_sketch_store import NBSketchStore
+
+SPAM_LABELS = {"spam", "1", "true", "yes"}
+HAM_LABELS = {"ham", "0", "false", "no"}
+
+
+@dataclass
+class TrainingReport:
+    """Итоги пакетного обучения."""
+    mode: str = "merge"
+    spam_docs: int = 0
+    ham_docs: int = 0
+    skipped: int = 0
+    fields_written: int = 0
+    flushes: int = 0
+    elapsed: float = 0.0
+    resumed: bool = False
+
+    @property
+    def docs(self) -> int:
+        return self.spam_docs + self.ham_docs
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.docs / self.elapsed if self.elapsed > 0 else 0.0
+
+    def as_text(self) -> str:
+        return (
+            f"mode={self.mode} docs={self.docs} (spam={self.spam_docs}, ham={self.ham_docs}, "
+            f"skipped={self.skipped}) fields={self.fields_written} flushes={self.flushes} "
+            f"elapsed={self.elapsed:.1f}s throughput={self.docs_per_sec:.0f} docs/s"
+            f"{' resumed' if self.resumed else ''}"
+        )
+
+
+class NBBulkTrainer:
+    """
+    Пакетный тренер NB-модели с возобновлением.
+
+    Использование:
+        trainer = NBBulkTrainer(redis)
+        report = await trainer.train(jsonl_path="corpus.jsonl", mode="rebuild")
+        logger.info(report.as_text())
+
+    Для sketch-хранилища передается sketch=NBSketchStore(...).
+    """
+
+    MODE_MERGE = "merge"
+    MODE_REBUILD = "rebuild"
+    STAGING_SUFFIX = ":staging"
+
+    def __init__(
+        self,
+        redis: Redis,
+        nb: Optional[NBModel] = None,
+        *,
+        sketch: Optional[NBSketchStore] = None,
+        flush_docs: int = 2000,
+        chunk_size: int = 500,
+        ttl_seconds: int = 30 * 24 * 3600,
+    ):
+        """
+        Args:
+            redis: Клиент Redis
+            nb: Параметры модели (ключи, размер пространства признаков)
+            sketch: Хранилище count-min sketch (вместо HASH-модели)
+            flush_docs: Сколько документов агрегировать в памяти до сброса
+            chunk_size: Размер порции LRANGE при чтении примеров
+            ttl_seconds: TTL ключей модели (как у онлайн-обучения)
+        """
+        self.redis = redis
+        self.nb = nb or NBModel()
+        self.sketch = sketch
+        self.flush_docs = max(1, flush_docs)
+        self.chunk_size = max(1, chunk_size)
+        self.ttl_seconds = ttl_seconds
+        self.checkpoint_key = KeyFactory.nb_train_checkpoint()
+        self.snapshot_key = KeyFactory.nb_train_samples_snapshot()
+        self._job: Dict[str, str] = {}
+
+    # ------------------------------------------------------------------
+    # Публичный API
+    # ------------------------------------------------------------------
+
+    async def train(
+        self,
+        *,
+        use_samples: bool = True,
+        jsonl_path: Optional[str] = None,
+        mode: str = MODE_MERGE,
+        resume: bool = True,
+    ) -> TrainingReport:
+        """
+        Обучает модель на примерах из Redis и/или JSONL-корпусе.
+
+        Args:
+            use_samples: Читать примеры спама из SpamKnowledgeBase
+            jsonl_path: Путь к размеченному JSONL-корпусу
+            mode: "merge" или "rebuild"
+            resume: Продолжить с чекпоинта, если он от того же задания
+
+        Returns:
+            TrainingReport: Итоги обучения
+
+        Raises:
+            ValueError: Неизвестный режим или rebuild без источника ham
+            RuntimeError: Rebuild не набрал оба класса (модель не подменена)
+                или снимок примеров для возобновления потерян
+        """
+        if mode not in (self.MODE_MERGE, self.MODE_REBUILD):
+            raise ValueError(f"Неизвестный режим обучения: {mode}")
+        if mode == self.MODE_REBUILD and not jsonl_path:
+            raise ValueError(
+                "Rebuild без JSONL-корпуса невозможен: примеры из Redis — только спам, "
+                "модель ham была бы потеряна"
+            )
+
+        report = TrainingReport(mode=mode)
+        started = time.perf_counter()
+
+        positions = {"samples": 0, "jsonl": 0}
+        checkpoint = await self._load_checkpoint() if resume else {}
+        if checkpoint and self._same_job(checkpoint, mode, use_samples, jsonl_path):
+            positions["samples"] = int(checkpoint.get("samples_offset") or 0)
+            positions["jsonl"] = int(checkpoint.get("jsonl_offset") or 0)
+            report.resumed = True
+            if use_samples and positions["samples"] and not await self.redis.exists(self.snapshot_key):
+                raise RuntimeError("Снимок примеров спама потерян — запустите обучение заново (--restart)")
+            logger.info(
+                f"🔁 NB: продолжаем обучение с чекпоинта "
+                f"(samples={positions['samples']}, jsonl={positions['jsonl']})"
+            )
+        else:
+            await self.redis.delete(self.checkpoint_key, self.snapshot_key)
+            if mode == self.MODE_REBUILD:
+                await self._discard_staging()
+            if use_samples:
+                await self._snapshot_samples()
+
+        self._job = {
+            "mode": mode,
+            "use_samples": "1" if use_samples else "0",
+            "jsonl_path": jsonl_path or "",
+        }
+        target = self._keys(staging=(mode == self.MODE_REBUILD))
+
+        spam_counts: Counter = Counter()
+        ham_counts: Counter = Counter()
+        pending = {"spam": 0, "ham": 0}
+
+        async for source, position, text, label in self._iter_documents(
+            use_samples, jsonl_path, positions
+        ):
+            positions[source] = position
+
+            if label is None or not text:
+                report.skipped += 1
+                continue
+
+            feats = hashed_features(tokenize(normalize_text(text)), n_bits=self.nb.n_bits)
+            if label:
+                spam_counts.update(feats)
+                pending["spam"] += 1
+            else:
+                ham_counts.update(feats)
+                pending["ham"] += 1
+
+            if pending["spam"] + pending["ham"] >= self.flush_docs:
+                await self._flush(target, spam_counts, ham_counts, pending, positions, report)
+
+        await self._flush(target, spam_counts, ham_counts, pending, positions, report)
+
+        if mode == self.MODE_REBUILD:
+            if not await self._staged_both_classes():
+                await self._discard_staging()
+                await self.redis.delete(self.checkpoint_key, self.snapshot_key)
+                raise RuntimeError(
+                    "Rebuild отменен: в данных нет одного из классов (spam/ham), "
+                    "рабочая модель не изменена"
+                )
+            await self._swap()
+
+        await self.redis.delete(self.checkpoint_key, self.snapshot_key)
+
+        report.elapsed = time.perf_counter() - started
+        logger.success(f"✅ NB: пакетное обучение завершено — {report.as_text()}")
+        return report
+
+    # ------------------------------------------------------------------
+    # Источники
+    # ------------------------------------------------------------------
+
+    async def _iter_documents(
+        self,
+        use_samples: bool,
+        jsonl_path: Optional[str],
+        positions: Dict[str, int],
+    ) -> AsyncIterator[Tuple[str, int, str, Optional[int]]]:
+        """Выдает (источник, позиция после документа, текст, метка)."""
+        if use_samples:
+            async for offset, text in self._iter_samples(positions["samples"]):
+                yield "samples", offset, text, 1
+
+        if jsonl_path:
+            for offset, text, label in self._iter_jsonl(jsonl_path, positions["jsonl"]):
+                yield "jsonl", offset, text, label
+
+    async def _snapshot_samples(self) -> None:
+        """Копирует текущий список примеров спама в снимок задания."""
+        # список ограничен learning_max_samples, один LRANGE дает согласованную копию
+        items = await self.redis.lrange(KeyFactory.spam_samples(), 0, -1)
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(self.snapshot_key)
+        for start in range(0, len(items), self.chunk_size):
+            pipe.rpush(self.snapshot_key, *items[start:start + self.chunk_size])
+        pipe.expire(self.snapshot_key, self.ttl_seconds)
+        await pipe.execute()
+
+    async def _iter_samples(self, offset: int) -> AsyncIterator[Tuple[int, str]]:
+        """
+        Читает примеры спама из снимка порциями от старых к новым.
+
+        Снимок не меняется до конца задания, поэтому смещение (от хвоста,
+        где лежат старые примеры) при возобновлении указывает на тот же
+        документ.
+        """
+        key = self.snapshot_key
+
+        while True:
+            items = await self.redis.lrange(
+                key, -(offset + self.chunk_size), -(offset + 1)
+            )
+            if not items:
+                return
+
+            for raw in reversed(items):
+                offset += 1
+                yield offset, raw.decode("utf-8", errors="ignore") if isinstance(raw, bytes) else raw
+
+            if len(items) < self.chunk_size:
+                return
+
+    @staticmethod
+    def _iter_jsonl(path: str, offset: int) -> Iterator[Tuple[int, str, Optional[int]]]:
+        """Читает JSONL с байтового смещения; битые строки пропускаются (метка None)."""
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in iter(f.readline, b""):
+                position = f.tell()
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    yield position, "", None
+                    continue
+                if not isinstance(row, dict):
+                    yield position, "", None
+                    continue
+                yield position, str(row.get("text") or ""), NBBulkTrainer._parse_label(row)
+
+    @staticmethod
+    def _parse_label(row: dict) -> Optional[int]:
+        label = row.get("label", row.get("is_spam"))
+        if isinstance(label, bool):
+            return int(label)
+        value = str(label).strip().lower()
+        if value in SPAM_LABELS:
+            return 1
+        if value in HAM_LABELS:
+            return 0
+        return None
+
+    # ------------------------------------------------------------------
+    # Запись
+    # ------------------------------------------------------------------
+
+    def _keys(self, staging: bool) -> Tuple[str, ...]:
+        suffix = self.STAGING_SUFFIX if staging else ""
+        if self.sketch is not None:
+            return (self.sketch.key + suffix,)
+        return (
+            self.nb.spam_counts_key + suffix,
+            self.nb.ham_counts_key + suffix,
+            self.nb.meta_key + suffix,
+        )
+
+    def _sketch_store(self, key: str) -> NBSketchStore:
+        """Хранилище sketch для ключа (рабочего или staging) с параметрами модели."""
+        if key == self.sketch.key:
+            return self.sketch
+        return NBSketchStore(self.sketch.redis, width=self.sketch.width, depth=self.sketch.depth, key=key)
+
+    async def _flush(
+        self,
+        target: Tuple[str, str, str],
+        spam_counts: Counter,
+        ham_counts: Counter,
+        pending: Dict[str, int],
+        positions: Dict[str, int],
+        report: TrainingReport,
+    ) -> None:
+        """
+        Сбрасывает накопленные счетчики и чекпоинт одной транзакцией.
+
+        Позиции в чекпоинте всегда соответствуют записанным счетчикам,
+        поэтому возобновление не учитывает документы дважды.
+        """
+        if not (pending["spam"] or pending["ham"] or spam_counts or ham_counts):
+            await self._save_checkpoint(positions)
+            return
+
+        if self.sketch is not None:
+            store = self._sketch_store(target[0])
+            await store.ensure_created()
+            pipe = store.redis.pipeline(transaction=True)
+            store.stage_counts(pipe, SPAM, spam_counts, pending["spam"])
+            store.stage_counts(pipe, HAM, ham_counts, pending["ham"])
+        else:
+            spam_key, ham_key, meta_key = target
+
+            pipe = self.redis.pipeline(transaction=True)
+            if pending["spam"]:
+                pipe.hincrby(meta_key, "spam_docs", pending["spam"])
+            if pending["ham"]:
+                pipe.hincrby(meta_key, "ham_docs", pending["ham"])
+            for idx, cnt in spam_counts.items():
+                pipe.hincrby(spam_key, str(idx), int(cnt))
+            for idx, cnt in ham_counts.items():
+                pipe.hincrby(ham_key, str(idx), int(cnt))
+            for key in target:
+                pipe.expire(key, self.ttl_seconds)
+        pipe.hset(self.checkpoint_key, mapping=self._checkpoint_fields(positions))
+        await pipe.execute()
+
+        report.spam_docs += pending["spam"]
+        report.ham_docs += pending["ham"]
+        report.fields_written += len(spam_counts) + len(ham_counts)
+        report.flushes += 1
+
+        logger.info(
+            f"📦 NB: сброс #{report.flushes} — {report.docs} документов, "
+            f"{report.fields_written} полей"
+        )
+
+        spam_counts.clear()
+        ham_counts.clear()
+        pending["spam"] = pending["ham"] = 0
+
+    async def _staged_both_classes(self) -> bool:
+        """Есть ли в пересобранной модели документы обоих классов."""
+        if self.sketch is not None:
+            payload = await self.sketch.redis.get(self._keys(staging=True)[0])
+            if not payload:
+                return False
+            staged = CountMinSketch.from_bytes(payload)
+            return staged.docs(SPAM) > 0 and staged.docs(HAM) > 0
+
+        spam_key, ham_key, meta_key = self._keys(staging=True)
+        spam_docs, ham_docs = await self.redis.hmget(meta_key, "spam_docs", "ham_docs")
+        return (
+            int(spam_docs or 0) > 0
+            and int(ham_docs or 0) > 0
+            and await self.redis.exists(spam_key, ham_key) == 2
+        )
+
+    async def _discard_staging(self) -> None:
+        await self.redis.delete(*self._keys(staging=True))
+
+    async def _swap(self) -> None:
+        """Атомарно подменяет рабочую модель построенной (все ключи staging существуют)."""
+        staging = self._keys(staging=True)
+        live = self._keys(staging=False)
+
+        pipe = self.redis.pipeline(transaction=True)
+        for src, dst in zip(staging, live):
+            pipe.rename(src, dst)
+            if self.sketch is None:
+                pipe.expire(dst, self.ttl_seconds)
+        await pipe.execute()
+
+        if self.sketch is not None:
+            self.sketch.invalidate()
+        logger.info("🔄 NB: модель подменена пересобранной версией")
+
+    # ------------------------------------------------------------------
+    # Чекпоинт
+    # ------------------------------------------------------------------
+
+    def _checkpoint_fields(self, positions: Dict[str, int]) -> Dict[str, str]:
+        return {
+            **self._job,
+            "samples_offset": str(positions["samples"]),
+            "jsonl_offset": str(positions["jsonl"]),
+            "updated_at": str(int(time.time())),
+        }
+
+    async def _save_checkpoint(self, positions: Dict[str, int]) -> None:
+        await self.redis.hset(self.checkpoint_key, mapping=self._checkpoint_fields(positions))
+
+    async def _load_checkpoint(self) -> Dict[str, str]:
+        raw = await self.redis.hgetall(self.checkpoint_key)
+        return {
+            (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+            for k, v in (raw or {}).items()
+        }
+
+    @staticmethod
+    def _same_job(
+        checkpoint: Dict[str, str],
+        mode: str,
+        use_samples: bool,
+        jsonl_path: Optional[str],
+    ) -> bool:
+        return (
+            checkpoint.get("mode") == mode
+            and checkpoint.get("use_samples") == ("1" if use_samples else "0")
+            and checkpoint.get("jsonl_path", "") == (jsonl_path or "")
+        )
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from bot.config.settings import settings
+
+    redis = Redis.from_url(settings.redis_url, encoding="utf-8", decode_responses=True)
+    # параметры модели — как у AntiSpamService, иначе индексы признаков не совпадут
+    sec = settings.security
+    nb = NBModel(n_bits=sec.nb_bits, alpha=1.0)
+    sketch = None
+    if sec.nb_store == "sketch":
+        sketch = NBSketchStore(
+            redis,
+            alpha=nb.alpha,
+            vocab_size=nb.vocab_size,
+            width=sec.nb_sketch_width,
+            depth=sec.nb_sketch_depth,
+            half_life_days=sec.nb_half_life_days,
+        )
+    try:
+        trainer = NBBulkTrainer(redis, nb, sketch=sketch, flush_docs=args.flush_docs)
+        report = await trainer.train(
+            use_samples=not args.no_samples,
+            jsonl_path=args.jsonl,
+            mode=NBBulkTrainer.MODE_REBUILD if args.rebuild else NBBulkTrainer.MODE_MERGE,
+            resume=not args.restart,
+        )
+        print(report.as_text())
+    finally:
+        if sketch is not None:
+            await sketch.close()
+        await redis.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пакетное обучение NB-модели антиспама")
+    parser.add_argument("--jsonl", help="Размеченный JSONL-корпус")
+    parser.add_argument("--no-samples", action="store_true", help="Не использовать примеры из Redis")
+    parser.add_argument("--rebuild", action="store_true", help="Пересобрать модель с нуля и подменить (нужен --jsonl с ham)")
+    parser.add_argument("--restart", action="store_true", help="Игнорировать чекпоинт")
+    parser.add_argument("--flush-docs", type=int, default=2000, help="Документов на один сброс")
+    asyncio.run(_main(parser.parse_args()))
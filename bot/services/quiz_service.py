@@ -3,18 +3,24 @@
 # Версия: 2.0.1
 # Описание: ИСПРАВЛЕНО - Правильные имена настроек (строчные буквы)
 
+import asyncio
 import json
 import random
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import List, Optional
 
 from loguru import logger
 from pydantic import ValidationError
+from redis.asyncio import Redis
 
 from bot.config.settings import settings
 from bot.services.ai_content_service import AIContentService
-from bot.texts.ai_prompts import get_quiz_question_prompt
+from bot.texts.ai_prompts import get_quiz_batch_prompt, get_quiz_question_prompt
+from bot.utils.keys import KeyFactory
 from bot.utils.models import QuizQuestion
+from bot.utils.quiz_pool import QuizQuestionPool, validate_question
+from bot.utils.redis_lock import RedisLock
 
 
 class QuizService:
@@ -22,18 +28,36 @@ class QuizService:
     Управляет созданием и предоставлением вопросов для викторины.
     Использует AI для генерации уникальных вопросов и имеет локальный
     список вопросов в качестве резервного источника.
+
+    При наличии Redis вопросы выдаются из пула, который заранее
+    пополняет фоновый воркер (run_refill_worker): старт викторины не
+    ждет AI.
     """
 
-    def __init__(self, ai_content_service: AIContentService):
+    MAX_EMPTY_BATCHES = 3
+
+    def __init__(self, ai_content_service: AIContentService, redis: Optional[Redis] = None):
         """
         Инициализирует сервис.
 
         :param ai_content_service: Сервис для взаимодействия с AI-моделями.
+        :param redis: Клиент Redis для пула вопросов (без него вопрос
+            генерируется при каждом запросе).
         """
         self.ai_service = ai_content_service
+        self.redis = redis
         # ✅ ИСПРАВЛЕНО: settings.QUIZ → settings.quiz
         self.config = settings.quiz
         self.fallback_questions: List[QuizQuestion] = self._load_fallback_questions()
+
+        self.pool: Optional[QuizQuestionPool] = None
+        if redis is not None and getattr(self.config, "pool_enabled", True):
+            self.pool = QuizQuestionPool(
+                redis,
+                max_size=getattr(self.config, "pool_max_size", 500),
+                retention_seconds=getattr(self.config, "dedup_retention_days", 30) * 24 * 3600,
+            )
+        self._refill_wakeup = asyncio.Event()
         logger.info("Сервис QuizService инициализирован.")
 
     def _load_fallback_questions(self) -> List[QuizQuestion]:
@@ -72,9 +96,25 @@ class QuizService:
     async def get_random_question(self) -> Optional[QuizQuestion]:
         """
         Возвращает случайный вопрос для викторины.
-        Приоритет отдается генерации через AI. В случае неудачи используется
+        Вопрос берется из пула одним обращением к Redis; если пул пуст,
+        сразу используется резервный вопрос, а воркер будится на пополнение.
+        Без пула вопрос генерируется через AI, в случае неудачи используется
         резервный список вопросов из файла.
         """
+        if self.pool is not None:
+            try:
+                question = await self.pool.pop()
+            except Exception as e:
+                logger.warning(f"⚠️ Пул вопросов викторины недоступен: {e}")
+                question = None
+            self._refill_wakeup.set()
+
+            if question is not None:
+                return question
+
+            logger.warning("Пул вопросов викторины пуст. Используется резервный вариант.")
+            return self._fallback_question()
+
         logger.info("Попытка сгенерировать вопрос для викторины через AI...")
         
         prompt = get_quiz_question_prompt()
@@ -94,9 +134,113 @@ class QuizService:
 
         # Если AI не справился, используем резервный вариант
         logger.warning("AI не смог сгенерировать валидный вопрос. Используется резервный вариант.")
-        
+        return self._fallback_question()
+
+    def _fallback_question(self) -> Optional[QuizQuestion]:
+        """Случайный вопрос из резервного списка."""
         if not self.fallback_questions:
-            logger.critical("AI не справился, и резервные вопросы недоступны или не загружены.")
+            logger.critical("Вопрос не получен, и резервные вопросы недоступны или не загружены.")
             return None
             
-        return random.choice(self.fallback_questions)
\ No newline at end of file
+        return random.choice(self.fallback_questions)
+
+    # ------------------------------------------------------------------
+    # Пул вопросов
+    # ------------------------------------------------------------------
+
+    async def run_refill_worker(self) -> None:
+        """
+        Фоновый воркер пополнения пула.
+
+        Проверяет пул раз в refill_check_seconds или сразу после выдачи
+        вопроса и пополняет его партиями (см. refill_pool).
+        """
+        if self.pool is None:
+            logger.info("Пул вопросов викторины выключен — воркер пополнения не запущен.")
+            return
+
+        logger.info("🧩 Воркер пополнения пула вопросов викторины запущен")
+        interval = getattr(self.config, "refill_check_seconds", 300)
+        while True:
+            try:
+                await self.refill_pool()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка пополнения пула вопросов викторины: {e}")
+
+            try:
+                await asyncio.wait_for(self._refill_wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._refill_wakeup.clear()
+
+    async def refill_pool(self) -> int:
+        """
+        Пополняет пул до pool_target.
+
+        Пул пополняется, если он опустился ниже pool_low_water, а в
+        часы низкой нагрузки (offpeak_hours_utc) — всегда, когда он не
+        полон. Пополняет один процесс (блокировка в Redis).
+
+        Returns:
+            Сколько вопросов добавлено
+        """
+        if self.pool is None:
+            return 0
+
+        target = getattr(self.config, "pool_target", 100)
+        low_water = getattr(self.config, "pool_low_water", 20)
+        size = await self.pool.size()
+        if size >= target or (size >= low_water and not self._is_offpeak()):
+            return 0
+
+        lock = RedisLock(self.redis, KeyFactory.quiz_pool_refill_lock(), timeout=600)
+        if not await lock.acquire():
+            return 0
+
+        added_total = 0
+        empty_batches = 0
+        batch_size = getattr(self.config, "refill_batch_size", 10)
+        try:
+            while size < target and empty_batches < self.MAX_EMPTY_BATCHES:
+                questions = await self._generate_batch(min(batch_size, target - size))
+                added = await self.pool.push(questions) if questions else 0
+                # пустая партия или одни повторы — AI сейчас не поможет
+                empty_batches = empty_batches + 1 if added == 0 else 0
+                size += added
+                added_total += added
+        finally:
+            await lock.release()
+
+        if added_total:
+            logger.info(f"🧩 Пул вопросов викторины пополнен на {added_total} (всего {size})")
+        return added_total
+
+    async def _generate_batch(self, count: int) -> List[QuizQuestion]:
+        """Генерирует партию вопросов одним AI-запросом и отбрасывает невалидные."""
+        json_schema = {
+            "type": "object",
+            "properties": {
+                "questions": {"type": "array", "items": QuizQuestion.model_json_schema()}
+            },
+            "required": ["questions"],
+        }
+        # высокая температура — разнообразие вопросов между партиями
+        ai_result = await self.ai_service.get_structured_response(
+            get_quiz_batch_prompt(count), json_schema, temperature=0.9
+        )
+
+        items = ai_result.get("questions") if isinstance(ai_result, dict) else ai_result
+        if not isinstance(items, list):
+            return []
+
+        questions = [q for q in (validate_question(item) for item in items) if q is not None]
+        if len(questions) < len(items):
+            logger.warning(f"AI вернул {len(items) - len(questions)} невалидных вопросов из {len(items)}.")
+        return questions
+
+    def _is_offpeak(self) -> bool:
+        """Час низкой нагрузки (UTC) из настроек."""
+        hours = getattr(self.config, "offpeak_hours_utc", [])
+        return datetime.now(timezone.utc).hour in hours
\ No newline at end of file
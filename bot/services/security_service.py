@@ -6,7 +6,7 @@
 import re
 import asyncio
 from datetime import timedelta
-from typing import List
+from typing import List, Optional
 from urllib.parse import urlparse
 import contextlib
 
@@ -18,9 +18,11 @@ from redis.asyncio import Redis
 from bot.config.settings import settings
 from bot.services.ai_content_service import AIContentService
 from bot.services.image_vision_service import ImageVisionService
+from bot.services.message_analysis import MessageAnalysis
 from bot.services.moderation_service import ModerationService
 from bot.utils.keys import KeyFactory
 from bot.utils.models import Verdict, Escalation, ImageAnalysisResult
+from bot.utils.violation_counter import ViolationCounter
 
 URL_RE = re.compile(r"(?i)\b((?:https?://|www\d{0,3}[.]|[a-z0-9.\-]+[.][a-z]{2,4}/)[^\s()<>]+|\bt\.me/[a-zA-Z0-9_]+|@[a-zA-Z0-9_]{5,})")
 REPEATED_CHARS_RE = re.compile(r"(.)\1{6,}")
@@ -48,20 +50,31 @@ class SecurityService:
         # ✅ ИСПРАВЛЕНО: settings.SECURITY → settings.threat_filter
         self.config = settings.threat_filter
         self.keys = KeyFactory
+        self.violations = ViolationCounter(redis_client)
         logger.info("Сервис SecurityService инициализирован.")
 
     def is_enabled(self) -> bool:
         # ✅ ИСПРАВЛЕНО: self.config.ENABLED → self.config.enabled
         return self.config.enabled
 
-    async def analyze_message(self, message: tg.Message) -> Verdict:
+    async def analyze_message(
+        self,
+        message: tg.Message,
+        analysis: Optional[MessageAnalysis] = None
+    ) -> Verdict:
         """
         Основной метод анализа сообщения с каскадом проверок.
+
+        analysis — общий контекст сообщения из middleware: текст и скачанные
+        файлы переиспользуются другими слоями модерации.
         """
         if not self.is_enabled():
             return Verdict(ok=True, reasons=["security_disabled"])
 
-        text = message.text or message.caption or ""
+        if analysis is None or not analysis.is_for(message):
+            analysis = MessageAnalysis(message, bot=self.bot)
+
+        text = analysis.text
         
         # Уровень 1: Быстрые эвристики
         verdict = self._apply_text_heuristics(text)
@@ -72,7 +85,7 @@ class SecurityService:
         if not link_verdict.ok: return link_verdict
 
         # Уровень 3: AI-анализ
-        ai_verdict = await self._apply_ai_analysis(message, text)
+        ai_verdict = await self._apply_ai_analysis(message, text, analysis)
         if not ai_verdict.ok: return ai_verdict
 
         return Verdict(ok=True)
@@ -84,24 +97,25 @@ class SecurityService:
         offense_key = self.keys.user_offense_count(user_id, chat_id)
         
         try:
-            pipe = self.redis.pipeline()
-            pipe.incrby(offense_key, weight)
-            # ✅ ИСПРАВЛЕНО: self.config.WINDOW_SECONDS → self.config.window_seconds
-            pipe.expire(offense_key, self.config.window_seconds)
-            new_count = (await pipe.execute())[0]
+            # Инкремент, окно и выбор меры — один атомарный Lua-вызов
+            result = await self.violations.register(
+                offense_key,
+                weight=weight,
+                window_seconds=self.config.window_seconds,
+                warn_threshold=self.config.warn_threshold,
+                mute_threshold=self.config.mute_threshold,
+                ban_threshold=self.config.ban_threshold,
+            )
+            new_count, decision = result.count, result.decision
         except Exception as e:
             logger.error(f"Не удалось обновить счетчик нарушений для user_id={user_id}: {e}")
             new_count = weight
-
-        # ✅ ИСПРАВЛЕНО: все пороги теперь строчными
-        if new_count >= self.config.ban_threshold: 
-            decision = "ban"
-        elif new_count >= self.config.mute_threshold: 
-            decision = "mute"
-        elif new_count >= self.config.warn_threshold: 
-            decision = "warn"
-        else: 
-            decision = "none"
+            decision = ViolationCounter.decide(
+                new_count,
+                self.config.warn_threshold,
+                self.config.mute_threshold,
+                self.config.ban_threshold,
+            )
             
         # ✅ ИСПРАВЛЕНО: self.config.MUTE_SECONDS → self.config.mute_seconds
         return Escalation(count=new_count, decision=decision, mute_seconds=self.config.mute_seconds)
@@ -156,7 +170,12 @@ class SecurityService:
 
         return Verdict(ok=True)
 
-    async def _apply_ai_analysis(self, message: tg.Message, text: str) -> Verdict:
+    async def _apply_ai_analysis(
+        self,
+        message: tg.Message,
+        text: str,
+        analysis: MessageAnalysis
+    ) -> Verdict:
         """
         Делегирует анализ контента AI-сервисам. **(ПОЛНАЯ РЕАЛИЗАЦИЯ)**
         """
@@ -164,16 +183,28 @@ class SecurityService:
             return Verdict(ok=True)
 
         tasks = []
+        results = []
         # Анализ изображения, если оно есть и сервис доступен
         if self.image_vision_service and (message.photo or (message.document and message.document.mime_type and "image" in message.document.mime_type)):
-            photo_bytes = await self.image_vision_service._download_photo(message)
-            if photo_bytes:
-                tasks.append(self.image_vision_service.analyze(photo_bytes))
+            # Уже проверенная картинка (тот же file_unique_id) не скачивается
+            cached = await self.image_vision_service.get_cached(analysis.image_unique_id)
+            if cached is not None:
+                results.append(cached)
+            elif self.image_vision_service.accepts(message.chat.id):
+                # при перегрузке очереди vision картинку не качаем: решают эвристики
+                if message.photo:
+                    photo_bytes = await analysis.photo_bytes(self.bot)
+                else:
+                    photo_bytes = await analysis.download(message.document.file_id, bot=self.bot)
+                if photo_bytes:
+                    tasks.append(self.image_vision_service.analyze(
+                        photo_bytes, analysis.image_unique_id, message.chat.id
+                    ))
         
-        if not tasks:
+        if not tasks and not results:
             return Verdict(ok=True)
 
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        results.extend(await asyncio.gather(*tasks, return_exceptions=True))
         
         final_verdict = Verdict(ok=True)
         for res in results:
@@ -1,11 +1,12 @@
 # bot/services/stop_word_service.py
-from typing import List, Set
+import asyncio
+from typing import FrozenSet, List, Set
 
-from async_lru import alru_cache
 from loguru import logger
 from redis.asyncio import Redis
 
 from bot.utils.keys import KeyFactory
+from bot.utils.redis_invalidation import VersionedInvalidator
 
 
 class StopWordService:
@@ -16,9 +17,10 @@ class StopWordService:
     с использованием многоуровневого кэширования.
     
     Архитектура:
-    - Redis как источник истины
-    - In-memory LRU кэш для минимизации обращений к Redis
-    - Автоматическая инвалидация кэша при изменениях
+    - Redis как источник истины (SET + счетчик версии)
+    - Process-local кэш: проверка слова — O(1) без сетевых обращений
+    - Модификации увеличивают версию и публикуют ее в канал,
+      все экземпляры лениво перезагружают набор при следующем обращении
     """
 
     def __init__(self, redis: Redis):
@@ -30,34 +32,59 @@ class StopWordService:
         """
         self.redis = redis
         self.keys = KeyFactory
+
+        self._words: FrozenSet[str] = frozenset()
+        self._reload_lock = asyncio.Lock()
+        self._sync = VersionedInvalidator(
+            redis,
+            version_key=self.keys.stop_words_version(),
+            channel=self.keys.stop_words_channel(),
+            name="stop_words",
+        )
         
         logger.info("✅ Сервис StopWordService инициализирован.")
 
-    @alru_cache(maxsize=1)
-    async def get_stop_words_set(self) -> Set[str]:
+    async def get_stop_words_set(self) -> FrozenSet[str]:
         """
-        Получает набор стоп-слов с кэшированием.
+        Получает набор стоп-слов из локального кэша.
         
-        Кэш автоматически сбрасывается при модификациях.
+        Набор перезагружается из Redis только если локальная версия
+        устарела (пришло уведомление об изменении или кэш еще пуст).
         
         Returns:
-            Set[str]: Набор стоп-слов в нижнем регистре
+            FrozenSet[str]: Набор стоп-слов в нижнем регистре
+        """
+        if not await self._sync.needs_refresh():
+            return self._words
+
+        async with self._reload_lock:
+            # Пока ждали блокировку, набор мог перезагрузить другой корутин
+            if not await self._sync.needs_refresh():
+                return self._words
+            await self._reload()
+
+        return self._words
+
+    async def _reload(self) -> None:
+        """
+        Загружает набор и его версию одной транзакцией.
+        
+        При ошибке Redis сохраняется последний известный набор.
         """
         try:
-            words = await self.redis.smembers(self.keys.stop_words())
-            
-            if not words:
-                logger.debug("📋 База стоп-слов пуста")
-                return set()
-            
-            decoded_words = self._decode_words(words)
-            logger.debug(f"✅ Загружено {len(decoded_words)} стоп-слов из Redis")
-            
-            return decoded_words
-            
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.smembers(self.keys.stop_words())
+            pipe.get(self.keys.stop_words_version())
+            words, raw_version = await pipe.execute()
         except Exception as e:
             logger.error(f"❌ Ошибка получения стоп-слов из Redis: {e}")
-            return set()
+            return
+
+        self._words = frozenset(self._decode_words(words or set()))
+        version = self._sync.parse_version(raw_version)
+        self._sync.mark_fresh(version)
+
+        logger.debug(f"✅ Загружено {len(self._words)} стоп-слов из Redis (версия {version})")
 
     def _decode_words(self, words: Set[bytes]) -> Set[str]:
         """
@@ -140,7 +167,7 @@ class StopWordService:
             
             if added_count > 0:
                 logger.success(f"✅ Стоп-слово добавлено: '{normalized_word}'")
-                self._invalidate_cache()
+                await self._invalidate_cache()
                 return True
             
             logger.info(f"ℹ️ Стоп-слово уже существует: '{normalized_word}'")
@@ -173,7 +200,7 @@ class StopWordService:
             
             if removed_count > 0:
                 logger.success(f"✅ Стоп-слово удалено: '{normalized_word}'")
-                self._invalidate_cache()
+                await self._invalidate_cache()
                 return True
             
             logger.warning(f"⚠️ Стоп-слово не найдено: '{normalized_word}'")
@@ -213,7 +240,7 @@ class StopWordService:
             )
             
             logger.success(f"✅ Массово добавлено {added_count} стоп-слов")
-            self._invalidate_cache()
+            await self._invalidate_cache()
             
             return added_count
             
@@ -275,20 +302,25 @@ class StopWordService:
         try:
             await self.redis.delete(self.keys.stop_words())
             logger.warning("⚠️ Все стоп-слова удалены из базы")
-            self._invalidate_cache()
+            await self._invalidate_cache()
             return True
         except Exception as e:
             logger.error(f"❌ Ошибка очистки стоп-слов: {e}")
             return False
 
-    def _invalidate_cache(self) -> None:
+    async def _invalidate_cache(self) -> None:
         """
-        Принудительно сбрасывает кэш стоп-слов.
+        Увеличивает версию набора и оповещает все экземпляры.
         
         Вызывается после любых модификаций базы.
         """
         try:
-            self.get_stop_words_set.cache_clear()
-            logger.debug("🔄 Кэш стоп-слов сброшен")
+            version = await self._sync.bump()
+            logger.debug(f"🔄 Кэш стоп-слов инвалидирован (версия {version})")
         except Exception as e:
-            logger.warning(f"⚠️ Ошибка сброса кэша: {e}")
\ No newline at end of file
+            self._sync.mark_stale()
+            logger.warning(f"⚠️ Ошибка инвалидации кэша: {e}")
+
+    async def close(self) -> None:
+        """Останавливает подписку на уведомления об изменениях."""
+        await self._sync.close()
@@ -4,6 +4,7 @@ from loguru import logger
 
 from bot.containers import Container
 from bot.middlewares.dependencies import DependenciesMiddleware
+from bot.middlewares.message_analysis_middleware import MessageAnalysisMiddleware
 
 
 def register_middlewares(dp: Dispatcher, container: Container) -> None:
@@ -19,6 +20,10 @@ def register_middlewares(dp: Dispatcher, container: Container) -> None:
     try:
         dp.update.middleware(DependenciesMiddleware(container))
         logger.info("✅ Dependencies middleware registered")
+        
+        # Общий контекст анализа сообщения — раньше любых слоев модерации
+        dp.message.outer_middleware(MessageAnalysisMiddleware())
+        logger.info("✅ Message analysis middleware registered")
     except Exception as e:
         logger.error(f"❌ Failed to register middleware: {e}")
         raise
\ No newline at end of file
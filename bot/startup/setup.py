@@ -4,6 +4,7 @@ from aiogram.fsm.storage.redis import RedisStorage
 from loguru import logger
 
 from bot.containers import Container
+from bot.utils.violation_counter import ViolationCounter
 
 
 async def setup_dependencies(container: Container) -> None:
@@ -17,8 +18,9 @@ async def setup_dependencies(container: Container) -> None:
         raise
     
     try:
-        await container.redis_client()
+        redis = await container.redis_client()
         logger.info("✅ Redis connected successfully")
+        await ViolationCounter.preload(redis)
     except Exception as e:
         logger.error(f"❌ Failed to connect to Redis: {e}")
         raise
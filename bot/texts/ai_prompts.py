@@ -29,6 +29,15 @@ def get_quiz_question_prompt() -> str:
         "Вопрос и ответы должны быть на русском языке."
     )
 
+def get_quiz_batch_prompt(count: int) -> str:
+    return (
+        f"Создай {count} разных интересных и не слишком сложных вопросов для викторины на тему "
+        "криптовалют, блокчейна или майнинга. Вопросы не должны повторять друг друга по смыслу. "
+        "Верни объект с ключом 'questions': массив, где у каждого вопроса есть 'question', "
+        "'options' (массив из 4 разных строк) и 'correct_option_index' (индекс от 0 до 3). "
+        "Вопросы и ответы должны быть на русском языке."
+    )
+
 def get_quiz_json_schema() -> Dict[str, Any]:
     return {
         "type": "OBJECT",
@@ -0,0 +1,183 @@
+# bot/utils/ai_response_cache.py
+"""
+Кэш точных совпадений для ответов AI.
+
+Одинаковый запрос (промпт, системный промпт, схема, модели, температура
+с точностью до 0.1) не отправляется провайдеру повторно, пока ответ
+лежит в Redis. Кэш включается на месте вызова (cache_ttl в
+AIContentService.get_text_response / get_structured_response): ответы
+с намеренной случайностью кэшировать нельзя.
+
+Размер кэша ограничен бюджетом в байтах: при записи Lua-скрипт вытесняет
+давно не читанные ответы (LRU по ZSET времени обращения), поэтому кэш
+не растет вместе с числом уникальных запросов.
+"""
+import hashlib
+import json
+import time
+from typing import Any, Dict, Optional
+
+from loguru import logger
+from redis.asyncio import Redis
+from redis.exceptions import NoScriptError
+
+from bot.utils.keys import KeyFactory
+from bot.utils.lua_scripts import LuaScripts
+
+
+# TTL ответов на вопросы без контекста разговора (FAQ): они повторяются
+# дословно, и одинаковый вопрос не должен каждый раз уходить провайдеру
+FAQ_CACHE_TTL = 6 * 3600
+
+
+def estimate_tokens(*texts: Optional[str]) -> int:
+    """Грубая оценка числа токенов (~4 символа на токен)."""
+    return sum(len(text) for text in texts if text) // 4
+
+
+class AIResponseCache:
+    """
+    Кэш ответов AI в Redis с TTL и бюджетом по байтам.
+
+    Использование:
+        cache = AIResponseCache(redis, max_bytes=32 * 1024 * 1024)
+        digest = cache.make_key("text", prompt, system_prompt, None, model, 0.5)
+        answer = await cache.get(digest)
+        if answer is None:
+            answer = await provider.generate_text(...)
+            await cache.set(digest, answer, ttl_seconds=3600, tokens=...)
+    """
+
+    GET_SCRIPT = LuaScripts.AI_CACHE_GET
+    GET_SHA = hashlib.sha1(GET_SCRIPT.encode("utf-8")).hexdigest()
+    SET_SCRIPT = LuaScripts.AI_CACHE_SET
+    SET_SHA = hashlib.sha1(SET_SCRIPT.encode("utf-8")).hexdigest()
+
+    def __init__(self, redis: Redis, *, max_bytes: int = 32 * 1024 * 1024):
+        """
+        Args:
+            redis: Клиент Redis
+            max_bytes: Бюджет суммарного размера ответов в Redis
+        """
+        self.redis = redis
+        self.max_bytes = max_bytes
+        self._keys = (
+            KeyFactory.ai_response_lru(),
+            KeyFactory.ai_response_sizes(),
+            KeyFactory.ai_response_bytes(),
+        )
+        self._entry_prefix = KeyFactory.ai_response("")
+
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+        self._tokens_saved = 0
+
+    @staticmethod
+    def make_key(
+        kind: str,
+        prompt: str,
+        system_prompt: Optional[str],
+        schema: Optional[Dict[str, Any]],
+        model: str,
+        temperature: float,
+    ) -> str:
+        """
+        Хэш запроса.
+
+        Args:
+            kind: Тип ответа ("text" / "json")
+            prompt: Промпт
+            system_prompt: Системный промпт
+            schema: JSON-схема ответа
+            model: Подпись моделей провайдеров
+            temperature: Температура (округляется до 0.1)
+
+        Returns:
+            Hex-дайджест
+        """
+        payload = json.dumps(
+            [kind, prompt, system_prompt, schema, model, round(float(temperature), 1)],
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def _eval(self, sha: str, script: str, digest: str, *args: Any) -> Any:
+        keys = (KeyFactory.ai_response(digest),) + self._keys
+        try:
+            return await self.redis.evalsha(sha, len(keys), *keys, digest, *args)
+        except NoScriptError:
+            return await self.redis.eval(script, len(keys), *keys, digest, *args)
+
+    async def get(self, digest: str) -> Optional[Any]:
+        """
+        Ответ из кэша или None.
+
+        Args:
+            digest: Ключ из make_key()
+        """
+        try:
+            raw = await self._eval(self.GET_SHA, self.GET_SCRIPT, digest, int(time.time()))
+        except Exception as e:
+            logger.warning(f"⚠️ AI cache read failed: {e}")
+            return None
+
+        if raw is None:
+            self._misses += 1
+            return None
+
+        try:
+            entry = json.loads(raw)
+        except (TypeError, ValueError):
+            self._misses += 1
+            return None
+
+        self._hits += 1
+        self._tokens_saved += int(entry.get("t", 0))
+        return entry.get("v")
+
+    async def set(self, digest: str, value: Any, *, ttl_seconds: int, tokens: int = 0) -> None:
+        """
+        Сохраняет ответ и при необходимости вытесняет старые.
+
+        Args:
+            digest: Ключ из make_key()
+            value: Ответ (строка или JSON-совместимый объект)
+            ttl_seconds: Время жизни ответа
+            tokens: Оценка токенов запроса и ответа (для метрики tokens_saved)
+        """
+        payload = json.dumps({"v": value, "t": int(tokens)}, ensure_ascii=False)
+        if len(payload.encode("utf-8")) > self.max_bytes:
+            return
+
+        try:
+            evicted = await self._eval(
+                self.SET_SHA, self.SET_SCRIPT, digest,
+                payload, int(ttl_seconds), int(time.time()), int(self.max_bytes), self._entry_prefix,
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ AI cache write failed: {e}")
+            return
+
+        self._stores += 1
+        self._evictions += int(evicted or 0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Возвращает статистику кэша процесса.
+
+        Returns:
+            Словарь {hits, misses, hit_ratio, stores, evictions, tokens_saved, max_bytes}
+        """
+        total = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_ratio": round(self._hits / total, 4) if total else 0.0,
+            "stores": self._stores,
+            "evictions": self._evictions,
+            "tokens_saved": self._tokens_saved,
+            "max_bytes": self.max_bytes,
+        }
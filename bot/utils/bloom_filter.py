@@ -0,0 +1,92 @@
+# bot/utils/bloom_filter.py
+"""
+Компактный Bloom-фильтр для быстрых отрицательных проверок без обращения к Redis.
+
+Ложноположительные ответы возможны (их нужно подтверждать по источнику
+истины), ложноотрицательные — нет.
+"""
+import hashlib
+import math
+from typing import Iterable
+
+
+class BloomFilter:
+    """
+    Bloom-фильтр на bytearray с двойным хешированием (Kirsch–Mitzenmacher).
+
+    Использование:
+        bloom = BloomFilter.from_items(domains, fp_rate=0.01)
+        if "example.com" not in bloom:
+            ...  # точно не в наборе
+    """
+
+    MIN_BITS = 64
+
+    def __init__(self, num_bits: int, num_hashes: int):
+        """
+        Args:
+            num_bits: Размер битового массива
+            num_hashes: Количество хеш-функций
+        """
+        self.num_bits = max(self.MIN_BITS, int(num_bits))
+        self.num_hashes = max(1, int(num_hashes))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._count = 0
+
+    @classmethod
+    def for_capacity(cls, capacity: int, fp_rate: float = 0.01) -> "BloomFilter":
+        """
+        Создает фильтр оптимального размера.
+
+        Args:
+            capacity: Ожидаемое количество элементов
+            fp_rate: Допустимая доля ложноположительных ответов
+        """
+        capacity = max(1, capacity)
+        fp_rate = min(max(fp_rate, 1e-6), 0.5)
+
+        num_bits = math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2))
+        num_hashes = round(num_bits / capacity * math.log(2))
+        return cls(num_bits, num_hashes)
+
+    @classmethod
+    def from_items(
+        cls,
+        items: Iterable[str],
+        fp_rate: float = 0.01,
+        min_capacity: int = 1024
+    ) -> "BloomFilter":
+        """Строит фильтр по набору строк."""
+        items = list(items)
+        bloom = cls.for_capacity(max(len(items), min_capacity), fp_rate)
+        for item in items:
+            bloom.add(item)
+        return bloom
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str) -> None:
+        """Добавляет элемент."""
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self._count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[pos >> 3] & (1 << (pos & 7))
+            for pos in self._positions(item)
+        )
+
+    def __len__(self) -> int:
+        """Количество добавленных элементов (с повторами)."""
+        return self._count
+
+    @property
+    def size_bytes(self) -> int:
+        """Размер битового массива в байтах."""
+        return len(self._bits)
@@ -0,0 +1,156 @@
+# bot/utils/count_min_sketch.py
+"""
+Count-min sketch для счетчиков признаков NB-модели с фиксированной памятью.
+
+Счетчики двух классов (спам/не спам) хранятся одним упакованным массивом
+uint32 (big-endian, как у Redis BITFIELD): заголовок из HEADER_WORDS слов,
+затем depth x width счетчиков спама и столько же счетчиков не-спама.
+Такой буфер целиком читается одним GET и инкрементируется через
+BITFIELD INCRBY u32 #<слово> без чтения.
+
+Оценка счетчика — минимум по строкам (завышение возможно, занижение — нет).
+"""
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = 0x434D5331  # "CMS1"
+HEADER_WORDS = 8
+DTYPE = np.dtype(">u4")
+_PRIME = (1 << 61) - 1
+_UINT32_MAX = 0xFFFFFFFF
+
+# Слова заголовка
+H_MAGIC, H_WIDTH, H_DEPTH, H_SPAM_DOCS, H_HAM_DOCS, H_DECAYED_AT = range(6)
+
+SPAM, HAM = 0, 1
+
+
+def _row_params(depth: int) -> List[Tuple[int, int]]:
+    """Детерминированные коэффициенты (a, b) универсального хеширования по строкам."""
+    params = []
+    for row in range(depth):
+        digest = hashlib.blake2b(f"cms-row-{row}".encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "big") % (_PRIME - 1) + 1
+        b = int.from_bytes(digest[8:], "big") % _PRIME
+        params.append((a, b))
+    return params
+
+
+class CountMinSketch:
+    """
+    Упакованный двухклассовый count-min sketch.
+
+    Использование:
+        sketch = CountMinSketch.empty(width=1 << 16, depth=4)
+        sketch.add(SPAM, {feature_idx: count, ...})
+        sketch.estimate(SPAM, feature_idx)
+        payload = sketch.to_bytes()
+    """
+
+    def __init__(self, words: np.ndarray):
+        """
+        Args:
+            words: Упакованный массив uint32 (заголовок + счетчики)
+        """
+        if words[H_MAGIC] != MAGIC:
+            raise ValueError("Неверный формат count-min sketch")
+
+        self.words = words
+        self.width = int(words[H_WIDTH])
+        self.depth = int(words[H_DEPTH])
+        self._params = _row_params(self.depth)
+
+        expected = self.words_for(self.width, self.depth)
+        if len(words) != expected:
+            raise ValueError(f"Размер sketch {len(words)} слов, ожидалось {expected}")
+
+    # ------------------------------------------------------------------
+    # Создание / сериализация
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def words_for(width: int, depth: int) -> int:
+        """Размер упакованного буфера в словах uint32."""
+        return HEADER_WORDS + 2 * width * depth
+
+    @classmethod
+    def empty(cls, width: int, depth: int) -> "CountMinSketch":
+        """Пустой sketch заданного размера."""
+        words = np.zeros(cls.words_for(width, depth), dtype=DTYPE)
+        words[H_MAGIC] = MAGIC
+        words[H_WIDTH] = width
+        words[H_DEPTH] = depth
+        return cls(words)
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> "CountMinSketch":
+        """Восстанавливает sketch из буфера Redis (копия, доступная на запись)."""
+        return cls(np.frombuffer(payload, dtype=DTYPE).copy())
+
+    def to_bytes(self) -> bytes:
+        return self.words.tobytes()
+
+    @property
+    def size_bytes(self) -> int:
+        return self.words.nbytes
+
+    # ------------------------------------------------------------------
+    # Адресация
+    # ------------------------------------------------------------------
+
+    def word_offsets(self, label: int, feature: int) -> List[int]:
+        """Номера слов (для BITFIELD #offset) счетчиков признака по всем строкам."""
+        base = HEADER_WORDS + label * self.width * self.depth
+        return [
+            base + row * self.width + ((a * feature + b) % _PRIME) % self.width
+            for row, (a, b) in enumerate(self._params)
+        ]
+
+    @staticmethod
+    def docs_offset(label: int) -> int:
+        """Номер слова счетчика документов класса."""
+        return H_SPAM_DOCS if label == SPAM else H_HAM_DOCS
+
+    # ------------------------------------------------------------------
+    # Операции
+    # ------------------------------------------------------------------
+
+    def add(self, label: int, features: Dict[int, int], docs: int = 1) -> None:
+        """Добавляет документ локально (насыщение на uint32)."""
+        for feature, count in features.items():
+            for offset in self.word_offsets(label, feature):
+                self.words[offset] = min(_UINT32_MAX, int(self.words[offset]) + count)
+        offset = self.docs_offset(label)
+        self.words[offset] = min(_UINT32_MAX, int(self.words[offset]) + docs)
+
+    def estimate(self, label: int, feature: int) -> int:
+        """Оценка счетчика признака (минимум по строкам)."""
+        return int(min(self.words[offset] for offset in self.word_offsets(label, feature)))
+
+    def docs(self, label: int) -> int:
+        return int(self.words[self.docs_offset(label)])
+
+    @property
+    def decayed_at(self) -> int:
+        return int(self.words[H_DECAYED_AT])
+
+    def decay(self, factor: float, now: int, rng: Optional[np.random.Generator] = None) -> None:
+        """
+        Экспоненциальное затухание: все счетчики умножаются на factor.
+
+        Округление стохастическое (несмещенное в среднем), иначе частые
+        маленькие шаги затухания обнуляли бы малые счетчики слишком быстро.
+        Редкие признаки со временем обнуляются, частые — плавно уменьшаются.
+        """
+        factor = min(max(factor, 0.0), 1.0)
+        rng = rng or np.random.default_rng()
+
+        body = self.words[HEADER_WORDS:].astype(np.float64) * factor
+        body = np.floor(body + rng.random(body.shape))
+        self.words[HEADER_WORDS:] = body.astype(DTYPE)
+
+        for offset in (H_SPAM_DOCS, H_HAM_DOCS):
+            self.words[offset] = int(round(int(self.words[offset]) * factor))
+        self.words[H_DECAYED_AT] = now
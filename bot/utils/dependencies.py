@@ -42,5 +42,6 @@ class Deps:
     stop_word_service: Optional[Any] = None
     image_guard_service: Optional[Any] = None
     image_vision_service: Optional[Any] = None
+    image_result_cache: Optional[Any] = None
     advanced_security_service: Optional[Any] = None
     antispam_learning_service: Optional[Any] = None
\ No newline at end of file
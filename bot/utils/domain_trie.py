@@ -0,0 +1,80 @@
+# bot/utils/domain_trie.py
+"""
+Суффиксное дерево доменов по меткам (labels) в обратном порядке.
+
+"login.evil.xyz" хранится как путь xyz → evil → login, поэтому проверка
+"домен совпадает с правилом или является его поддоменом" занимает
+O(число меток) независимо от размера списков.
+"""
+from typing import Dict, Iterable, Optional
+
+
+class DomainSuffixTrie:
+    """
+    Дерево правил вида "xyz" (TLD) или "evil.com" (домен со всеми поддоменами).
+
+    Каждое правило хранит метку категории, например "tld" или "blacklist".
+    """
+
+    __slots__ = ("_root", "_size")
+
+    _TERMINAL = "\x00"
+
+    def __init__(self) -> None:
+        self._root: Dict[str, dict] = {}
+        self._size = 0
+
+    @staticmethod
+    def _labels(domain: str):
+        domain = domain.strip().lower().strip(".")
+        if not domain:
+            return []
+        return domain.split(".")[::-1]
+
+    def add(self, suffix: str, category: str) -> None:
+        """
+        Добавляет правило.
+
+        Args:
+            suffix: Суффикс домена (".xyz", "xyz", "evil.com")
+            category: Категория правила
+        """
+        labels = self._labels(suffix)
+        if not labels:
+            return
+
+        node = self._root
+        for label in labels:
+            node = node.setdefault(label, {})
+
+        if self._TERMINAL not in node:
+            self._size += 1
+        node[self._TERMINAL] = category
+
+    def add_many(self, suffixes: Iterable[str], category: str) -> None:
+        """Добавляет несколько правил одной категории."""
+        for suffix in suffixes or ():
+            self.add(suffix, category)
+
+    def match(self, domain: str) -> Optional[str]:
+        """
+        Находит самое специфичное (длинное) правило, покрывающее домен.
+
+        Returns:
+            Категория правила или None
+        """
+        node = self._root
+        found: Optional[str] = None
+
+        for label in self._labels(domain):
+            node = node.get(label)
+            if node is None:
+                break
+            category = node.get(self._TERMINAL)
+            if category is not None:
+                found = category
+
+        return found
+
+    def __len__(self) -> int:
+        return self._size
@@ -0,0 +1,108 @@
+# bot/utils/hedging.py
+"""
+Хеджирование запросов к нескольким AI-провайдерам.
+
+Провайдеры опрашиваются по порядку, но следующий не ждет таймаута
+предыдущего: если ответа нет через hedge_delay секунд, запускается
+следующий, и побеждает первый валидный ответ. Проигравшие вызовы
+отменяются. Ошибка или невалидный ответ запускают следующего провайдера
+сразу, без задержки. При hedge_delay=None это обычный последовательный
+failover.
+
+Использование:
+    name, text = await hedged_call(
+        [(p.get_name(), lambda p=p: p.generate_text(prompt)) for p in providers],
+        hedge_delay=2.0,
+        parse=validate_text,
+    )
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+from loguru import logger
+
+Attempt = Tuple[str, Callable[[], Awaitable[Any]]]
+
+
+class AllAttemptsFailed(Exception):
+    """Ни один провайдер не вернул валидный ответ."""
+
+    def __init__(self, errors: Dict[str, BaseException]):
+        self.errors = errors
+        details = "; ".join(f"{name}: {error!r}" for name, error in errors.items())
+        super().__init__(f"все попытки неудачны ({details})")
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+async def hedged_call(
+    attempts: Sequence[Attempt],
+    *,
+    hedge_delay: Optional[float] = None,
+    parse: Callable[[Any], Any] = _identity,
+) -> Tuple[str, Any]:
+    """
+    Возвращает первый валидный ответ из нескольких попыток.
+
+    Args:
+        attempts: Пары (имя, фабрика корутины) в порядке приоритета
+        hedge_delay: Через сколько секунд без ответа запускать следующую
+            попытку (None — только после ошибки предыдущей)
+        parse: Проверка и разбор ответа; исключение означает невалидный
+            ответ (например, json.JSONDecodeError)
+
+    Returns:
+        (имя победившей попытки, разобранный ответ)
+
+    Raises:
+        AllAttemptsFailed: Все попытки завершились ошибкой
+    """
+    pending = list(attempts)
+    running: Dict[asyncio.Task, str] = {}
+    errors: Dict[str, BaseException] = {}
+
+    def launch() -> None:
+        name, factory = pending.pop(0)
+
+        async def run() -> Any:
+            return parse(await factory())
+
+        running[asyncio.ensure_future(run())] = name
+
+    try:
+        if pending:
+            launch()
+        while running:
+            timeout = hedge_delay if pending else None
+            done, _ = await asyncio.wait(
+                set(running), timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+
+            if not done:
+                # никто не ответил за hedge_delay — подстраховываемся следующим
+                logger.debug(
+                    f"⏱️ Нет ответа от {', '.join(running.values())} за {hedge_delay}s, "
+                    f"запускаем {pending[0][0]}"
+                )
+                launch()
+                continue
+
+            for task in done:
+                name = running.pop(task)
+                if task.exception() is None:
+                    return name, task.result()
+                errors[name] = task.exception()
+                logger.warning(f"⚠️ {name} failed: {task.exception()}")
+
+            # ошибка — следующий запускается сразу
+            if pending:
+                launch()
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+    raise AllAttemptsFailed(errors)
@@ -0,0 +1,127 @@
+# bot/utils/image_fingerprint.py
+"""
+Составной перцептивный отпечаток изображения: dHash + pHash (+ wHash).
+
+dHash хорошо ловит точные пересылки и пережатие, но легко теряется при
+обрезке краев и перекраске. pHash (низкие частоты DCT 32x32) и wHash
+(аппроксимация Хаара) устойчивее к таким правкам. Все три считаются из
+одного декодированного изображения в оттенках серого средствами NumPy:
+изображение декодируется один раз (JPEG — сразу уменьшенным, см.
+bot.utils.image_hash), дальше только матричные операции над 32x32.
+
+dHash побитно совпадает с bot.utils.image_hash.dhash, поэтому уже
+сохраненные хэши продолжают находиться.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from bot.utils.image_hash import HASH_SIZE, HASH_WIDTH, bits_to_int, dhash_pixels, open_for_hashing, to_grayscale
+
+FINGERPRINT_KINDS = ("dhash", "phash", "whash")
+
+_DCT_SIZE = HASH_SIZE * 4
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Ортонормированная матрица DCT-II размера n x n."""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT = _dct_matrix(_DCT_SIZE)
+_DCT_LOW = np.ascontiguousarray(_DCT[:HASH_SIZE], dtype=np.float32)
+
+
+@dataclass(frozen=True)
+class ImageFingerprint:
+    """Набор 64-битных хэшей одного изображения."""
+    dhash: int
+    phash: int
+    whash: Optional[int] = None
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        """Пары (тип хэша, значение) для всех посчитанных хэшей."""
+        for kind in FINGERPRINT_KINDS:
+            value = getattr(self, kind)
+            if value is not None:
+                yield kind, value
+
+    def to_fields(self) -> Dict[str, str]:
+        """Поля для хранения (десятичные строки)."""
+        return {kind: str(value) for kind, value in self.items()}
+
+    @classmethod
+    def from_fields(cls, fields: Dict[str, str]) -> Optional["ImageFingerprint"]:
+        """Восстанавливает отпечаток из полей; None, если нет dHash или pHash."""
+        try:
+            return cls(
+                dhash=int(fields["dhash"]),
+                phash=int(fields["phash"]),
+                whash=int(fields["whash"]) if fields.get("whash") is not None else None,
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+
+
+def _median(values: np.ndarray) -> float:
+    """Медиана 8x8 через partition (np.median заметно дороже на 64 значениях)."""
+    flat = values.ravel()
+    mid = flat.size // 2
+    part = np.partition(flat, (mid - 1, mid))
+    return (part[mid - 1] + part[mid]) / 2
+
+
+def phash_array(pixels: np.ndarray) -> int:
+    """
+    pHash по массиву 32x32: знак низких частот DCT относительно медианы.
+
+    Считается только нужный угол 8x8 спектра: D[:8] @ A @ D[:8].T.
+    """
+    low = _DCT_LOW @ pixels @ _DCT_LOW.T
+    return bits_to_int(low > _median(low))
+
+
+def whash_array(pixels: np.ndarray) -> int:
+    """
+    wHash по массиву 32x32: аппроксимация Хаара 2-го уровня (8x8)
+    относительно медианы.
+    """
+    n = pixels.shape[0] // HASH_SIZE
+    # сумма блока n x n вместо среднего: порог по медиане от масштаба не зависит
+    approx = pixels.reshape(HASH_SIZE, n, HASH_SIZE, n).sum(axis=(1, 3))
+    return bits_to_int(approx > _median(approx))
+
+
+def fingerprint(image: Image.Image, with_whash: bool = False) -> ImageFingerprint:
+    """
+    Вычисляет составной отпечаток.
+
+    Args:
+        image: PIL изображение
+        with_whash: Считать ли wHash
+
+    Returns:
+        ImageFingerprint
+    """
+    gray = to_grayscale(image)
+    # 9x8 — тем же фильтром, что bot.utils.image_hash.dhash (совместимость);
+    # 32x32 — усреднением по площади: для низких частот его достаточно
+    small = np.asarray(gray.resize((HASH_WIDTH, HASH_SIZE), Image.Resampling.LANCZOS), dtype=np.int16)
+    square = np.asarray(gray.resize((_DCT_SIZE, _DCT_SIZE), Image.Resampling.BOX), dtype=np.float32)
+
+    return ImageFingerprint(
+        dhash=dhash_pixels(small),
+        phash=phash_array(square),
+        whash=whash_array(square) if with_whash else None,
+    )
+
+
+def fingerprint_bytes(data: bytes, with_whash: bool = False) -> ImageFingerprint:
+    """Отпечаток по байтам файла (JPEG декодируется уменьшенным)."""
+    return fingerprint(open_for_hashing(data), with_whash)
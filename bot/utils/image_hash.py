@@ -0,0 +1,173 @@
+# bot/utils/image_hash.py
+"""
+dHash изображений с минимальными затратами на скачивание и декодирование.
+
+Для 64-битного dHash изображение все равно сжимается до 9x8, поэтому:
+- из размеров фото Telegram берется самый маленький, у которого меньшая
+  сторона не меньше min_side (при DEFAULT_MIN_SIDE = 160 это обычно
+  превью 320px по большей стороне вместо 1280px — на порядок меньше
+  байт); полноразмерное фото нужно только OCR/vision;
+- JPEG декодируется через Image.draft(): libjpeg сразу отдает картинку
+  в 1/2–1/8 размера в оттенках серого, без полного декодирования.
+
+Хэш уменьшенной копии не совпадает побитно с хэшем полноразмерного
+фото (на синтетических 1280x960 расхождение доходило до 6 бит), а в базе
+лежат и хэши, посчитанные по оригиналам. Поэтому порог расстояния
+phash_distance по умолчанию 8 (было 5): расхождение плюс 2 бита на
+пересжатие, что все еще заметно ниже 32 бит у несвязанных картинок.
+
+Кроме фото хэшируются стикеры и изображения-документы (pick_hash_source):
+статичный WebP-стикер и небольшой документ скачиваются как есть, а для
+анимированных (TGS) и видео-стикеров, GIF/MP4-анимаций и крупных
+документов берется превью Telegram — первый кадр, который Pillow умеет
+декодировать, в отличие от Lottie и WebM.
+"""
+import io
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+from aiogram.types import Message, PhotoSize
+from PIL import Image, ImageOps
+
+HASH_SIZE = 8
+HASH_WIDTH = HASH_SIZE + 1
+DEFAULT_MIN_SIDE = 160
+MAX_DOCUMENT_BYTES = 5 * 1024 * 1024
+
+# draft() выбирает масштаб, при котором картинка не меньше запрошенной
+_DRAFT_SIZE = (HASH_WIDTH * 4, HASH_SIZE * 4)
+
+
+def pick_photo_for_hashing(
+    photos: Sequence[PhotoSize],
+    min_side: int = DEFAULT_MIN_SIDE
+) -> Optional[PhotoSize]:
+    """
+    Самый маленький размер фото, достаточный для хэширования.
+
+    Args:
+        photos: Размеры фото из message.photo
+        min_side: Минимальная меньшая сторона в пикселях
+
+    Returns:
+        Подходящий PhotoSize; если ни один не дотягивает — самый крупный
+    """
+    if not photos:
+        return None
+
+    def area(p: PhotoSize) -> int:
+        return (p.width or 0) * (p.height or 0)
+
+    sufficient = [p for p in photos if min(p.width or 0, p.height or 0) >= min_side]
+    if sufficient:
+        return min(sufficient, key=lambda p: (area(p), p.file_size or 0))
+    return max(photos, key=lambda p: (area(p), p.file_size or 0))
+
+
+@dataclass(frozen=True)
+class HashSource:
+    """Файл Telegram, по которому считается отпечаток изображения."""
+    unique_id: str  # file_unique_id самого медиа — ключ кэша результатов
+    file_id: str    # что скачивать (сам файл или его превью)
+    kind: str       # photo / sticker / animated_sticker / video_sticker / animation / document
+
+
+def pick_hash_source(
+    message: Message,
+    min_side: int = DEFAULT_MIN_SIDE,
+    max_document_bytes: int = MAX_DOCUMENT_BYTES
+) -> Optional[HashSource]:
+    """
+    Выбирает, что скачать для отпечатка изображения из сообщения.
+
+    Args:
+        message: Сообщение с фото, стикером, анимацией или документом
+        min_side: Минимальная меньшая сторона для фото и превью документа
+        max_document_bytes: Документ крупнее скачивается только через превью
+
+    Returns:
+        HashSource или None, если хэшировать нечего
+    """
+    if message.photo:
+        largest = max(message.photo, key=lambda p: (p.width or 0) * (p.height or 0))
+        chosen = pick_photo_for_hashing(message.photo, min_side)
+        return HashSource(largest.file_unique_id, chosen.file_id, "photo")
+
+    sticker = message.sticker
+    if sticker:
+        if sticker.is_animated or sticker.is_video:
+            if not sticker.thumbnail:
+                return None
+            kind = "video_sticker" if sticker.is_video else "animated_sticker"
+            return HashSource(sticker.file_unique_id, sticker.thumbnail.file_id, kind)
+        return HashSource(sticker.file_unique_id, sticker.file_id, "sticker")
+
+    animation = message.animation
+    if animation:
+        if not animation.thumbnail:
+            return None
+        return HashSource(animation.file_unique_id, animation.thumbnail.file_id, "animation")
+
+    document = message.document
+    if document and (document.mime_type or "").startswith("image/"):
+        thumb = document.thumbnail
+        if thumb and min(thumb.width or 0, thumb.height or 0) >= min_side:
+            return HashSource(document.file_unique_id, thumb.file_id, "document")
+        if (document.file_size or 0) <= max_document_bytes:
+            return HashSource(document.file_unique_id, document.file_id, "document")
+        if thumb:
+            return HashSource(document.file_unique_id, thumb.file_id, "document")
+    return None
+
+
+def open_for_hashing(data: bytes) -> Image.Image:
+    """Открывает изображение; для JPEG включает уменьшенное декодирование."""
+    image = Image.open(io.BytesIO(data))
+    if image.format == "JPEG":
+        image.draft("L", _DRAFT_SIZE)
+    return image
+
+
+def to_grayscale(image: Image.Image) -> Image.Image:
+    """
+    Оттенки серого с учетом EXIF-поворота и прозрачности.
+
+    Прозрачный фон стикера кладется на белый: иначе convert("L") отдает
+    цвет скрытых пикселей, и один и тот же стикер хэшируется по-разному.
+    """
+    img = ImageOps.exif_transpose(image)
+    if img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+        img = img.convert("RGBA")
+        img = Image.alpha_composite(Image.new("RGBA", img.size, (255, 255, 255, 255)), img)
+    return img.convert("L")
+
+
+def bits_to_int(bits: np.ndarray) -> int:
+    """Булев массив (старший бит первый, построчно) в целое."""
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def dhash_pixels(pixels: np.ndarray) -> int:
+    """dHash по массиву HASH_SIZE x HASH_WIDTH: сравнение соседей по строкам."""
+    return bits_to_int(pixels[:, :-1] > pixels[:, 1:])
+
+
+def dhash(image: Image.Image) -> int:
+    """
+    64-битный dHash: 9x8 в оттенках серого, сравнение соседей по строкам.
+
+    Args:
+        image: PIL изображение
+
+    Returns:
+        Хэш (старший бит — левый верхний пиксель)
+    """
+    img = to_grayscale(image)
+    img = img.resize((HASH_WIDTH, HASH_SIZE), Image.Resampling.LANCZOS)
+    return dhash_pixels(np.asarray(img, dtype=np.int16))
+
+
+def dhash_bytes(data: bytes) -> int:
+    """dHash по байтам файла (с уменьшенным декодированием JPEG)."""
+    return dhash(open_for_hashing(data))
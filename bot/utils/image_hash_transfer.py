@@ -0,0 +1,149 @@
+# bot/utils/image_hash_transfer.py
+"""
+Форматы файлов для обмена базой хэшей спам-изображений между ботами.
+
+Текстовый формат — один хэш на строку: десятичное число (так хэши лежат
+в Redis) или шестнадцатеричное с префиксом 0x. Пустые строки и строки
+с # пропускаются. Бинарный формат — подряд идущие 64-битные числа
+big-endian без заголовка (8 байт на хэш).
+
+Файлы читаются и пишутся потоково, кусками: миллион хэшей не требует
+держать в памяти весь файл.
+"""
+from typing import BinaryIO, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+FORMAT_TEXT = "text"
+FORMAT_BINARY = "binary"
+FORMATS = (FORMAT_TEXT, FORMAT_BINARY)
+
+RECORD_SIZE = 8
+_MAX_HASH = (1 << 64) - 1
+_TEXT_BYTES = frozenset(range(0x20, 0x7F)) | frozenset(b"\t\r\n")
+_BINARY_DTYPE = np.dtype(">u8")
+
+
+def detect_format(head: bytes) -> str:
+    """Текстовый файл — печатный ASCII; в бинарном такие байты почти сразу встречаются."""
+    if head and all(byte in _TEXT_BYTES for byte in head):
+        return FORMAT_TEXT
+    return FORMAT_BINARY
+
+
+def parse_hash_line(line: str) -> Optional[int]:
+    """
+    Разбирает строку текстового формата.
+
+    Args:
+        line: Строка файла
+
+    Returns:
+        Хэш или None (пустая строка, комментарий, мусор)
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    try:
+        value = int(line, 16) if line[:2].lower() == "0x" else int(line)
+    except ValueError:
+        return None
+    return value if 0 <= value <= _MAX_HASH else None
+
+
+class HashFileReader:
+    """
+    Потоковое чтение хэшей из файла.
+
+    Использование:
+        reader = HashFileReader(stream)
+        for batch in reader.batches(100_000):
+            ...
+        reader.invalid  # пропущенные строки / неполная запись в конце
+    """
+
+    def __init__(self, stream: BinaryIO, fmt: str = "auto", chunk_size: int = 1 << 20):
+        """
+        Args:
+            stream: Файл, открытый в бинарном режиме
+            fmt: "text", "binary" или "auto" (по первому куску)
+            chunk_size: Размер читаемого куска в байтах
+        """
+        self.stream = stream
+        self.fmt = fmt
+        self.chunk_size = chunk_size - chunk_size % RECORD_SIZE or RECORD_SIZE
+        self.invalid = 0
+
+    def batches(self, batch_size: int) -> Iterator[List[int]]:
+        """Хэши пачками не больше batch_size."""
+        batch: List[int] = []
+        for chunk in self._chunks():
+            batch.extend(chunk)
+            while len(batch) >= batch_size:
+                yield batch[:batch_size]
+                batch = batch[batch_size:]
+        if batch:
+            yield batch
+
+    def _chunks(self) -> Iterator[List[int]]:
+        head = self.stream.read(self.chunk_size)
+        fmt = detect_format(head[:4096]) if self.fmt == "auto" else self.fmt
+        if fmt == FORMAT_BINARY:
+            yield from self._binary_chunks(head)
+        else:
+            yield from self._text_chunks(head)
+
+    def _binary_chunks(self, data: bytes) -> Iterator[List[int]]:
+        tail = b""
+        while data:
+            data = tail + data
+            usable = len(data) - len(data) % RECORD_SIZE
+            tail = data[usable:]
+            if usable:
+                yield np.frombuffer(data[:usable], dtype=_BINARY_DTYPE).tolist()
+            data = self.stream.read(self.chunk_size)
+        if tail:
+            self.invalid += 1
+
+    def _text_chunks(self, data: bytes) -> Iterator[List[int]]:
+        tail = b""
+        while data:
+            lines = (tail + data).split(b"\n")
+            tail = lines.pop()
+            yield self._parse_lines(lines)
+            data = self.stream.read(self.chunk_size)
+        if tail.strip():
+            yield self._parse_lines([tail])
+
+    def _parse_lines(self, lines: List[bytes]) -> List[int]:
+        values = []
+        for raw in lines:
+            line = raw.decode("ascii", "replace")
+            value = parse_hash_line(line)
+            if value is not None:
+                values.append(value)
+            elif line.strip() and not line.lstrip().startswith("#"):
+                self.invalid += 1
+        return values
+
+
+def write_hashes(stream: BinaryIO, hashes: Iterable[int], fmt: str = FORMAT_TEXT) -> int:
+    """
+    Дописывает пачку хэшей в файл.
+
+    Args:
+        stream: Файл, открытый в бинарном режиме
+        hashes: Хэши
+        fmt: "text" или "binary"
+
+    Returns:
+        Количество записанных хэшей
+    """
+    hashes = list(hashes)
+    if not hashes:
+        return 0
+    if fmt == FORMAT_BINARY:
+        stream.write(np.array(hashes, dtype=np.uint64).astype(_BINARY_DTYPE).tobytes())
+    else:
+        stream.write(("\n".join(map(str, hashes)) + "\n").encode("ascii"))
+    return len(hashes)
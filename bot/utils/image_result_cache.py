@@ -0,0 +1,304 @@
+# bot/utils/image_result_cache.py
+"""
+Кэш результатов обработки изображений по Telegram file_unique_id.
+
+Пересланный спам приходит с тем же file_unique_id, поэтому dHash, текст
+OCR и вердикт vision для уже виденной картинки не нужно ни скачивать,
+ни пересчитывать, ни оплачивать повторным AI-вызовом. Результаты лежат
+в Redis HASH на картинку (общий для всех процессов, с TTL), а перед ним
+стоит небольшой LRU в памяти процесса.
+
+Поля HASH:
+    dhash             — 64-битный dHash (десятичная строка)
+    phash, whash      — остальные хэши составного отпечатка
+    ocr               — распознанный текст
+    vision            — JSON ImageAnalysisResult
+    spam_score:<id>   — JSON вердикта spam_score_image для конкретной подписи
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from aiogram.types import Message
+from loguru import logger
+from redis.asyncio import Redis
+
+from bot.utils.image_fingerprint import ImageFingerprint
+from bot.utils.keys import KeyFactory
+
+FIELD_DHASH = "dhash"
+FIELD_OCR = "ocr"
+FIELD_VISION = "vision"
+FIELD_SPAM_SCORE = "spam_score"
+
+
+def image_unique_id(message: Message) -> Optional[str]:
+    """
+    Устойчивый идентификатор изображения в сообщении.
+
+    Для фото берется file_unique_id самого крупного размера: у пересланной
+    копии совпадают все размеры, а крупный есть всегда.
+
+    Args:
+        message: Сообщение с фото, изображением-документом, стикером или анимацией
+
+    Returns:
+        file_unique_id или None, если изображения нет
+    """
+    if message.photo:
+        largest = max(message.photo, key=lambda p: (p.width or 0) * (p.height or 0))
+        return largest.file_unique_id
+    document = message.document
+    if document and (document.mime_type or "").startswith("image/"):
+        return document.file_unique_id
+    if message.sticker:
+        return message.sticker.file_unique_id
+    if message.animation:
+        return message.animation.file_unique_id
+    return None
+
+
+def spam_score_field(caption: str) -> str:
+    """Поле вердикта spam_score_image: вердикт зависит и от подписи."""
+    digest = hashlib.blake2b(caption.encode("utf-8", "surrogatepass"), digest_size=8).hexdigest()
+    return f"{FIELD_SPAM_SCORE}:{digest}"
+
+
+class ImageResultCache:
+    """
+    Двухуровневый кэш результатов по file_unique_id: LRU в памяти + Redis.
+
+    Использование:
+        cache = ImageResultCache(redis)
+        uid = image_unique_id(message)
+        image_hash = await cache.get_dhash(uid)
+        if image_hash is None:
+            image_hash = ...  # скачать и посчитать
+            await cache.set_dhash(uid, image_hash)
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        *,
+        ttl_seconds: int = 7 * 24 * 3600,
+        local_entries: int = 2048,
+        local_ttl_seconds: float = 600.0,
+    ):
+        """
+        Args:
+            redis: Клиент Redis
+            ttl_seconds: Время жизни результатов в Redis (продлевается при записи)
+            local_entries: Максимум картинок в LRU процесса
+            local_ttl_seconds: Сколько запись живет в LRU без обращения к Redis
+        """
+        self.redis = redis
+        self.ttl_seconds = ttl_seconds
+        self.local_entries = local_entries
+        self.local_ttl_seconds = min(local_ttl_seconds, ttl_seconds)
+
+        # file_unique_id -> (момент загрузки, поля)
+        self._local: "OrderedDict[str, Tuple[float, Dict[str, str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._local_hits = 0
+        self._redis_hits = 0
+        self._misses = 0
+
+    # ------------------------------------------------------------------
+    # LRU процесса
+    # ------------------------------------------------------------------
+
+    def _local_get(self, unique_id: str) -> Optional[Dict[str, str]]:
+        with self._lock:
+            entry = self._local.get(unique_id)
+            if entry is None:
+                return None
+            loaded_at, fields = entry
+            if time.monotonic() - loaded_at > self.local_ttl_seconds:
+                del self._local[unique_id]
+                return None
+            self._local.move_to_end(unique_id)
+            return fields
+
+    def _drop_local(self, unique_id: str) -> None:
+        with self._lock:
+            self._local.pop(unique_id, None)
+
+    def _local_put(self, unique_id: str, fields: Dict[str, str]) -> None:
+        with self._lock:
+            entry = self._local.get(unique_id)
+            merged = dict(entry[1]) if entry else {}
+            merged.update(fields)
+            self._local[unique_id] = (time.monotonic(), merged)
+            self._local.move_to_end(unique_id)
+            while len(self._local) > self.local_entries:
+                self._local.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # Чтение / запись
+    # ------------------------------------------------------------------
+
+    async def _load(self, unique_id: str) -> Tuple[Dict[str, str], bool]:
+        """Поля картинки: из LRU, иначе все поля из Redis (HGETALL).
+
+        Returns:
+            (поля, прочитаны ли из Redis)
+        """
+        fields = self._local_get(unique_id)
+        if fields is not None:
+            return fields, False
+
+        try:
+            raw = await self.redis.hgetall(KeyFactory.image_result(unique_id))
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка чтения кэша изображений: {e}")
+            return {}, True
+
+        fields = {
+            (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+            for k, v in (raw or {}).items()
+        }
+        if fields:
+            self._local_put(unique_id, fields)
+        return fields, True
+
+    def _count(self, found: bool, from_redis: bool) -> None:
+        if not found:
+            self._misses += 1
+        elif from_redis:
+            self._redis_hits += 1
+        else:
+            self._local_hits += 1
+
+    async def get(self, unique_id: Optional[str], field: str) -> Optional[str]:
+        """
+        Возвращает сохраненное поле картинки.
+
+        При промахе LRU читаются сразу все поля (HGETALL): следующий слой
+        модерации найдет свой результат уже в памяти.
+
+        Args:
+            unique_id: file_unique_id изображения
+            field: Имя поля (FIELD_*)
+
+        Returns:
+            Значение или None
+        """
+        if not unique_id:
+            return None
+
+        fields, from_redis = await self._load(unique_id)
+        if field not in fields and not from_redis:
+            # в LRU есть другие поля картинки, но не это — перечитываем Redis
+            self._drop_local(unique_id)
+            fields, from_redis = await self._load(unique_id)
+
+        value = fields.get(field)
+        self._count(value is not None, from_redis)
+        return value
+
+    async def set(self, unique_id: Optional[str], field: str, value: str) -> None:
+        """
+        Сохраняет поле картинки в LRU и Redis (HSET + EXPIRE одним pipeline).
+
+        Args:
+            unique_id: file_unique_id изображения
+            field: Имя поля (FIELD_*)
+            value: Значение
+        """
+        await self.set_many(unique_id, {field: value})
+
+    async def set_many(self, unique_id: Optional[str], fields: Dict[str, str]) -> None:
+        """Сохраняет несколько полей картинки одним pipeline."""
+        if not unique_id or not fields:
+            return
+
+        self._local_put(unique_id, fields)
+
+        key = KeyFactory.image_result(unique_id)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hset(key, mapping=fields)
+            pipe.expire(key, self.ttl_seconds)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка записи кэша изображений: {e}")
+
+    async def get_dhash(self, unique_id: Optional[str]) -> Optional[int]:
+        """dHash картинки или None."""
+        raw = await self.get(unique_id, FIELD_DHASH)
+        if raw is None:
+            return None
+        try:
+            return int(raw)
+        except ValueError:
+            return None
+
+    async def set_dhash(self, unique_id: Optional[str], image_hash: int) -> None:
+        """Сохраняет dHash картинки."""
+        await self.set(unique_id, FIELD_DHASH, str(int(image_hash)))
+
+    async def get_fingerprint(
+        self,
+        unique_id: Optional[str],
+        with_whash: bool = False
+    ) -> Optional[ImageFingerprint]:
+        """
+        Составной отпечаток картинки или None, если он сохранен не полностью.
+
+        Args:
+            unique_id: file_unique_id изображения
+            with_whash: Нужен ли wHash
+        """
+        if not unique_id:
+            return None
+
+        fields, from_redis = await self._load(unique_id)
+        fingerprint = ImageFingerprint.from_fields(fields)
+        if fingerprint is not None and with_whash and fingerprint.whash is None:
+            fingerprint = None
+        if fingerprint is None and not from_redis:
+            self._drop_local(unique_id)
+            return await self.get_fingerprint(unique_id, with_whash)
+
+        self._count(fingerprint is not None, from_redis)
+        return fingerprint
+
+    async def set_fingerprint(self, unique_id: Optional[str], fingerprint: ImageFingerprint) -> None:
+        """Сохраняет все хэши отпечатка."""
+        await self.set_many(unique_id, fingerprint.to_fields())
+
+    # ------------------------------------------------------------------
+    # Статистика
+    # ------------------------------------------------------------------
+
+    def clear_local(self) -> None:
+        """Очищает LRU процесса и счетчики (Redis не трогается)."""
+        with self._lock:
+            self._local.clear()
+            self._local_hits = self._redis_hits = self._misses = 0
+
+    def get_hit_rate(self) -> float:
+        """Доля попаданий любого уровня (0.0 — 1.0)."""
+        hits = self._local_hits + self._redis_hits
+        total = hits + self._misses
+        return hits / total if total else 0.0
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Возвращает статистику кэша.
+
+        Returns:
+            Словарь {entries, local_hits, redis_hits, misses, hit_rate, max_entries}
+        """
+        return {
+            "entries": len(self._local),
+            "local_hits": self._local_hits,
+            "redis_hits": self._redis_hits,
+            "misses": self._misses,
+            "hit_rate": round(self.get_hit_rate(), 4),
+            "max_entries": self.local_entries,
+        }
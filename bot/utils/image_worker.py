@@ -0,0 +1,264 @@
+# bot/utils/image_worker.py
+"""
+Пул процессов для CPU-работы с изображениями (декодирование, dHash,
+составной отпечаток, подготовка картинки для vision).
+
+Pillow держит GIL на большей части декодирования, поэтому asyncio.to_thread
+не спасает: пачка фото в активной группе тормозит обработку всех остальных
+апдейтов. Здесь байты уходят в отдельные процессы, а очередь ограничена:
+когда заданий больше max_pending, вызывающий ждет свободного места
+(back-pressure), а после queue_timeout получает ImageQueueFull и может
+пропустить проверку картинки вместо того, чтобы копить память.
+
+Использование:
+    worker = get_image_worker()
+    image_hash = await worker.dhash(data)
+    prepared = await worker.prepare_for_vision(data)
+    worker.get_stats()  # queue_depth, running, p50_ms, p99_ms, ...
+"""
+import asyncio
+import io
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, Dict, Optional
+
+from loguru import logger
+from PIL import Image
+
+from bot.utils.image_fingerprint import ImageFingerprint, fingerprint_bytes
+from bot.utils.image_hash import dhash_bytes
+
+VISION_MAX_SIDE = 1280
+VISION_JPEG_QUALITY = 90
+
+_LATENCY_WINDOW = 1024
+
+
+class ImageQueueFull(Exception):
+    """Очередь обработки изображений переполнена дольше queue_timeout."""
+
+
+# ----------------------------------------------------------------------
+# Задания (выполняются в процессах пула, поэтому — функции модуля)
+# ----------------------------------------------------------------------
+
+def prepare_image_for_vision(
+    data: bytes,
+    max_side: int = VISION_MAX_SIDE,
+    quality: int = VISION_JPEG_QUALITY
+) -> bytes:
+    """
+    Приводит изображение к JPEG не крупнее max_side для отправки в AI.
+
+    Args:
+        data: Байты исходного изображения
+        max_side: Максимальная сторона результата
+        quality: Качество JPEG
+
+    Returns:
+        Байты JPEG (исходные байты, если декодировать не удалось)
+    """
+    try:
+        img = Image.open(io.BytesIO(data))
+        if img.format == "JPEG":
+            img.draft("RGB", (max_side, max_side))
+        img = img.convert("RGB")
+        img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=quality)
+        return buffer.getvalue()
+    except Exception:
+        return data
+
+
+def _warm_up() -> None:
+    """Инициализатор процесса: импорт декодеров Pillow до первого задания."""
+    Image.init()
+
+
+# ----------------------------------------------------------------------
+# Пул
+# ----------------------------------------------------------------------
+
+class ImageWorkerPool:
+    """
+    Ограниченная очередь заданий над изображениями поверх ProcessPoolExecutor.
+
+    processes = 0 — задания выполняются в одном фоновом потоке (для тестов
+    и совсем маленьких инсталляций); ограничение очереди и метрики те же.
+    """
+
+    def __init__(
+        self,
+        processes: int = 2,
+        max_pending: int = 64,
+        queue_timeout: float = 10.0,
+    ):
+        """
+        Args:
+            processes: Число процессов (0 — фоновый поток вместо процессов)
+            max_pending: Максимум заданий в очереди и в работе одновременно
+            queue_timeout: Сколько ждать места в очереди до ImageQueueFull
+        """
+        self.processes = processes
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        self._waiting = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._latencies: Deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self._queue_waits: Deque[float] = deque(maxlen=_LATENCY_WINDOW)
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.processes > 0:
+                # spawn: не форкаем процесс с event loop, потоками и сокетами
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_up,
+                )
+                logger.info(f"🖼️ Пул обработки изображений запущен: {self.processes} процесс(ов)")
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-worker")
+        return self._executor
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Выполняет задание в пуле с ограничением очереди.
+
+        Args:
+            func: Функция уровня модуля (должна сериализоваться pickle)
+            *args: Аргументы
+
+        Returns:
+            Результат функции
+
+        Raises:
+            ImageQueueFull: Места в очереди не было дольше queue_timeout
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+
+        enqueued = time.perf_counter()
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._rejected += 1
+            raise ImageQueueFull(f"очередь изображений заполнена ({self.max_pending})")
+        finally:
+            self._waiting -= 1
+
+        started = time.perf_counter()
+        self._queue_waits.append(started - enqueued)
+        self._running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(self._get_executor(), func, *args)
+            except BrokenProcessPool:
+                # процесс убит (OOM на огромной картинке) — пересоздаем пул
+                logger.error("❌ Пул обработки изображений сломан, перезапуск")
+                self._executor = None
+                raise
+            self._completed += 1
+            return result
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._running -= 1
+            self._latencies.append(time.perf_counter() - enqueued)
+            self._slots.release()
+
+    async def dhash(self, data: bytes) -> int:
+        """64-битный dHash изображения (JPEG декодируется уменьшенным)."""
+        return await self.run(dhash_bytes, data)
+
+    async def fingerprint(self, data: bytes, with_whash: bool = False) -> ImageFingerprint:
+        """Составной отпечаток (dHash + pHash, опционально wHash) за одно декодирование."""
+        return await self.run(fingerprint_bytes, data, with_whash)
+
+    async def prepare_for_vision(self, data: bytes) -> bytes:
+        """JPEG не крупнее VISION_MAX_SIDE для отправки в AI."""
+        return await self.run(prepare_image_for_vision, data)
+
+    def shutdown(self) -> None:
+        """Останавливает процессы пула (незавершенные задания отменяются)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @staticmethod
+    def _percentile_ms(values: Deque[float], pct: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return round(ordered[idx] * 1000, 3)
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Возвращает метрики очереди.
+
+        Returns:
+            Словарь {queue_depth, running, max_pending, processes, completed,
+            failed, rejected, p50_ms, p99_ms, queue_wait_p99_ms}
+            (задержки — от постановки в очередь до результата, по последним
+            заданиям)
+        """
+        return {
+            "queue_depth": self._waiting,
+            "running": self._running,
+            "max_pending": self.max_pending,
+            "processes": self.processes,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "p50_ms": self._percentile_ms(self._latencies, 50),
+            "p99_ms": self._percentile_ms(self._latencies, 99),
+            "queue_wait_p99_ms": self._percentile_ms(self._queue_waits, 99),
+        }
+
+
+_worker: Optional[ImageWorkerPool] = None
+
+
+def get_image_worker() -> ImageWorkerPool:
+    """Общий пул процесса бота (создается при первом обращении)."""
+    global _worker
+    if _worker is None:
+        # импорт здесь: процессы пула импортируют модуль ради заданий,
+        # и им не нужно загружать и валидировать конфигурацию бота
+        from bot.config.settings import settings
+
+        sec = settings.security
+        _worker = ImageWorkerPool(
+            processes=sec.image_worker_processes,
+            max_pending=sec.image_worker_max_pending,
+            queue_timeout=sec.image_worker_queue_timeout,
+        )
+    return _worker
+
+
+def image_worker_stats() -> Optional[Dict[str, float]]:
+    """Метрики общего пула или None, если он еще не создавался."""
+    return _worker.get_stats() if _worker is not None else None
+
+
+def shutdown_image_worker() -> None:
+    """Останавливает общий пул (при завершении приложения)."""
+    global _worker
+    if _worker is not None:
+        _worker.shutdown()
+        _worker = None
@@ -117,4 +117,204 @@ class KeyFactory:
     @staticmethod
     def get_top_coins_cache_key() -> str:
         """Ключ для кэша топовых монет."""
-        return "cache:market:top_coins"
\ No newline at end of file
+        return "cache:market:top_coins"
+
+    # --- Стоп-слова ---
+    @staticmethod
+    def stop_words() -> str:
+        """SET стоп-слов (источник истины)."""
+        return "moderation:stop_words"
+
+    @staticmethod
+    def stop_words_version() -> str:
+        """Счетчик версии набора стоп-слов для инвалидации локальных кэшей."""
+        return "moderation:stop_words:version"
+
+    @staticmethod
+    def stop_words_channel() -> str:
+        """Pub/sub канал уведомлений об изменении стоп-слов."""
+        return "moderation:stop_words:invalidate"
+
+    # --- Счетчики нарушений ---
+    @staticmethod
+    def user_offense_count(user_id: int, chat_id: int) -> str:
+        """HASH счетчика нарушений пользователя в чате (SecurityService)."""
+        return f"moderation:offenses:{chat_id}:{user_id}"
+
+    @staticmethod
+    def user_spam_image_count(user_id: int) -> str:
+        """HASH счетчика спам-изображений пользователя (ImageGuard)."""
+        return f"moderation:image_spam:{user_id}"
+
+    @staticmethod
+    def antispam_violations(chat_id: int, user_id: int) -> str:
+        """HASH счетчика нарушений AntiSpamService."""
+        return f"antispam:viol:{chat_id}:{user_id}"
+
+    @staticmethod
+    def security_violations(chat_id: int, user_id: int) -> str:
+        """HASH счетчика нарушений SecurityMiddleware (cnt, score_sum, first_ts)."""
+        return f"sec:chat:{chat_id}:user:{user_id}"
+
+    # --- Самообучаемый антиспам ---
+    @staticmethod
+    def spam_phrases() -> str:
+        """ZSET спам-фраз: score = частота."""
+        return "antispam:learning:phrases"
+
+    @staticmethod
+    def spam_phrases_log() -> str:
+        """ZSET журнала изменений фраз: score = версия последнего изменения."""
+        return "antispam:learning:phrases:log"
+
+    @staticmethod
+    def spam_phrases_version() -> str:
+        """Счетчик версии набора спам-фраз."""
+        return "antispam:learning:phrases:version"
+
+    @staticmethod
+    def spam_phrases_channel() -> str:
+        """Pub/sub канал уведомлений об изменении спам-фраз."""
+        return "antispam:learning:phrases:invalidate"
+
+    @staticmethod
+    def spam_domains() -> str:
+        """ZSET спам-доменов: score = количество жалоб."""
+        return "antispam:learning:domains"
+
+    @staticmethod
+    def spam_domains_version() -> str:
+        """Счетчик версии набора спам-доменов."""
+        return "antispam:learning:domains:version"
+
+    @staticmethod
+    def spam_domains_channel() -> str:
+        """Pub/sub канал уведомлений об изменении спам-доменов."""
+        return "antispam:learning:domains:invalidate"
+
+    @staticmethod
+    def spam_samples() -> str:
+        """LIST сохраненных примеров спама."""
+        return "antispam:learning:samples"
+
+    @staticmethod
+    def nb_sketch() -> str:
+        """STRING упакованного count-min sketch NB-модели (uint32, BITFIELD)."""
+        return "antispam:nb:cms"
+
+    @staticmethod
+    def nb_train_checkpoint() -> str:
+        """HASH чекпоинта пакетного обучения NB (позиции в источниках)."""
+        return "antispam:nb:train:checkpoint"
+
+    @staticmethod
+    def nb_train_samples_snapshot() -> str:
+        """LIST снимка примеров спама на время пакетного обучения NB."""
+        return "antispam:nb:train:samples"
+
+    @staticmethod
+    def near_duplicate_bucket(band: int, value: int) -> str:
+        """ZSET LSH-бакета SimHash: member = "<simhash>:<user_id>", score = время."""
+        return f"antispam:neardup:{band}:{value:04x}"
+
+    @staticmethod
+    def antispam_phash_band(band: int, value: int) -> str:
+        """
+        SET dHash-ей изображений AntiSpamService с совпадающей 16-битной полосой.
+
+        Полоса 0 совпадает с прежним бакетом по старшим 16 битам, поэтому
+        накопленные хэши продолжают находиться.
+        """
+        if band == 0:
+            return f"antispam:phash:{value:04x}"
+        return f"antispam:phash:b{band}:{value:04x}"
+
+    @staticmethod
+    def image_hash_band(band: int, value: int) -> str:
+        """SET хэшей спам-изображений (image_guard) с совпадающей 16-битной полосой."""
+        return f"image_guard:phash:{band}:{value:04x}"
+
+    @staticmethod
+    def image_hash_set() -> str:
+        """ZSET всех хэшей спам-изображений (score = время добавления)."""
+        return "image_guard:phash:all"
+
+    @staticmethod
+    def image_hash_stream() -> str:
+        """STREAM изменений базы хэшей: {"op": "add"|"del", "hash": "<int>"}."""
+        return "image_guard:phash:stream"
+
+    @staticmethod
+    def image_fingerprint_band(kind: str, band: int, value: int) -> str:
+        """
+        SET хэшей спам-изображений типа kind (dhash/phash/whash) по 16-битной полосе.
+
+        dHash живет в прежних ключах image_guard:phash:* (исторически так
+        назывался dHash), остальные типы — в image_guard:fp:<kind>:*.
+        """
+        if kind == "dhash":
+            return KeyFactory.image_hash_band(band, value)
+        return f"image_guard:fp:{kind}:{band}:{value:04x}"
+
+    @staticmethod
+    def image_fingerprint_band_pattern(kind: str, band: int) -> str:
+        """Шаблон SCAN для всех бакетов одной полосы типа kind."""
+        if kind == "dhash":
+            return f"image_guard:phash:{band}:*"
+        return f"image_guard:fp:{kind}:{band}:*"
+
+    @staticmethod
+    def image_fingerprint_set(kind: str) -> str:
+        """ZSET всех хэшей спам-изображений типа kind (score = время добавления)."""
+        if kind == "dhash":
+            return KeyFactory.image_hash_set()
+        return f"image_guard:fp:{kind}:all"
+
+    @staticmethod
+    def image_fingerprint_stream(kind: str) -> str:
+        """STREAM изменений хэшей типа kind: {"op": "add"|"del", "hash": "<int>"}."""
+        if kind == "dhash":
+            return KeyFactory.image_hash_stream()
+        return f"image_guard:fp:{kind}:stream"
+
+    @staticmethod
+    def image_result(file_unique_id: str) -> str:
+        """HASH результатов обработки картинки (dhash, ocr, vision) по file_unique_id."""
+        return f"image:result:{file_unique_id}"
+
+    # --- Кэш ответов AI ---
+    @staticmethod
+    def ai_response(digest: str) -> str:
+        """STRING кэшированного ответа AI (JSON) по хэшу запроса."""
+        return f"ai:cache:entry:{digest}"
+
+    @staticmethod
+    def ai_response_lru() -> str:
+        """ZSET кэша ответов AI: digest -> время последнего обращения."""
+        return "ai:cache:lru"
+
+    @staticmethod
+    def ai_response_sizes() -> str:
+        """HASH кэша ответов AI: digest -> размер записи в байтах."""
+        return "ai:cache:sizes"
+
+    @staticmethod
+    def ai_response_bytes() -> str:
+        """Счетчик суммарного размера кэша ответов AI."""
+        return "ai:cache:bytes"
+
+    # --- Пул вопросов викторины ---
+    @staticmethod
+    def quiz_pool() -> str:
+        """LIST заранее сгенерированных вопросов викторины (JSON)."""
+        return "quiz:pool"
+
+    @staticmethod
+    def quiz_pool_hashes() -> str:
+        """ZSET хэшей вопросов викторины -> время добавления (дедупликация)."""
+        return "quiz:pool:hashes"
+
+    @staticmethod
+    def quiz_pool_refill_lock() -> str:
+        """Ресурс блокировки пополнения пула викторины (RedisLock добавляет префикс lock:)."""
+        return "quiz:pool:refill"
@@ -197,3 +197,171 @@ class LuaScripts:
 
         return 1 -- Успешная покупка
     """
+
+    REGISTER_VIOLATION = """
+        -- Атомарно регистрирует нарушение и возвращает решение об эскалации.
+        -- KEYS[1]: violation_counter_key (HASH: cnt, score_sum, first_ts)
+        -- ARGV[1]: weight (целое)
+        -- ARGV[2]: window_seconds
+        -- ARGV[3]: warn_threshold (0 — не используется)
+        -- ARGV[4]: mute_threshold (0 — не используется)
+        -- ARGV[5]: ban_threshold (0 — не используется)
+        -- ARGV[6]: now_unix
+        -- ARGV[7]: score (дробное, '0' если не нужен)
+        -- ARGV[8]: '1' — скользящее окно (TTL продлевается на каждое нарушение),
+        --          '0' — фиксированное окно от первого нарушения
+
+        -- 1. Старые счетчики хранились строкой (INCR) — переносим в HASH
+        if redis.call('TYPE', KEYS[1]).ok == 'string' then
+            local legacy = tonumber(redis.call('GET', KEYS[1])) or 0
+            local legacy_ttl = redis.call('TTL', KEYS[1])
+            redis.call('DEL', KEYS[1])
+            redis.call('HSET', KEYS[1], 'cnt', legacy)
+            if legacy_ttl > 0 then
+                redis.call('EXPIRE', KEYS[1], legacy_ttl)
+            end
+        end
+
+        -- 2. Обновляем счетчики
+        local count = redis.call('HINCRBY', KEYS[1], 'cnt', tonumber(ARGV[1]))
+        redis.call('HSETNX', KEYS[1], 'first_ts', ARGV[6])
+        local score_sum = redis.call('HINCRBYFLOAT', KEYS[1], 'score_sum', ARGV[7])
+
+        -- 3. Окно
+        if ARGV[8] == '1' or redis.call('TTL', KEYS[1]) < 0 then
+            redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+        end
+
+        -- 4. Решение по порогам
+        local warn_threshold = tonumber(ARGV[3])
+        local mute_threshold = tonumber(ARGV[4])
+        local ban_threshold = tonumber(ARGV[5])
+        local decision = 'none'
+        if ban_threshold > 0 and count >= ban_threshold then
+            decision = 'ban'
+        elseif mute_threshold > 0 and count >= mute_threshold then
+            decision = 'mute'
+        elseif warn_threshold > 0 and count >= warn_threshold then
+            decision = 'warn'
+        end
+
+        return {count, decision, score_sum}
+    """
+
+    AI_CACHE_GET = """
+        -- Читает ответ AI из кэша и отмечает обращение (LRU).
+        -- KEYS[1]: entry_key (STRING с JSON ответа, TTL)
+        -- KEYS[2]: lru_key (ZSET: digest -> время последнего обращения)
+        -- KEYS[3]: sizes_key (HASH: digest -> размер в байтах)
+        -- KEYS[4]: bytes_key (счетчик суммарного размера)
+        -- ARGV[1]: digest
+        -- ARGV[2]: now_unix
+
+        local value = redis.call('GET', KEYS[1])
+        if value then
+            redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+            return value
+        end
+
+        -- Запись истекла по TTL — убираем ее из учета бюджета
+        local size = redis.call('HGET', KEYS[3], ARGV[1])
+        if size then
+            redis.call('HDEL', KEYS[3], ARGV[1])
+            redis.call('ZREM', KEYS[2], ARGV[1])
+            redis.call('DECRBY', KEYS[4], size)
+        end
+        return false
+    """
+
+    AI_CACHE_SET = """
+        -- Сохраняет ответ AI и вытесняет давно не читанные записи,
+        -- пока суммарный размер не уложится в бюджет.
+        -- KEYS[1..4]: как в AI_CACHE_GET
+        -- ARGV[1]: digest
+        -- ARGV[2]: value (JSON)
+        -- ARGV[3]: ttl_seconds
+        -- ARGV[4]: now_unix
+        -- ARGV[5]: max_bytes
+        -- ARGV[6]: префикс ключей записей (prefix .. digest = entry_key)
+
+        local previous = redis.call('HGET', KEYS[3], ARGV[1])
+        if previous then
+            redis.call('DECRBY', KEYS[4], previous)
+        end
+
+        local size = string.len(ARGV[2])
+        redis.call('SET', KEYS[1], ARGV[2], 'EX', tonumber(ARGV[3]))
+        redis.call('HSET', KEYS[3], ARGV[1], size)
+        redis.call('ZADD', KEYS[2], ARGV[4], ARGV[1])
+        local total = redis.call('INCRBY', KEYS[4], size)
+
+        local evicted = 0
+        local max_bytes = tonumber(ARGV[5])
+        while total > max_bytes do
+            local oldest = redis.call('ZRANGE', KEYS[2], 0, 0)
+            if #oldest == 0 then
+                break
+            end
+            local digest = oldest[1]
+            local oldest_size = tonumber(redis.call('HGET', KEYS[3], digest) or '0')
+            redis.call('DEL', ARGV[6] .. digest)
+            redis.call('ZREM', KEYS[2], digest)
+            redis.call('HDEL', KEYS[3], digest)
+            total = redis.call('DECRBY', KEYS[4], oldest_size)
+            evicted = evicted + 1
+        end
+
+        return evicted
+    """
+
+    QUIZ_POOL_PUSH = """
+        -- Добавляет вопросы в пул викторины, пропуская уже виденные.
+        -- KEYS[1]: LIST пула (JSON вопросов)
+        -- KEYS[2]: ZSET хэшей вопросов -> время добавления
+        -- ARGV[1]: now_unix
+        -- ARGV[2]: сколько секунд помнить хэш
+        -- ARGV[3]: максимальный размер пула
+        -- ARGV[4..]: пары (хэш, JSON вопроса)
+
+        local now = tonumber(ARGV[1])
+        redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now - tonumber(ARGV[2]))
+
+        local size = redis.call('LLEN', KEYS[1])
+        local max_size = tonumber(ARGV[3])
+        local added = 0
+        for i = 4, #ARGV, 2 do
+            if size >= max_size then
+                break
+            end
+            if redis.call('ZADD', KEYS[2], 'NX', now, ARGV[i]) == 1 then
+                redis.call('RPUSH', KEYS[1], ARGV[i + 1])
+                size = size + 1
+                added = added + 1
+            end
+        end
+
+        return added
+    """
+
+    ADD_SPAM_PHRASES = """
+        -- Добавляет спам-фразы и записывает их в журнал под новой версией.
+        -- Версия резервируется в том же скрипте, поэтому журнал
+        -- заполняется строго в порядке версий.
+        -- KEYS[1]: ZSET фраз (score = частота)
+        -- KEYS[2]: ZSET журнала (score = версия последнего изменения)
+        -- KEYS[3]: счетчик версии набора
+        -- ARGV[1]: максимальное число фраз
+        -- ARGV[2]: сколько последних версий хранит журнал
+        -- ARGV[3..]: фразы
+
+        local version = redis.call('INCR', KEYS[3])
+        for i = 3, #ARGV do
+            redis.call('ZINCRBY', KEYS[1], 1, ARGV[i])
+            redis.call('ZADD', KEYS[2], version, ARGV[i])
+        end
+
+        redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -(tonumber(ARGV[1]) + 1))
+        redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', version - tonumber(ARGV[2]))
+
+        return version
+    """
@@ -0,0 +1,210 @@
+# bot/utils/multi_index_hash.py
+"""
+Multi-index hashing (MIH) для поиска почти одинаковых 64-битных хэшей
+изображений в Redis.
+
+Хэш делится на NUM_BANDS непересекающихся 16-битных полос, каждая
+индексируется отдельным SET. Если два хэша отличаются меньше чем в
+NUM_BANDS битах, хотя бы одна полоса совпадает целиком (принцип
+Дирихле), поэтому поиск читает NUM_BANDS бакетов одним pipeline.
+С probe_radius = r дополнительно читаются бакеты соседних значений
+полосы (до r измененных бит), и гарантия расширяется до расстояния
+NUM_BANDS * (r + 1) - 1. Больше этого совпадения находятся с высокой
+вероятностью: различия редко ложатся поровну во все полосы.
+
+Прежняя схема — бакет по старшим 16 битам — это ровно полоса 0, поэтому
+индекс находит все, что находила она, и больше.
+"""
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Callable, Iterable, Iterator, List, Optional
+
+import numpy as np
+from loguru import logger
+from redis.asyncio import Redis
+
+from bot.utils.simhash import bands
+
+NUM_BANDS = 4
+BAND_BITS = 16
+
+
+def hamming64(a: int, b: int) -> int:
+    """Расстояние Хэмминга между двумя 64-битными хэшами."""
+    return (a ^ b).bit_count()
+
+
+def band_values(image_hash: int) -> List[int]:
+    """16-битные полосы хэша от старших битов к младшим."""
+    return bands(image_hash, NUM_BANDS)
+
+
+def probe_values(value: int, radius: int) -> Iterator[int]:
+    """
+    Значения полосы на расстоянии не больше radius (включая само значение).
+
+    Args:
+        value: Значение полосы
+        radius: Сколько бит можно изменить
+    """
+    yield value
+    for r in range(1, radius + 1):
+        for positions in combinations(range(BAND_BITS), r):
+            mask = 0
+            for pos in positions:
+                mask |= 1 << pos
+            yield value ^ mask
+
+
+@dataclass(frozen=True)
+class HashMatch:
+    """Найденный в индексе близкий хэш."""
+    image_hash: int
+    distance: int
+
+
+class MultiIndexHashIndex:
+    """
+    Индекс 64-битных перцептивных хэшей по 16-битным полосам.
+
+    Использование:
+        index = MultiIndexHashIndex(redis, KeyFactory.image_hash_band, max_distance=10)
+        match = await index.find(dhash)
+        await index.add(dhash)
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        key_for: Callable[[int, int], str],
+        *,
+        max_distance: int,
+        ttl_seconds: int,
+        probe_radius: int = 0,
+    ):
+        """
+        Args:
+            redis: Клиент Redis
+            key_for: Ключ SET-бакета по (номер полосы, значение полосы)
+            max_distance: Максимальное расстояние Хэмминга для совпадения
+            ttl_seconds: Время жизни бакета (продлевается при добавлении)
+            probe_radius: Радиус проверки соседних значений полосы
+                (0 — только точное совпадение; 1 — 17 бакетов на полосу)
+        """
+        self.redis = redis
+        self.key_for = key_for
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+        self.probe_radius = probe_radius
+
+    @property
+    def guaranteed_distance(self) -> int:
+        """До какого расстояния совпадение находится гарантированно."""
+        return NUM_BANDS * (self.probe_radius + 1) - 1
+
+    def bucket_keys(self, image_hash: int) -> List[str]:
+        """Ключи бакетов, в которых хранится хэш."""
+        return [self.key_for(band, value) for band, value in enumerate(band_values(image_hash))]
+
+    def probe_keys(self, image_hash: int) -> List[str]:
+        """Ключи бакетов, которые читает поиск."""
+        return [
+            self.key_for(band, probe)
+            for band, value in enumerate(band_values(image_hash))
+            for probe in probe_values(value, self.probe_radius)
+        ]
+
+    async def find(self, image_hash: int) -> Optional[HashMatch]:
+        """
+        Ищет ближайший хэш в пределах max_distance (один round trip).
+
+        Args:
+            image_hash: Хэш запроса
+
+        Returns:
+            Ближайшее совпадение или None
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        for key in self.probe_keys(image_hash):
+            pipe.smembers(key)
+        replies = await pipe.execute()
+
+        best: Optional[HashMatch] = None
+        seen = set()
+        for members in replies:
+            for raw in members or ():
+                if raw in seen:
+                    continue
+                seen.add(raw)
+                try:
+                    candidate = int(raw)
+                except (TypeError, ValueError):
+                    logger.warning(f"⚠️ Некорректный хэш в индексе: {raw!r}")
+                    continue
+                distance = hamming64(image_hash, candidate)
+                if distance <= self.max_distance and (best is None or distance < best.distance):
+                    best = HashMatch(image_hash=candidate, distance=distance)
+                    if distance == 0:
+                        return best
+        return best
+
+    def stage_add(self, pipe, image_hash: int) -> None:
+        """Добавляет в pipeline запись хэша во все бакеты его полос."""
+        member = str(int(image_hash))
+        for key in self.bucket_keys(image_hash):
+            pipe.sadd(key, member)
+            pipe.expire(key, self.ttl_seconds)
+
+    def stage_add_many(self, pipe, hashes: Iterable[int]) -> List[List[str]]:
+        """
+        Добавляет в pipeline пачку хэшей: один SADD на бакет вместо
+        NUM_BANDS команд на хэш. Полосы считаются и группируются NumPy
+        (сортировка по значению полосы), строки ключей строятся только
+        для занятых бакетов. TTL не продлевается — вызывающий делает
+        EXPIRE один раз на затронутый бакет (см. stage_expire).
+
+        Returns:
+            Ключи бакетов по полосам в порядке постановки команд
+        """
+        values = np.fromiter((int(h) for h in hashes), dtype=np.uint64)
+        if not values.size:
+            return [[] for _ in range(NUM_BANDS)]
+        # bytes: redis-py не перекодирует каждый из миллионов аргументов
+        members = [b"%d" % h for h in values.tolist()]
+
+        staged: List[List[str]] = []
+        for band in range(NUM_BANDS):
+            shift = np.uint64(BAND_BITS * (NUM_BANDS - 1 - band))
+            band_of = ((values >> shift) & np.uint64(0xFFFF)).astype(np.int64)
+            order = np.argsort(band_of, kind="stable")
+            buckets, starts = np.unique(band_of[order], return_index=True)
+            grouped = [members[i] for i in order.tolist()]
+            bounds = starts.tolist() + [len(grouped)]
+            keys = [self.key_for(band, value) for value in buckets.tolist()]
+            for key, start, end in zip(keys, bounds, bounds[1:]):
+                pipe.sadd(key, *grouped[start:end])
+            staged.append(keys)
+        return staged
+
+    def stage_expire(self, pipe, keys: Iterable[str]) -> None:
+        """Продлевает TTL бакетов."""
+        for key in keys:
+            pipe.expire(key, self.ttl_seconds)
+
+    def stage_remove(self, pipe, image_hash: int) -> None:
+        """Добавляет в pipeline удаление хэша из всех бакетов его полос."""
+        member = str(int(image_hash))
+        for key in self.bucket_keys(image_hash):
+            pipe.srem(key, member)
+
+    async def add(self, image_hash: int) -> None:
+        """Добавляет хэш во все бакеты его полос (один round trip)."""
+        pipe = self.redis.pipeline(transaction=False)
+        self.stage_add(pipe, image_hash)
+        await pipe.execute()
+
+    async def remove(self, image_hash: int) -> None:
+        """Удаляет хэш из всех бакетов его полос."""
+        pipe = self.redis.pipeline(transaction=False)
+        self.stage_remove(pipe, image_hash)
+        await pipe.execute()
@@ -0,0 +1,301 @@
+# bot/utils/nb_sketch_store.py
+"""
+Хранилище NB-модели антиспама на count-min sketch с затуханием.
+
+В отличие от HASH-хранилища (до 2^n_bits полей на класс и EXPIRE на всю
+модель), sketch занимает фиксированный объем, не имеет TTL и стареет
+плавно: периодическое экспоненциальное затухание с заданным периодом
+полураспада. Предсказания идут по локальной копии, которая загружается
+одним GET и обновляется раз в refresh_seconds; обучение — один BITFIELD
+на документ без чтения.
+"""
+import math
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+from loguru import logger
+from redis.asyncio import Redis
+from redis.exceptions import WatchError
+
+from bot.utils.count_min_sketch import HAM, SPAM, CountMinSketch
+from bot.utils.keys import KeyFactory
+
+
+class NBSketchStore:
+    """
+    Счетчики признаков NB в упакованном count-min sketch в Redis.
+
+    Использование:
+        store = NBSketchStore(redis, alpha=1.0, vocab_size=1 << 20)
+        await store.partial_fit(features, label_spam=1)
+        prob = await store.predict(features)
+        await store.decay()  # из периодической задачи
+    """
+
+    DECAY_RETRIES = 3
+
+    def __init__(
+        self,
+        redis: Redis,
+        *,
+        alpha: float = 1.0,
+        vocab_size: int = 1 << 20,
+        width: int = 1 << 16,
+        depth: int = 4,
+        half_life_days: float = 14.0,
+        refresh_seconds: float = 60.0,
+        key: Optional[str] = None,
+    ):
+        """
+        Args:
+            redis: Клиент Redis
+            alpha: Сглаживание Лапласа
+            vocab_size: Размер пространства признаков (для сглаживания)
+            width: Ширина строки sketch
+            depth: Количество строк (хеш-функций)
+            half_life_days: Период полураспада счетчиков
+            refresh_seconds: Как часто перечитывать модель для предсказаний
+            key: Ключ Redis (по умолчанию KeyFactory.nb_sketch())
+        """
+        self.redis = self._binary_client(redis)
+        self._owns_client = self.redis is not redis
+        self.alpha = alpha
+        self.vocab_size = vocab_size
+        self.width = width
+        self.depth = depth
+        self.half_life_seconds = half_life_days * 24 * 3600
+        self.refresh_seconds = refresh_seconds
+        self.key = key or KeyFactory.nb_sketch()
+
+        self._sketch: Optional[CountMinSketch] = None
+        self._layout: Optional[CountMinSketch] = None
+        self._loaded_at = 0.0
+        self._created = False
+
+    @property
+    def size_bytes(self) -> int:
+        """Фиксированный размер модели в Redis."""
+        return CountMinSketch.words_for(self.width, self.depth) * 4
+
+    # ------------------------------------------------------------------
+    # Загрузка
+    # ------------------------------------------------------------------
+
+    async def get_sketch(self) -> CountMinSketch:
+        """Локальная копия модели (перечитывается раз в refresh_seconds)."""
+        if self._sketch is not None and time.monotonic() - self._loaded_at < self.refresh_seconds:
+            return self._sketch
+
+        try:
+            payload = await self.redis.get(self.key)
+            if payload:
+                self._sketch = CountMinSketch.from_bytes(payload)
+            else:
+                # ключ вытеснен или сброшен: следующая запись заново создаст заголовок
+                self._created = False
+                if self._sketch is None:
+                    self._sketch = CountMinSketch.empty(self.width, self.depth)
+            self._loaded_at = time.monotonic()
+        except ValueError as e:
+            # BITFIELD по пропавшему ключу создает буфер без заголовка
+            logger.warning(f"⚠️ NB sketch поврежден, модель создается заново: {e}")
+            self._sketch = await self._reset()
+            self._loaded_at = time.monotonic()
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось загрузить NB sketch: {e}")
+            if self._sketch is None:
+                self._sketch = CountMinSketch.empty(self.width, self.depth)
+
+        return self._sketch
+
+    async def ensure_created(self) -> None:
+        """
+        Создает пустую модель в Redis, если ее еще нет.
+
+        SET NX повторяется, только когда get_sketch не нашел ключ, чтобы
+        не гонять буфер модели на каждую запись.
+        """
+        if self._created:
+            return
+        empty = CountMinSketch.empty(self.width, self.depth)
+        await self.redis.set(self.key, empty.to_bytes(), nx=True)
+        self._created = True
+
+    async def _reset(self) -> CountMinSketch:
+        """Перезаписывает поврежденную модель пустой."""
+        empty = CountMinSketch.empty(self.width, self.depth)
+        await self.redis.set(self.key, empty.to_bytes())
+        self._created = True
+        return empty
+
+    @staticmethod
+    def _binary_client(redis: Redis) -> Redis:
+        """
+        Клиент без decode_responses: модель — бинарный буфер, который
+        нельзя декодировать как UTF-8. Пул создается с теми же параметрами.
+        """
+        pool = getattr(redis, "connection_pool", None)
+        kwargs = dict(getattr(pool, "connection_kwargs", None) or {})
+        if not kwargs.get("decode_responses"):
+            return redis
+
+        kwargs["decode_responses"] = False
+        # from_pool: клиент владеет пулом и закрывает его в aclose()
+        return Redis.from_pool(
+            pool.__class__(
+                connection_class=pool.connection_class,
+                max_connections=pool.max_connections,
+                **kwargs,
+            )
+        )
+
+    async def close(self) -> None:
+        """Закрывает собственный бинарный пул (общий клиент не трогает)."""
+        if self._owns_client:
+            await self.redis.aclose()
+
+    # ------------------------------------------------------------------
+    # Обучение и предсказание
+    # ------------------------------------------------------------------
+
+    async def partial_fit(self, features: Dict[int, int], label_spam: int) -> None:
+        """
+        Добавляет документ одним BITFIELD (насыщающие инкременты uint32).
+
+        Args:
+            features: {индекс признака: количество}
+            label_spam: 1 — спам, 0 — не спам
+        """
+        label = SPAM if label_spam else HAM
+        sketch = await self.get_sketch()
+
+        await self.ensure_created()
+
+        bitfield = self.redis.bitfield(self.key, default_overflow="SAT")
+        for feature, count in features.items():
+            for offset in sketch.word_offsets(label, feature):
+                bitfield.incrby("u32", f"#{offset}", int(count))
+        bitfield.incrby("u32", f"#{sketch.docs_offset(label)}", 1)
+        await bitfield.execute()
+
+        # Чтобы свежий пример сразу влиял на предсказания этого процесса
+        sketch.add(label, features)
+
+    def stage_counts(self, pipe, label: int, counts: Dict[int, int], docs: int) -> None:
+        """
+        Добавляет в pipeline агрегированные счетчики пачки документов.
+
+        Совпадающие слова sketch суммируются заранее: один INCRBY на слово
+        в одном BITFIELD. Заголовок модели должен существовать
+        (ensure_created), pipeline — от self.redis.
+
+        Args:
+            pipe: Pipeline клиента self.redis
+            label: SPAM или HAM
+            counts: {индекс признака: количество по всем документам}
+            docs: Количество документов
+        """
+        if self._layout is None:
+            self._layout = CountMinSketch.empty(self.width, self.depth)
+
+        words: Counter = Counter()
+        for feature, count in counts.items():
+            for offset in self._layout.word_offsets(label, feature):
+                words[offset] += int(count)
+        if docs:
+            words[self._layout.docs_offset(label)] += int(docs)
+        if not words:
+            return
+
+        bitfield = pipe.bitfield(self.key, default_overflow="SAT")
+        for offset, count in sorted(words.items()):
+            bitfield.incrby("u32", f"#{offset}", count)
+        bitfield.execute()
+
+    def invalidate(self) -> None:
+        """Сбрасывает локальную копию: следующее предсказание перечитает модель."""
+        self._sketch = None
+        self._loaded_at = 0.0
+
+    async def predict(self, features: Dict[int, int]) -> float:
+        """
+        Вероятность спама по мультиномиальному NB (формула как у HASH-модели).
+
+        Args:
+            features: {индекс признака: количество}
+        """
+        sketch = await self.get_sketch()
+
+        spam_docs = sketch.docs(SPAM)
+        ham_docs = sketch.docs(HAM)
+        total_docs = max(1, spam_docs + ham_docs)
+
+        spam_loglik = math.log((spam_docs + 1) / (total_docs + 2))
+        ham_loglik = math.log((ham_docs + 1) / (total_docs + 2))
+
+        smoothing = self.alpha * self.vocab_size + 1e-9
+        for feature, cnt in features.items():
+            s_prob = (sketch.estimate(SPAM, feature) + self.alpha) / (spam_docs + smoothing)
+            h_prob = (sketch.estimate(HAM, feature) + self.alpha) / (ham_docs + smoothing)
+            spam_loglik += cnt * math.log(s_prob + 1e-12)
+            ham_loglik += cnt * math.log(h_prob + 1e-12)
+
+        mmax = max(spam_loglik, ham_loglik)
+        s = math.exp(spam_loglik - mmax)
+        h = math.exp(ham_loglik - mmax)
+        return s / (s + h + 1e-12)
+
+    # ------------------------------------------------------------------
+    # Затухание
+    # ------------------------------------------------------------------
+
+    async def decay(self, now: Optional[int] = None) -> Optional[float]:
+        """
+        Применяет затухание за время с прошлого вызова (WATCH/MULTI).
+
+        Коэффициент зависит от прошедшего времени, поэтому пропущенные
+        запуски периодической задачи не меняют итоговую скорость старения.
+
+        Returns:
+            Примененный коэффициент или None, если модели нет / она
+            повреждена (тогда создается заново) / конфликт
+        """
+        now = int(time.time()) if now is None else now
+
+        for _ in range(self.DECAY_RETRIES):
+            try:
+                async with self.redis.pipeline(transaction=True) as pipe:
+                    await pipe.watch(self.key)
+                    payload = await pipe.get(self.key)
+                    if not payload:
+                        return None
+
+                    try:
+                        sketch = CountMinSketch.from_bytes(payload)
+                    except ValueError as e:
+                        await pipe.reset()
+                        logger.warning(f"⚠️ NB sketch поврежден, модель создается заново: {e}")
+                        self._sketch = await self._reset()
+                        self._loaded_at = time.monotonic()
+                        return None
+                    if not sketch.decayed_at:
+                        factor = 1.0
+                    else:
+                        elapsed = max(0, now - sketch.decayed_at)
+                        factor = 0.5 ** (elapsed / self.half_life_seconds)
+                    sketch.decay(factor, now)
+
+                    pipe.multi()
+                    pipe.set(self.key, sketch.to_bytes())
+                    await pipe.execute()
+            except WatchError:
+                continue
+
+            self._sketch = sketch
+            self._loaded_at = time.monotonic()
+            logger.info(f"🍂 NB sketch: затухание x{factor:.3f}")
+            return factor
+
+        logger.warning("⚠️ NB sketch: затухание не применено (конкурентные изменения)")
+        return None
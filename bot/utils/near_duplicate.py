@@ -0,0 +1,131 @@
+# bot/utils/near_duplicate.py
+"""
+Детектор флуда почти одинаковыми сообщениями (SimHash + LSH в Redis).
+
+Каждое сообщение дает 64-битный SimHash, разбитый на полосы. Для каждой
+полосы в Redis хранится ZSET недавних отпечатков (score = время). Проверка
+читает ровно num_bands бакетов одним pipeline, поэтому стоимость не
+зависит от общего потока сообщений; размер бакета ограничен и живет
+не дольше окна.
+"""
+import time
+from dataclasses import dataclass
+from typing import Optional, Set
+
+from loguru import logger
+from redis.asyncio import Redis
+
+from bot.utils.keys import KeyFactory
+from bot.utils.simhash import bands, hamming_distance, text_simhash
+
+
+@dataclass(frozen=True)
+class NearDuplicateResult:
+    """Результат проверки сообщения."""
+    fingerprint: int
+    distinct_users: int
+    is_flood: bool
+
+
+class NearDuplicateDetector:
+    """
+    Отмечает сообщение как флуд, если за окно пришло больше `min_users`
+    почти одинаковых сообщений от разных пользователей (во всех чатах).
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        *,
+        window_seconds: int = 600,
+        min_users: int = 5,
+        max_distance: int = 10,
+        num_bands: int = 8,
+        bucket_limit: int = 128,
+        min_chars: int = 30,
+    ):
+        """
+        Args:
+            redis: Клиент Redis
+            window_seconds: Окно наблюдения
+            min_users: Флуд, если разных пользователей (включая текущего)
+                с почти одинаковым текстом больше этого числа
+            max_distance: Максимальное расстояние Хэмминга между копиями.
+                До num_bands - 1 копия находится гарантированно, больше —
+                с высокой вероятностью (различия редко задевают все полосы)
+            num_bands: Количество LSH-полос
+            bucket_limit: Сколько последних отпечатков хранить в бакете
+            min_chars: Короче этого тексты не проверяются
+        """
+        self.redis = redis
+        self.window_seconds = window_seconds
+        self.min_users = min_users
+        self.max_distance = max_distance
+        self.num_bands = num_bands
+        self.bucket_limit = bucket_limit
+        self.min_chars = min_chars
+
+    async def check(
+        self,
+        text: str,
+        user_id: int,
+        now: Optional[float] = None
+    ) -> Optional[NearDuplicateResult]:
+        """
+        Регистрирует текст и проверяет его на массовую рассылку.
+
+        Args:
+            text: Нормализованный текст
+            user_id: Автор сообщения
+            now: Текущее время (unix)
+
+        Returns:
+            Результат или None, если текст слишком короткий / Redis недоступен
+        """
+        if len(text) < self.min_chars:
+            return None
+
+        now = time.time() if now is None else now
+        fingerprint = text_simhash(text)
+        member = f"{fingerprint:016x}:{user_id}"
+        keys = [
+            KeyFactory.near_duplicate_bucket(i, value)
+            for i, value in enumerate(bands(fingerprint, self.num_bands))
+        ]
+
+        # Чтение и запись всех бакетов — один round trip
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.zremrangebyscore(key, "-inf", now - self.window_seconds)
+            pipe.zrange(key, 0, -1)
+        for key in keys:
+            pipe.zadd(key, {member: now})
+            pipe.zremrangebyrank(key, 0, -self.bucket_limit - 1)
+            pipe.expire(key, self.window_seconds)
+
+        try:
+            replies = await pipe.execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка проверки почти-дубликатов: {e}")
+            return None
+
+        users: Set[str] = {str(user_id)}
+        for members in replies[1:2 * len(keys):2]:
+            for raw in members or ():
+                if isinstance(raw, bytes):
+                    raw = raw.decode()
+                other_hash, _, other_user = raw.partition(":")
+                if other_user in users:
+                    continue
+                try:
+                    distance = hamming_distance(fingerprint, int(other_hash, 16))
+                except ValueError:
+                    continue
+                if distance <= self.max_distance:
+                    users.add(other_user)
+
+        return NearDuplicateResult(
+            fingerprint=fingerprint,
+            distinct_users=len(users),
+            is_flood=len(users) > self.min_users,
+        )
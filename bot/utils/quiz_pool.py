@@ -0,0 +1,133 @@
+# bot/utils/quiz_pool.py
+"""
+Пул заранее сгенерированных вопросов викторины в Redis.
+
+Вопросы лежат в LIST: старт викторины забирает вопрос одним LPOP и не
+ждет AI. Пополняет пул фоновый воркер QuizService партиями. Каждый
+вопрос дедуплицируется по хэшу нормализованного текста: хэши хранятся
+в ZSET с временем добавления и забываются через retention, поэтому
+выданный вопрос не вернется в пул, пока его не забудут.
+"""
+import hashlib
+import json
+import re
+import time
+from typing import Any, Iterable, List, Optional
+
+from loguru import logger
+from pydantic import ValidationError
+from redis.asyncio import Redis
+from redis.exceptions import NoScriptError
+
+from bot.utils.keys import KeyFactory
+from bot.utils.lua_scripts import LuaScripts
+from bot.utils.models import QuizQuestion
+
+_SPACES_RE = re.compile(r"\s+")
+
+QUIZ_OPTIONS = 4
+
+
+def question_hash(question: QuizQuestion) -> str:
+    """Хэш вопроса: регистр, пробелы и пунктуация в конце не важны."""
+    text = _SPACES_RE.sub(" ", question.question).strip().lower().rstrip("?!. ")
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def validate_question(item: Any) -> Optional[QuizQuestion]:
+    """
+    Проверяет вопрос, сгенерированный AI.
+
+    Кроме схемы QuizQuestion требуется ровно 4 разных непустых варианта
+    ответа и индекс правильного в их пределах.
+
+    Returns:
+        QuizQuestion или None, если вопрос непригоден
+    """
+    try:
+        question = QuizQuestion.model_validate(item)
+    except ValidationError:
+        return None
+
+    options = [option.strip() for option in question.options]
+    if (
+        not question.question.strip()
+        or len(options) != QUIZ_OPTIONS
+        or not all(options)
+        or len({option.lower() for option in options}) != QUIZ_OPTIONS
+        or not 0 <= question.correct_option_index < QUIZ_OPTIONS
+    ):
+        return None
+    return question
+
+
+class QuizQuestionPool:
+    """
+    LIST вопросов викторины с дедупликацией по хэшу.
+
+    Использование:
+        pool = QuizQuestionPool(redis)
+        question = await pool.pop()       # None — пул пуст
+        added = await pool.push(questions)
+    """
+
+    PUSH_SCRIPT = LuaScripts.QUIZ_POOL_PUSH
+    PUSH_SHA = hashlib.sha1(PUSH_SCRIPT.encode("utf-8")).hexdigest()
+
+    def __init__(
+        self,
+        redis: Redis,
+        *,
+        max_size: int = 500,
+        retention_seconds: int = 30 * 24 * 3600,
+    ):
+        """
+        Args:
+            redis: Клиент Redis
+            max_size: Максимальный размер пула
+            retention_seconds: Сколько помнить хэш вопроса для дедупликации
+        """
+        self.redis = redis
+        self.max_size = max_size
+        self.retention_seconds = retention_seconds
+        self._keys = (KeyFactory.quiz_pool(), KeyFactory.quiz_pool_hashes())
+
+    async def pop(self) -> Optional[QuizQuestion]:
+        """Забирает вопрос из пула (один LPOP) или None, если пул пуст."""
+        raw = await self.redis.lpop(KeyFactory.quiz_pool())
+        if raw is None:
+            return None
+        try:
+            return QuizQuestion.model_validate(json.loads(raw))
+        except (TypeError, ValueError) as e:
+            logger.warning(f"⚠️ Поврежденный вопрос в пуле викторины: {e}")
+            return None
+
+    async def size(self) -> int:
+        """Текущий размер пула."""
+        return int(await self.redis.llen(KeyFactory.quiz_pool()) or 0)
+
+    async def push(self, questions: Iterable[QuizQuestion]) -> int:
+        """
+        Добавляет вопросы, пропуская уже виденные (по question_hash).
+
+        Returns:
+            Сколько вопросов добавлено
+        """
+        args: List[str] = []
+        seen = set()
+        for question in questions:
+            digest = question_hash(question)
+            if digest in seen:
+                continue
+            seen.add(digest)
+            args += [digest, question.model_dump_json()]
+        if not args:
+            return 0
+
+        argv = [int(time.time()), self.retention_seconds, self.max_size, *args]
+        try:
+            added = await self.redis.evalsha(self.PUSH_SHA, len(self._keys), *self._keys, *argv)
+        except NoScriptError:
+            added = await self.redis.eval(self.PUSH_SCRIPT, len(self._keys), *self._keys, *argv)
+        return int(added or 0)
@@ -0,0 +1,254 @@
+# bot/utils/redis_invalidation.py
+"""
+Версионированная инвалидация process-local кэшей через Redis.
+
+Источник истины — счетчик версии в Redis (INCR). Каждая модификация
+увеличивает версию и публикует ее в канал. Экземпляры бота слушают канал
+в фоне и лишь помечают свой кэш устаревшим — перезагрузка выполняется
+лениво при следующем обращении.
+
+Использование:
+    sync = VersionedInvalidator(redis, "stop_words:version", "invalidate:stop_words")
+
+    if await sync.needs_refresh():
+        data, version = await load_data_with_version()
+        sync.mark_fresh(version)
+
+    # после записи в Redis
+    await sync.bump()
+"""
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+from loguru import logger
+from redis.asyncio import Redis
+
+InvalidationCallback = Callable[[int, Optional[str]], Awaitable[None]]
+
+
+class VersionedInvalidator:
+    """
+    Отслеживает версию набора данных в Redis и сообщения об инвалидации.
+
+    Пока подписка на канал активна, проверка актуальности не требует
+    сетевых обращений. Если подписка потеряна, каждая проверка сравнивает
+    локальную версию с версией в Redis (один GET), пока слушатель не
+    переподключится.
+    """
+
+    RECONNECT_DELAY_MIN = 1.0  # секунды
+    RECONNECT_DELAY_MAX = 30.0
+
+    def __init__(
+        self,
+        redis: Redis,
+        version_key: str,
+        channel: str,
+        name: str = "cache",
+        on_invalidate: Optional[InvalidationCallback] = None,
+    ):
+        """
+        Args:
+            redis: Клиент Redis
+            version_key: Ключ счетчика версии
+            channel: Канал pub/sub для уведомлений
+            name: Имя кэша для логов
+            on_invalidate: Необязательный колбэк (version, payload) на каждое уведомление
+        """
+        self.redis = redis
+        self.version_key = version_key
+        self.channel = channel
+        self.name = name
+        self.on_invalidate = on_invalidate
+
+        self._local_version: Optional[int] = None
+        self._last_seen_version: Optional[int] = None
+        self._stale = True
+        self._listening = False
+        self._listener_task: Optional[asyncio.Task] = None
+
+    # ------------------------------------------------------------------
+    # Состояние
+    # ------------------------------------------------------------------
+
+    @property
+    def local_version(self) -> Optional[int]:
+        """Версия данных, загруженных в локальный кэш."""
+        return self._local_version
+
+    @property
+    def is_listening(self) -> bool:
+        """Активна ли подписка на канал инвалидации."""
+        return self._listening
+
+    async def needs_refresh(self) -> bool:
+        """
+        Проверяет, нужно ли перезагрузить локальный кэш.
+
+        Returns:
+            bool: True если кэш пуст или устарел
+        """
+        self.start()
+
+        if self._local_version is None or self._stale:
+            return True
+
+        if self._listening:
+            return False
+
+        remote_version = await self.get_remote_version()
+        return remote_version != self._local_version
+
+    def mark_fresh(self, version: int) -> None:
+        """
+        Фиксирует версию, с которой синхронизирован локальный кэш.
+
+        Если за время загрузки пришло уведомление о более новой версии,
+        кэш остается помеченным как устаревший.
+        """
+        self._local_version = version
+        self._stale = (
+            self._last_seen_version is not None
+            and self._last_seen_version > version
+        )
+
+    def mark_stale(self) -> None:
+        """Принудительно помечает локальный кэш устаревшим."""
+        self._stale = True
+
+    # ------------------------------------------------------------------
+    # Redis
+    # ------------------------------------------------------------------
+
+    async def get_remote_version(self) -> int:
+        """Возвращает текущую версию из Redis (0 если ключа нет)."""
+        raw = await self.redis.get(self.version_key)
+        return self.parse_version(raw)
+
+    async def bump(self, payload: Optional[str] = None) -> int:
+        """
+        Увеличивает версию и оповещает все экземпляры.
+
+        Args:
+            payload: Необязательные данные для подписчиков
+
+        Returns:
+            int: Новая версия
+        """
+        version = await self.next_version()
+        await self.publish(version, payload)
+        return version
+
+    async def next_version(self) -> int:
+        """
+        Резервирует новую версию без уведомления.
+
+        Нужна, когда версию надо записать вместе с данными до публикации.
+        """
+        return int(await self.redis.incr(self.version_key))
+
+    async def publish(self, version: int, payload: Optional[str] = None) -> None:
+        """Оповещает все экземпляры о новой версии."""
+        message = str(version) if payload is None else f"{version}:{payload}"
+
+        try:
+            await self.redis.publish(self.channel, message)
+        except Exception as e:
+            # Версия уже увеличена — остальные экземпляры увидят ее при переподключении
+            logger.warning(f"⚠️ [{self.name}] Не удалось опубликовать инвалидацию: {e}")
+
+        self._stale = True
+
+    @staticmethod
+    def parse_version(raw) -> int:
+        """Приводит значение версии из Redis к int."""
+        if raw is None:
+            return 0
+        if isinstance(raw, bytes):
+            raw = raw.decode()
+        try:
+            return int(raw)
+        except (TypeError, ValueError):
+            return 0
+
+    # ------------------------------------------------------------------
+    # Подписка
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        """Запускает фоновый слушатель канала (идемпотентно)."""
+        if self._listener_task and not self._listener_task.done():
+            return
+
+        try:
+            self._listener_task = asyncio.create_task(
+                self._listen_loop(),
+                name=f"invalidation_listener:{self.name}",
+            )
+        except RuntimeError:
+            # Нет запущенного event loop — работаем в режиме опроса версии
+            self._listener_task = None
+
+    async def close(self) -> None:
+        """Останавливает слушатель."""
+        if self._listener_task and not self._listener_task.done():
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+        self._listener_task = None
+        self._listening = False
+
+    async def _listen_loop(self) -> None:
+        """Слушает канал, переподключаясь с экспоненциальной задержкой."""
+        delay = self.RECONNECT_DELAY_MIN
+
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                self._listening = True
+                # Уведомления за время отключения потеряны — перепроверяем
+                self._stale = True
+                delay = self.RECONNECT_DELAY_MIN
+                logger.debug(f"📡 [{self.name}] Подписка на {self.channel} активна")
+
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    await self._handle_message(message.get("data"))
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ [{self.name}] Подписка на инвалидацию прервана: {e}")
+            finally:
+                self._listening = False
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.RECONNECT_DELAY_MAX)
+
+    async def _handle_message(self, data) -> None:
+        """Обрабатывает одно уведомление вида "<version>[:<payload>]"."""
+        if isinstance(data, bytes):
+            data = data.decode("utf-8", errors="ignore")
+
+        raw_version, _, payload = str(data).partition(":")
+        version = self.parse_version(raw_version)
+
+        if self._last_seen_version is None or version > self._last_seen_version:
+            self._last_seen_version = version
+
+        if version != self._local_version:
+            self._stale = True
+
+        if self.on_invalidate:
+            try:
+                await self.on_invalidate(version, payload or None)
+            except Exception as e:
+                logger.warning(f"⚠️ [{self.name}] Ошибка обработчика инвалидации: {e}")
@@ -0,0 +1,98 @@
+# bot/utils/simhash.py
+"""
+SimHash для поиска почти одинаковых текстов.
+
+Слегка измененные копии одного сообщения (замена пары слов, эмодзи,
+пунктуации) дают 64-битные отпечатки с малым расстоянием Хэмминга.
+Отпечаток делится на полосы (bands) для LSH: если расстояние не больше
+числа полос минус один, хотя бы одна полоса совпадет целиком
+(принцип Дирихле), поэтому кандидатов достаточно искать по точному
+совпадению полос.
+
+Отпечаток считается для каждого сообщения группы на event loop, поэтому
+подсчет весов по битам векторизован (NumPy): хэши признаков
+раскладываются в битовую матрицу, веса — суммы по столбцам.
+"""
+import hashlib
+import re
+from typing import Iterable, List
+
+import numpy as np
+
+SIMHASH_BITS = 64
+_MASK = (1 << SIMHASH_BITS) - 1
+_SPACES_RE = re.compile(r"\s+")
+
+
+def _token_hash(token: str) -> bytes:
+    return hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+
+
+def shingles(text: str, size: int = 3) -> List[str]:
+    """
+    Признаки текста: слова и символьные n-граммы без пробелов.
+
+    Args:
+        text: Нормализованный текст
+        size: Длина символьной n-граммы
+
+    Returns:
+        Список признаков (с повторами — они увеличивают вес)
+    """
+    words = text.split()
+    chars = _SPACES_RE.sub("", text)
+    grams = [chars[i:i + size] for i in range(max(0, len(chars) - size + 1))]
+    return words + grams
+
+
+def simhash(features: Iterable[str]) -> int:
+    """
+    Вычисляет 64-битный SimHash по набору признаков.
+
+    Args:
+        features: Признаки (токены, шинглы)
+
+    Returns:
+        Отпечаток (0 для пустого набора)
+    """
+    digests = b"".join(_token_hash(feature) for feature in features)
+    if not digests:
+        return 0
+
+    # строка = хэш признака, столбец j = бит (63 - j), big-endian как у digest
+    matrix = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1)
+    ones = matrix.sum(axis=0, dtype=np.int64)
+    # вес бита = единицы - нули; бит отпечатка выставлен при весе > 0
+    bits = 2 * ones > matrix.shape[0]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big") & _MASK
+
+
+def text_simhash(text: str) -> int:
+    """SimHash нормализованного текста."""
+    return simhash(shingles(text))
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Расстояние Хэмминга между двумя отпечатками."""
+    return bin(a ^ b).count("1")
+
+
+def bands(fingerprint: int, num_bands: int = 8) -> List[int]:
+    """
+    Делит отпечаток на num_bands равных полос (LSH).
+
+    Args:
+        fingerprint: 64-битный отпечаток
+        num_bands: Количество полос (делитель 64)
+
+    Returns:
+        Значения полос от старших битов к младшим
+    """
+    if SIMHASH_BITS % num_bands:
+        raise ValueError(f"num_bands должен делить {SIMHASH_BITS}")
+    width = SIMHASH_BITS // num_bands
+    mask = (1 << width) - 1
+    return [
+        (fingerprint >> (SIMHASH_BITS - width * (i + 1))) & mask
+        for i in range(num_bands)
+    ]
@@ -0,0 +1,143 @@
+# bot/utils/telegram_stream.py
+"""
+Вывод потокового ответа AI в Telegram правкой сообщения.
+
+Первое сообщение отправляется, как только пришел первый фрагмент
+ответа, дальше оно редактируется не чаще edit_interval: Telegram
+ограничивает частоту правок (около 1 в секунду в личке и 20 в минуту в
+группе), а правка на каждый токен быстро упирается в RetryAfter. Когда
+текст перестает помещаться в одно сообщение, оно фиксируется и
+продолжение идет в следующем.
+
+Использование:
+    chunks = ai_service.stream_text_response(prompt)
+    text = await stream_to_message(message, chunks, header="🤖 <b>Ответ:</b>\\n\\n")
+"""
+import asyncio
+import html
+import time
+from typing import AsyncIterator, Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import Message
+from loguru import logger
+
+TELEGRAM_TEXT_LIMIT = 4096
+
+# минимальный интервал между правками (секунды): личка / группы
+PRIVATE_EDIT_INTERVAL = 1.0
+GROUP_EDIT_INTERVAL = 3.0
+
+_CURSOR = " ▌"
+
+
+class _StreamedMessage:
+    """Одно сообщение Telegram, которое дописывается правками."""
+
+    def __init__(self, origin: Message, header: str, parse_mode: str):
+        self.origin = origin
+        self.header = header
+        self.parse_mode = parse_mode
+        self.sent: Optional[Message] = None
+        self.shown = ""
+
+    def render(self, body: str, final: bool) -> str:
+        return self.header + html.escape(body) + ("" if final else _CURSOR)
+
+    async def show(self, body: str, final: bool = False) -> None:
+        text = self.render(body, final)
+        if text == self.shown:
+            return
+        try:
+            if self.sent is None:
+                self.sent = await self.origin.answer(text, parse_mode=self.parse_mode)
+            else:
+                await self.sent.edit_text(text, parse_mode=self.parse_mode)
+            self.shown = text
+        except TelegramRetryAfter as e:
+            if not final:
+                # промежуточную правку можно пропустить — следующая ее догонит
+                logger.debug(f"⏳ Telegram просит подождать {e.retry_after}s, правка пропущена")
+                return
+            await asyncio.sleep(e.retry_after)
+            await self.show(body, final)
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                raise
+
+
+def _split_point(body: str, limit: int) -> int:
+    """Где разорвать текст: по абзацу, строке или пробелу не дальше limit."""
+    for separator in ("\n\n", "\n", " "):
+        index = body.rfind(separator, 0, limit)
+        if index > limit // 2:
+            return index + len(separator)
+    return limit
+
+
+def _fitting_prefix(body: str, limit: int) -> int:
+    """Длина префикса, который после html.escape помещается в limit."""
+    size = limit
+    while size > 0:
+        overflow = len(html.escape(body[:size])) - limit
+        if overflow <= 0:
+            return size
+        size -= overflow
+    return 1
+
+
+async def stream_to_message(
+    message: Message,
+    chunks: AsyncIterator[str],
+    *,
+    header: str = "",
+    parse_mode: str = "HTML",
+    edit_interval: Optional[float] = None,
+) -> str:
+    """
+    Показывает потоковый ответ в чате, дописывая сообщение правками.
+
+    Текст ответа экранируется, header вставляется как есть (HTML).
+
+    Args:
+        message: Сообщение, на которое отвечаем
+        chunks: Фрагменты ответа
+        header: Заголовок каждого сообщения
+        parse_mode: Режим разметки header
+        edit_interval: Минимальный интервал между правками (по умолчанию
+            зависит от типа чата)
+
+    Returns:
+        Полный текст ответа (пустая строка, если фрагментов не было —
+        тогда ничего не отправлено)
+    """
+    if edit_interval is None:
+        private = getattr(message.chat, "type", None) == "private"
+        edit_interval = PRIVATE_EDIT_INTERVAL if private else GROUP_EDIT_INTERVAL
+
+    current = _StreamedMessage(message, header, parse_mode)
+    limit = TELEGRAM_TEXT_LIMIT - len(header) - len(_CURSOR)
+    parts = []
+    body = ""
+    last_edit = 0.0
+
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        parts.append(chunk)
+        body += chunk
+
+        while len(html.escape(body)) > limit:
+            cut = _split_point(body, _fitting_prefix(body, limit))
+            await current.show(body[:cut].rstrip(), final=True)
+            current = _StreamedMessage(message, header, parse_mode)
+            body = body[cut:].lstrip()
+
+        now = time.monotonic()
+        if current.sent is None or now - last_edit >= edit_interval:
+            await current.show(body)
+            last_edit = now
+
+    if body or current.sent is not None:
+        await current.show(body, final=True)
+    return "".join(parts)
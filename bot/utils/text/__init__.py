@@ -6,8 +6,10 @@
 
 from bot.utils.text.normalizer import (
     normalize_text,
+    normalize_spam_text,
     normalize_asic_name,
     normalize_whitespace,
+    normalization_stats,
     remove_emoji,
     transliterate_to_latin
 )
@@ -34,8 +36,10 @@ from bot.utils.text.formatter import (
 __all__ = [
     # Normalizer
     "normalize_text",
+    "normalize_spam_text",
     "normalize_asic_name",
     "normalize_whitespace",
+    "normalization_stats",
     "remove_emoji",
     "transliterate_to_latin",
     # Sanitizer
@@ -0,0 +1,127 @@
+# bot/utils/text/memo.py
+"""
+Ограниченный LRU-кэш результатов нормализации текста.
+
+Пересланный спам приходит тысячами одинаковых копий, и каждый слой
+модерации нормализует один и тот же текст заново. Кэш хранит результат
+по 128-битному BLAKE2b-отпечатку исходного текста (сам текст не хранится),
+ограничен и по числу записей, и по объему памяти.
+"""
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple
+
+_DIGEST_SIZE = 16
+
+
+class NormalizationMemo:
+    """
+    LRU-мемоизация нормализации: (профиль, отпечаток текста) -> результат.
+
+    Использование:
+        memo = NormalizationMemo(max_entries=4096)
+        result = memo.get_or_compute("spam", text, _normalize_spam)
+        memo.get_stats()  # hits, misses, hit_rate, bytes_held, ...
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 4096,
+        max_bytes: int = 8 * 1024 * 1024,
+        min_chars: int = 32,
+    ):
+        """
+        Args:
+            max_entries: Максимум записей
+            max_bytes: Максимальный объем результатов в памяти
+            min_chars: Короче этого тексты не кэшируются (пересчет дешевле хеша)
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.min_chars = min_chars
+
+        self._entries: "OrderedDict[Tuple[str, bytes], Tuple[str, int]]" = OrderedDict()
+        self._bytes_held = 0
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def _fingerprint(text: str) -> bytes:
+        return hashlib.blake2b(
+            text.encode("utf-8", "surrogatepass"), digest_size=_DIGEST_SIZE
+        ).digest()
+
+    def get_or_compute(self, profile: str, text: str, compute: Callable[[str], str]) -> str:
+        """
+        Возвращает результат из кэша или вычисляет и сохраняет его.
+
+        Args:
+            profile: Вариант нормализации (разные профили не смешиваются)
+            text: Исходный текст
+            compute: Функция нормализации
+
+        Returns:
+            Нормализованный текст
+        """
+        if len(text) < self.min_chars:
+            return compute(text)
+
+        key = (profile, self._fingerprint(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+            self._misses += 1
+
+        result = compute(text)
+        size = sys.getsizeof(result) + _DIGEST_SIZE
+        if size > self.max_bytes:
+            return result
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (result, size)
+                self._bytes_held += size
+                while len(self._entries) > self.max_entries or self._bytes_held > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self._bytes_held -= evicted
+                    self._evictions += 1
+        return result
+
+    def clear(self) -> None:
+        """Очищает кэш и счетчики."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes_held = 0
+            self._hits = self._misses = self._evictions = 0
+
+    def get_hit_rate(self) -> float:
+        """Доля попаданий (0.0 — 1.0)."""
+        total = self._hits + self._misses
+        return self._hits / total if total else 0.0
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Возвращает статистику кэша.
+
+        Returns:
+            Словарь {entries, hits, misses, evictions, hit_rate,
+            bytes_held, max_entries, max_bytes}
+        """
+        return {
+            "entries": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "hit_rate": round(self.get_hit_rate(), 4),
+            "bytes_held": self._bytes_held,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+        }
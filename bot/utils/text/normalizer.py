@@ -1,10 +1,83 @@
 # bot/utils/text/normalizer.py
 """
 Нормализация текста для обработки, поиска и анализа.
+
+Все регулярные выражения и таблицы замены скомпилированы один раз при
+импорте. Результаты для длинных текстов кэшируются в ограниченном LRU
+по отпечатку исходного текста (см. bot.utils.text.memo): одинаковый
+пересланный спам нормализуется один раз на все слои модерации.
 """
+import html
 import re
 import unicodedata
-from typing import Optional
+from typing import Dict
+
+from bot.utils.text.memo import NormalizationMemo
+
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+_WHITESPACE_RE = re.compile(r'\s+')
+_BRACKETS_RE = re.compile(r'\s*\([^)]*\)')
+_SEPARATORS_RE = re.compile(r'[-_/]')
+
+_EMOJI_RE = re.compile(
+    "["
+    "\U0001F600-\U0001F64F"  # emoticons
+    "\U0001F300-\U0001F5FF"  # symbols & pictographs
+    "\U0001F680-\U0001F6FF"  # transport & map symbols
+    "\U0001F1E0-\U0001F1FF"  # flags (iOS)
+    "\U00002702-\U000027B0"
+    "\U000024C2-\U0001F251"
+    "\U0001F900-\U0001F9FF"  # Supplemental Symbols and Pictographs
+    "\U0001FA00-\U0001FA6F"  # Chess Symbols
+    "\U0001FA70-\U0001FAFF"  # Symbols and Pictographs Extended-A
+    "\U00002600-\U000026FF"  # Miscellaneous Symbols
+    "\U00002700-\U000027BF"  # Dingbats
+    "]+",
+    flags=re.UNICODE
+)
+
+# Таблица транслитерации (ГОСТ 7.79-2000, система Б)
+_TRANSLIT = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd',
+    'е': 'e', 'ё': 'yo', 'ж': 'zh', 'з': 'z', 'и': 'i',
+    'й': 'j', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n',
+    'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't',
+    'у': 'u', 'ф': 'f', 'х': 'h', 'ц': 'c', 'ч': 'ch',
+    'ш': 'sh', 'щ': 'shh', 'ъ': '', 'ы': 'y', 'ь': '',
+    'э': 'e', 'ю': 'yu', 'я': 'ya',
+    'А': 'A', 'Б': 'B', 'В': 'V', 'Г': 'G', 'Д': 'D',
+    'Е': 'E', 'Ё': 'Yo', 'Ж': 'Zh', 'З': 'Z', 'И': 'I',
+    'Й': 'J', 'К': 'K', 'Л': 'L', 'М': 'M', 'Н': 'N',
+    'О': 'O', 'П': 'P', 'Р': 'R', 'С': 'S', 'Т': 'T',
+    'У': 'U', 'Ф': 'F', 'Х': 'H', 'Ц': 'C', 'Ч': 'Ch',
+    'Ш': 'Sh', 'Щ': 'Shh', 'Ъ': '', 'Ы': 'Y', 'Ь': '',
+    'Э': 'E', 'Ю': 'Yu', 'Я': 'Ya'
+})
+
+# Антиспам: невидимые символы, конфузаблы латиница/кириллица и leet
+ZERO_WIDTH_RE = re.compile(r"[\u200B-\u200F\uFEFF]", re.UNICODE)
+CONFUSABLES = str.maketrans(
+    {
+        "о": "o", "О": "O", "а": "a", "А": "A", "е": "e", "Е": "E",
+        "р": "p", "Р": "P", "с": "c", "С": "C", "х": "x", "Х": "X",
+        "у": "y", "У": "Y", "к": "k", "К": "K", "В": "B", "Т": "T",
+        "М": "M", "Н": "H",
+    }
+)
+LEET = str.maketrans({"0": "o", "1": "l", "3": "e", "4": "a", "5": "s", "7": "t"})
+_SPAM_DISALLOWED_RE = re.compile(r"[^a-z0-9а-яё@#\.\:/\-\s]")
+
+_memo = NormalizationMemo()
+
+
+def normalization_stats() -> Dict[str, float]:
+    """
+    Статистика кэша нормализации.
+
+    Returns:
+        Словарь {entries, hits, misses, evictions, hit_rate, bytes_held, ...}
+    """
+    return _memo.get_stats()
 
 
 def normalize_text(text: str, lowercase: bool = True, remove_punctuation: bool = True) -> str:
@@ -28,6 +101,14 @@ def normalize_text(text: str, lowercase: bool = True, remove_punctuation: bool =
     if not text:
         return ""
     
+    return _memo.get_or_compute(
+        f"text:{int(lowercase)}{int(remove_punctuation)}",
+        text,
+        lambda raw: _normalize_text(raw, lowercase, remove_punctuation)
+    )
+
+
+def _normalize_text(text: str, lowercase: bool, remove_punctuation: bool) -> str:
     # Unicode нормализация (NFC - canonical decomposition + canonical composition)
     normalized = unicodedata.normalize('NFC', text)
     
@@ -38,12 +119,43 @@ def normalize_text(text: str, lowercase: bool = True, remove_punctuation: bool =
     # Удаление пунктуации
     if remove_punctuation:
         # Удаляем все знаки пунктуации, кроме пробелов
-        normalized = re.sub(r'[^\w\s]', ' ', normalized)
+        normalized = _PUNCTUATION_RE.sub(' ', normalized)
     
     # Нормализация пробелов
-    normalized = normalize_whitespace(normalized)
+    return _WHITESPACE_RE.sub(' ', normalized).strip()
+
+
+def normalize_spam_text(text: str) -> str:
+    """
+    Нормализует текст для антиспама с раскрытием обфускации.
     
-    return normalized.strip()
+    Применяет:
+    - Раскрытие HTML-сущностей
+    - Удаление невидимых символов (zero-width)
+    - Замену кириллических двойников латиницей и leet-цифр буквами
+    - Приведение к нижнему регистру
+    - Замену прочих символов пробелами (ссылки, @ и # сохраняются)
+    
+    Args:
+        text: Исходный текст
+    
+    Returns:
+        Нормализованный текст
+    """
+    if not text:
+        return ""
+    
+    return _memo.get_or_compute("spam", text, _normalize_spam_text)
+
+
+def _normalize_spam_text(text: str) -> str:
+    txt = html.unescape(text)
+    txt = ZERO_WIDTH_RE.sub("", txt)
+    txt = txt.translate(CONFUSABLES)
+    txt = txt.translate(LEET)
+    txt = txt.lower()
+    txt = _SPAM_DISALLOWED_RE.sub(" ", txt)
+    return _WHITESPACE_RE.sub(" ", txt).strip()
 
 
 def normalize_whitespace(text: str) -> str:
@@ -64,7 +176,7 @@ def normalize_whitespace(text: str) -> str:
         return ""
     
     # Заменяем все виды пробелов на обычный пробел
-    normalized = re.sub(r'\s+', ' ', text)
+    normalized = _WHITESPACE_RE.sub(' ', text)
     
     return normalized.strip()
 
@@ -91,10 +203,10 @@ def normalize_asic_name(name: str) -> str:
     normalized = name.lower()
     
     # Удаление содержимого в скобках (например, "(2023)" или "(Pro)")
-    normalized = re.sub(r'\s*\([^)]*\)', '', normalized)
+    normalized = _BRACKETS_RE.sub('', normalized)
     
     # Замена разделителей на пробелы
-    normalized = re.sub(r'[-_/]', ' ', normalized)
+    normalized = _SEPARATORS_RE.sub(' ', normalized)
     
     # Нормализация пробелов
     normalized = normalize_whitespace(normalized)
@@ -115,25 +227,7 @@ def remove_emoji(text: str) -> str:
     if not text:
         return ""
     
-    # Паттерн для всех emoji
-    emoji_pattern = re.compile(
-        "["
-        "\U0001F600-\U0001F64F"  # emoticons
-        "\U0001F300-\U0001F5FF"  # symbols & pictographs
-        "\U0001F680-\U0001F6FF"  # transport & map symbols
-        "\U0001F1E0-\U0001F1FF"  # flags (iOS)
-        "\U00002702-\U000027B0"
-        "\U000024C2-\U0001F251"
-        "\U0001F900-\U0001F9FF"  # Supplemental Symbols and Pictographs
-        "\U0001FA00-\U0001FA6F"  # Chess Symbols
-        "\U0001FA70-\U0001FAFF"  # Symbols and Pictographs Extended-A
-        "\U00002600-\U000026FF"  # Miscellaneous Symbols
-        "\U00002700-\U000027BF"  # Dingbats
-        "]+",
-        flags=re.UNICODE
-    )
-    
-    return emoji_pattern.sub('', text)
+    return _memo.get_or_compute("emoji", text, lambda raw: _EMOJI_RE.sub('', raw))
 
 
 def transliterate_to_latin(text: str) -> str:
@@ -151,26 +245,4 @@ def transliterate_to_latin(text: str) -> str:
     if not text:
         return ""
     
-    # Таблица транслитерации (ГОСТ 7.79-2000, система Б)
-    translit_table = {
-        'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd',
-        'е': 'e', 'ё': 'yo', 'ж': 'zh', 'з': 'z', 'и': 'i',
-        'й': 'j', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n',
-        'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't',
-        'у': 'u', 'ф': 'f', 'х': 'h', 'ц': 'c', 'ч': 'ch',
-        'ш': 'sh', 'щ': 'shh', 'ъ': '', 'ы': 'y', 'ь': '',
-        'э': 'e', 'ю': 'yu', 'я': 'ya',
-        'А': 'A', 'Б': 'B', 'В': 'V', 'Г': 'G', 'Д': 'D',
-        'Е': 'E', 'Ё': 'Yo', 'Ж': 'Zh', 'З': 'Z', 'И': 'I',
-        'Й': 'J', 'К': 'K', 'Л': 'L', 'М': 'M', 'Н': 'N',
-        'О': 'O', 'П': 'P', 'Р': 'R', 'С': 'S', 'Т': 'T',
-        'У': 'U', 'Ф': 'F', 'Х': 'H', 'Ц': 'C', 'Ч': 'Ch',
-        'Ш': 'Sh', 'Щ': 'Shh', 'Ъ': '', 'Ы': 'Y', 'Ь': '',
-        'Э': 'E', 'Ю': 'Yu', 'Я': 'Ya'
-    }
-    
-    result = []
-    for char in text:
-        result.append(translit_table.get(char, char))
-    
-    return ''.join(result)
\ No newline at end of file
+    return _memo.get_or_compute("translit", text, lambda raw: raw.translate(_TRANSLIT))
@@ -7,8 +7,10 @@
 # Импортируем все из новых модулей для обратной совместимости
 from bot.utils.text.normalizer import (
     normalize_text,
+    normalize_spam_text,
     normalize_asic_name,
     normalize_whitespace,
+    normalization_stats,
     remove_emoji,
     transliterate_to_latin
 )
@@ -41,8 +43,10 @@ from bot.utils.text.formatter import (
 __all__ = [
     # Normalizer
     "normalize_text",
+    "normalize_spam_text",
     "normalize_asic_name",
     "normalize_whitespace",
+    "normalization_stats",
     "remove_emoji",
     "transliterate_to_latin",
     # Sanitizer
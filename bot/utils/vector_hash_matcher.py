@@ -0,0 +1,106 @@
+# bot/utils/vector_hash_matcher.py
+"""
+Поиск ближайшего 64-битного хэша в памяти процесса (NumPy).
+
+Все хэши лежат в непрерывном массиве uint64; запрос — один векторный
+XOR и popcount (np.bitwise_count) по всему массиву, без сети и без
+цикла на Python. На 1M хэшей это порядка миллисекунды.
+"""
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+_DTYPE = np.uint64
+
+
+class VectorHashMatcher:
+    """
+    Множество 64-битных хэшей с поиском ближайшего по расстоянию Хэмминга.
+
+    Использование:
+        matcher = VectorHashMatcher()
+        matcher.load(hashes)
+        matcher.add(h)
+        match = matcher.nearest(query, max_distance=5)  # (хэш, расстояние) | None
+    """
+
+    def __init__(self, initial_capacity: int = 1024):
+        """
+        Args:
+            initial_capacity: Начальная емкость массива (растет удвоением)
+        """
+        self._data = np.zeros(max(1, initial_capacity), dtype=_DTYPE)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, image_hash: int) -> bool:
+        return bool(np.any(self._view() == _DTYPE(image_hash)))
+
+    @property
+    def nbytes(self) -> int:
+        """Объем выделенного массива."""
+        return self._data.nbytes
+
+    def _view(self) -> np.ndarray:
+        return self._data[:self._size]
+
+    def load(self, hashes: Iterable[int]) -> None:
+        """Заменяет содержимое (дубликаты отбрасываются)."""
+        values = np.unique(np.fromiter((int(h) for h in hashes), dtype=_DTYPE))
+        self._data = np.zeros(max(1024, len(values) * 2), dtype=_DTYPE)
+        self._data[:len(values)] = values
+        self._size = len(values)
+
+    def add(self, image_hash: int) -> bool:
+        """
+        Добавляет хэш (идемпотентно).
+
+        Returns:
+            True, если хэша не было
+        """
+        if image_hash in self:
+            return False
+        if self._size == len(self._data):
+            grown = np.zeros(len(self._data) * 2, dtype=_DTYPE)
+            grown[:self._size] = self._view()
+            self._data = grown
+        self._data[self._size] = image_hash
+        self._size += 1
+        return True
+
+    def remove(self, image_hash: int) -> bool:
+        """
+        Удаляет хэш (последний элемент переносится на его место).
+
+        Returns:
+            True, если хэш был
+        """
+        positions = np.flatnonzero(self._view() == _DTYPE(image_hash))
+        if not len(positions):
+            return False
+        for pos in positions[::-1]:
+            self._size -= 1
+            self._data[pos] = self._data[self._size]
+        return True
+
+    def nearest(self, image_hash: int, max_distance: int) -> Optional[Tuple[int, int]]:
+        """
+        Ищет ближайший хэш.
+
+        Args:
+            image_hash: Хэш запроса
+            max_distance: Максимальное расстояние Хэмминга
+
+        Returns:
+            (хэш, расстояние) или None, если ближе max_distance ничего нет
+        """
+        if not self._size:
+            return None
+        distances = np.bitwise_count(self._view() ^ _DTYPE(image_hash))
+        idx = int(distances.argmin())
+        distance = int(distances[idx])
+        if distance > max_distance:
+            return None
+        return int(self._data[idx]), distance
@@ -0,0 +1,156 @@
+# bot/utils/violation_counter.py
+"""
+Атомарный счетчик нарушений с решением об эскалации.
+
+Все пути применения мер (AntiSpamService, ImageGuard, SecurityService,
+SecurityMiddleware) регистрируют нарушение одним вызовом EVALSHA скрипта
+LuaScripts.REGISTER_VIOLATION: увеличение счетчика, поддержание окна
+и выбор меры по порогам выполняются за один сетевой round trip без гонок.
+
+Использование:
+    counter = ViolationCounter(redis)
+    result = await counter.register(
+        KeyFactory.user_offense_count(user_id, chat_id),
+        window_seconds=86400,
+        warn_threshold=1, mute_threshold=2, ban_threshold=3,
+    )
+    if result.decision == "ban":
+        ...
+"""
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from loguru import logger
+from redis.asyncio import Redis
+from redis.exceptions import NoScriptError, ResponseError
+
+from bot.utils.lua_scripts import LuaScripts
+
+
+@dataclass(frozen=True)
+class ViolationResult:
+    """Результат регистрации нарушения."""
+    count: int
+    decision: str = "none"  # none | warn | mute | ban
+    score_sum: float = 0.0
+
+
+class ViolationCounter:
+    """
+    Обертка над скриптом REGISTER_VIOLATION.
+
+    SHA скрипта вычисляется локально, поэтому после preload() каждое
+    нарушение — один EVALSHA. Если Redis потерял кэш скриптов
+    (перезапуск, SCRIPT FLUSH), скрипт загружается повторно.
+    """
+
+    SCRIPT = LuaScripts.REGISTER_VIOLATION
+    SHA = hashlib.sha1(SCRIPT.encode("utf-8")).hexdigest()
+
+    def __init__(self, redis: Redis):
+        """
+        Args:
+            redis: Клиент Redis
+        """
+        self.redis = redis
+
+    @classmethod
+    async def preload(cls, redis: Redis) -> None:
+        """Загружает скрипт в кэш Redis (вызывается при старте)."""
+        try:
+            await redis.script_load(cls.SCRIPT)
+            logger.info("✅ Lua-скрипт счетчика нарушений загружен")
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось предзагрузить Lua-скрипт нарушений: {e}")
+
+    async def register(
+        self,
+        key: str,
+        *,
+        window_seconds: int,
+        weight: int = 1,
+        warn_threshold: int = 0,
+        mute_threshold: int = 0,
+        ban_threshold: int = 0,
+        score: float = 0.0,
+        sliding: bool = True,
+        now: Optional[int] = None,
+    ) -> ViolationResult:
+        """
+        Регистрирует нарушение и вычисляет решение об эскалации.
+
+        Args:
+            key: Ключ счетчика (HASH)
+            window_seconds: Длина окна подсчета
+            weight: Вес нарушения
+            warn_threshold: Порог предупреждения (0 — не используется)
+            mute_threshold: Порог мута (0 — не используется)
+            ban_threshold: Порог бана (0 — не используется)
+            score: Оценка угрозы для накопления в score_sum
+            sliding: Продлевать окно на каждое нарушение (иначе окно
+                отсчитывается от первого нарушения)
+            now: Текущее время (unix), по умолчанию time.time()
+
+        Returns:
+            ViolationResult: Счетчик, решение и сумма оценок
+
+        Raises:
+            redis.RedisError: При недоступности Redis
+        """
+        args = (
+            int(weight),
+            int(window_seconds),
+            int(warn_threshold or 0),
+            int(mute_threshold or 0),
+            int(ban_threshold or 0),
+            int(now if now is not None else time.time()),
+            repr(float(score)),
+            "1" if sliding else "0",
+        )
+
+        try:
+            raw = await self.redis.evalsha(self.SHA, 1, key, *args)
+        except NoScriptError:
+            raw = await self.redis.eval(self.SCRIPT, 1, key, *args)
+
+        return self._parse(raw)
+
+    async def get_count(self, key: str) -> int:
+        """Текущее значение счетчика (0 если ключа нет)."""
+        try:
+            value = await self.redis.hget(key, "cnt")
+        except ResponseError:
+            # Счетчик старого формата (строка) — будет перенесен при следующем нарушении
+            value = await self.redis.get(key)
+        return int(value) if value else 0
+
+    @staticmethod
+    def decide(
+        count: int,
+        warn_threshold: int = 0,
+        mute_threshold: int = 0,
+        ban_threshold: int = 0,
+    ) -> str:
+        """Та же логика порогов, что и в скрипте (для резервных путей)."""
+        if ban_threshold > 0 and count >= ban_threshold:
+            return "ban"
+        if mute_threshold > 0 and count >= mute_threshold:
+            return "mute"
+        if warn_threshold > 0 and count >= warn_threshold:
+            return "warn"
+        return "none"
+
+    @staticmethod
+    def _parse(raw) -> ViolationResult:
+        count, decision, score_sum = raw
+        if isinstance(decision, bytes):
+            decision = decision.decode()
+        if isinstance(score_sum, bytes):
+            score_sum = score_sum.decode()
+        return ViolationResult(
+            count=int(count),
+            decision=str(decision),
+            score_sum=float(score_sum or 0),
+        )
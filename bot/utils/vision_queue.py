@@ -0,0 +1,294 @@
+# bot/utils/vision_queue.py
+"""
+Очередь AI vision-запросов: общий лимит параллельных вызовов, честная
+очередь по чатам, склейка одинаковых картинок и сброс нагрузки.
+
+Рейд из сотни фото раньше порождал сотню параллельных запросов к
+Gemini/OpenAI. Теперь одновременно выполняется не больше max_concurrency
+вызовов, остальные ждут в очередях своих чатов и запускаются по кругу
+(один рейдящий чат не задерживает проверку в остальных). Одинаковая
+картинка, которая уже анализируется, второй раз не отправляется —
+вызывающие получают общий результат. Когда очередь заполнена (всего или
+в одном чате) или задание прождало дольше max_wait, бросается
+VisionOverloaded: вызывающий остается с эвристическим вердиктом.
+
+Использование:
+    queue = get_vision_queue()
+    if queue.accepts(chat_id):
+        photo = await download()
+        try:
+            verdict = await queue.submit(lambda: ai.analyze(photo), key=uid, chat_id=chat_id)
+        except VisionOverloaded:
+            verdict = None  # только эвристики
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Set
+
+from loguru import logger
+
+_LATENCY_WINDOW = 1024
+
+
+class VisionOverloaded(Exception):
+    """Очередь vision-запросов переполнена: решение остается за эвристиками."""
+
+
+@dataclass(eq=False)
+class _Job:
+    func: Callable[[], Awaitable[Any]]
+    key: Optional[str]
+    chat: Hashable
+    future: asyncio.Future
+    enqueued: float = field(default_factory=time.monotonic)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+def _consume_exception(future: asyncio.Future) -> None:
+    # все ожидающие могли быть отменены — не даем asyncio ругаться
+    if not future.cancelled():
+        future.exception()
+
+
+class VisionWorkQueue:
+    """
+    Планировщик vision-запросов процесса бота.
+
+    Задания ставятся в очередь своего чата; свободный слот берет задание
+    из чата, стоящего первым в круге, и переставляет чат в конец.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        max_queue: int = 64,
+        max_queue_per_chat: int = 8,
+        max_wait: float = 20.0,
+    ):
+        """
+        Args:
+            max_concurrency: Максимум одновременных AI-вызовов
+            max_queue: Максимум ожидающих заданий всего
+            max_queue_per_chat: Максимум ожидающих заданий одного чата
+            max_wait: Сколько задание может ждать слота (0 — без ограничения)
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.max_queue_per_chat = max_queue_per_chat
+        self.max_wait = max_wait
+
+        self._pending: "OrderedDict[Hashable, Deque[_Job]]" = OrderedDict()
+        self._queued = 0
+        self._running = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+        self._completed = 0
+        self._failed = 0
+        self._shed = 0
+        self._deduplicated = 0
+        self._queue_waits: Deque[float] = deque(maxlen=_LATENCY_WINDOW)
+
+    # ------------------------------------------------------------------
+    # Постановка
+    # ------------------------------------------------------------------
+
+    def accepts(self, chat_id: Optional[Hashable] = None) -> bool:
+        """
+        Будет ли задание принято прямо сейчас.
+
+        Вызывайте до скачивания картинки: при перегрузке ее незачем качать.
+        """
+        if self._running < self.max_concurrency:
+            return True
+        if self._queued >= self.max_queue:
+            return False
+        return len(self._pending.get(chat_id, ())) < self.max_queue_per_chat
+
+    async def submit(
+        self,
+        func: Callable[[], Awaitable[Any]],
+        *,
+        key: Optional[str] = None,
+        chat_id: Optional[Hashable] = None,
+    ) -> Any:
+        """
+        Выполняет AI-вызов с учетом лимитов.
+
+        Args:
+            func: Фабрика корутины AI-вызова (вызывается, когда найдется слот)
+            key: Ключ склейки (file_unique_id, хэш байт); одинаковые
+                ключи в работе выполняются один раз
+            chat_id: Чат, в очередь которого ставится задание
+
+        Returns:
+            Результат func
+
+        Raises:
+            VisionOverloaded: Очередь заполнена или слот не дождался max_wait
+        """
+        if key is not None:
+            future = self._inflight.get(key)
+            if future is not None:
+                self._deduplicated += 1
+                return await asyncio.shield(future)
+
+        if not self.accepts(chat_id):
+            self._shed += 1
+            logger.warning(
+                f"🚦 Vision-запрос сброшен: в очереди {self._queued}, "
+                f"в работе {self._running} (chat={chat_id})"
+            )
+            raise VisionOverloaded(f"очередь vision заполнена ({self._queued}/{self.max_queue})")
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_consume_exception)
+        job = _Job(func=func, key=key, chat=chat_id, future=future)
+        if key is not None:
+            self._inflight[key] = future
+
+        self._pending.setdefault(chat_id, deque()).append(job)
+        self._queued += 1
+        self._dispatch()
+
+        # не дождалось слота за max_wait — снимаем с очереди, не дожидаясь
+        # освобождения слота (вызов мог зависнуть на весь таймаут провайдера)
+        if self.max_wait and not job.future.done() and self._is_queued(job):
+            job.timer = asyncio.get_running_loop().call_later(self.max_wait, self._expire, job)
+
+        # отмена одного ожидающего не отменяет общий вызов
+        return await asyncio.shield(future)
+
+    # ------------------------------------------------------------------
+    # Планирование
+    # ------------------------------------------------------------------
+
+    def _next_job(self) -> Optional[_Job]:
+        """Задание чата, стоящего первым в круге; чат уходит в конец."""
+        if not self._pending:
+            return None
+        chat, jobs = next(iter(self._pending.items()))
+        job = jobs.popleft()
+        if jobs:
+            self._pending.move_to_end(chat)
+        else:
+            del self._pending[chat]
+        self._queued -= 1
+        if job.timer is not None:
+            job.timer.cancel()
+        return job
+
+    def _is_queued(self, job: _Job) -> bool:
+        return job in self._pending.get(job.chat, ())
+
+    def _expire(self, job: _Job) -> None:
+        """Снимает задание, прождавшее слота дольше max_wait, с очереди его чата."""
+        if not self._is_queued(job):
+            return
+        jobs = self._pending[job.chat]
+        jobs.remove(job)
+        if not jobs:
+            del self._pending[job.chat]
+        self._queued -= 1
+        self._shed += 1
+        waited = time.monotonic() - job.enqueued
+        self._finish(job, exc=VisionOverloaded(f"vision-запрос ждал слота {waited:.1f}s"))
+
+    def _dispatch(self) -> None:
+        while self._running < self.max_concurrency:
+            job = self._next_job()
+            if job is None:
+                return
+
+            self._queue_waits.append(time.monotonic() - job.enqueued)
+            self._running += 1
+            task = asyncio.create_task(self._run(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job: _Job) -> None:
+        try:
+            result = await job.func()
+        except asyncio.CancelledError:
+            # остановка приложения: ожидающие получают отмену, а не зависают
+            self._finish(job, cancel=True)
+            raise
+        except Exception as e:
+            self._failed += 1
+            self._finish(job, exc=e)
+        else:
+            self._completed += 1
+            self._finish(job, result=result)
+        finally:
+            self._running -= 1
+            self._dispatch()
+
+    def _finish(
+        self,
+        job: _Job,
+        result: Any = None,
+        exc: Optional[BaseException] = None,
+        cancel: bool = False,
+    ) -> None:
+        if job.key is not None and self._inflight.get(job.key) is job.future:
+            del self._inflight[job.key]
+        if job.future.done():
+            return
+        if cancel:
+            job.future.cancel()
+        elif exc is not None:
+            job.future.set_exception(exc)
+        else:
+            job.future.set_result(result)
+
+    # ------------------------------------------------------------------
+    # Метрики
+    # ------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Возвращает метрики очереди.
+
+        Returns:
+            Словарь {running, queued, chats_waiting, max_concurrency,
+            completed, failed, shed, deduplicated, queue_wait_p99_ms}
+        """
+        waits = sorted(self._queue_waits)
+        p99 = waits[min(len(waits) - 1, int(round(0.99 * (len(waits) - 1))))] if waits else 0.0
+        return {
+            "running": self._running,
+            "queued": self._queued,
+            "chats_waiting": len(self._pending),
+            "max_concurrency": self.max_concurrency,
+            "completed": self._completed,
+            "failed": self._failed,
+            "shed": self._shed,
+            "deduplicated": self._deduplicated,
+            "queue_wait_p99_ms": round(p99 * 1000, 3),
+        }
+
+
+_queue: Optional[VisionWorkQueue] = None
+
+
+def get_vision_queue() -> VisionWorkQueue:
+    """Общая очередь процесса бота (создается при первом обращении)."""
+    global _queue
+    if _queue is None:
+        from bot.config.settings import settings
+
+        sec = settings.security
+        _queue = VisionWorkQueue(
+            max_concurrency=sec.vision_max_concurrency,
+            max_queue=sec.vision_max_queue,
+            max_queue_per_chat=sec.vision_max_queue_per_chat,
+            max_wait=sec.vision_max_wait,
+        )
+    return _queue
+
+
+def vision_queue_stats() -> Optional[Dict[str, float]]:
+    """Метрики общей очереди или None, если она еще не создавалась."""
+    return _queue.get_stats() if _queue is not None else None
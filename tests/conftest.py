@@ -0,0 +1,12 @@
+import importlib
+
+import pytest
+
+
+@pytest.fixture
+def import_with_settings(monkeypatch):
+    """Импортирует модуль, который при импорте загружает bot.config.settings."""
+    monkeypatch.setenv("BOT_TOKEN", "42:AAAbbb")
+    monkeypatch.setenv("REDIS_URL", "redis://localhost:6379/0")
+    monkeypatch.setenv("ADMIN_IDS", "123")
+    return importlib.import_module
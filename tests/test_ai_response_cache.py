@@ -0,0 +1,103 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from bot.utils import ai_response_cache
+from bot.utils.ai_response_cache import AIResponseCache, estimate_tokens
+from bot.utils.keys import KeyFactory
+
+
+class _BrokenRedis:
+    """Redis, который недоступен."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def evalsha(self, *args):
+        self.calls += 1
+        raise ConnectionError("redis down")
+
+
+def test_key_depends_on_request_and_buckets_temperature():
+    key = AIResponseCache.make_key("text", "Что такое хешрейт?", None, None, "gemini|openai", 0.71)
+    assert key == AIResponseCache.make_key("text", "Что такое хешрейт?", None, None, "gemini|openai", 0.74)
+    assert key != AIResponseCache.make_key("text", "Что такое хешрейт?", None, None, "gemini|openai", 0.8)
+    assert key != AIResponseCache.make_key("text", "Что такое хешрейт?", "sys", None, "gemini|openai", 0.7)
+    assert key != AIResponseCache.make_key("json", "Что такое хешрейт?", None, {}, "gemini|openai", 0.7)
+    assert estimate_tokens("abcd" * 10, None, "") == 10
+
+
+def test_unavailable_redis_degrades_to_miss_and_skips_oversized():
+    async def scenario():
+        redis = _BrokenRedis()
+        cache = AIResponseCache(redis, max_bytes=64)
+        assert await cache.get("digest") is None
+        await cache.set("digest", "x" * 100, ttl_seconds=60)
+        await cache.set("digest", "ok", ttl_seconds=60)
+        return redis.calls, cache.get_stats()
+
+    calls, stats = asyncio.run(scenario())
+    assert calls == 2
+    assert stats["stores"] == 0 and stats["hits"] == 0
+
+
+def _scripted_cache(monkeypatch, max_bytes):
+    fakeredis = pytest.importorskip("fakeredis")
+    clock = [1000]
+    monkeypatch.setattr(ai_response_cache, "time", SimpleNamespace(time=lambda: clock[0]))
+    redis = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+    return redis, AIResponseCache(redis, max_bytes=max_bytes), clock
+
+
+def _entry_size(value):
+    return len(json.dumps({"v": value, "t": 0}, ensure_ascii=False).encode("utf-8"))
+
+
+def test_set_evicts_least_recently_read_entries_to_fit_budget(monkeypatch):
+    answer = "ответ" * 10
+    redis, cache, clock = _scripted_cache(monkeypatch, max_bytes=2 * _entry_size(answer))
+
+    async def scenario():
+        await cache.set("a", answer, ttl_seconds=60)
+        clock[0] += 1
+        await cache.set("b", answer, ttl_seconds=60)
+        clock[0] += 1
+        assert await cache.get("a") == answer  # "a" теперь свежее "b"
+        clock[0] += 1
+        await cache.set("c", answer, ttl_seconds=60)
+        return (
+            [await cache.get(digest) for digest in "abc"],
+            int(await redis.get(KeyFactory.ai_response_bytes())),
+            await redis.zrange(KeyFactory.ai_response_lru(), 0, -1),
+        )
+
+    values, total, lru = asyncio.run(scenario())
+    assert values == [answer, None, answer]
+    assert total == 2 * _entry_size(answer)
+    assert sorted(lru) == ["a", "c"]
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_overwrite_and_expired_entries_release_their_bytes(monkeypatch):
+    redis, cache, _ = _scripted_cache(monkeypatch, max_bytes=10_000)
+
+    async def scenario():
+        await cache.set("a", "короткий", ttl_seconds=60)
+        await cache.set("a", "длинный ответ", ttl_seconds=60)
+        after_overwrite = int(await redis.get(KeyFactory.ai_response_bytes()))
+
+        # запись истекла по TTL: чтение убирает ее из учета бюджета
+        await redis.delete(KeyFactory.ai_response("a"))
+        missed = await cache.get("a")
+        return (
+            after_overwrite,
+            missed,
+            int(await redis.get(KeyFactory.ai_response_bytes())),
+            await redis.hgetall(KeyFactory.ai_response_sizes()),
+        )
+
+    after_overwrite, missed, total, sizes = asyncio.run(scenario())
+    assert after_overwrite == _entry_size("длинный ответ")
+    assert missed is None and total == 0 and sizes == {}
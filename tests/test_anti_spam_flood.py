@@ -0,0 +1,69 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+TEXT = "Всем привет, загляните в наш новый канал о криптовалютах и майнинге"
+
+
+def _message(user_id):
+    async def delete():
+        message.deleted = True
+
+    async def answer(text):
+        message.answered = True
+
+    message = SimpleNamespace(
+        chat=SimpleNamespace(id=-100, type="supergroup"),
+        from_user=SimpleNamespace(id=user_id),
+        text=TEXT,
+        caption=None,
+        photo=None,
+        document=None,
+        deleted=False,
+        answered=False,
+        delete=delete,
+        answer=answer,
+    )
+    return message
+
+
+def _run_wave(import_with_settings, flood_action):
+    service_module = import_with_settings("bot.services.anti_spam_service")
+
+    async def scenario():
+        settings = SimpleNamespace(
+            security=SimpleNamespace(flood_min_users=2, flood_action=flood_action)
+        )
+        service = service_module.AntiSpamService(
+            fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True),
+            bot=None,
+            settings=settings,
+        )
+        results = []
+        for user_id in range(1, 5):
+            message = _message(user_id)
+            results.append((await service.analyze_and_act(message), message.deleted))
+        violations = await service.violations.get_count(
+            service_module.KeyFactory.antispam_violations(-100, 4)
+        )
+        return results, violations
+
+    return asyncio.run(scenario())
+
+
+def test_near_duplicate_wave_is_deleted_without_violation(import_with_settings):
+    results, violations = _run_wave(import_with_settings, "delete")
+
+    assert results[:2] == [(None, False), (None, False)]
+    assert results[2:] == [("delete:near-dup:3", True), ("delete:near-dup:4", True)]
+    assert violations == 0
+
+
+def test_near_duplicate_wave_escalates_when_configured(import_with_settings):
+    results, violations = _run_wave(import_with_settings, "spam")
+
+    assert results[3] == ("warn:near-dup:4", True)
+    assert violations == 1
@@ -0,0 +1,57 @@
+import asyncio
+from types import SimpleNamespace
+
+
+class _FailingProvider:
+    def get_name(self):
+        return "failing"
+
+    async def stream_text(self, prompt, system_prompt=None, temperature=None):
+        raise ConnectionError("provider down")
+        yield ""
+
+
+class _Chat:
+    id = 1
+    type = "private"
+
+
+class _Message:
+    def __init__(self, text):
+        self.text = text
+        self.chat = _Chat()
+        self.bot = SimpleNamespace(send_chat_action=self._noop)
+        self.answers = []
+
+    async def _noop(self, *args, **kwargs):
+        return None
+
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+        return self
+
+
+def _service(import_with_settings, providers):
+    service_module = import_with_settings("bot.services.ai.service")
+    service = service_module.AIContentService()
+    service.providers = providers
+    return service
+
+
+def test_stream_yields_nothing_when_providers_fail(import_with_settings):
+    async def collect(service):
+        return [chunk async for chunk in service.stream_text_response("вопрос")]
+
+    assert asyncio.run(collect(_service(import_with_settings, []))) == []
+    assert asyncio.run(collect(_service(import_with_settings, [_FailingProvider()]))) == []
+
+
+def test_ask_shows_its_own_error_when_providers_fail(import_with_settings):
+    service = _service(import_with_settings, [_FailingProvider()])
+    text_handler = import_with_settings("bot.handlers.public.text_handler")
+    message = _Message("/ask Что такое хешрейт?")
+
+    asyncio.run(text_handler.cmd_ask(message, SimpleNamespace(ai_content_service=service)))
+
+    assert len(message.answers) == 1
+    assert message.answers[0].startswith("❌ Не удалось получить ответ")
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def test_image_services_share_one_result_cache(import_with_settings):
+    container_module = import_with_settings("bot.containers.container")
+
+    async def build():
+        container = container_module.Container()
+        return (
+            container.image_vision_service(),
+            container.image_guard_service(),
+            container.anti_spam_service(),
+            container.ai_service(),
+        )
+
+    vision, guard, anti_spam, ai_service = asyncio.run(build())
+    assert vision.ai_service is ai_service
+    assert vision.result_cache is guard.result_cache is anti_spam.image_cache
+
+
+def test_shutdown_stops_invalidation_listeners(import_with_settings):
+    container_module = import_with_settings("bot.containers.container")
+
+    async def scenario():
+        container = container_module.Container()
+        syncs = [
+            container.stop_word_service()._sync,
+            container.antispam_learning_service().phrase_sync,
+            container.antispam_learning_service().domain_sync,
+        ]
+        for sync in syncs:
+            sync.start()
+        tasks = [sync._listener_task for sync in syncs]
+        await container_module.shutdown_container_resources(container)
+        return [task.done() for task in tasks]
+
+    assert asyncio.run(scenario()) == [True, True, True]
+
+
+def test_security_settings_reach_anti_spam_service(import_with_settings, monkeypatch):
+    settings_module = import_with_settings("bot.config.settings")
+    service_module = import_with_settings("bot.services.anti_spam_service")
+    monkeypatch.setenv("SECURITY__NB_STORE", "sketch")
+    monkeypatch.setenv("SECURITY__FLOOD_MIN_USERS", "3")
+
+    async def build():
+        return service_module.AntiSpamService(
+            fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer()),
+            bot=None,
+            settings=settings_module.Settings(),
+        )
+
+    service = asyncio.run(build())
+    assert service.nb_sketch is not None
+    assert service.near_dup.min_users == 3
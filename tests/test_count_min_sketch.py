@@ -0,0 +1,24 @@
+import numpy as np
+
+from bot.utils.count_min_sketch import HAM, SPAM, CountMinSketch
+
+
+def test_estimates_never_undercount_and_roundtrip():
+    sketch = CountMinSketch.empty(width=256, depth=4)
+    for feature in range(1000):
+        sketch.add(SPAM, {feature: feature % 7 + 1})
+    sketch.add(HAM, {5: 3})
+
+    restored = CountMinSketch.from_bytes(sketch.to_bytes())
+    assert all(restored.estimate(SPAM, f) >= f % 7 + 1 for f in range(1000))
+    assert restored.estimate(HAM, 5) == 3
+    assert restored.docs(SPAM) == 1000 and restored.docs(HAM) == 1
+
+
+def test_decay_scales_counts():
+    sketch = CountMinSketch.empty(width=64, depth=2)
+    sketch.add(SPAM, {1: 1000})
+    sketch.decay(0.5, now=100, rng=np.random.default_rng(0))
+
+    assert 499 <= sketch.estimate(SPAM, 1) <= 500
+    assert sketch.decayed_at == 100
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def _service(import_with_settings):
+    module = import_with_settings("bot.services.antispam_learning.service")
+    redis = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+    return module.AntiSpamLearningService(redis)
+
+
+def test_concurrent_checks_rebuild_domain_filter_once(import_with_settings):
+    async def scenario():
+        service = _service(import_with_settings)
+        calls = 0
+        original = service.knowledge_base.get_domains_above
+
+        async def counting(min_score):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return await original(min_score)
+
+        service.knowledge_base.get_domains_above = counting
+        await asyncio.gather(*(service._domain_may_be_bad("spam.example") for _ in range(5)))
+        await service.close()
+        return calls
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_clear_all_invalidates_domain_filter(import_with_settings):
+    async def scenario():
+        service = _service(import_with_settings)
+        await service.knowledge_base.add_domains(["spam.example"] * 3)
+        await service._bump_domain_version()
+        await service._domain_may_be_bad("spam.example")
+        # подписка активна: дальше фильтр обновляется только по уведомлениям
+        await asyncio.sleep(0.05)
+        before = await service._domain_may_be_bad("spam.example")
+
+        await service.knowledge_base.clear_all()
+        await asyncio.sleep(0.05)
+        after = await service._domain_may_be_bad("spam.example")
+        await service.close()
+        return before, after
+
+    assert asyncio.run(scenario()) == (True, False)
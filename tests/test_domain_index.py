@@ -0,0 +1,35 @@
+from bot.utils.domain_trie import DomainSuffixTrie
+from bot.utils.bloom_filter import BloomFilter
+
+
+def test_suffix_trie_matches_labels_not_substrings():
+    trie = DomainSuffixTrie()
+    trie.add_many([".xyz", "top"], "tld")
+    trie.add("evil.com", "blacklist")
+
+    assert trie.match("promo.xyz") == "tld"
+    assert trie.match("a.b.top") == "tld"
+    assert trie.match("evil.com") == "blacklist"
+    assert trie.match("login.EVIL.com") == "blacklist"
+    assert trie.match("notevil.com") is None
+    assert trie.match("xyz.com") is None
+    assert len(trie) == 3
+
+
+def test_suffix_trie_prefers_most_specific_rule():
+    trie = DomainSuffixTrie()
+    trie.add("xyz", "tld")
+    trie.add("scam.xyz", "blacklist")
+
+    assert trie.match("get.scam.xyz") == "blacklist"
+    assert trie.match("other.xyz") == "tld"
+
+
+def test_bloom_filter_has_no_false_negatives():
+    domains = [f"spam{i}.example" for i in range(2000)]
+    bloom = BloomFilter.from_items(domains, fp_rate=0.01)
+
+    assert all(domain in bloom for domain in domains)
+
+    false_positives = sum(f"clean{i}.example" in bloom for i in range(5000))
+    assert false_positives < 150
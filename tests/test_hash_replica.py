@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+import pytest
+
+from bot.utils.vector_hash_matcher import VectorHashMatcher
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def test_full_reload_runs_in_background_and_keeps_stale_copy(import_with_settings, monkeypatch):
+    hash_replica = import_with_settings("bot.services.image_guard.hash_replica")
+    gate = threading.Event()
+
+    class _GatedMatcher(VectorHashMatcher):
+        def load(self, hashes):
+            gate.wait(5)
+            super().load(hashes)
+
+    monkeypatch.setattr(hash_replica, "VectorHashMatcher", _GatedMatcher)
+
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+        replica = hash_replica.SpamHashReplica(redis, ttl_seconds=3600, refresh_seconds=0)
+
+        pipe = redis.pipeline()
+        replica.stage_add(pipe, 0b1111)
+        await pipe.execute()
+
+        # первая загрузка не держит вызывающего
+        await asyncio.wait_for(replica.ensure_fresh(), 1)
+        first_pending = not replica.is_loaded and replica.is_reloading
+        gate.set()
+        await replica._reload_task
+        first = replica.nearest(0b1111, max_distance=0)
+
+        # импорт: новая пачка и событие reload
+        gate.clear()
+        pipe = redis.pipeline()
+        replica.stage_add_many(pipe, [1 << 40])
+        replica.stage_reload(pipe)
+        await pipe.execute()
+
+        await asyncio.wait_for(replica.ensure_fresh(), 1)
+        stale = replica.is_reloading, replica.nearest(0b1111, 0), replica.nearest(1 << 40, 0)
+        gate.set()
+        await replica._reload_task
+        fresh = replica.nearest(1 << 40, 0)
+
+        await replica.close()
+        return first_pending, first, stale, fresh
+
+    first_pending, first, stale, fresh = asyncio.run(scenario())
+    assert first_pending
+    assert first == (0b1111, 0)
+    assert stale == (True, (0b1111, 0), None)
+    assert fresh == (1 << 40, 0)
+
+
+def test_close_cancels_pending_reload(import_with_settings, monkeypatch):
+    hash_replica = import_with_settings("bot.services.image_guard.hash_replica")
+    gate = threading.Event()
+
+    class _GatedMatcher(VectorHashMatcher):
+        def load(self, hashes):
+            gate.wait(5)
+            super().load(hashes)
+
+    monkeypatch.setattr(hash_replica, "VectorHashMatcher", _GatedMatcher)
+
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+        replica = hash_replica.SpamHashReplica(redis, ttl_seconds=3600)
+        await replica.ensure_fresh()
+        task = replica._reload_task
+        await replica.close()
+        gate.set()
+        return task.cancelled(), replica.is_reloading
+
+    assert asyncio.run(scenario()) == (True, False)
@@ -0,0 +1,55 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from bot.utils.hedging import AllAttemptsFailed, hedged_call
+
+
+def _provider(delay, result=None, error=None, log=None):
+    async def call():
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            if log is not None:
+                log.append("cancelled")
+            raise
+        if error is not None:
+            raise error
+        return result
+
+    return call
+
+
+def test_hanging_primary_is_hedged_and_cancelled():
+    log = []
+
+    async def scenario():
+        started = time.monotonic()
+        winner = await hedged_call(
+            [("gemini", _provider(10, "slow", log=log)), ("openai", _provider(0.01, "fast"))],
+            hedge_delay=0.05,
+        )
+        return winner, time.monotonic() - started
+
+    winner, elapsed = asyncio.run(scenario())
+    assert winner == ("openai", "fast")
+    assert elapsed < 1.0
+    assert log == ["cancelled"]
+
+
+def test_invalid_answer_starts_next_immediately_and_all_failed_raises():
+    async def scenario():
+        winner = await hedged_call(
+            [("gemini", _provider(0, "not json")), ("openai", _provider(0, '{"ok": true}'))],
+            hedge_delay=None,
+            parse=json.loads,
+        )
+        with pytest.raises(AllAttemptsFailed) as info:
+            await hedged_call([("gemini", _provider(0, error=RuntimeError("boom")))], hedge_delay=0.01)
+        return winner, info.value.errors
+
+    winner, errors = asyncio.run(scenario())
+    assert winner == ("openai", {"ok": True})
+    assert list(errors) == ["gemini"]
@@ -0,0 +1,42 @@
+import io
+import random
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from bot.utils.image_fingerprint import ImageFingerprint, fingerprint_bytes
+from bot.utils.image_hash import dhash_bytes
+
+
+def _jpeg(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def _banner(seed: int) -> Image.Image:
+    rng = random.Random(seed)
+    image = Image.new("RGB", (640, 480), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.randrange(600), rng.randrange(440)
+        box = [x, y, x + rng.randrange(40, 300), y + rng.randrange(40, 200)]
+        draw.rectangle(box, fill=tuple(rng.randrange(256) for _ in range(3)))
+    return image.filter(ImageFilter.GaussianBlur(2))
+
+
+def test_dhash_is_compatible_and_fields_round_trip():
+    data = _jpeg(_banner(1))
+    fp = fingerprint_bytes(data, with_whash=True)
+    assert fp.dhash == dhash_bytes(data)
+    assert ImageFingerprint.from_fields(fp.to_fields()) == fp
+    assert ImageFingerprint.from_fields({"dhash": "1"}) is None
+
+
+def test_phash_survives_recolour_and_separates_images():
+    base = _banner(2)
+    recoloured = Image.merge("RGB", base.split()[::-1])
+    a = fingerprint_bytes(_jpeg(base))
+    b = fingerprint_bytes(_jpeg(recoloured))
+    other = fingerprint_bytes(_jpeg(_banner(3)))
+    assert (a.phash ^ b.phash).bit_count() <= 10
+    assert (a.phash ^ other.phash).bit_count() > 10
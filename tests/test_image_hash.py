@@ -0,0 +1,38 @@
+import io
+
+from aiogram.types import PhotoSize
+from PIL import Image, ImageDraw
+
+from bot.config.models import SecurityConfig
+from bot.utils.image_hash import dhash, dhash_bytes, pick_photo_for_hashing
+
+
+def _photo(width, height):
+    return PhotoSize(file_id=f"f{width}", file_unique_id=f"u{width}", width=width, height=height, file_size=width * 90)
+
+
+def test_pick_smallest_sufficient_size():
+    sizes = [_photo(90, 68), _photo(320, 240), _photo(800, 600), _photo(1280, 960)]
+
+    assert pick_photo_for_hashing(sizes, min_side=160).width == 320
+    assert pick_photo_for_hashing(sizes, min_side=500).width == 800
+    assert pick_photo_for_hashing(sizes[:1], min_side=160).width == 90
+    assert pick_photo_for_hashing([], min_side=160) is None
+
+
+def test_draft_decoded_thumbnail_hash_matches_full_image():
+    image = Image.new("RGB", (1280, 960), (30, 30, 30))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([100, 100, 700, 500], fill=(240, 200, 20))
+    draw.ellipse([600, 300, 1200, 900], fill=(20, 120, 240))
+
+    thumb = io.BytesIO()
+    image.resize((320, 240)).save(thumb, "JPEG", quality=85)
+
+    assert bin(dhash(image) ^ dhash_bytes(thumb.getvalue())).count("1") <= 3
+
+
+def test_default_distance_covers_thumbnail_drift():
+    # хэши в базе бывают посчитаны по оригиналам: до 6 бит расхождения
+    # с уменьшенной копией плюс запас на пересжатие
+    assert SecurityConfig().phash_distance >= 8
@@ -0,0 +1,66 @@
+import datetime
+import io
+
+from aiogram.types import Animation, Chat, Document, Message, PhotoSize, Sticker
+from PIL import Image
+
+from bot.utils.image_fingerprint import fingerprint_bytes
+from bot.utils.image_hash import pick_hash_source
+
+
+def _message(**media) -> Message:
+    return Message(
+        message_id=1,
+        date=datetime.datetime(2025, 1, 1),
+        chat=Chat(id=-100, type="supergroup"),
+        **media,
+    )
+
+
+def _thumb(uid: str, side: int = 320) -> PhotoSize:
+    return PhotoSize(file_id=f"thumb-{uid}", file_unique_id=f"t-{uid}", width=side, height=side)
+
+
+def _sticker(uid: str, **flags) -> Sticker:
+    return Sticker(
+        file_id=f"file-{uid}", file_unique_id=uid, type="regular", width=512, height=512,
+        is_animated=flags.get("is_animated", False), is_video=flags.get("is_video", False),
+        thumbnail=_thumb(uid),
+    )
+
+
+def test_animated_media_hashed_by_thumbnail_and_cached_by_own_id():
+    static = pick_hash_source(_message(sticker=_sticker("s1")))
+    video = pick_hash_source(_message(sticker=_sticker("s2", is_video=True)))
+    tgs = pick_hash_source(_message(sticker=_sticker("s3", is_animated=True)))
+    gif = pick_hash_source(_message(animation=Animation(
+        file_id="file-a", file_unique_id="a1", width=480, height=270, duration=3, thumbnail=_thumb("a1"),
+    )))
+
+    assert (static.file_id, static.kind) == ("file-s1", "sticker")
+    assert (video.file_id, video.unique_id, video.kind) == ("thumb-s2", "s2", "video_sticker")
+    assert (tgs.file_id, tgs.kind) == ("thumb-s3", "animated_sticker")
+    assert (gif.file_id, gif.unique_id) == ("thumb-a1", "a1")
+
+
+def test_large_image_document_uses_thumbnail_small_one_is_downloaded():
+    def doc(size, thumb_side):
+        return _message(document=Document(
+            file_id="file-d", file_unique_id="d1", mime_type="image/png",
+            file_size=size, thumbnail=_thumb("d1", thumb_side),
+        ))
+
+    assert pick_hash_source(doc(50 * 1024 * 1024, 90)).file_id == "thumb-d1"
+    assert pick_hash_source(doc(50 * 1024, 90)).file_id == "file-d"
+    assert pick_hash_source(doc(50 * 1024 * 1024, 320)).file_id == "thumb-d1"
+
+
+def test_transparent_sticker_hash_ignores_hidden_pixel_colour():
+    def webp(hidden):
+        image = Image.new("RGBA", (512, 512), hidden + (0,))
+        image.paste((200, 30, 30, 255), (100, 150, 400, 300))
+        buffer = io.BytesIO()
+        image.save(buffer, format="WEBP", lossless=True)
+        return buffer.getvalue()
+
+    assert fingerprint_bytes(webp((0, 0, 0))) == fingerprint_bytes(webp((255, 255, 0)))
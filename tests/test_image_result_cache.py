@@ -0,0 +1,67 @@
+import asyncio
+
+from bot.utils.image_result_cache import FIELD_DHASH, ImageResultCache, spam_score_field
+
+
+class _RecordingRedis:
+    """Минимальный HASH-клиент со счетчиком чтений."""
+
+    def __init__(self):
+        self.hashes = {}
+        self.reads = 0
+
+    async def hgetall(self, key):
+        self.reads += 1
+        return dict(self.hashes.get(key, {}))
+
+    def pipeline(self, transaction=False):
+        return _Pipeline(self)
+
+
+class _Pipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        for item in (mapping or {field: value}).items():
+            self.ops.append((key, *item))
+
+    def expire(self, key, ttl):
+        pass
+
+    async def execute(self):
+        for key, field, value in self.ops:
+            self.redis.hashes.setdefault(key, {})[field] = value
+
+
+def test_repeated_image_served_without_redis_round_trip():
+    async def scenario():
+        redis = _RecordingRedis()
+        writer = ImageResultCache(redis)
+        await writer.set_dhash("AQADuid", 0xDEADBEEF)
+
+        reader = ImageResultCache(redis)
+        assert await reader.get_dhash("AQADuid") == 0xDEADBEEF
+        assert await reader.get_dhash("AQADuid") == 0xDEADBEEF
+        assert await reader.get("AQADuid", "ocr") is None
+        assert await reader.get_dhash(None) is None
+        return redis.reads, reader.get_stats()
+
+    reads, stats = asyncio.run(scenario())
+    assert reads == 2
+    assert stats["redis_hits"] == 1 and stats["local_hits"] == 1 and stats["misses"] == 1
+
+
+def test_local_lru_is_bounded_and_fields_merge():
+    async def scenario():
+        cache = ImageResultCache(_RecordingRedis(), local_entries=2)
+        await cache.set("a", FIELD_DHASH, "1")
+        await cache.set("a", "ocr", "text")
+        await cache.set("b", FIELD_DHASH, "2")
+        await cache.set("c", FIELD_DHASH, "3")
+        return cache
+
+    cache = asyncio.run(scenario())
+    assert list(cache._local) == ["b", "c"]
+    assert spam_score_field("x") != spam_score_field("y")
@@ -0,0 +1,41 @@
+import asyncio
+import io
+import time
+
+from PIL import Image
+
+from bot.utils.image_hash import dhash_bytes
+from bot.utils.image_worker import ImageQueueFull, ImageWorkerPool, prepare_image_for_vision
+
+
+def _jpeg(size=(640, 480)) -> bytes:
+    buffer = io.BytesIO()
+    Image.linear_gradient("L").resize(size).convert("RGB").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def test_worker_matches_inline_hash_and_sheds_overflow():
+    data = _jpeg()
+
+    async def scenario():
+        worker = ImageWorkerPool(processes=0, max_pending=1, queue_timeout=0.01)
+        try:
+            assert await worker.dhash(data) == dhash_bytes(data)
+            # задание заведомо дольше queue_timeout: остальные не дождутся места
+            results = await asyncio.gather(
+                *[worker.run(time.sleep, 0.1) for _ in range(4)], return_exceptions=True
+            )
+        finally:
+            worker.shutdown()
+        return results, worker.get_stats()
+
+    results, stats = asyncio.run(scenario())
+    assert results[0] is None
+    assert sum(isinstance(r, ImageQueueFull) for r in results) == stats["rejected"] >= 1
+    assert stats["completed"] == 1 + len(results) - stats["rejected"]
+    assert stats["queue_depth"] == stats["running"] == 0
+
+
+def test_prepare_for_vision_bounds_size():
+    prepared = Image.open(io.BytesIO(prepare_image_for_vision(_jpeg((2560, 1920)), max_side=1280)))
+    assert prepared.format == "JPEG" and max(prepared.size) == 1280
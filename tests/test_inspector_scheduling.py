@@ -0,0 +1,108 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class _Inspection:
+    """Фабрика инспектора с заданной оценкой и задержкой; помнит запуск и отмену."""
+
+    def __init__(self, score, delay=0.0):
+        self.score = score
+        self.delay = delay
+        self.started = False
+        self.cancelled = False
+
+    def __call__(self, result_cls):
+        async def run():
+            self.started = True
+            try:
+                await asyncio.sleep(self.delay)
+            except asyncio.CancelledError:
+                self.cancelled = True
+                raise
+            return result_cls(score=self.score, reasons=[f"score {self.score}"])
+
+        return run
+
+
+@pytest.fixture
+def security(import_with_settings):
+    service_module = import_with_settings("bot.services.advanced_security.service")
+    config_module = import_with_settings("bot.services.advanced_security.config")
+    models_module = import_with_settings("bot.services.advanced_security.models")
+
+    service = service_module.AdvancedSecurityService(
+        fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer()),
+        learning_service=SimpleNamespace(),
+        config=config_module.SecurityConfig(SCORE_BAN=70),
+    )
+    return service, models_module.InspectionResult
+
+
+def _run(service, result_cls, specs, concurrent):
+    inspections = {name: spec(result_cls) for name, spec in specs.items()}
+    method = service._inspect_concurrent if concurrent else service._inspect_sequential
+    results = asyncio.run(method(inspections))
+    score = sum(result.score for result in results.values())
+    return results, service.verdict_calculator._get_action_by_score(score)[0]
+
+
+def test_cheap_ban_skips_expensive_inspectors(security):
+    service, result_cls = security
+    specs = {
+        "text": _Inspection(50),
+        "domain": _Inspection(40),
+        "phrase": _Inspection(10),
+        "image": _Inspection(35),
+    }
+
+    results, action = _run(service, result_cls, specs, concurrent=True)
+
+    assert action == "ban" and set(results) == {"text", "domain"}
+    assert not specs["phrase"].started and not specs["image"].started
+    stats = service.get_inspector_stats()
+    assert stats["phrase"]["skipped"] == stats["image"]["skipped"] == 1
+
+
+def test_ban_from_fast_expensive_inspector_cancels_the_slow_one(security):
+    service, result_cls = security
+    specs = {
+        "text": _Inspection(20),
+        "domain": _Inspection(0),
+        "phrase": _Inspection(60, delay=0.01),
+        "image": _Inspection(35, delay=5.0),
+    }
+
+    results, action = _run(service, result_cls, specs, concurrent=True)
+
+    assert action == "ban" and "image" not in results
+    assert specs["image"].started and specs["image"].cancelled
+    assert service.get_inspector_stats()["image"]["cancelled"] == 1
+
+
+@pytest.mark.parametrize("scores", [
+    (0, 0, 0, 0),
+    (20, 0, 10, 0),
+    (20, 15, 10, 35),
+    (40, 40, 10, 35),
+    (20, 0, 60, 35),
+    (10, 0, 10, 35),
+])
+def test_concurrent_actions_match_sequential(security, scores):
+    service, result_cls = security
+    names = ("text", "domain", "phrase", "image")
+    delays = (0.0, 0.0, 0.01, 0.02)
+
+    def specs():
+        return {name: _Inspection(score, delay) for name, score, delay in zip(names, scores, delays)}
+
+    concurrent_results, concurrent_action = _run(service, result_cls, specs(), concurrent=True)
+    sequential_results, sequential_action = _run(service, result_cls, specs(), concurrent=False)
+
+    assert concurrent_action == sequential_action
+    if concurrent_action != "ban":
+        # без раннего выхода набор результатов и причины те же
+        assert concurrent_results == sequential_results
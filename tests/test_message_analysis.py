@@ -0,0 +1,57 @@
+import asyncio
+import io
+from types import SimpleNamespace
+
+from bot.services.message_analysis import MessageAnalysis
+
+
+class _SlowBot:
+    """Бот, скачивание которого ждет сигнала; считает обращения."""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def get_file(self, file_id):
+        self.calls += 1
+        await self.release.wait()
+        return SimpleNamespace(file_path=f"photos/{file_id}.jpg")
+
+    async def download_file(self, path):
+        return io.BytesIO(b"image")
+
+
+def test_cancelled_download_is_not_cached():
+    async def scenario():
+        bot = _SlowBot()
+        analysis = MessageAnalysis(SimpleNamespace(), bot=bot)
+
+        first = asyncio.create_task(analysis.download("f1"))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(analysis.download("f1"))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        bot.release.set()
+
+        assert await waiter == b"image"
+        assert first.cancelled()
+        assert await analysis.download("f1") == b"image"
+        assert bot.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_downloads_share_one_fetch():
+    async def scenario():
+        bot = _SlowBot()
+        analysis = MessageAnalysis(SimpleNamespace(), bot=bot)
+
+        tasks = [asyncio.create_task(analysis.download("f1")) for _ in range(3)]
+        await asyncio.sleep(0)
+        bot.release.set()
+
+        assert await asyncio.gather(*tasks) == [b"image"] * 3
+        assert bot.calls == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,22 @@
+import random
+
+from bot.utils.multi_index_hash import band_values, hamming64, probe_values
+
+
+def test_pigeonhole_band_match_below_band_count():
+    rng = random.Random(3)
+    for _ in range(500):
+        value = rng.getrandbits(64)
+        other = value
+        for pos in rng.sample(range(64), 3):
+            other ^= 1 << pos
+        assert hamming64(value, other) == 3
+        assert any(a == b for a, b in zip(band_values(value), band_values(other)))
+
+
+def test_probe_values_cover_radius():
+    probes = list(probe_values(0xABCD, 1))
+    assert probes[0] == 0xABCD
+    assert len(probes) == 17
+    assert all(bin(p ^ 0xABCD).count("1") <= 1 for p in probes)
+    assert len(set(probe_values(0, 2))) == 1 + 16 + 120
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from bot.utils.count_min_sketch import SPAM, CountMinSketch
+from bot.utils.nb_sketch_store import NBSketchStore
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def _redis(**kwargs):
+    return fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), **kwargs)
+
+
+def test_write_after_eviction_recreates_header():
+    async def scenario():
+        redis = _redis()
+        store = NBSketchStore(redis, width=64, depth=2, refresh_seconds=0)
+        await store.partial_fit({1: 2}, label_spam=1)
+        await redis.flushall()
+
+        await store.get_sketch()
+        await store.partial_fit({1: 2}, label_spam=1)
+        return CountMinSketch.from_bytes(await redis.get(store.key))
+
+    sketch = asyncio.run(scenario())
+    assert sketch.docs(SPAM) == 1 and sketch.estimate(SPAM, 1) == 2
+
+
+def test_headerless_buffer_is_reinitialised_by_read_and_decay():
+    async def scenario():
+        redis = _redis()
+        store = NBSketchStore(redis, width=64, depth=2, refresh_seconds=0)
+        # так выглядит ключ, созданный BITFIELD без заголовка
+        await redis.bitfield(store.key).incrby("u32", "#40", 3).execute()
+        sketch = await store.get_sketch()
+        restored = CountMinSketch.from_bytes(await redis.get(store.key))
+
+        await redis.bitfield(store.key).incrby("u32", "#40", 3).execute()
+        await redis.delete(store.key)
+        await redis.bitfield(store.key).incrby("u32", "#40", 3).execute()
+        factor = await store.decay(now=100)
+        return sketch, restored, factor, CountMinSketch.from_bytes(await redis.get(store.key))
+
+    sketch, restored, factor, after_decay = asyncio.run(scenario())
+    assert sketch.docs(SPAM) == 0 and restored.width == 64
+    assert factor is None and after_decay.depth == 2
+
+
+def test_close_releases_only_own_binary_pool():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        text_client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+        binary_client = fakeredis.FakeAsyncRedis(server=server)
+
+        own = NBSketchStore(text_client)
+        shared = NBSketchStore(binary_client)
+        await own.close()
+        await shared.close()
+        return own.redis is not text_client, await binary_client.ping()
+
+    owns_pool, shared_alive = asyncio.run(scenario())
+    assert owns_pool and shared_alive
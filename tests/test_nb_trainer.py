@@ -0,0 +1,130 @@
+import asyncio
+import json
+
+import pytest
+
+from bot.services.anti_spam_service import NBModel
+from bot.services.nb_trainer import NBBulkTrainer
+from bot.utils.count_min_sketch import HAM, SPAM
+from bot.utils.keys import KeyFactory
+from bot.utils.nb_sketch_store import NBSketchStore
+
+fakeredis = pytest.importorskip("fakeredis")
+
+SPAM_TEXTS = [f"заработок без вложений пиши в личку {i}" for i in range(10)]
+
+
+def _redis(**kwargs):
+    return fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), **kwargs)
+
+
+class _CrashingTrainer(NBBulkTrainer):
+    """Падает после заданного числа сбросов."""
+
+    def __init__(self, *args, crash_after, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.crash_after = crash_after
+
+    async def _flush(self, *args, **kwargs):
+        await super()._flush(*args, **kwargs)
+        if args[-1].flushes >= self.crash_after:
+            raise RuntimeError("crash")
+
+
+async def _add_sample(redis, text, max_samples=10):
+    # как SpamKnowledgeBase.add_sample: LPUSH + LTRIM
+    await redis.lpush(KeyFactory.spam_samples(), text)
+    await redis.ltrim(KeyFactory.spam_samples(), 0, max_samples - 1)
+
+
+def _corpus(tmp_path, rows):
+    path = tmp_path / "corpus.jsonl"
+    path.write_text("\n".join(json.dumps(row, ensure_ascii=False) for row in rows), encoding="utf-8")
+    return str(path)
+
+
+def test_resume_counts_every_snapshotted_sample_once_despite_trimming():
+    async def scenario():
+        redis = _redis(decode_responses=True)
+        for text in SPAM_TEXTS:
+            await _add_sample(redis, text)
+
+        with pytest.raises(RuntimeError):
+            await _CrashingTrainer(redis, flush_docs=3, chunk_size=2, crash_after=1).train()
+
+        # пока тренер лежал, пришли новые примеры и вытеснили старые
+        for i in range(4):
+            await _add_sample(redis, f"новый спам {i}")
+
+        report = await NBBulkTrainer(redis, flush_docs=3, chunk_size=2).train()
+        meta = await redis.hgetall(NBModel().meta_key)
+        return report, meta, await redis.exists(KeyFactory.nb_train_samples_snapshot())
+
+    report, meta, snapshot_left = asyncio.run(scenario())
+    assert report.resumed and report.spam_docs == 7
+    assert int(meta["spam_docs"]) == len(SPAM_TEXTS)
+    assert snapshot_left == 0
+
+
+def test_rebuild_without_ham_keeps_live_model(tmp_path):
+    nb = NBModel(n_bits=12)
+
+    async def scenario():
+        redis = _redis(decode_responses=True)
+        await redis.hset(nb.ham_counts_key, mapping={"1": 5})
+        await redis.hset(nb.meta_key, mapping={"spam_docs": 1, "ham_docs": 1})
+        for text in SPAM_TEXTS:
+            await _add_sample(redis, text)
+        trainer = NBBulkTrainer(redis, nb)
+
+        with pytest.raises(ValueError):
+            await trainer.train(mode="rebuild")
+        spam_only = _corpus(tmp_path, [{"text": "ещё спам", "label": "spam"}])
+        with pytest.raises(RuntimeError):
+            await trainer.train(jsonl_path=spam_only, mode="rebuild")
+
+        return await redis.hgetall(nb.ham_counts_key), await redis.keys("*staging*")
+
+    ham, staging = asyncio.run(scenario())
+    assert ham == {"1": "5"}
+    assert staging == []
+
+
+def test_rebuild_swaps_hash_model_with_configured_feature_space(tmp_path):
+    nb = NBModel(n_bits=12)
+    corpus = _corpus(tmp_path, [
+        {"text": "Какой пул лучше для S19?", "label": "ham"},
+        {"text": "Бонус 500% переходи по ссылке", "label": "spam"},
+    ])
+
+    async def scenario():
+        redis = _redis(decode_responses=True)
+        await redis.hset(nb.spam_counts_key, mapping={"999999": 1})
+        report = await NBBulkTrainer(redis, nb).train(use_samples=False, jsonl_path=corpus, mode="rebuild")
+        fields = await redis.hkeys(nb.spam_counts_key) + await redis.hkeys(nb.ham_counts_key)
+        return report, fields
+
+    report, fields = asyncio.run(scenario())
+    assert (report.spam_docs, report.ham_docs) == (1, 1)
+    assert "999999" not in fields
+    assert all(int(field) < nb.vocab_size for field in fields)
+
+
+def test_trainer_writes_into_sketch_store(tmp_path):
+    corpus = _corpus(tmp_path, [
+        {"text": "Какой пул лучше для S19?", "label": "ham"},
+        {"text": "Бонус 500% переходи по ссылке", "label": "spam"},
+        {"text": "Бонус 500% пиши в личку", "label": "spam"},
+    ])
+
+    async def scenario():
+        redis = _redis()
+        store = NBSketchStore(redis, width=256, depth=2)
+        trainer = NBBulkTrainer(redis, NBModel(n_bits=12), sketch=store, flush_docs=2)
+        await trainer.train(use_samples=False, jsonl_path=corpus, mode="rebuild")
+        store.invalidate()
+        return await store.get_sketch(), await redis.exists(NBModel().spam_counts_key)
+
+    sketch, hash_model = asyncio.run(scenario())
+    assert (sketch.docs(SPAM), sketch.docs(HAM)) == (2, 1)
+    assert hash_model == 0
@@ -0,0 +1,36 @@
+from bot.utils.text.memo import NormalizationMemo
+
+
+def test_memo_hits_and_lru_eviction():
+    memo = NormalizationMemo(max_entries=2, min_chars=1)
+    calls = []
+
+    def upper(text):
+        calls.append(text)
+        return text.upper()
+
+    assert memo.get_or_compute("p", "first", upper) == "FIRST"
+    assert memo.get_or_compute("p", "first", upper) == "FIRST"
+    assert memo.get_or_compute("other", "first", upper) == "FIRST"
+    assert calls == ["first", "first"]
+
+    memo.get_or_compute("p", "second", upper)  # вытесняет ("p", "first")
+    memo.get_or_compute("other", "first", upper)
+    assert calls == ["first", "first", "second"]
+
+    stats = memo.get_stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2
+    assert stats["bytes_held"] > 0
+
+
+def test_memo_respects_byte_budget_and_short_texts():
+    memo = NormalizationMemo(max_bytes=200, min_chars=4)
+
+    memo.get_or_compute("p", "abc", str.upper)
+    assert memo.get_stats()["misses"] == 0
+
+    for i in range(10):
+        memo.get_or_compute("p", f"text number {i}", str.upper)
+    assert memo.get_stats()["bytes_held"] <= 200
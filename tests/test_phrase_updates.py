@@ -0,0 +1,27 @@
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def test_phrases_are_journaled_in_version_order(import_with_settings):
+    kb_module = import_with_settings("bot.services.antispam_learning.knowledge_base")
+
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+        kb = kb_module.SpamKnowledgeBase(redis)
+
+        first = await kb.add_phrases({"быстрый заработок"})
+        synced = await kb.get_phrase_updates(0)
+        versions = await asyncio.gather(*(kb.add_phrases({f"фраза {i}"}) for i in range(5)))
+        later = await kb.get_phrase_updates(synced[1])
+        return first, synced, versions, later
+
+    first, synced, versions, later = asyncio.run(scenario())
+    assert first == 1
+    assert synced == ({"быстрый заработок": 1.0}, 1)
+    assert sorted(versions) == [2, 3, 4, 5, 6]
+    updates, version = later
+    assert version == 6
+    assert set(updates) == {f"фраза {i}" for i in range(5)}
@@ -0,0 +1,138 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from bot.utils import quiz_pool
+from bot.utils.keys import KeyFactory
+from bot.utils.models import QuizQuestion
+from bot.utils.quiz_pool import QuizQuestionPool, question_hash, validate_question
+
+
+class _ListRedis:
+    def __init__(self, items):
+        self.items = list(items)
+
+    async def lpop(self, key):
+        return self.items.pop(0) if self.items else None
+
+
+def _item(question="Кто создал Bitcoin?", options=("Виталик", "Сатоши", "Чарли", "Илон"), index=1):
+    return {"question": question, "options": list(options), "correct_option_index": index}
+
+
+def test_generated_questions_are_validated_and_hashed_by_normalized_text():
+    assert validate_question(_item()) is not None
+    assert validate_question(_item(options=("A", "B", "C"))) is None
+    assert validate_question(_item(options=("A", "a", "C", "D"))) is None
+    assert validate_question(_item(index=4)) is None
+    assert validate_question({"question": "?"}) is None
+
+    same = QuizQuestion.model_validate(_item(question="  кто   создал bitcoin ?"))
+    other = QuizQuestion.model_validate(_item(question="Что такое халвинг?"))
+    assert question_hash(same) == question_hash(QuizQuestion.model_validate(_item()))
+    assert question_hash(same) != question_hash(other)
+
+
+def test_pop_skips_corrupt_entries_and_reports_empty_pool():
+    question = QuizQuestion.model_validate(_item())
+    pool = QuizQuestionPool(_ListRedis([question.model_dump_json(), "{broken"]))
+
+    async def scenario():
+        return [await pool.pop() for _ in range(3)]
+
+    assert asyncio.run(scenario()) == [question, None, None]
+
+
+def _redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+
+
+def _question(n):
+    return QuizQuestion.model_validate(_item(question=f"Вопрос номер {n}?"))
+
+
+def test_push_dedups_by_hash_caps_size_and_forgets_old_hashes(monkeypatch):
+    clock = [1000]
+    monkeypatch.setattr(quiz_pool, "time", SimpleNamespace(time=lambda: clock[0]))
+    redis = _redis()
+    pool = QuizQuestionPool(redis, max_size=3, retention_seconds=100)
+
+    async def scenario():
+        first = await pool.push([_question(1), _question(1), _question(2)])
+        repeated = await pool.push([_question(2), _question(3), _question(4), _question(5)])
+        popped = await pool.pop()
+
+        clock[0] += 50
+        still_known = await pool.push([_question(1)])
+        clock[0] += 60  # хэш вопроса 1 старше retention
+        forgotten = await pool.push([_question(1)])
+        return first, repeated, popped, still_known, forgotten, await pool.size()
+
+    first, repeated, popped, still_known, forgotten, size = asyncio.run(scenario())
+    assert (first, repeated) == (2, 1)  # в пуле только 3 места
+    assert popped == _question(1)
+    assert (still_known, forgotten, size) == (0, 1, 3)
+
+
+class _QuizAI:
+    """AI, выдающий партии из заданного списка (повторы — как у настоящего AI)."""
+
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.calls = 0
+
+    async def get_structured_response(self, prompt, json_schema, temperature=None):
+        self.calls += 1
+        batch = self.batches.pop(0) if self.batches else []
+        return {"questions": [_item(question=f"Вопрос номер {n}?") for n in batch]}
+
+
+def _quiz_service(import_with_settings, ai, *, offpeak=False):
+    quiz_module = import_with_settings("bot.services.quiz_service")
+    service = quiz_module.QuizService(ai, redis=_redis())
+    service.config = SimpleNamespace(pool_target=6, pool_low_water=3, refill_batch_size=3)
+    service.pool.max_size = 100
+    service._is_offpeak = lambda: offpeak
+    return service
+
+
+def test_refill_waits_for_low_water_outside_offpeak(import_with_settings):
+    ai = _QuizAI([[10, 11, 12]])
+    service = _quiz_service(import_with_settings, ai)
+
+    async def scenario():
+        await service.pool.push([_question(n) for n in range(4)])
+        return await service.refill_pool(), ai.calls
+
+    assert asyncio.run(scenario()) == (0, 0)
+
+
+def test_refill_tops_up_offpeak_and_below_low_water(import_with_settings):
+    ai = _QuizAI([[10, 11]])
+    offpeak = _quiz_service(import_with_settings, ai, offpeak=True)
+    low = _quiz_service(import_with_settings, _QuizAI([[20, 21, 22], [23, 24, 25]]))
+
+    async def scenario():
+        await offpeak.pool.push([_question(n) for n in range(4)])
+        return await offpeak.refill_pool(), await offpeak.pool.size(), await low.refill_pool()
+
+    assert asyncio.run(scenario()) == (2, 6, 6)
+
+
+def test_refill_stops_after_consecutive_empty_batches(import_with_settings):
+    # AI повторяет уже выданные вопросы — каждая партия ничего не добавляет
+    ai = _QuizAI([[1, 2], [1], [2], [1, 2], [3]])
+    service = _quiz_service(import_with_settings, ai)
+
+    async def scenario():
+        await service.pool.push([_question(1), _question(2)])
+        added = await service.refill_pool()
+        locked = await service.redis.exists(f"lock:{KeyFactory.quiz_pool_refill_lock()}")
+        return added, ai.calls, locked
+
+    added, calls, locked = asyncio.run(scenario())
+    assert added == 0
+    assert calls == service.MAX_EMPTY_BATCHES
+    assert locked == 0
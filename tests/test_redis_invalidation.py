@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from bot.utils.redis_invalidation import VersionedInvalidator
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def _pair():
+    redis = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+    reader = VersionedInvalidator(redis, "test:version", "invalidate:test", name="reader")
+    writer = VersionedInvalidator(redis, "test:version", "invalidate:test", name="writer")
+    return reader, writer
+
+
+def test_polling_mode_compares_local_and_remote_versions():
+    reader, writer = _pair()
+    reader.start = lambda: None  # без подписки — режим опроса версии
+
+    async def scenario():
+        empty = await reader.needs_refresh()
+        reader.mark_fresh(await reader.get_remote_version())
+        fresh = await reader.needs_refresh()
+        await writer.bump()
+        changed = await reader.needs_refresh()
+        reader.mark_fresh(1)
+        return empty, fresh, changed, await reader.needs_refresh()
+
+    assert asyncio.run(scenario()) == (True, False, True, False)
+
+
+def test_notification_during_load_keeps_cache_stale():
+    reader, _ = _pair()
+    seen = []
+
+    async def on_invalidate(version, payload):
+        seen.append((version, payload))
+
+    reader.on_invalidate = on_invalidate
+
+    async def scenario():
+        reader.mark_fresh(3)
+        # загрузка версии 4 идет, а уже пришло уведомление о 5
+        await reader._handle_message(b"5:words")
+        reader.mark_fresh(4)
+        stale_after_older_load = reader._stale
+        reader.mark_fresh(5)
+        fresh = not reader._stale
+        await reader._handle_message("5")
+        return stale_after_older_load, fresh, reader._stale
+
+    assert asyncio.run(scenario()) == (True, True, False)
+    assert seen == [(5, "words"), (5, None)]
+
+
+def test_listener_marks_stale_on_publish_and_stops_on_close():
+    reader, writer = _pair()
+
+    async def wait_for(condition):
+        for _ in range(200):
+            if condition():
+                return True
+            await asyncio.sleep(0.01)
+        return False
+
+    async def scenario():
+        reader.start()
+        assert await wait_for(lambda: reader.is_listening)
+        reader.mark_fresh(0)
+        assert not await reader.needs_refresh()
+
+        await writer.bump()
+        invalidated = await wait_for(lambda: reader._stale)
+        task = reader._listener_task
+        await reader.close()
+        return invalidated, task.done(), reader.is_listening
+
+    assert asyncio.run(scenario()) == (True, True, False)
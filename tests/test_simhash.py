@@ -0,0 +1,32 @@
+import hashlib
+
+from bot.utils.simhash import bands, hamming_distance, shingles, simhash, text_simhash
+
+
+def test_near_duplicates_are_close():
+    base = "заработок от 500$ в день без вложений пиши в личку расскажу подробности места ограничены"
+    mutated = "заработок от 600$ в день без вложений пиши в личку расскажу подробности места ограничены"
+    other = "привет всем кто знает где купить асик s19 подешевле в москве нужен срочно"
+
+    assert hamming_distance(text_simhash(base), text_simhash(mutated)) <= 10
+    assert hamming_distance(text_simhash(base), text_simhash(other)) > 20
+
+
+def test_bands_split_fingerprint():
+    fingerprint = 0x0123456789ABCDEF
+    assert bands(fingerprint, 4) == [0x0123, 0x4567, 0x89AB, 0xCDEF]
+    assert len(bands(fingerprint)) == 8
+
+
+def test_vectorised_weights_match_bitwise_definition():
+    features = shingles("пиши в личку заработок 500$ в день") + ["", "личку", "личку"]
+
+    weights = [0] * 64
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    expected = sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+    assert simhash(features) == expected
+    assert simhash([]) == 0
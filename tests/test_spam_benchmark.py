@@ -0,0 +1,26 @@
+from bot.diagnostics.spam_benchmark import Sample, find_regressions, percentile, synthesize
+
+
+def test_percentile_nearest_rank():
+    values = [0.001 * i for i in range(1, 101)]
+    assert percentile(values, 50) == values[49]
+    assert percentile(values, 99) == values[98]
+    assert percentile([], 99) == 0.0
+
+
+def test_regressions_respect_tolerance():
+    baseline = {"classifiers": {"nb": {"precision": 0.9, "recall": 0.8, "messages_per_sec": 1000}}}
+    ok = {"classifiers": {"nb": {"precision": 0.89, "recall": 0.8, "messages_per_sec": 800}}}
+    bad = {"classifiers": {"nb": {"precision": 0.8, "recall": 0.8, "messages_per_sec": 500}}}
+
+    assert find_regressions(ok, baseline) == []
+    assert len(find_regressions(bad, baseline)) == 2
+
+
+def test_synthesis_is_deterministic_and_keeps_labels():
+    samples = [Sample("Заработок без вложений, пиши в личку", True), Sample("Какой пул лучше?", False)]
+    first = synthesize(samples, variants=3, seed=7)
+
+    assert first == synthesize(samples, variants=3, seed=7)
+    assert len(first) == 6
+    assert [s.is_spam for s in first] == [True] * 3 + [False] * 3
@@ -0,0 +1,45 @@
+import io
+import random
+from functools import partial
+
+from bot.utils.image_hash_transfer import HashFileReader, write_hashes
+from bot.utils.keys import KeyFactory
+from bot.utils.multi_index_hash import MultiIndexHashIndex
+
+
+class _RecordingPipeline:
+    def __init__(self):
+        self.sets = {}
+
+    def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(int(m) for m in members)
+
+
+def test_text_and_binary_round_trip_in_small_chunks():
+    hashes = [random.getrandbits(64) for _ in range(1000)] + [0, (1 << 64) - 1]
+    for fmt in ("text", "binary"):
+        buffer = io.BytesIO()
+        write_hashes(buffer, hashes[:500], fmt)
+        write_hashes(buffer, hashes[500:], fmt)
+        buffer.seek(0)
+        reader = HashFileReader(buffer, chunk_size=64)
+        assert [h for batch in reader.batches(300) for h in batch] == hashes
+        assert reader.invalid == 0
+
+    reader = HashFileReader(io.BytesIO(b"# list\n0x10\n42\n\nnot-a-hash\n-1\n7"))
+    assert list(reader.batches(10)) == [[16, 42, 7]]
+    assert reader.invalid == 2
+
+
+def test_bulk_staging_puts_every_hash_in_each_band_bucket():
+    index = MultiIndexHashIndex(
+        None, partial(KeyFactory.image_fingerprint_band, "phash"), max_distance=10, ttl_seconds=60
+    )
+    hashes = {random.getrandbits(64) for _ in range(2000)}
+    pipe = _RecordingPipeline()
+    band_keys = index.stage_add_many(pipe, hashes)
+
+    assert [len(keys) for keys in band_keys] == [len(set(keys)) for keys in band_keys]
+    for image_hash in hashes:
+        assert all(image_hash in pipe.sets[key] for key in index.bucket_keys(image_hash))
+    assert sum(len(pipe.sets[key]) for key in band_keys[0]) == len(hashes)
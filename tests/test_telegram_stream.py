@@ -0,0 +1,60 @@
+import asyncio
+
+from bot.utils.telegram_stream import TELEGRAM_TEXT_LIMIT, stream_to_message
+
+
+class _Chat:
+    type = "private"
+
+
+class _Sent:
+    def __init__(self, log, text):
+        self.log = log
+        self.text = text
+
+    async def edit_text(self, text, parse_mode=None):
+        self.log.append(("edit", text))
+        self.text = text
+
+
+class _Message:
+    chat = _Chat()
+
+    def __init__(self):
+        self.log = []
+        self.sent = []
+
+    async def answer(self, text, parse_mode=None):
+        self.log.append(("send", text))
+        sent = _Sent(self.log, text)
+        self.sent.append(sent)
+        return sent
+
+
+async def _chunks(parts, delay=0.0):
+    for part in parts:
+        await asyncio.sleep(delay)
+        yield part
+
+
+def test_first_chunk_is_sent_at_once_and_edits_are_throttled():
+    message = _Message()
+    parts = ["Биткоин ", "- это ", "<первая> ", "криптовалюта."] * 5
+    result = asyncio.run(
+        stream_to_message(message, _chunks(parts, delay=0.01), header="<b>A:</b> ", edit_interval=0.05)
+    )
+
+    assert result == "".join(parts)
+    assert message.log[0] == ("send", "<b>A:</b> Биткоин  ▌")
+    assert len(message.log) < len(parts)
+    assert message.sent[0].text == "<b>A:</b> " + result.replace("<", "&lt;").replace(">", "&gt;")
+
+
+def test_long_answer_continues_in_next_message():
+    message = _Message()
+    parts = ["слово " * 100] * 20
+    result = asyncio.run(stream_to_message(message, _chunks(parts), edit_interval=0))
+
+    assert len(message.sent) == 3
+    assert all(len(sent.text) <= TELEGRAM_TEXT_LIMIT for sent in message.sent)
+    assert " ".join(sent.text for sent in message.sent).split() == result.split()
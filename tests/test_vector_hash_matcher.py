@@ -0,0 +1,27 @@
+import random
+
+from bot.utils.vector_hash_matcher import VectorHashMatcher
+
+
+def test_nearest_matches_bruteforce():
+    rng = random.Random(11)
+    hashes = [rng.getrandbits(64) for _ in range(5000)]
+    matcher = VectorHashMatcher()
+    matcher.load(hashes)
+
+    query = hashes[42] ^ 0b10101
+    assert matcher.nearest(query, max_distance=5) == (hashes[42], 3)
+    assert matcher.nearest(query, max_distance=2) is None
+
+
+def test_add_remove_are_idempotent_and_grow():
+    matcher = VectorHashMatcher(initial_capacity=2)
+    for value in (1, 2, 3, 2**64 - 1):
+        assert matcher.add(value)
+    assert not matcher.add(3)
+    assert len(matcher) == 4
+
+    assert matcher.remove(2)
+    assert not matcher.remove(2)
+    assert 2 not in matcher and 2**64 - 1 in matcher
+    assert matcher.nearest(2**64 - 2, max_distance=1) == (2**64 - 1, 1)
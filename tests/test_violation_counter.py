@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from bot.utils.keys import KeyFactory
+from bot.utils.violation_counter import ViolationCounter
+
+fakeredis = pytest.importorskip("fakeredis")
+
+THRESHOLDS = {"warn_threshold": 1, "mute_threshold": 3, "ban_threshold": 5}
+
+
+def _redis():
+    return fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+
+
+def test_script_escalates_by_thresholds_like_decide():
+    async def scenario():
+        counter = ViolationCounter(_redis())
+        results = [
+            await counter.register("v", window_seconds=60, score=0.5, **THRESHOLDS)
+            for _ in range(5)
+        ]
+        heavy = await counter.register("w", window_seconds=60, weight=3, **THRESHOLDS)
+        silent = await counter.register("x", window_seconds=60)
+        return results, heavy, silent
+
+    results, heavy, silent = asyncio.run(scenario())
+    assert [r.decision for r in results] == ["warn", "warn", "mute", "mute", "ban"]
+    assert [r.decision for r in results] == [ViolationCounter.decide(r.count, **THRESHOLDS) for r in results]
+    assert results[-1].score_sum == pytest.approx(2.5)
+    assert (heavy.count, heavy.decision) == (3, "mute")
+    assert silent.decision == "none"
+
+
+def test_sliding_window_is_extended_and_fixed_window_is_not():
+    async def scenario():
+        redis = _redis()
+        counter = ViolationCounter(redis)
+        ttls = {}
+        for key, sliding in (("sliding", True), ("fixed", False)):
+            await counter.register(key, window_seconds=100, sliding=sliding)
+            await redis.expire(key, 30)  # прошло 70 секунд окна
+            result = await counter.register(key, window_seconds=100, sliding=sliding)
+            ttls[key] = (result.count, await redis.ttl(key))
+        return ttls
+
+    ttls = asyncio.run(scenario())
+    assert ttls["sliding"][0] == 2 and ttls["sliding"][1] > 30
+    assert ttls["fixed"] == (2, 30)
+
+
+def test_legacy_string_counter_is_migrated_with_its_ttl():
+    async def scenario():
+        redis = _redis()
+        counter = ViolationCounter(redis)
+        await redis.set("legacy", 2, ex=50)
+        before = await counter.get_count("legacy")
+        result = await counter.register("legacy", window_seconds=100, sliding=False, **THRESHOLDS)
+        return before, result, await redis.type("legacy"), await redis.ttl("legacy"), await counter.get_count("legacy")
+
+    before, result, key_type, ttl, after = asyncio.run(scenario())
+    assert before == 2
+    assert (result.count, result.decision) == (3, "mute")
+    assert (key_type, ttl, after) == ("hash", 50, 3)
+
+
+def test_image_guard_tracker_keeps_counting_a_legacy_counter(import_with_settings):
+    tracker_module = import_with_settings("bot.services.image_guard.violation_tracker")
+
+    async def scenario():
+        redis = _redis()
+        tracker = tracker_module.ViolationTracker(redis)
+        key = KeyFactory.user_spam_image_count(42)
+        await redis.set(key, 1, ex=3600)
+        return [await tracker.increment_violations(42) for _ in range(2)], await redis.ttl(key)
+
+    counts, ttl = asyncio.run(scenario())
+    assert counts == [2, 3]
+    assert 0 < ttl <= 3600
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from bot.utils.vision_queue import VisionOverloaded, VisionWorkQueue
+
+
+def test_concurrency_fairness_and_inflight_dedup():
+    async def scenario():
+        queue = VisionWorkQueue(max_concurrency=1, max_queue=16, max_queue_per_chat=8, max_wait=0)
+        release = asyncio.Event()
+        started, calls = [], []
+
+        def job(name):
+            async def run():
+                started.append(name)
+                calls.append(name)
+                await release.wait()
+                return name
+            return run
+
+        raid = [queue.submit(job(f"raid{i}"), chat_id="raid") for i in range(4)]
+        other = queue.submit(job("other"), chat_id="calm")
+        dup_a = queue.submit(job("same"), key="uid", chat_id="calm")
+        dup_b = queue.submit(job("same-again"), key="uid", chat_id="calm")
+        tasks = [asyncio.ensure_future(c) for c in raid + [other, dup_a, dup_b]]
+        await asyncio.sleep(0)
+        assert queue.get_stats()["running"] == 1
+        release.set()
+        results = await asyncio.gather(*tasks)
+        return results, calls, queue.get_stats()
+
+    results, calls, stats = asyncio.run(scenario())
+    # спокойный чат не ждет весь рейд: round-robin между чатами
+    assert calls.index("other") < calls.index("raid2") and calls.index("same") < calls.index("raid3")
+    assert results[-2:] == ["same", "same"] and "same-again" not in calls
+    assert stats["deduplicated"] == 1 and stats["completed"] == 6 and stats["running"] == 0
+
+
+def test_saturated_queue_sheds_instead_of_queueing():
+    async def scenario():
+        queue = VisionWorkQueue(max_concurrency=1, max_queue=2, max_queue_per_chat=1)
+        gate = asyncio.Event()
+
+        async def slow():
+            await gate.wait()
+            return "ok"
+
+        first = asyncio.ensure_future(queue.submit(slow, chat_id=1))
+        queued = asyncio.ensure_future(queue.submit(slow, chat_id=1))
+        await asyncio.sleep(0)
+        assert not queue.accepts(1) and queue.accepts(2)
+        with pytest.raises(VisionOverloaded):
+            await queue.submit(slow, chat_id=1)
+        gate.set()
+        assert await asyncio.gather(first, queued) == ["ok", "ok"]
+        return queue.get_stats()
+
+    assert asyncio.run(scenario())["shed"] == 1
+
+
+def test_job_waiting_past_max_wait_is_dropped_while_slot_is_busy():
+    async def scenario():
+        queue = VisionWorkQueue(max_concurrency=1, max_queue=4, max_queue_per_chat=4, max_wait=0.05)
+        gate = asyncio.Event()
+
+        async def slow():
+            await gate.wait()
+            return "ok"
+
+        running = asyncio.ensure_future(queue.submit(slow, chat_id=1))
+        await asyncio.sleep(0)
+        with pytest.raises(VisionOverloaded):
+            # слот все еще занят: отказ приходит по таймеру, а не при выборке
+            await asyncio.wait_for(queue.submit(slow, key="uid", chat_id=2), 1)
+        stats = queue.get_stats()
+        gate.set()
+        assert await running == "ok"
+        return stats, queue._inflight
+
+    stats, inflight = asyncio.run(scenario())
+    assert stats["queued"] == 0 and stats["chats_waiting"] == 0 and stats["shed"] == 1
+    assert inflight == {}